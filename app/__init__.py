@@ -3,6 +3,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import config
 
 # Inicialização das extensões
@@ -17,6 +18,12 @@ def create_app(config_name='default'):
     # Configuração da aplicação
     app.config.from_object(config[config_name])
     
+    # Atrás de proxies reversos, o IP do cliente (limite de login) e o esquema
+    # vêm de X-Forwarded-*; só os últimos N saltos, os dos proxies confiáveis, valem
+    saltos = app.config.get('PROXY_SALTOS_CONFIAVEIS', 0)
+    if saltos:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=saltos, x_proto=saltos)
+    
     # Inicialização das extensões
     db.init_app(app)
     login_manager.init_app(app)
@@ -50,6 +57,38 @@ def create_app(config_name='default'):
     # Importação dos modelos para que sejam reconhecidos pelo SQLAlchemy
     from app import models
     
+    # Hash de senhas (método configurável e pool de verificação)
+    from app import senhas
+    senhas.init_app(app)
+    
+    # Limite de tentativas de login por IP e por e-mail
+    from app import limite_login
+    limite_login.init_app(app)
+    
+    # Barramento de invalidação dos caches em memória entre processos
+    from app import invalidacao
+    invalidacao.init_app(app)
+    
+    # Autenticação da API por tokens JWT (Authorization: Bearer)
+    from app import tokens
+    tokens.init_app(app)
+    
+    # Índice de disponibilidade (bitmap de horários livres)
+    from app import disponibilidade
+    disponibilidade.init_app(app)
+    
+    # Envio de e-mails (SMTP ou memória, conforme EMAIL_BACKEND)
+    from app import emails
+    emails.init_app(app)
+    
+    # Eventos de agenda em tempo real (SSE)
+    from app import eventos
+    eventos.init_app(app)
+    
+    # Comandos de manutenção (flask <comando>)
+    from app.cli import init_cli
+    init_cli(app)
+    
     # Filtros personalizados para tradução
     @app.template_filter('dia_semana_pt')
     def dia_semana_pt(data):
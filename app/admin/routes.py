@@ -1,7 +1,8 @@
 import pytz
-from flask import render_template, request, redirect, url_for, flash
+from flask import current_app, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from app.models import Usuario, Psicologo, Paciente, Agendamento, Admin, db
+from app import importacao_psicologos, invalidacao
 from sqlalchemy import func, case, String, cast
 from functools import wraps
 
@@ -252,6 +253,7 @@ def init_routes(admin):
                 db.session.add(novo_psicologo)
                 
                 db.session.commit()
+                invalidacao.publicar('psicologos')
                 
                 flash('Psicólogo cadastrado com sucesso!', 'success')
                 return redirect(url_for('admin.dashboard'))
@@ -261,4 +263,40 @@ def init_routes(admin):
                 flash(f"Erro ao cadastrar psicólogo: {e}") # Adicionado para depuração
                 return render_template('admin/cadastrar_psicologo.html')
         
-        return render_template('admin/cadastrar_psicologo.html')
\ No newline at end of file
+        return render_template('admin/cadastrar_psicologo.html')
+    
+    @admin.route('/importar_psicologos', methods=['GET', 'POST'])
+    @login_required
+    @admin_required
+    def importar_psicologos():
+        """Cadastrar psicólogos em lote a partir de um arquivo CSV"""
+        resultado = None
+        if request.method == 'POST':
+            arquivo = request.files.get('arquivo')
+            if not arquivo or not arquivo.filename:
+                flash('Selecione o arquivo CSV.', 'error')
+                return render_template('admin/importar_psicologos.html')
+            
+            try:
+                linhas = importacao_psicologos.ler_csv(arquivo.read())
+            except importacao_psicologos.ArquivoInvalido as e:
+                flash(str(e), 'error')
+                return render_template('admin/importar_psicologos.html')
+            
+            # Hashes em série, dentro da requisição: arquivos grandes vão pela linha de comando
+            limite = current_app.config.get('IMPORTACAO_LIMITE_WEB', 100)
+            if len(linhas) > limite:
+                flash(f'O arquivo tem {len(linhas)} linhas; pelo painel o limite é {limite}. '
+                      f'Use "flask importar-psicologos" para arquivos maiores.', 'error')
+                return render_template('admin/importar_psicologos.html')
+            
+            resultado = importacao_psicologos.importar(linhas, simular=bool(request.form.get('simular')))
+            
+            if request.form.get('simular'):
+                flash(f"{resultado['validas']} psicólogo(s) prontos para cadastro.", 'info')
+            elif resultado['criados']:
+                flash(f"{resultado['criados']} psicólogo(s) cadastrado(s) com sucesso!", 'success')
+            if resultado['erros']:
+                flash(f"{len(resultado['erros'])} linha(s) com erro não foram cadastradas.", 'error')
+        
+        return render_template('admin/importar_psicologos.html', resultado=resultado)
\ No newline at end of file
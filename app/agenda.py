@@ -0,0 +1,422 @@
+"""Operações sobre agendamentos compartilhadas pelas áreas do paciente e do psicólogo."""
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import tuple_
+
+from app import disponibilidade, eventos, lista_espera, notificacoes, reservas
+from app.models import Agendamento, Paciente, Prontuario, Psicologo, ReservaHorario, Usuario, db
+
+
+class ErroAgendamento(Exception):
+    """Operação de agendamento recusada; a mensagem pode ser exibida ao usuário"""
+
+
+def bloquear_agenda(psicologo_id):
+    """Serializa as alterações na agenda do psicólogo até o fim da transação.
+
+    No PostgreSQL trava a linha do psicólogo (``SELECT ... FOR UPDATE``), de
+    modo que duas transações não validem o mesmo horário ao mesmo tempo. No
+    SQLite a cláusula é ignorada e as escritas já são serializadas pelo banco.
+    """
+    db.session.query(Psicologo.id).filter(
+        Psicologo.id == psicologo_id
+    ).with_for_update().first()
+
+
+def verificar_conflito(psicologo_id, data_hora, duracao_minutos=disponibilidade.DURACAO_SESSAO_MINUTOS,
+                       ignorar_id=None):
+    """Agendamento ativo do psicólogo que se sobrepõe à sessão, se houver"""
+    fim = data_hora + timedelta(minutes=duracao_minutos)
+    consulta = Agendamento.query.filter(
+        Agendamento.psicologo_id == psicologo_id,
+        Agendamento.filtro_sobreposicao(data_hora, fim),
+        Agendamento.status.in_(disponibilidade.STATUS_OCUPADOS)
+    )
+    if ignorar_id is not None:
+        consulta = consulta.filter(Agendamento.id != ignorar_id)
+    return consulta.first()
+
+
+# Status que o psicólogo pode registrar ao fechar o dia
+STATUS_FECHAMENTO = ('confirmado', 'realizado', 'ausencia')
+LIMITE_ITENS_LOTE = 200
+
+
+def atualizar_status_em_lote(psicologo_id, itens):
+    """Aplica vários pares ``{agendamento_id, status}`` em uma única transação.
+
+    A posse dos agendamentos é verificada com uma única consulta e as
+    alterações são gravadas com um ``UPDATE`` por status. Itens inválidos
+    (status não permitido, agendamento de outro psicólogo ou cancelado) são
+    recusados individualmente sem impedir os demais.
+
+    Retorna a lista de resultados por item, na ordem recebida.
+    """
+    if len(itens) > LIMITE_ITENS_LOTE:
+        raise ErroAgendamento(f'Envie no máximo {LIMITE_ITENS_LOTE} agendamentos por vez.')
+
+    resultados = []
+    pedidos = {}
+    for item in itens:
+        try:
+            agendamento_id = int(item.get('agendamento_id'))
+        except (AttributeError, TypeError, ValueError):
+            resultados.append({'agendamento_id': None, 'sucesso': False, 'erro': 'ID de agendamento inválido'})
+            continue
+        status = item.get('status')
+        resultado = {'agendamento_id': agendamento_id, 'status': status, 'sucesso': False}
+        resultados.append(resultado)
+        if status not in STATUS_FECHAMENTO:
+            resultado['erro'] = 'Status não permitido'
+        elif agendamento_id in pedidos:
+            resultado['erro'] = 'Agendamento repetido na requisição'
+        else:
+            pedidos[agendamento_id] = resultado
+
+    atuais = dict(db.session.query(Agendamento.id, Agendamento.status).filter(
+        Agendamento.id.in_(pedidos),
+        Agendamento.psicologo_id == psicologo_id
+    ).all()) if pedidos else {}
+
+    # Agrupados por (status novo, status lido): o UPDATE só pega a linha se
+    # ela ainda estiver como foi lida, então um cancelamento concorrente
+    # entre o SELECT e o UPDATE não é sobrescrito.
+    por_status = {}
+    for agendamento_id, resultado in pedidos.items():
+        if agendamento_id not in atuais:
+            resultado['erro'] = 'Agendamento não encontrado'
+        elif atuais[agendamento_id] == 'cancelado':
+            resultado['erro'] = 'Consulta cancelada'
+        else:
+            chave = (resultado['status'], atuais[agendamento_id])
+            por_status.setdefault(chave, []).append(agendamento_id)
+
+    atualizados = {}
+    try:
+        for (status, atual), ids in por_status.items():
+            filtro = (
+                Agendamento.id.in_(ids),
+                Agendamento.psicologo_id == psicologo_id,
+                Agendamento.status == atual
+            )
+            total = Agendamento.query.filter(*filtro).update({'status': status}, synchronize_session=False)
+            if total == len(ids):
+                atualizados[status] = atualizados.get(status, []) + ids
+            elif total:
+                # As linhas já estão travadas pelo UPDATE; basta ver quais mudaram.
+                alterados = {linha[0] for linha in db.session.query(Agendamento.id).filter(
+                    Agendamento.id.in_(ids), Agendamento.status == status
+                )}
+                atualizados[status] = atualizados.get(status, []) + [i for i in ids if i in alterados]
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    canal = eventos.canal_psicologo(psicologo_id)
+    for status, ids in atualizados.items():
+        for agendamento_id in ids:
+            pedidos[agendamento_id]['sucesso'] = True
+            eventos.publicar(canal, 'agendamento_status', {'id': agendamento_id, 'status': status})
+    for resultado in pedidos.values():
+        if not resultado['sucesso'] and 'erro' not in resultado:
+            resultado['erro'] = 'Agendamento alterado por outra operação'
+    return resultados
+
+
+def criar_agendamentos_em_lote(itens, agora=None):
+    """Cria vários agendamentos em uma única transação.
+
+    Cada item traz ``paciente_id``, ``psicologo_id``, ``data_hora``,
+    ``duracao_minutos`` e ``observacoes`` (ou ``erro``, se já foi recusado
+    na leitura). Existência de pacientes e psicólogos, sessões sobrepostas
+    (inclusive entre itens do próprio lote) e reservas de outros pacientes
+    são verificadas com uma consulta para o lote inteiro; itens inválidos
+    são recusados individualmente sem impedir os demais.
+
+    Retorna a lista de resultados por item, na ordem recebida.
+    """
+    if len(itens) > LIMITE_ITENS_LOTE:
+        raise ErroAgendamento(f'Envie no máximo {LIMITE_ITENS_LOTE} agendamentos por vez.')
+
+    agora = agora or datetime.now()
+    resultados = [{'indice': indice, 'sucesso': False} for indice in range(len(itens))]
+    validos = []
+    for indice, item in enumerate(itens):
+        if item.get('erro'):
+            resultados[indice]['erro'] = item['erro']
+        else:
+            validos.append((indice, item))
+    if not validos:
+        return resultados
+
+    psicologo_ids = {item['psicologo_id'] for _, item in validos}
+    paciente_ids = {item['paciente_id'] for _, item in validos}
+    inicio = min(item['data_hora'] for _, item in validos)
+    fim = max(item['data_hora'] + timedelta(minutes=item['duracao_minutos']) for _, item in validos)
+
+    criados = []
+    try:
+        nomes_psicologos = dict(db.session.query(Psicologo.id, Usuario.nome_completo).join(
+            Usuario, Usuario.id == Psicologo.usuario_id
+        ).filter(Psicologo.id.in_(psicologo_ids)).all())
+        usuarios_pacientes = dict(db.session.query(Paciente.id, Usuario).join(
+            Usuario, Usuario.id == Paciente.usuario_id
+        ).filter(Paciente.id.in_(paciente_ids)).all())
+
+        for psicologo_id in sorted(nomes_psicologos):
+            bloquear_agenda(psicologo_id)
+
+        ocupados = {}
+        for psicologo_id, ocupado_inicio, ocupado_fim in db.session.query(
+            Agendamento.psicologo_id, Agendamento.data_hora, Agendamento.data_hora_fim
+        ).filter(
+            Agendamento.psicologo_id.in_(psicologo_ids),
+            Agendamento.filtro_sobreposicao(inicio, fim),
+            Agendamento.status.in_(disponibilidade.STATUS_OCUPADOS)
+        ):
+            ocupados.setdefault(psicologo_id, []).append((ocupado_inicio, ocupado_fim))
+
+        reservados = {}
+        for psicologo_id, reserva_inicio, reserva_fim, paciente_id in db.session.query(
+            ReservaHorario.psicologo_id, ReservaHorario.data_hora,
+            ReservaHorario.data_hora_fim, ReservaHorario.paciente_id
+        ).filter(
+            ReservaHorario.psicologo_id.in_(psicologo_ids),
+            ReservaHorario.data_hora < fim,
+            ReservaHorario.data_hora_fim > inicio,
+            ReservaHorario.expira_em > datetime.utcnow()
+        ):
+            reservados.setdefault(psicologo_id, []).append((reserva_inicio, reserva_fim, paciente_id))
+        com_prontuario = set(db.session.query(Prontuario.paciente_id, Prontuario.psicologo_id).filter(
+            Prontuario.paciente_id.in_(paciente_ids),
+            Prontuario.psicologo_id.in_(psicologo_ids)
+        ).all())
+
+        for indice, item in validos:
+            psicologo_id, paciente_id, data_hora = item['psicologo_id'], item['paciente_id'], item['data_hora']
+            fim_item = data_hora + timedelta(minutes=item['duracao_minutos'])
+            if psicologo_id not in nomes_psicologos:
+                resultados[indice]['erro'] = 'Psicólogo não encontrado'
+            elif paciente_id not in usuarios_pacientes:
+                resultados[indice]['erro'] = 'Paciente não encontrado'
+            elif data_hora <= agora:
+                resultados[indice]['erro'] = 'Não é possível agendar no passado'
+            elif any(o_inicio < fim_item and o_fim > data_hora for o_inicio, o_fim in ocupados.get(psicologo_id, ())):
+                resultados[indice]['erro'] = 'Horário indisponível'
+            elif any(r_inicio < fim_item and r_fim > data_hora and r_paciente != paciente_id
+                     for r_inicio, r_fim, r_paciente in reservados.get(psicologo_id, ())):
+                resultados[indice]['erro'] = 'Horário reservado por outro paciente'
+            else:
+                agendamento = Agendamento(
+                    paciente_id=paciente_id,
+                    psicologo_id=psicologo_id,
+                    data_hora=data_hora,
+                    duracao_minutos=item['duracao_minutos'],
+                    observacoes=item.get('observacoes'),
+                    status='agendado'
+                )
+                db.session.add(agendamento)
+                ocupados.setdefault(psicologo_id, []).append((data_hora, fim_item))
+                criados.append((indice, agendamento))
+
+                lista_espera.registrar_agendamento(paciente_id, psicologo_id, data_hora)
+                notificacoes.notificar_agendamento(
+                    usuarios_pacientes[paciente_id], nomes_psicologos[psicologo_id], data_hora
+                )
+                # Primeiro agendamento do par: cria o prontuário, como no agendamento pelo site
+                if (paciente_id, psicologo_id) not in com_prontuario:
+                    db.session.add(Prontuario(paciente_id=paciente_id, psicologo_id=psicologo_id))
+                    com_prontuario.add((paciente_id, psicologo_id))
+
+        if criados:
+            ReservaHorario.query.filter(
+                tuple_(ReservaHorario.psicologo_id, ReservaHorario.data_hora).in_(
+                    [(a.psicologo_id, a.data_hora) for _, a in criados]
+                )
+            ).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for indice, agendamento in criados:
+        resultados[indice].update({'sucesso': True, 'id': agendamento.id})
+        disponibilidade.horario_ocupado(agendamento.psicologo_id, agendamento.data_hora, agendamento.duracao_minutos)
+        eventos.agendamento_alterado(agendamento, 'agendamento_criado')
+    return resultados
+
+
+def alterar_agendamentos_em_lote(itens, escopo, transicoes):
+    """Aplica vários ``{id, status, observacoes}`` em uma única transação.
+
+    ``escopo`` limita os agendamentos alteráveis (condição SQLAlchemy) e
+    ``transicoes`` mapeia cada status que quem chama pode registrar para os
+    status atuais a partir dos quais ele é permitido. Consultas canceladas
+    não mudam de status. Os agendamentos são carregados com uma consulta e
+    gravados no mesmo flush.
+
+    Retorna a lista de resultados por item, na ordem recebida.
+    """
+    if len(itens) > LIMITE_ITENS_LOTE:
+        raise ErroAgendamento(f'Envie no máximo {LIMITE_ITENS_LOTE} agendamentos por vez.')
+
+    resultados = []
+    pedidos = {}
+    for item in itens:
+        try:
+            agendamento_id = int(item.get('id'))
+        except (AttributeError, TypeError, ValueError):
+            resultados.append({'id': None, 'sucesso': False, 'erro': 'ID de agendamento inválido'})
+            continue
+        resultado = {'id': agendamento_id, 'sucesso': False}
+        resultados.append(resultado)
+        if 'status' in item and item['status'] not in transicoes:
+            resultado['erro'] = 'Status não permitido'
+        elif agendamento_id in pedidos:
+            resultado['erro'] = 'Agendamento repetido na requisição'
+        else:
+            pedidos[agendamento_id] = (item, resultado)
+
+    agendamentos = {
+        agendamento.id: agendamento
+        for agendamento in Agendamento.query.filter(Agendamento.id.in_(pedidos), escopo).all()
+    } if pedidos else {}
+
+    alterados = []
+    try:
+        for agendamento_id, (item, resultado) in pedidos.items():
+            agendamento = agendamentos.get(agendamento_id)
+            if agendamento is None:
+                resultado['erro'] = 'Agendamento não encontrado'
+                continue
+            novo_status = item.get('status', agendamento.status)
+            if novo_status != agendamento.status:
+                if agendamento.status == 'cancelado':
+                    resultado['erro'] = 'Consulta cancelada'
+                    continue
+                if agendamento.status not in transicoes[novo_status]:
+                    resultado['erro'] = f'Não é possível passar de {agendamento.status} para {novo_status}'
+                    continue
+            cancelou = novo_status == 'cancelado' and agendamento.status != 'cancelado'
+            agendamento.status = novo_status
+            if 'observacoes' in item:
+                agendamento.observacoes = item['observacoes']
+            alterados.append((agendamento, resultado, cancelou))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for agendamento, resultado, cancelou in alterados:
+        resultado['sucesso'] = True
+        if cancelou:
+            disponibilidade.horario_liberado(agendamento.psicologo_id, agendamento.data_hora)
+            eventos.agendamento_alterado(agendamento, 'agendamento_cancelado')
+            lista_espera.ofertar_horario(agendamento.psicologo_id, agendamento.data_hora,
+                                         agendamento.duracao_minutos)
+        else:
+            eventos.agendamento_alterado(agendamento, 'agendamento_status')
+    return resultados
+
+
+def encerrar_agendamentos_vencidos(agora=None, tamanho_lote=1000, simular=False):
+    """Tira de ``agendado``/``confirmado`` as consultas que já passaram.
+
+    Consultas iniciadas há mais de ``AGENDAMENTO_VENCIMENTO_HORAS`` sem
+    registro do psicólogo recebem ``AGENDAMENTO_STATUS_VENCIDO``
+    (``pendente_revisao`` ou ``realizado``). A atualização é feita em lotes de
+    ``tamanho_lote`` IDs, percorridos pelo índice de ``data_hora``, com um
+    commit por lote para não manter transações longas.
+
+    Com ``simular`` apenas conta as consultas afetadas. Retorna a quantidade.
+    """
+    status_destino = current_app.config.get('AGENDAMENTO_STATUS_VENCIDO', 'pendente_revisao')
+    if status_destino not in ('pendente_revisao', 'realizado'):
+        raise ErroAgendamento(f'Status inválido para consultas vencidas: {status_destino}')
+
+    horas = current_app.config.get('AGENDAMENTO_VENCIMENTO_HORAS', 24)
+    limite = (agora or datetime.now()) - timedelta(hours=horas)
+    vencidas = db.session.query(Agendamento.id).filter(
+        Agendamento.data_hora < limite,
+        Agendamento.status.in_(disponibilidade.STATUS_OCUPADOS)
+    )
+
+    if simular:
+        return vencidas.count()
+
+    total = 0
+    while True:
+        ids = [agendamento_id for (agendamento_id,) in
+               vencidas.order_by(Agendamento.data_hora).limit(tamanho_lote).all()]
+        if not ids:
+            break
+        total += Agendamento.query.filter(
+            Agendamento.id.in_(ids),
+            Agendamento.status.in_(disponibilidade.STATUS_OCUPADOS)
+        ).update({'status': status_destino}, synchronize_session=False)
+        db.session.commit()
+        if len(ids) < tamanho_lote:
+            break
+    return total
+
+
+def reagendar_agendamento(agendamento, nova_data_hora, respeitar_expediente=True):
+    """Move o agendamento para ``nova_data_hora`` em uma única transação.
+
+    O registro (e seu ID) é mantido; apenas ``data_hora`` muda e o status
+    volta para ``agendado``, pois a confirmação era do horário anterior. Com
+    ``respeitar_expediente`` o novo horário precisa estar entre os horários
+    disponíveis do psicólogo (caso do paciente); o psicólogo pode mover
+    consultas para qualquer horário livre da própria agenda.
+
+    Levanta ``ErroAgendamento`` se o reagendamento não for possível.
+    """
+    if agendamento.status not in disponibilidade.STATUS_OCUPADOS:
+        raise ErroAgendamento('Apenas consultas agendadas ou confirmadas podem ser reagendadas.')
+
+    if nova_data_hora < datetime.now():
+        raise ErroAgendamento('Não é possível reagendar para datas e horários passados.')
+
+    data_hora_anterior = agendamento.data_hora
+    if nova_data_hora == data_hora_anterior:
+        return data_hora_anterior
+
+    psicologo_id = agendamento.psicologo_id
+    duracao = agendamento.duracao_minutos or disponibilidade.DURACAO_SESSAO_MINUTOS
+
+    if respeitar_expediente:
+        # A própria consulta não bloqueia horários que se sobreponham a ela
+        horarios = disponibilidade.calcular_horarios_disponiveis(
+            psicologo_id, nova_data_hora.date(), duracao, ignorar_id=agendamento.id
+        ) or ()
+        if nova_data_hora.strftime('%H:%M') not in horarios:
+            raise ErroAgendamento('O novo horário não está disponível.')
+
+    try:
+        bloquear_agenda(psicologo_id)
+
+        if verificar_conflito(psicologo_id, nova_data_hora, duracao, ignorar_id=agendamento.id):
+            raise ErroAgendamento('O novo horário não está mais disponível.')
+
+        if reservas.reservado_por_outro(psicologo_id, nova_data_hora, agendamento.paciente_id, duracao):
+            raise ErroAgendamento('O novo horário está reservado por outro paciente.')
+
+        agendamento.data_hora = nova_data_hora
+        agendamento.status = 'agendado'
+        reservas.consumir_reserva(agendamento.paciente_id, psicologo_id, nova_data_hora)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    disponibilidade.horario_liberado(psicologo_id, data_hora_anterior)
+    disponibilidade.horario_ocupado(psicologo_id, nova_data_hora, duracao)
+    eventos.agendamento_alterado(agendamento, 'agendamento_reagendado',
+                                 data_hora_anterior=data_hora_anterior.isoformat())
+
+    # O horário anterior fica livre para a lista de espera
+    lista_espera.ofertar_horario(psicologo_id, data_hora_anterior, duracao)
+
+    return data_hora_anterior
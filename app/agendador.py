@@ -0,0 +1,129 @@
+"""Agendador de tarefas periódicas com eleição de executor.
+
+O comando ``flask agendador`` pode rodar em todas as instâncias da aplicação:
+para cada tarefa de ``AGENDADOR_TAREFAS`` que estiver devida, a instância
+tenta obter uma trava exclusiva com o nome da tarefa e só a executa se
+conseguir. No PostgreSQL a trava é um *advisory lock* de sessão
+(``pg_try_advisory_lock``), liberado automaticamente se o processo morrer;
+nos demais bancos usa-se uma trava de arquivo (``flock``), válida para
+instâncias na mesma máquina.
+
+Depois de obter a trava o controle em ``ExecucaoPeriodica`` é relido, de modo
+que uma instância que chegue logo após outra ter executado a tarefa não a
+repita. Início, duração, erro e instância da última execução ficam gravados
+na mesma tabela.
+"""
+import contextlib
+import fcntl
+import os
+import socket
+import tempfile
+import time
+import traceback
+import zlib
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import text
+
+from app import tarefas
+from app.models import ExecucaoPeriodica, db
+
+
+def _chave_trava(nome):
+    """Chave numérica estável do advisory lock (inteiro de 32 bits)"""
+    return zlib.crc32(f'agendador:{nome}'.encode())
+
+
+@contextlib.contextmanager
+def _trava_postgresql(nome):
+    chave = _chave_trava(nome)
+    with db.engine.connect() as conexao:
+        obtida = conexao.execute(text('SELECT pg_try_advisory_lock(:chave)'), {'chave': chave}).scalar()
+        try:
+            yield bool(obtida)
+        finally:
+            if obtida:
+                conexao.execute(text('SELECT pg_advisory_unlock(:chave)'), {'chave': chave})
+
+
+@contextlib.contextmanager
+def _trava_arquivo(nome):
+    diretorio = current_app.config.get('AGENDADOR_DIRETORIO_TRAVAS') or tempfile.gettempdir()
+    caminho = os.path.join(diretorio, f'clinica-agendador-{nome}.lock')
+    with open(caminho, 'a') as arquivo:
+        try:
+            fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+
+def trava(nome):
+    """Trava exclusiva entre instâncias; o contexto produz ``True`` se obtida"""
+    if db.engine.dialect.name == 'postgresql':
+        return _trava_postgresql(nome)
+    return _trava_arquivo(nome)
+
+
+def _identificacao():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _devida(controle, agora):
+    return controle is None or controle.proxima_execucao is None or controle.proxima_execucao <= agora
+
+
+def executar_devidas(agora=None):
+    """Executa as tarefas periódicas devidas que esta instância conseguir travar.
+
+    Retorna a lista de nomes executados.
+    """
+    agendadas = current_app.config.get('AGENDADOR_TAREFAS', {})
+    executadas = []
+
+    for nome, intervalo in agendadas.items():
+        momento = agora or datetime.utcnow()
+        controle = ExecucaoPeriodica.query.filter_by(nome=nome).first()
+        if not _devida(controle, momento):
+            continue
+
+        with trava(nome) as obtida:
+            if not obtida:
+                continue
+
+            # Outra instância pode ter executado a tarefa enquanto esperávamos
+            db.session.expire_all()
+            controle = ExecucaoPeriodica.query.filter_by(nome=nome).first()
+            if not _devida(controle, momento):
+                db.session.commit()
+                continue
+            if controle is None:
+                controle = ExecucaoPeriodica(nome=nome)
+                db.session.add(controle)
+
+            controle.ultima_execucao = momento
+            controle.proxima_execucao = momento + timedelta(seconds=intervalo)
+            controle.executado_por = _identificacao()
+            db.session.commit()
+
+            inicio = time.perf_counter()
+            try:
+                tarefas.obter_tarefa(nome)()
+                erro = None
+            except Exception:
+                db.session.rollback()
+                erro = traceback.format_exc(limit=5)
+
+            controle = ExecucaoPeriodica.query.filter_by(nome=nome).one()
+            controle.duracao_ms = (time.perf_counter() - inicio) * 1000
+            controle.execucoes += 1
+            controle.ultimo_erro = erro
+            db.session.commit()
+            executadas.append(nome)
+
+    return executadas
@@ -1,6 +1,8 @@
-from flask import jsonify, request
+from flask import jsonify, request, current_app, redirect, url_for
+from flask_login import current_user
 from . import bp
 from app.models import Usuario, Paciente, Psicologo, Agendamento
+from app import invalidacao, limite_login, sincronizacao, tarefas
 
 @bp.route('/status')
 def status():
@@ -11,16 +13,52 @@ def status():
         'version': '1.0.0'
     })
 
-# Importar rotas de horários
-from . import horarios
+@bp.route('/metricas')
+def metricas():
+    """Contadores internos do worker (apenas administradores)"""
+    if not current_user.is_authenticated or current_user.tipo_usuario != 'admin':
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    return jsonify({
+        'horarios_disponiveis': current_app.extensions['coalescedor_horarios'].estatisticas(),
+        'tarefas': tarefas.estatisticas(),
+        'invalidacao': invalidacao.estatisticas(),
+        'limite_login': limite_login.obter_limitador().estatisticas()
+    })
+
+@bp.route('/sincronizacao/agendamentos')
+def sincronizar_agendamentos():
+    """Agendamentos alterados e removidos desde o cursor da última sincronização.
+    
+    Alterações recentes podem ser reenviadas na sincronização seguinte; o
+    cliente deve deduplicar por ``id``.
+    """
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Autenticação necessária'}), 401
+    
+    escopo = sincronizacao.escopo_do_usuario(current_user)
+    if escopo is None:
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    limite = min(request.args.get('limite', type=int) or current_app.config['SINCRONIZACAO_LIMITE'],
+                 current_app.config['SINCRONIZACAO_LIMITE'])
+    try:
+        resultado = sincronizacao.alteracoes(current_user, escopo, request.args.get('cursor'), max(limite, 1))
+    except sincronizacao.CursorInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(resultado)
+
+# Importar rotas de horários e da API versionada
+from . import horarios, v1
 
-# Placeholder para outras rotas da API que serão implementadas nos próximos módulos
+# Endpoints antigos: redirecionam para a API versionada
 @bp.route('/usuarios')
 def usuarios():
-    """Gestão de usuários - será implementada nos próximos módulos"""
-    return jsonify({'message': 'Endpoint em desenvolvimento'})
+    """Gestão de usuários (ver ``/api/v1/usuarios``)"""
+    return redirect(url_for('api.v1_listar_usuarios', **request.args), 308)
 
 @bp.route('/agendamentos')
 def agendamentos():
-    """Gestão de agendamentos - será implementada nos próximos módulos"""
-    return jsonify({'message': 'Endpoint em desenvolvimento'})
\ No newline at end of file
+    """Gestão de agendamentos (ver ``/api/v1/agendamentos``)"""
+    return redirect(url_for('api.v1_listar_agendamentos', **request.args), 308)
@@ -0,0 +1,571 @@
+"""API JSON versionada (``/api/v1``) para integrações.
+
+Recursos: usuários, agendamentos, resumos de prontuário e horários de
+atendimento. As listagens seguem as mesmas convenções:
+
+- paginação por chave (*keyset*): a resposta traz ``proximo_cursor``, que
+  deve ser enviado em ``cursor`` para obter a página seguinte; o custo de
+  cada página não cresce com o número de páginas já lidas;
+- ``limite`` de itens por página (até ``API_LIMITE_PAGINA``);
+- ``fields=id,status,...`` devolve apenas os campos pedidos;
+- filtros apenas em colunas indexadas (ver cada rota).
+
+Alterações em massa usam as rotas ``/lote``, que aplicam até
+``LIMITE_ITENS_LOTE`` itens em uma transação e devolvem o resultado de cada
+item, de modo que uma sincronização típica cabe em poucas requisições.
+"""
+import base64
+import json
+from datetime import datetime, time
+from functools import wraps
+
+from flask import current_app, g, jsonify, request
+from flask_login import current_user
+from sqlalchemy import func, or_, tuple_
+from sqlalchemy.orm import aliased
+
+from app import disponibilidade, invalidacao, sincronizacao
+from app.agenda import (
+    LIMITE_ITENS_LOTE, ErroAgendamento, alterar_agendamentos_em_lote, criar_agendamentos_em_lote
+)
+from app.models import (
+    Agendamento, HorarioAtendimento, Paciente, Prontuario, Psicologo, Sessao, Usuario, db
+)
+from . import bp
+
+STATUS_AGENDAMENTO = Agendamento.status.type.enums
+# Transições de status permitidas a cada perfil: novo status -> status atuais de onde se pode chegar a ele.
+# A equipe confirma, cancela e registra o resultado das consultas em aberto e
+# pode corrigir um registro (realizado <-> ausência, revisão pendente);
+# ``pendente_revisao`` é atribuído apenas pelo encerramento automático.
+TRANSICOES_AGENDAMENTO = {
+    'agendado': ('confirmado',),
+    'confirmado': ('agendado',),
+    'cancelado': ('agendado', 'confirmado'),
+    'realizado': ('agendado', 'confirmado', 'ausencia', 'pendente_revisao'),
+    'ausencia': ('agendado', 'confirmado', 'realizado', 'pendente_revisao'),
+}
+# O paciente apenas confirma ou cancela as próprias consultas que ainda não aconteceram
+TRANSICOES_PACIENTE = {
+    'confirmado': ('agendado',),
+    'cancelado': ('agendado', 'confirmado'),
+}
+
+
+class ErroApi(Exception):
+    """Requisição recusada com a mensagem e o código HTTP informados"""
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+@bp.errorhandler(ErroApi)
+def _erro_api(erro):
+    return jsonify({'error': str(erro)}), erro.status
+
+
+def requer_autenticacao(f):
+    """Responde 401 em JSON (em vez de redirecionar para o login)"""
+    @wraps(f)
+    def decorada(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Autenticação necessária'}), 401
+        return f(*args, **kwargs)
+    return decorada
+
+
+def _perfil_id():
+    """ID do psicólogo ou paciente do usuário atual (``None`` para administradores)"""
+    if 'api_perfil_id' not in g:
+        if getattr(current_user, 'perfil_id', None) is not None:
+            g.api_perfil_id = current_user.perfil_id
+            return g.api_perfil_id
+        modelo = {'psicologo': Psicologo, 'paciente': Paciente}.get(current_user.tipo_usuario)
+        g.api_perfil_id = modelo and db.session.query(modelo.id).filter(
+            modelo.usuario_id == current_user.id
+        ).scalar()
+    return g.api_perfil_id
+
+
+# --------------------------------------------------------------- parâmetros
+
+def _inteiro(nome):
+    valor = request.args.get(nome)
+    if valor in (None, ''):
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ErroApi(f'Parâmetro "{nome}" deve ser um número inteiro')
+
+
+def _data_hora(nome):
+    valor = request.args.get(nome)
+    if not valor:
+        return None
+    try:
+        return datetime.fromisoformat(valor)
+    except ValueError:
+        raise ErroApi(f'Parâmetro "{nome}" deve estar no formato ISO 8601')
+
+
+def _booleano(nome):
+    valor = request.args.get(nome)
+    if valor in (None, ''):
+        return None
+    if valor.lower() not in ('true', 'false', '1', '0'):
+        raise ErroApi(f'Parâmetro "{nome}" deve ser true ou false')
+    return valor.lower() in ('true', '1')
+
+
+def _campos(disponiveis):
+    """Campos pedidos em ``fields`` (todos, se ausente)"""
+    pedido = request.args.get('fields')
+    if not pedido:
+        return None
+    campos = [campo.strip() for campo in pedido.split(',') if campo.strip()]
+    desconhecidos = [campo for campo in campos if campo not in disponiveis]
+    if desconhecidos:
+        raise ErroApi(f'Campos desconhecidos: {", ".join(desconhecidos)}')
+    return campos
+
+
+def _corpo_lote(chave):
+    dados = request.get_json(silent=True) or {}
+    itens = dados.get(chave)
+    if not isinstance(itens, list) or not itens:
+        raise ErroApi(f'Envie a lista "{chave}"')
+    if len(itens) > LIMITE_ITENS_LOTE:
+        raise ErroApi(f'Envie no máximo {LIMITE_ITENS_LOTE} itens por vez')
+    return itens
+
+
+# ---------------------------------------------------------------- paginação
+
+def _codificar_cursor(valores):
+    texto = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in valores])
+    return base64.urlsafe_b64encode(texto.encode()).decode()
+
+
+def _decodificar_cursor(token, colunas):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(token.encode()))
+        if len(valores) != len(colunas):
+            raise ValueError
+        return tuple(
+            datetime.fromisoformat(valor) if coluna.type.python_type is datetime else valor
+            for valor, coluna in zip(valores, colunas)
+        )
+    except (ValueError, TypeError):
+        raise ErroApi('Cursor inválido')
+
+
+def _pagina(consulta, ordem, serializar, campos_disponiveis):
+    """Executa a listagem paginada por ``ordem`` (colunas terminadas pela chave primária).
+
+    ``serializar(linha)`` devolve ``(dicionario, valores_da_ordem)``.
+    """
+    campos = _campos(campos_disponiveis)
+    limite_maximo = current_app.config.get('API_LIMITE_PAGINA', 500)
+    limite = min(max(_inteiro('limite') or 100, 1), limite_maximo)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        consulta = consulta.filter(tuple_(*ordem) > _decodificar_cursor(cursor, ordem))
+    linhas = consulta.order_by(*ordem).limit(limite + 1).all()
+
+    itens = []
+    ultimo = None
+    for linha in linhas[:limite]:
+        item, ultimo = serializar(linha)
+        itens.append({campo: item[campo] for campo in campos} if campos else item)
+
+    return jsonify({
+        'itens': itens,
+        'proximo_cursor': _codificar_cursor(ultimo) if len(linhas) > limite else None
+    })
+
+
+def _iso(valor):
+    return valor.isoformat() if valor is not None else None
+
+
+# ----------------------------------------------------------------- usuários
+
+CAMPOS_USUARIO = ('id', 'nome_completo', 'email', 'telefone', 'tipo_usuario', 'ativo', 'perfil_id', 'data_criacao')
+
+
+@bp.route('/v1/usuarios')
+@requer_autenticacao
+def v1_listar_usuarios():
+    """Usuários visíveis: todos (admin), o próprio e seus pacientes (psicólogo) ou o próprio (paciente).
+
+    Filtros: ``tipo_usuario``, ``ativo``, ``email``.
+    """
+    consulta = db.session.query(
+        Usuario, func.coalesce(Psicologo.id, Paciente.id)
+    ).outerjoin(
+        Psicologo, Psicologo.usuario_id == Usuario.id
+    ).outerjoin(
+        Paciente, Paciente.usuario_id == Usuario.id
+    )
+
+    if current_user.tipo_usuario == 'psicologo':
+        pacientes = db.session.query(Paciente.usuario_id).join(
+            Agendamento, Agendamento.paciente_id == Paciente.id
+        ).filter(Agendamento.psicologo_id == _perfil_id())
+        consulta = consulta.filter(or_(Usuario.id == current_user.id, Usuario.id.in_(pacientes)))
+    elif current_user.tipo_usuario != 'admin':
+        consulta = consulta.filter(Usuario.id == current_user.id)
+
+    if request.args.get('tipo_usuario'):
+        consulta = consulta.filter(Usuario.tipo_usuario == request.args['tipo_usuario'])
+    if _booleano('ativo') is not None:
+        consulta = consulta.filter(Usuario.ativo.is_(_booleano('ativo')))
+    if request.args.get('email'):
+        consulta = consulta.filter(Usuario.email == request.args['email'].lower())
+
+    def serializar(linha):
+        usuario, perfil_id = linha
+        return {
+            'id': usuario.id,
+            'nome_completo': usuario.nome_completo,
+            'email': usuario.email,
+            'telefone': usuario.telefone,
+            'tipo_usuario': usuario.tipo_usuario,
+            'ativo': usuario.ativo,
+            'perfil_id': perfil_id,
+            'data_criacao': _iso(usuario.data_criacao),
+        }, (usuario.id,)
+
+    return _pagina(consulta, (Usuario.id,), serializar, CAMPOS_USUARIO)
+
+
+@bp.route('/v1/usuarios/lote', methods=['PATCH'])
+@requer_autenticacao
+def v1_alterar_usuarios():
+    """Altera ``nome_completo``, ``telefone`` e ``ativo`` de vários usuários (apenas administradores)"""
+    if current_user.tipo_usuario != 'admin':
+        raise ErroApi('Acesso negado', 403)
+    itens = _corpo_lote('usuarios')
+
+    resultados = []
+    pedidos = {}
+    for item in itens:
+        try:
+            usuario_id = int(item.get('id'))
+        except (AttributeError, TypeError, ValueError):
+            resultados.append({'id': None, 'sucesso': False, 'erro': 'ID de usuário inválido'})
+            continue
+        resultado = {'id': usuario_id, 'sucesso': False}
+        resultados.append(resultado)
+        if usuario_id in pedidos:
+            resultado['erro'] = 'Usuário repetido na requisição'
+        elif 'nome_completo' in item and not str(item['nome_completo'] or '').strip():
+            resultado['erro'] = 'Nome completo é obrigatório'
+        elif 'ativo' in item and not isinstance(item['ativo'], bool):
+            resultado['erro'] = '"ativo" deve ser true ou false'
+        else:
+            pedidos[usuario_id] = (item, resultado)
+
+    usuarios = {u.id: u for u in Usuario.query.filter(Usuario.id.in_(pedidos)).all()} if pedidos else {}
+    alterou_psicologo = False
+    for usuario_id, (item, resultado) in pedidos.items():
+        usuario = usuarios.get(usuario_id)
+        if usuario is None:
+            resultado['erro'] = 'Usuário não encontrado'
+            continue
+        if 'nome_completo' in item:
+            usuario.nome_completo = item['nome_completo'].strip()
+        if 'telefone' in item:
+            usuario.telefone = item['telefone']
+        if 'ativo' in item:
+            usuario.ativo = item['ativo']
+        resultado['sucesso'] = True
+        alterou_psicologo = alterou_psicologo or usuario.tipo_usuario == 'psicologo'
+    db.session.commit()
+
+    if alterou_psicologo:
+        invalidacao.publicar('psicologos')
+    return jsonify({'resultados': resultados})
+
+
+# ------------------------------------------------------------- agendamentos
+
+CAMPOS_AGENDAMENTO = (
+    'id', 'paciente_id', 'paciente', 'psicologo_id', 'psicologo', 'data_hora', 'data_hora_fim',
+    'duracao_minutos', 'status', 'observacoes', 'data_criacao', 'data_atualizacao'
+)
+
+
+@bp.route('/v1/agendamentos')
+@requer_autenticacao
+def v1_listar_agendamentos():
+    """Agendamentos no escopo do usuário.
+
+    Filtros: ``psicologo_id``, ``paciente_id``, ``inicio`` e ``fim`` (período
+    de ``data_hora``), ``status`` (lista separada por vírgulas) e
+    ``atualizado_desde``. ``ordem`` pode ser ``id`` (padrão) ou ``data_hora``.
+    """
+    escopo = sincronizacao.escopo_do_usuario(current_user)
+    if escopo is None:
+        raise ErroApi('Acesso negado', 403)
+
+    usuario_paciente = aliased(Usuario)
+    usuario_psicologo = aliased(Usuario)
+    consulta = db.session.query(
+        Agendamento, usuario_paciente.nome_completo, usuario_psicologo.nome_completo
+    ).join(
+        Paciente, Paciente.id == Agendamento.paciente_id
+    ).join(
+        usuario_paciente, usuario_paciente.id == Paciente.usuario_id
+    ).join(
+        Psicologo, Psicologo.id == Agendamento.psicologo_id
+    ).join(
+        usuario_psicologo, usuario_psicologo.id == Psicologo.usuario_id
+    ).filter(escopo(Agendamento))
+
+    if _inteiro('psicologo_id') is not None:
+        consulta = consulta.filter(Agendamento.psicologo_id == _inteiro('psicologo_id'))
+    if _inteiro('paciente_id') is not None:
+        consulta = consulta.filter(Agendamento.paciente_id == _inteiro('paciente_id'))
+    if _data_hora('inicio'):
+        consulta = consulta.filter(Agendamento.data_hora >= _data_hora('inicio'))
+    if _data_hora('fim'):
+        consulta = consulta.filter(Agendamento.data_hora < _data_hora('fim'))
+    if _data_hora('atualizado_desde'):
+        consulta = consulta.filter(Agendamento.data_atualizacao >= _data_hora('atualizado_desde'))
+    if request.args.get('status'):
+        status = request.args['status'].split(',')
+        desconhecidos = [s for s in status if s not in STATUS_AGENDAMENTO]
+        if desconhecidos:
+            raise ErroApi(f'Status desconhecidos: {", ".join(desconhecidos)}')
+        consulta = consulta.filter(Agendamento.status.in_(status))
+
+    ordem = request.args.get('ordem', 'id')
+    if ordem not in ('id', 'data_hora'):
+        raise ErroApi('"ordem" deve ser id ou data_hora')
+    colunas_ordem = (Agendamento.id,) if ordem == 'id' else (Agendamento.data_hora, Agendamento.id)
+
+    def serializar(linha):
+        agendamento, nome_paciente, nome_psicologo = linha
+        chave = (agendamento.id,) if ordem == 'id' else (agendamento.data_hora, agendamento.id)
+        return {
+            'id': agendamento.id,
+            'paciente_id': agendamento.paciente_id,
+            'paciente': nome_paciente,
+            'psicologo_id': agendamento.psicologo_id,
+            'psicologo': nome_psicologo,
+            'data_hora': _iso(agendamento.data_hora),
+            'data_hora_fim': _iso(agendamento.data_hora_fim),
+            'duracao_minutos': agendamento.duracao_minutos,
+            'status': agendamento.status,
+            'observacoes': agendamento.observacoes,
+            'data_criacao': _iso(agendamento.data_criacao),
+            'data_atualizacao': _iso(agendamento.data_atualizacao),
+        }, chave
+
+    return _pagina(consulta, colunas_ordem, serializar, CAMPOS_AGENDAMENTO)
+
+
+def _ler_agendamento_novo(item):
+    """Converte um item do lote de criação, aplicando o escopo do usuário"""
+    if not isinstance(item, dict):
+        return {'erro': 'Item inválido'}
+    perfil_id = _perfil_id()
+    try:
+        paciente_id = perfil_id if current_user.tipo_usuario == 'paciente' else int(item['paciente_id'])
+        psicologo_id = perfil_id if current_user.tipo_usuario == 'psicologo' else int(item['psicologo_id'])
+        data_hora = datetime.fromisoformat(item['data_hora'])
+        duracao = int(item.get('duracao_minutos') or disponibilidade.DURACAO_SESSAO_MINUTOS)
+    except (KeyError, TypeError, ValueError):
+        return {'erro': 'Informe paciente_id, psicologo_id e data_hora (ISO 8601) válidos'}
+
+    for campo, valor in (('paciente_id', paciente_id), ('psicologo_id', psicologo_id)):
+        if campo in item and str(item[campo]) != str(valor):
+            return {'erro': 'Acesso negado'}
+    if duracao not in disponibilidade.DURACOES_SESSAO_MINUTOS:
+        return {'erro': 'Duração de sessão inválida'}
+    return {
+        'paciente_id': paciente_id,
+        'psicologo_id': psicologo_id,
+        'data_hora': data_hora.replace(tzinfo=None),
+        'duracao_minutos': duracao,
+        'observacoes': item.get('observacoes'),
+    }
+
+
+@bp.route('/v1/agendamentos/lote', methods=['POST'])
+@requer_autenticacao
+def v1_criar_agendamentos():
+    """Cria vários agendamentos; pacientes e psicólogos apenas na própria agenda"""
+    if sincronizacao.escopo_do_usuario(current_user) is None:
+        raise ErroApi('Acesso negado', 403)
+    itens = [_ler_agendamento_novo(item) for item in _corpo_lote('agendamentos')]
+    try:
+        resultados = criar_agendamentos_em_lote(itens)
+    except ErroAgendamento as e:
+        raise ErroApi(str(e))
+
+    criados = sum(1 for resultado in resultados if resultado['sucesso'])
+    return jsonify({'criados': criados, 'resultados': resultados}), 201 if criados else 200
+
+
+@bp.route('/v1/agendamentos/lote', methods=['PATCH'])
+@requer_autenticacao
+def v1_alterar_agendamentos():
+    """Altera ``status`` e ``observacoes`` de vários agendamentos (transições conforme o perfil)"""
+    escopo = sincronizacao.escopo_do_usuario(current_user)
+    if escopo is None:
+        raise ErroApi('Acesso negado', 403)
+    itens = [item if isinstance(item, dict) else {} for item in _corpo_lote('agendamentos')]
+    transicoes = TRANSICOES_PACIENTE if current_user.tipo_usuario == 'paciente' else TRANSICOES_AGENDAMENTO
+    try:
+        resultados = alterar_agendamentos_em_lote(itens, escopo(Agendamento), transicoes)
+    except ErroAgendamento as e:
+        raise ErroApi(str(e))
+
+    alterados = sum(1 for resultado in resultados if resultado['sucesso'])
+    return jsonify({'alterados': alterados, 'resultados': resultados})
+
+
+# --------------------------------------------------------------- prontuários
+
+CAMPOS_PRONTUARIO = (
+    'id', 'paciente_id', 'paciente', 'psicologo_id', 'data_criacao', 'recorrencia_ativa',
+    'recorrencia_dia_semana', 'recorrencia_horario', 'total_sessoes', 'ultima_sessao', 'proxima_consulta'
+)
+
+
+@bp.route('/v1/prontuarios')
+@requer_autenticacao
+def v1_listar_prontuarios():
+    """Resumo dos prontuários (sem anotações clínicas); psicólogos veem apenas os seus.
+
+    Filtros: ``psicologo_id``, ``paciente_id``.
+    """
+    if current_user.tipo_usuario not in ('admin', 'psicologo'):
+        raise ErroApi('Acesso negado', 403)
+
+    sessoes = db.session.query(
+        Sessao.prontuario_id.label('prontuario_id'),
+        func.count(Sessao.id).label('total'),
+        func.max(Sessao.data_sessao).label('ultima')
+    ).group_by(Sessao.prontuario_id).subquery()
+    proximas = db.session.query(
+        Agendamento.paciente_id.label('paciente_id'),
+        Agendamento.psicologo_id.label('psicologo_id'),
+        func.min(Agendamento.data_hora).label('proxima')
+    ).filter(
+        Agendamento.data_hora >= datetime.now(),
+        Agendamento.status.in_(disponibilidade.STATUS_OCUPADOS)
+    ).group_by(Agendamento.paciente_id, Agendamento.psicologo_id).subquery()
+
+    consulta = db.session.query(
+        Prontuario, Usuario.nome_completo, sessoes.c.total, sessoes.c.ultima, proximas.c.proxima
+    ).join(
+        Paciente, Paciente.id == Prontuario.paciente_id
+    ).join(
+        Usuario, Usuario.id == Paciente.usuario_id
+    ).outerjoin(
+        sessoes, sessoes.c.prontuario_id == Prontuario.id
+    ).outerjoin(
+        proximas,
+        (proximas.c.paciente_id == Prontuario.paciente_id) & (proximas.c.psicologo_id == Prontuario.psicologo_id)
+    )
+
+    if current_user.tipo_usuario == 'psicologo':
+        consulta = consulta.filter(Prontuario.psicologo_id == _perfil_id())
+    if _inteiro('psicologo_id') is not None:
+        consulta = consulta.filter(Prontuario.psicologo_id == _inteiro('psicologo_id'))
+    if _inteiro('paciente_id') is not None:
+        consulta = consulta.filter(Prontuario.paciente_id == _inteiro('paciente_id'))
+
+    def serializar(linha):
+        prontuario, nome_paciente, total, ultima, proxima = linha
+        return {
+            'id': prontuario.id,
+            'paciente_id': prontuario.paciente_id,
+            'paciente': nome_paciente,
+            'psicologo_id': prontuario.psicologo_id,
+            'data_criacao': _iso(prontuario.data_criacao),
+            'recorrencia_ativa': prontuario.recorrencia_ativa,
+            'recorrencia_dia_semana': prontuario.recorrencia_dia_semana,
+            'recorrencia_horario': prontuario.recorrencia_horario.strftime('%H:%M') if prontuario.recorrencia_horario else None,
+            'total_sessoes': total or 0,
+            'ultima_sessao': _iso(ultima),
+            'proxima_consulta': _iso(proxima),
+        }, (prontuario.id,)
+
+    return _pagina(consulta, (Prontuario.id,), serializar, CAMPOS_PRONTUARIO)
+
+
+# ------------------------------------------------------ horários de atendimento
+
+CAMPOS_HORARIO = ('id', 'psicologo_id', 'dia_semana', 'hora_inicio', 'hora_fim', 'ativo')
+
+
+@bp.route('/v1/horarios-atendimento')
+@requer_autenticacao
+def v1_listar_horarios():
+    """Horários de atendimento. Filtros: ``psicologo_id``, ``dia_semana``, ``ativo``"""
+    consulta = HorarioAtendimento.query
+    if _inteiro('psicologo_id') is not None:
+        consulta = consulta.filter(HorarioAtendimento.psicologo_id == _inteiro('psicologo_id'))
+    if _inteiro('dia_semana') is not None:
+        consulta = consulta.filter(HorarioAtendimento.dia_semana == _inteiro('dia_semana'))
+    if _booleano('ativo') is not None:
+        consulta = consulta.filter(HorarioAtendimento.ativo.is_(_booleano('ativo')))
+
+    def serializar(horario):
+        return {
+            'id': horario.id,
+            'psicologo_id': horario.psicologo_id,
+            'dia_semana': horario.dia_semana,
+            'hora_inicio': horario.hora_inicio.strftime('%H:%M'),
+            'hora_fim': horario.hora_fim.strftime('%H:%M'),
+            'ativo': horario.ativo,
+        }, (horario.id,)
+
+    return _pagina(consulta, (HorarioAtendimento.id,), serializar, CAMPOS_HORARIO)
+
+
+@bp.route('/v1/psicologos/<int:psicologo_id>/horarios-atendimento', methods=['PUT'])
+@requer_autenticacao
+def v1_substituir_horarios(psicologo_id):
+    """Substitui de uma vez todos os horários de atendimento do psicólogo"""
+    if current_user.tipo_usuario != 'admin' and not (
+        current_user.tipo_usuario == 'psicologo' and _perfil_id() == psicologo_id
+    ):
+        raise ErroApi('Acesso negado', 403)
+    if db.session.get(Psicologo, psicologo_id) is None:
+        raise ErroApi('Psicólogo não encontrado', 404)
+
+    dados = request.get_json(silent=True) or {}
+    itens = dados.get('horarios')
+    if not isinstance(itens, list):
+        raise ErroApi('Envie a lista "horarios" (pode ser vazia)')
+
+    novos = []
+    for indice, item in enumerate(itens):
+        try:
+            dia_semana = int(item['dia_semana'])
+            inicio = time.fromisoformat(item['hora_inicio'])
+            fim = time.fromisoformat(item['hora_fim'])
+        except (KeyError, TypeError, ValueError):
+            raise ErroApi(f'Horário {indice}: informe dia_semana, hora_inicio e hora_fim (HH:MM)')
+        if not 0 <= dia_semana <= 6 or inicio >= fim:
+            raise ErroApi(f'Horário {indice}: dia da semana ou período inválido')
+        if any(d == dia_semana and i < fim and f > inicio for d, i, f in novos):
+            raise ErroApi(f'Horário {indice}: sobrepõe outro turno do mesmo dia')
+        novos.append((dia_semana, inicio, fim))
+
+    HorarioAtendimento.query.filter_by(psicologo_id=psicologo_id).delete(synchronize_session=False)
+    db.session.add_all(
+        HorarioAtendimento(psicologo_id=psicologo_id, dia_semana=d, hora_inicio=i, hora_fim=f, ativo=True)
+        for d, i, f in novos
+    )
+    db.session.commit()
+    disponibilidade.expediente_alterado(psicologo_id)
+    return jsonify({'horarios': len(novos)})
@@ -1,10 +1,44 @@
+import math
+
 from flask import render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_user, logout_user, current_user, login_required
 from . import bp
-from app import db
+from app import db, limite_login, notificacoes, senhas, tokens
 from app.models import Usuario, Paciente
 from app.auth.forms import LoginForm, RegistroPacienteForm, AlterarSenhaForm, EditarPerfilForm
 
+class LoginRecusado(Exception):
+    """Tentativa recusada antes de verificar a senha (limite de tentativas ou sobrecarga)"""
+    
+    def __init__(self, mensagem, status, espera=None):
+        super().__init__(mensagem)
+        self.status = status
+        self.cabecalhos = {'Retry-After': str(math.ceil(espera))} if espera else {}
+
+def autenticar_credenciais(email, senha, tipo_usuario):
+    """Usuário ativo com as credenciais informadas ou ``None``.
+    
+    O limite de tentativas é aplicado antes do hash da senha; lança
+    ``LoginRecusado`` quando a tentativa nem chega a ser verificada.
+    """
+    espera = limite_login.espera(email)
+    if espera:
+        raise LoginRecusado(
+            f'Muitas tentativas de login. Tente novamente em {math.ceil(espera / 60)} minuto(s).', 429, espera
+        )
+    
+    usuario = Usuario.query.filter_by(email=email, tipo_usuario=tipo_usuario).first()
+    try:
+        autenticado = usuario is not None and senhas.autenticar(usuario, senha)
+    except senhas.SobrecargaSenhas as e:
+        raise LoginRecusado(str(e), 503, espera=1)
+    
+    if autenticado and usuario.ativo:
+        limite_login.registrar_sucesso(email)
+        return usuario
+    limite_login.registrar_falha(email)
+    return None
+
 @bp.route('/login', methods=['GET', 'POST'])
 def login():
     """Página de login"""
@@ -13,12 +47,13 @@ def login():
     
     form = LoginForm()
     if form.validate_on_submit():
-        usuario = Usuario.query.filter_by(
-            email=form.email.data,
-            tipo_usuario=form.tipo_usuario.data
-        ).first()
+        try:
+            usuario = autenticar_credenciais(form.email.data, form.senha.data, form.tipo_usuario.data)
+        except LoginRecusado as e:
+            flash(str(e), 'error')
+            return render_template('auth/login.html', form=form), e.status, e.cabecalhos
         
-        if usuario and usuario.check_senha(form.senha.data) and usuario.ativo:
+        if usuario:
             login_user(usuario)
             next_page = request.args.get('next')
             
@@ -69,6 +104,7 @@ def registro_paciente():
         )
         
         db.session.add(paciente)
+        notificacoes.notificar_cadastro(usuario)
         db.session.commit()
         
         flash('Cadastro realizado com sucesso! Você já pode fazer login.', 'success')
@@ -120,12 +156,12 @@ def api_login():
     if not data or not data.get('email') or not data.get('senha') or not data.get('tipo_usuario'):
         return jsonify({'error': 'E-mail, senha e tipo de usuário são obrigatórios'}), 400
     
-    usuario = Usuario.query.filter_by(
-        email=data['email'],
-        tipo_usuario=data['tipo_usuario']
-    ).first()
+    try:
+        usuario = autenticar_credenciais(data['email'], data['senha'], data['tipo_usuario'])
+    except LoginRecusado as e:
+        return jsonify({'error': str(e)}), e.status, e.cabecalhos
     
-    if usuario and usuario.check_senha(data['senha']) and usuario.ativo:
+    if usuario:
         login_user(usuario)
         return jsonify({
             'message': 'Login realizado com sucesso',
@@ -144,4 +180,49 @@ def api_login():
 def api_logout():
     """API de logout"""
     logout_user()
-    return jsonify({'message': 'Logout realizado com sucesso'}), 200
\ No newline at end of file
+    return jsonify({'message': 'Logout realizado com sucesso'}), 200
+
+@bp.route('/api/token', methods=['POST'])
+def api_token():
+    """Emite tokens JWT (access e refresh) para clientes da API"""
+    data = request.get_json(silent=True)
+    
+    if not data or not data.get('email') or not data.get('senha') or not data.get('tipo_usuario'):
+        return jsonify({'error': 'E-mail, senha e tipo de usuário são obrigatórios'}), 400
+    
+    try:
+        usuario = autenticar_credenciais(data['email'], data['senha'], data['tipo_usuario'])
+    except LoginRecusado as e:
+        return jsonify({'error': str(e)}), e.status, e.cabecalhos
+    
+    if usuario:
+        return jsonify(tokens.emitir_tokens(usuario)), 200
+    else:
+        return jsonify({'error': 'Credenciais inválidas'}), 401
+
+@bp.route('/api/token/renovar', methods=['POST'])
+def api_token_renovar():
+    """Troca um refresh token válido por um novo par de tokens"""
+    data = request.get_json(silent=True) or {}
+    if not data.get('refresh_token'):
+        return jsonify({'error': 'refresh_token é obrigatório'}), 400
+    
+    try:
+        return jsonify(tokens.renovar(data['refresh_token'])), 200
+    except tokens.TokenInvalido as e:
+        return jsonify({'error': str(e)}), 401
+
+@bp.route('/api/token/revogar', methods=['POST'])
+def api_token_revogar():
+    """Revoga o token de acesso enviado no cabeçalho e o refresh token do corpo"""
+    data = request.get_json(silent=True) or {}
+    revogados = 0
+    token_acesso = tokens.token_da_requisicao()
+    if token_acesso and tokens.revogar_token(token_acesso):
+        logout_user()
+        revogados += 1
+    if data.get('refresh_token') and tokens.revogar_token(data['refresh_token']):
+        revogados += 1
+    if not revogados:
+        return jsonify({'error': 'Nenhum token válido informado'}), 400
+    return jsonify({'message': 'Tokens revogados', 'revogados': revogados}), 200
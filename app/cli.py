@@ -0,0 +1,260 @@
+import json
+import os
+import time
+
+import click
+from app import reservas, lista_espera, recorrencia, lembretes, emails, tarefas, agendador, senhas, importacao_psicologos, importacao_legado, dados_sinteticos, desempenho
+from app.models import db
+from app.agenda import encerrar_agendamentos_vencidos
+
+
+def init_cli(app):
+    """Registra os comandos de manutenção da aplicação"""
+    
+    @app.cli.command('limpar-reservas')
+    def limpar_reservas():
+        """Remove as reservas temporárias vencidas e repassa ofertas da lista de espera"""
+        ofertas = lista_espera.expirar_ofertas()
+        removidas = reservas.varrer_reservas_expiradas()
+        click.echo(f'{ofertas} oferta(s) da lista de espera vencida(s).')
+        click.echo(f'{removidas} reserva(s) vencida(s) removida(s).')
+    
+    @app.cli.command('estender-recorrencias')
+    @click.option('--semanas', type=int, default=None,
+                  help='Horizonte em semanas (padrão: RECORRENCIA_HORIZONTE_SEMANAS)')
+    @click.option('--lote', type=int, default=500, show_default=True,
+                  help='Prontuários processados por transação')
+    def estender_recorrencias(semanas, lote):
+        """Completa as séries das recorrências ativas até o horizonte configurado"""
+        inicio = time.perf_counter()
+        totais = recorrencia.estender_recorrencias(horizonte_semanas=semanas, tamanho_lote=lote)
+        duracao = time.perf_counter() - inicio
+        click.echo(f"{totais['prontuarios']} recorrência(s) ativa(s) verificada(s).")
+        click.echo(f"{totais['criados']} agendamento(s) criado(s), "
+                   f"{totais['conflitos']} horário(s) ignorado(s) por conflito ({duracao:.2f}s).")
+    
+    @app.cli.command('encerrar-agendamentos')
+    @click.option('--simular', is_flag=True, help='Apenas conta as consultas que seriam alteradas')
+    @click.option('--lote', type=int, default=1000, show_default=True,
+                  help='Consultas alteradas por transação')
+    def encerrar_agendamentos(simular, lote):
+        """Move consultas passadas sem registro para o status de consultas vencidas"""
+        status = app.config.get('AGENDAMENTO_STATUS_VENCIDO', 'pendente_revisao')
+        inicio = time.perf_counter()
+        total = encerrar_agendamentos_vencidos(tamanho_lote=lote, simular=simular)
+        duracao = time.perf_counter() - inicio
+        if simular:
+            click.echo(f'{total} consulta(s) vencida(s) seriam marcadas como {status}.')
+            return
+        taxa = total / duracao if duracao else 0
+        click.echo(f'{total} consulta(s) vencida(s) marcada(s) como {status} '
+                   f'em {duracao:.2f}s ({taxa:.0f}/s).')
+    
+    @app.cli.command('enviar-lembretes')
+    @click.option('--lote', type=int, default=500, show_default=True,
+                  help='Mensagens entregues por conexão ao servidor de e-mail')
+    def enviar_lembretes(lote):
+        """Envia os lembretes de consulta devidos (executar a cada poucos minutos)"""
+        inicio = time.perf_counter()
+        totais = lembretes.enviar_lembretes(tamanho_lote=lote)
+        duracao = time.perf_counter() - inicio
+        taxa = totais['enviados'] / duracao * 60 if duracao else 0
+        click.echo(f"{totais['enviados']} lembrete(s) enviado(s), {totais['falhas']} falha(s) "
+                   f"em {duracao:.2f}s ({taxa:.0f}/min).")
+    
+    @app.cli.command('processar-emails')
+    @click.option('--lote', type=int, default=100, show_default=True,
+                  help='E-mails enviados por conexão ao servidor')
+    @click.option('--continuo', is_flag=True, help='Continua aguardando novos e-mails')
+    @click.option('--intervalo', type=float, default=5, show_default=True,
+                  help='Segundos de espera com a fila vazia (modo contínuo)')
+    def processar_emails(lote, continuo, intervalo):
+        """Envia os e-mails da caixa de saída"""
+        total_enviados = total_falhas = 0
+        while True:
+            enviados, falhas = emails.processar_fila(tamanho_lote=lote)
+            total_enviados += enviados
+            total_falhas += falhas
+            if enviados + falhas:
+                continue
+            if not continuo:
+                break
+            time.sleep(intervalo)
+        click.echo(f'{total_enviados} e-mail(s) enviado(s), {total_falhas} falha(s).')
+    
+    @app.cli.command('worker')
+    @click.option('--threads', type=int, default=2, show_default=True,
+                  help='Trabalhadores (threads) por processo')
+    @click.option('--processos', type=int, default=1, show_default=True,
+                  help='Processos trabalhadores (fork)')
+    @click.option('--intervalo', type=float, default=1.0, show_default=True,
+                  help='Segundos entre consultas com a fila vazia')
+    @click.option('--ate-esvaziar', is_flag=True, help='Encerra quando não houver tarefas devidas')
+    def worker(threads, processos, intervalo, ate_esvaziar):
+        """Executa as tarefas da fila em segundo plano"""
+        click.echo(f'Worker iniciado: {processos} processo(s) x {threads} thread(s). '
+                   f'Tarefas: {", ".join(tarefas.tarefas_registradas())}')
+        if processos > 1:
+            tarefas.executar_processos(app, processos, threads, intervalo, ate_esvaziar)
+        else:
+            tarefas.executar_trabalhador(app, threads, intervalo, ate_esvaziar)
+    
+    @app.cli.command('enfileirar-tarefa')
+    @click.argument('nome')
+    @click.option('--prioridade', type=int, default=0, show_default=True)
+    def enfileirar_tarefa(nome, prioridade):
+        """Coloca uma tarefa registrada na fila (ex.: estender_recorrencias)"""
+        try:
+            tarefa = tarefas.enfileirar(nome, prioridade=prioridade)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='NOME')
+        db.session.commit()
+        click.echo(f'Tarefa {tarefa.id} ({nome}) enfileirada.')
+    
+    @app.cli.command('agendador')
+    @click.option('--uma-vez', is_flag=True, help='Executa as tarefas devidas e encerra (uso pelo cron)')
+    @click.option('--intervalo', type=float, default=10, show_default=True,
+                  help='Segundos entre verificações no modo contínuo')
+    def executar_agendador(uma_vez, intervalo):
+        """Executa as tarefas periódicas de AGENDADOR_TAREFAS (uma instância por tarefa)"""
+        while True:
+            for nome in agendador.executar_devidas():
+                click.echo(f'{nome} executada.')
+            if uma_vez:
+                break
+            time.sleep(intervalo)
+    
+    @app.cli.command('benchmark-senhas')
+    @click.option('--metodo', multiple=True,
+                  help='Método a medir (repetível; padrão: SENHA_METODO). Ex.: scrypt:16384:8:1')
+    @click.option('--amostras', type=int, default=10, show_default=True,
+                  help='Verificações por thread')
+    @click.option('--threads', type=int, default=1, show_default=True,
+                  help='Verificações simultâneas (threads do worker)')
+    def benchmark_senhas(metodo, amostras, threads):
+        """Mede o custo da verificação de senha e a vazão de logins por worker"""
+        for item in metodo or [None]:
+            try:
+                resultado = senhas.medir(item, amostras=amostras, threads=threads)
+            except (ValueError, RuntimeError) as e:
+                raise click.BadParameter(str(e), param_hint='--metodo')
+            click.echo(f"{resultado['metodo']}: {resultado['ms_por_verificacao']:.1f} ms por verificação, "
+                       f"{resultado['logins_por_segundo']:.1f} login(s)/s com {threads} thread(s).")
+    
+    @app.cli.command('benchmark-endpoints')
+    @click.option('--repeticoes', type=int, default=5, show_default=True,
+                  help='Requisições medidas por endpoint, além da primeira')
+    @click.option('--referencia', type=click.Path(dir_okay=False), default='benchmarks/referencia.json',
+                  show_default=True, help='Medição de referência para comparação')
+    @click.option('--tolerancia', type=float, default=0.5, show_default=True,
+                  help='Aumento aceito na mediana do tempo (fração da referência)')
+    @click.option('--salvar', is_flag=True, help='Grava esta medição como a nova referência')
+    def benchmark_endpoints(repeticoes, referencia, tolerancia, salvar):
+        """Mede tempo e instruções SQL dos endpoints críticos sobre a massa gerada por flask seed"""
+        # Sem referência não há com o que comparar: falhar evita um "ok" silencioso na CI
+        if not salvar and not os.path.exists(referencia):
+            raise click.ClickException(f'Sem referência em {referencia}; use --salvar para criá-la.')
+        try:
+            resultado = desempenho.medir(repeticoes=repeticoes)
+        except desempenho.MassaAusente as e:
+            raise click.ClickException(str(e))
+        for nome, medicao in resultado['endpoints'].items():
+            click.echo(f"{nome:36} {'/'.join(map(str, medicao['status'])):>7} "
+                       f"{medicao['consultas_primeira']:>4} -> {medicao['consultas']:>4} SQL "
+                       f"{medicao['mediana_ms']:>9.1f} ms (p95 {medicao['p95_ms']:.1f} ms)")
+
+        if salvar:
+            os.makedirs(os.path.dirname(referencia) or '.', exist_ok=True)
+            with open(referencia, 'w', encoding='utf-8') as arquivo:
+                json.dump(resultado, arquivo, indent=2, sort_keys=True)
+                arquivo.write('\n')
+            click.echo(f'Referência gravada em {referencia}.')
+            return
+        with open(referencia, encoding='utf-8') as arquivo:
+            base = json.load(arquivo)
+        if base.get('massa') != resultado['massa']:
+            click.echo(f"Aviso: massa diferente da referência ({base.get('massa')}); compare com cautela.", err=True)
+        regressoes = desempenho.comparar(resultado, base, tolerancia)
+        for regressao in regressoes:
+            click.echo(f'REGRESSÃO {regressao}', err=True)
+        if regressoes:
+            raise click.ClickException(f'{len(regressoes)} regressão(ões) em relação a {referencia}')
+        click.echo('Sem regressões em relação à referência.')
+    
+    @app.cli.command('importar-psicologos')
+    @click.argument('arquivo', type=click.File('rb'))
+    @click.option('--processos', type=int, default=None,
+                  help='Processos para o hash das senhas (padrão: IMPORTACAO_PROCESSOS ou nº de CPUs)')
+    @click.option('--lote', type=int, default=500, show_default=True,
+                  help='Linhas por instrução INSERT')
+    @click.option('--simular', is_flag=True, help='Apenas valida o arquivo')
+    def importar_psicologos(arquivo, processos, lote, simular):
+        """Cadastra os psicólogos de um CSV (colunas nome, email, telefone, senha)"""
+        try:
+            linhas = importacao_psicologos.ler_csv(arquivo.read())
+        except importacao_psicologos.ArquivoInvalido as e:
+            raise click.BadParameter(str(e), param_hint='ARQUIVO')
+        inicio = time.perf_counter()
+        resultado = importacao_psicologos.importar(
+            linhas, processos=processos or importacao_psicologos.processos_configurados(),
+            tamanho_lote=lote, simular=simular
+        )
+        duracao = time.perf_counter() - inicio
+        for erro in resultado['erros']:
+            click.echo(f"Linha {erro['linha']} ({erro['email']}): {erro['erro']}", err=True)
+        if simular:
+            click.echo(f"{resultado['validas']} de {resultado['total']} linha(s) válida(s).")
+        else:
+            click.echo(f"{resultado['criados']} psicólogo(s) cadastrado(s), "
+                       f"{len(resultado['erros'])} linha(s) com erro ({duracao:.2f}s).")
+    
+    @app.cli.command('importar-historico')
+    @click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--lote', type=int, default=1000, show_default=True,
+                  help='Registros gravados por transação')
+    @click.option('--nome', default=None, help='Identificador do progresso (padrão: nome do arquivo)')
+    @click.option('--erros', 'arquivo_erros', default=None,
+                  help='Arquivo dos registros inválidos (padrão: ARQUIVO.erros.jsonl)')
+    @click.option('--reiniciar', is_flag=True, help='Ignora o progresso gravado e importa desde o início')
+    def importar_historico(arquivo, lote, nome, arquivo_erros, reiniciar):
+        """Importa consultas e prontuários antigos de um CSV ou JSONL, retomando de onde parou"""
+        inicio = time.perf_counter()
+
+        def progresso(totais):
+            click.echo(f"{totais['retomado_de'] + totais['processados']} registro(s) processado(s)...")
+
+        totais = importacao_legado.importar(arquivo, nome=nome, tamanho_lote=lote, arquivo_erros=arquivo_erros,
+                                            reiniciar=reiniciar, progresso=progresso)
+        duracao = time.perf_counter() - inicio
+        if totais['retomado_de']:
+            click.echo(f"Retomado após {totais['retomado_de']} registro(s) já importado(s).")
+        click.echo(f"{totais['importados']} consulta(s), {totais['sessoes']} sessão(ões) e "
+                   f"{totais['prontuarios']} prontuário(s) importado(s); {totais['erros']} registro(s) com erro "
+                   f"({duracao:.2f}s, {totais['processados'] / duracao if duracao else 0:.0f} registros/s).")
+    
+    @app.cli.command('seed')
+    @click.option('--psicologos', type=int, default=20, show_default=True)
+    @click.option('--pacientes', type=int, default=400, show_default=True)
+    @click.option('--anos', type=float, default=2, show_default=True, help='Anos de histórico de agendamentos')
+    @click.option('--semente', type=int, default=42, show_default=True, help='Mesma semente, mesmos dados')
+    @click.option('--hoje', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Data de referência (padrão: hoje); fixe-a para repetir exatamente os dados')
+    @click.option('--lote', type=int, default=5000, show_default=True, help='Agendamentos por lote de INSERT')
+    def seed(psicologos, pacientes, anos, semente, hoje, lote):
+        """Gera uma clínica sintética (psicólogos, pacientes e anos de agenda) para testes de escala"""
+        inicio = time.perf_counter()
+
+        def progresso(totais):
+            click.echo(f"{totais['pacientes']} paciente(s), {totais['agendamentos']} agendamento(s)...")
+
+        try:
+            totais = dados_sinteticos.gerar(psicologos=psicologos, pacientes=pacientes, anos=anos, semente=semente,
+                                            hoje=hoje.date() if hoje else None, tamanho_lote=lote,
+                                            progresso=progresso)
+        except dados_sinteticos.BaseJaPopulada as e:
+            raise click.ClickException(str(e))
+        duracao = time.perf_counter() - inicio
+        for tabela, quantidade in totais.items():
+            click.echo(f'{tabela}: {quantidade}')
+        click.echo(f'Concluído em {duracao:.2f}s. Senha de todos os usuários: {dados_sinteticos.SENHA_PADRAO} '
+                   f'(administrador: admin@{dados_sinteticos.DOMINIO}).')
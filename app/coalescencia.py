@@ -0,0 +1,107 @@
+"""Coalescência de computações idênticas ("single-flight").
+
+Quando várias requisições do mesmo worker pedem o mesmo resultado ao mesmo
+tempo, apenas a primeira executa a computação; as demais aguardam e recebem o
+mesmo resultado. Logo depois de pronto, o resultado ainda fica num micro-cache
+por ``ttl`` segundos para absorver as requisições que chegam em seguida.
+"""
+import threading
+import time
+
+
+class _Chamada:
+    """Computação em andamento compartilhada pelas requisições que a aguardam"""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro = None
+        self.invalidada = False
+
+
+class SingleFlight:
+    """Executa no máximo uma computação por chave ao mesmo tempo.
+
+    Os resultados são compartilhados entre as requisições e por isso devem ser
+    tratados como somente leitura (de preferência tuplas).
+    """
+
+    def __init__(self, ttl=2.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._em_andamento = {}
+        self._cache = {}
+        self.computacoes = 0
+        self.coalescidas = 0
+        self.acertos_cache = 0
+
+    def executar(self, chave, funcao):
+        """Retorna ``funcao()``, reaproveitando computações da mesma chave"""
+        with self._lock:
+            em_cache = self._cache.get(chave)
+            if em_cache is not None:
+                if em_cache[0] > time.monotonic():
+                    self.acertos_cache += 1
+                    return em_cache[1]
+                del self._cache[chave]
+
+            chamada = self._em_andamento.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = _Chamada()
+                self._em_andamento[chave] = chamada
+                self.computacoes += 1
+            else:
+                self.coalescidas += 1
+
+        if not lider:
+            chamada.evento.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+
+        try:
+            chamada.resultado = funcao()
+            return chamada.resultado
+        except Exception as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock:
+                if self._em_andamento.get(chave) is chamada:
+                    del self._em_andamento[chave]
+                if chamada.erro is None and not chamada.invalidada and self.ttl > 0:
+                    self._cache[chave] = (time.monotonic() + self.ttl, chamada.resultado)
+            chamada.evento.set()
+
+    def esquecer(self, chave):
+        """Descarta o resultado em cache da chave.
+
+        Uma computação da chave ainda em andamento pode ter lido dados
+        anteriores à alteração: ela deixa de receber novas requisições e seu
+        resultado não é guardado no cache.
+        """
+        with self._lock:
+            self._cache.pop(chave, None)
+            chamada = self._em_andamento.pop(chave, None)
+            if chamada is not None:
+                chamada.invalidada = True
+
+    def limpar(self):
+        """Descarta todos os resultados em cache"""
+        with self._lock:
+            self._cache.clear()
+            for chamada in self._em_andamento.values():
+                chamada.invalidada = True
+            self._em_andamento.clear()
+
+    def estatisticas(self):
+        """Contadores de computações executadas e economizadas"""
+        with self._lock:
+            return {
+                'computacoes': self.computacoes,
+                'coalescidas': self.coalescidas,
+                'acertos_cache': self.acertos_cache,
+                'economizadas': self.coalescidas + self.acertos_cache,
+                'em_andamento': len(self._em_andamento),
+            }
@@ -0,0 +1,302 @@
+"""Geração de uma clínica sintética para testes de escala (``flask seed``).
+
+Com poucas dezenas de linhas no banco de homologação, os problemas de
+consulta das telas de psicólogo e administrador só aparecem em produção.
+Este módulo cria, a partir de uma semente, uma clínica com volume realista:
+
+- psicólogos com expediente (``HorarioAtendimento``) de 3 a 5 dias por
+  semana e carga de pacientes desigual;
+- pacientes com prontuário, cada um em tratamento semanal ou quinzenal em um
+  horário fixo do expediente do seu psicólogo, por algumas semanas ou anos;
+- agendamentos de ``anos`` anos até ``RECORRENCIA_HORIZONTE_SEMANAS`` à
+  frente, com a mistura de status de uma agenda real (realizados, faltas,
+  cancelamentos, confirmados) e sessões com anotações nos realizados;
+- recorrência ativa nos prontuários dos tratamentos semanais em andamento.
+
+A mesma semente e a mesma data de referência (``hoje``) geram sempre os
+mesmos dados. Os IDs são atribuídos pelo gerador, a partir do maior ID de
+cada tabela, e as linhas são gravadas com ``INSERT`` em lote a cada
+``tamanho_lote`` agendamentos, em uma única transação; em memória ficam
+apenas o lote atual e os horários já ocupados de cada psicólogo. Todos os
+usuários têm a senha ``SENHA_PADRAO`` (um único hash é calculado).
+"""
+import random
+from datetime import date, datetime, time, timedelta
+
+from flask import current_app
+from sqlalchemy import func, insert, text
+
+from app import disponibilidade, invalidacao, senhas
+from app.models import (
+    Admin, Agendamento, HorarioAtendimento, Paciente, Prontuario, Psicologo, Sessao, Usuario, db
+)
+
+DOMINIO = 'sintetico.test'
+SENHA_PADRAO = 'senha123'
+
+NOMES = (
+    'Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela', 'João',
+    'Karina', 'Lucas', 'Mariana', 'Nicolas', 'Olívia', 'Pedro', 'Rafaela', 'Samuel', 'Tatiana', 'Vinícius',
+    'Beatriz', 'Caio', 'Débora', 'Emanuel', 'Fernanda', 'Gustavo', 'Helena', 'Igor', 'Juliana', 'Leonardo',
+)
+SOBRENOMES = (
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+    'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira', 'Barbosa',
+)
+EXPEDIENTES = (
+    ((time(8), time(12)), (time(13), time(18))),
+    ((time(9), time(17)),),
+    ((time(13), time(20)),),
+    ((time(7), time(11)), (time(14), time(19))),
+)
+ANOTACOES = (
+    'Paciente relata melhora no sono.',
+    'Trabalhamos estratégias de enfrentamento da ansiedade.',
+    'Retomada a discussão sobre conflitos familiares.',
+    'Paciente trouxe situação de estresse no trabalho.',
+    'Revisão das metas terapêuticas.',
+    'Exercícios de respiração propostos para a semana.',
+    'Relato de episódio de tristeza intensa; acompanhar.',
+    'Paciente mais participativo que na sessão anterior.',
+)
+OBSERVACOES_CANCELAMENTO = ('Cancelado pelo paciente', 'Cancelado pelo psicólogo', None)
+
+
+class BaseJaPopulada(Exception):
+    """O banco já contém dados gerados por uma execução anterior"""
+
+
+class GeradorClinica:
+    """Gera e grava as linhas da clínica; ``executar`` devolve os totais"""
+
+    def __init__(self, psicologos, pacientes, anos, semente, hoje, tamanho_lote, progresso=None):
+        self.rng = random.Random(semente)
+        self.quantidade_psicologos = psicologos
+        self.quantidade_pacientes = pacientes
+        self.hoje = hoje
+        self.inicio = hoje - timedelta(days=round(365.25 * anos))
+        horizonte = current_app.config.get('RECORRENCIA_HORIZONTE_SEMANAS', 8)
+        self.fim = hoje + timedelta(weeks=horizonte)
+        self.tamanho_lote = tamanho_lote
+        self.progresso = progresso
+        self.agora = datetime.combine(hoje, time(12))
+        self.totais = {'usuarios': 0, 'psicologos': 0, 'pacientes': 0, 'horarios_atendimento': 0,
+                       'prontuarios': 0, 'agendamentos': 0, 'sessoes': 0}
+        # Linhas pendentes por tabela, gravadas na ordem das chaves estrangeiras
+        self._pendentes = {Usuario: [], Paciente: [], Prontuario: [], Agendamento: [], Sessao: []}
+
+    # Gravação
+
+    def _proximo_id(self, modelo):
+        return (db.session.query(func.max(modelo.id)).scalar() or 0) + 1
+
+    def _inserir(self, modelo, linhas, total):
+        for inicio in range(0, len(linhas), self.tamanho_lote):
+            db.session.execute(insert(modelo), linhas[inicio:inicio + self.tamanho_lote])
+        self.totais[total] += len(linhas)
+
+    def _descarregar(self, forcar=False):
+        """Grava as linhas pendentes quando o lote de agendamentos enche"""
+        if not forcar and len(self._pendentes[Agendamento]) < self.tamanho_lote:
+            return
+        for modelo, linhas in self._pendentes.items():
+            self._inserir(modelo, linhas, modelo.__tablename__)
+            linhas.clear()
+        if self.progresso:
+            self.progresso(self.totais)
+
+    def _ajustar_sequencias(self):
+        """No PostgreSQL, avança as sequências além dos IDs atribuídos aqui"""
+        if db.session.get_bind().dialect.name != 'postgresql':
+            return
+        for modelo in (Usuario, Psicologo, Paciente, Prontuario, Agendamento):
+            tabela = modelo.__tablename__
+            db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), (SELECT MAX(id) FROM {tabela}))"
+            ))
+
+    # Geração
+
+    def _nome(self):
+        return f'{self.rng.choice(NOMES)} {self.rng.choice(SOBRENOMES)} {self.rng.choice(SOBRENOMES)}'
+
+    def _telefone(self):
+        return f'(11) 9{self.rng.randint(1000, 9999)}-{self.rng.randint(1000, 9999)}'
+
+    def _usuario(self, usuario_id, email, tipo, senha_hash, criado_em):
+        return {
+            'id': usuario_id,
+            'nome_completo': self._nome(),
+            'email': email,
+            'senha_hash': senha_hash,
+            'versao_senha': 1,
+            'telefone': self._telefone(),
+            'tipo_usuario': tipo,
+            'ativo': True,
+            'data_criacao': criado_em,
+        }
+
+    def _gerar_psicologos(self, senha_hash):
+        """Cria psicólogos e expedientes; devolve ``[(id, peso, horários fixos)]``"""
+        usuario_id = self._proximo_id(Usuario)
+        psicologo_id = self._proximo_id(Psicologo)
+        usuarios, linhas, horarios, psicologos = [], [], [], []
+        criado_em = datetime.combine(self.inicio, time(9)) - timedelta(days=30)
+        for numero in range(1, self.quantidade_psicologos + 1):
+            usuarios.append(self._usuario(usuario_id, f'psicologo{numero:04d}@{DOMINIO}', 'psicologo',
+                                          senha_hash, criado_em))
+            linhas.append({'id': psicologo_id, 'usuario_id': usuario_id})
+            dias = sorted(self.rng.sample(range(5), self.rng.randint(3, 5)))
+            expediente = self.rng.choice(EXPEDIENTES)
+            fixos = []
+            for dia in dias:
+                for hora_inicio, hora_fim in expediente:
+                    horarios.append({'psicologo_id': psicologo_id, 'dia_semana': dia,
+                                     'hora_inicio': hora_inicio, 'hora_fim': hora_fim, 'ativo': True})
+                    fixos += [(dia, time(hora)) for hora in range(hora_inicio.hour, hora_fim.hour)]
+            # Psicólogos com agendas mais e menos cheias
+            psicologos.append((psicologo_id, self.rng.uniform(0.3, 2.0), fixos))
+            usuario_id += 1
+            psicologo_id += 1
+        self._inserir(Usuario, usuarios, 'usuarios')
+        self._inserir(Psicologo, linhas, 'psicologos')
+        self._inserir(HorarioAtendimento, horarios, 'horarios_atendimento')
+        return psicologos
+
+    def _status(self, data_hora):
+        sorteio = self.rng.random()
+        if data_hora < self.agora:
+            if sorteio < 0.08:
+                return 'cancelado'
+            if sorteio < 0.14:
+                return 'ausencia'
+            if sorteio < 0.15:
+                return 'pendente_revisao'
+            return 'realizado'
+        if sorteio < 0.05:
+            return 'cancelado'
+        if data_hora < self.agora + timedelta(days=3) and sorteio < 0.7:
+            return 'confirmado'
+        return 'agendado'
+
+    def _tratamento(self):
+        """Início, fim e intervalo (semanas) do tratamento de um paciente"""
+        total_dias = (self.fim - self.inicio).days
+        inicio = self.inicio + timedelta(days=self.rng.randint(0, max(total_dias - 28, 0)))
+        sorteio = self.rng.random()
+        if sorteio < 0.4:
+            semanas = self.rng.randint(4, 12)
+        elif sorteio < 0.8:
+            semanas = self.rng.randint(12, 52)
+        else:
+            semanas = self.rng.randint(52, 52 * 4)
+        intervalo = 1 if self.rng.random() < 0.75 else 2
+        return inicio, min(inicio + timedelta(weeks=semanas), self.fim), intervalo
+
+    def _gerar_pacientes(self, psicologos, senha_hash):
+        usuario_id = self._proximo_id(Usuario)
+        paciente_id = self._proximo_id(Paciente)
+        prontuario_id = self._proximo_id(Prontuario)
+        agendamento_id = self._proximo_id(Agendamento)
+        pesos = [peso for _, peso, _ in psicologos]
+        ocupados = set()  # (psicologo_id, data_hora)
+
+        for numero in range(1, self.quantidade_pacientes + 1):
+            psicologo_id, _, fixos = self.rng.choices(psicologos, weights=pesos)[0]
+            inicio, fim, intervalo = self._tratamento()
+            dia_semana, horario = self.rng.choice(fixos)
+            duracao = 50 if self.rng.random() < 0.2 else 60
+            criado_em = datetime.combine(inicio, time(10)) - timedelta(days=self.rng.randint(1, 10))
+            em_andamento = fim >= self.hoje
+
+            self._pendentes[Usuario].append(
+                self._usuario(usuario_id, f'paciente{numero:06d}@{DOMINIO}', 'paciente', senha_hash, criado_em)
+            )
+            self._pendentes[Paciente].append(
+                {'id': paciente_id, 'usuario_id': usuario_id, 'psicologo_id': psicologo_id}
+            )
+            recorrente = em_andamento and intervalo == 1
+            self._pendentes[Prontuario].append({
+                'id': prontuario_id,
+                'paciente_id': paciente_id,
+                'psicologo_id': psicologo_id,
+                'data_criacao': criado_em,
+                'observacoes_gerais': 'Encaminhado pela triagem.' if self.rng.random() < 0.3 else None,
+                'recorrencia_ativa': recorrente,
+                'recorrencia_dia_semana': dia_semana if recorrente else None,
+                'recorrencia_horario': horario if recorrente else None,
+            })
+
+            datas = []
+            for data in _datas_tratamento(dia_semana, horario, inicio, fim, intervalo):
+                if (psicologo_id, data) not in ocupados:
+                    ocupados.add((psicologo_id, data))
+                    datas.append(data)
+            for indice, data_hora in enumerate(datas):
+                status = self._status(data_hora)
+                marcado_em = min(data_hora - timedelta(days=self.rng.randint(1, 14)), self.agora)
+                self._pendentes[Agendamento].append({
+                    'id': agendamento_id,
+                    'paciente_id': paciente_id,
+                    'psicologo_id': psicologo_id,
+                    'data_hora': data_hora,
+                    'duracao_minutos': duracao,
+                    'data_hora_fim': data_hora + timedelta(minutes=duracao),
+                    'status': status,
+                    'observacoes': self.rng.choice(OBSERVACOES_CANCELAMENTO) if status == 'cancelado' else None,
+                    'data_criacao': marcado_em,
+                    'data_atualizacao': min(data_hora, self.agora) if data_hora < self.agora else marcado_em,
+                })
+                if status == 'realizado' and self.rng.random() < 0.9:
+                    self._pendentes[Sessao].append({
+                        'prontuario_id': prontuario_id,
+                        'agendamento_id': agendamento_id,
+                        'data_sessao': data_hora,
+                        'anotacoes': ' '.join(self.rng.sample(ANOTACOES, self.rng.randint(1, 3))),
+                        'proxima_sessao': datas[indice + 1] if indice + 1 < len(datas) else None,
+                        'data_criacao': data_hora + timedelta(minutes=duracao),
+                    })
+                agendamento_id += 1
+            usuario_id += 1
+            paciente_id += 1
+            prontuario_id += 1
+            self._descarregar()
+        self._descarregar(forcar=True)
+
+    def executar(self):
+        if Usuario.query.filter(Usuario.email.like(f'%@{DOMINIO}')).first() is not None:
+            raise BaseJaPopulada(f'O banco já contém usuários @{DOMINIO}')
+        senha_hash = senhas.gerar_hash(SENHA_PADRAO)
+        try:
+            admin_id = self._proximo_id(Usuario)
+            self._inserir(Usuario, [self._usuario(admin_id, f'admin@{DOMINIO}', 'admin', senha_hash,
+                                                  datetime.combine(self.inicio, time(9)))], 'usuarios')
+            db.session.execute(insert(Admin), [{'usuario_id': admin_id}])
+            psicologos = self._gerar_psicologos(senha_hash)
+            self._gerar_pacientes(psicologos, senha_hash)
+            self._ajustar_sequencias()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        invalidacao.publicar('psicologos')
+        disponibilidade.agendamentos_em_lote()
+        return self.totais
+
+
+def _datas_tratamento(dia_semana, horario, inicio, fim, intervalo=1):
+    """Datas e horas no ``dia_semana`` a cada ``intervalo`` semanas entre ``inicio`` e ``fim``"""
+    data = inicio + timedelta(days=(dia_semana - inicio.weekday()) % 7)
+    while data <= fim:
+        yield datetime.combine(data, horario)
+        data += timedelta(weeks=intervalo)
+
+
+def gerar(psicologos=20, pacientes=400, anos=2, semente=42, hoje=None, tamanho_lote=5000, progresso=None):
+    """Gera a clínica sintética e devolve a quantidade de linhas por tabela.
+
+    ``progresso(totais)`` é chamada após cada lote de agendamentos gravado.
+    Levanta ``BaseJaPopulada`` se o banco já tiver dados gerados antes.
+    """
+    gerador = GeradorClinica(psicologos, pacientes, anos, semente, hoje or date.today(), tamanho_lote, progresso)
+    return gerador.executar()
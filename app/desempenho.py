@@ -0,0 +1,204 @@
+"""Medição de latência e de instruções SQL dos endpoints mais usados.
+
+Os endpoints são chamados pelo cliente de teste do Flask contra o banco
+configurado, que deve ter sido populado antes com ``flask seed`` (os
+usuários ``@sintetico.test`` fazem as requisições). As telas do psicólogo
+usam o psicólogo com mais agendamentos, e as do paciente um paciente dele.
+
+Para cada endpoint são feitas uma requisição com os caches vazios e
+``repeticoes`` requisições seguintes; o resultado traz o status, as
+instruções SQL da primeira (``consultas_primeira``) e o máximo das demais
+(``consultas``), e a mediana e o p95 do tempo das demais em milissegundos.
+
+``comparar`` confronta o resultado com uma referência gravada antes: é
+regressão qualquer aumento no número de instruções (que não depende da
+máquina), um status de erro que a referência não tinha ou uma mediana acima
+da referência em mais de ``tolerancia`` (fração; tempos só são comparáveis
+na mesma máquina e com a mesma massa).
+
+O ``agendar_modal`` cria de fato as consultas, em horários livres dos dias
+seguintes; elas e os e-mails enfileirados são removidos ao final.
+"""
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+from flask import current_app, g
+from sqlalchemy import event, func
+
+from app import disponibilidade
+from app.dados_sinteticos import DOMINIO, SENHA_PADRAO
+from app.models import Agendamento, EmailPendente, Paciente, Psicologo, Usuario, db
+
+# Dias à frente procurados para horários livres do psicólogo
+DIAS_PROCURADOS = 60
+
+
+class MassaAusente(Exception):
+    """O banco não tem os dados gerados por ``flask seed``"""
+
+
+class ContadorInstrucoes:
+    """Conta as instruções SQL executadas no engine enquanto ativo"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.total = 0
+
+    def _contar(self, *args):
+        self.total += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._contar)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._contar)
+
+
+def _contexto(repeticoes):
+    """Usuários e parâmetros das requisições medidas"""
+    mais_agendado = db.session.query(Agendamento.psicologo_id).join(
+        Psicologo, Psicologo.id == Agendamento.psicologo_id
+    ).join(Usuario, Usuario.id == Psicologo.usuario_id).filter(
+        Usuario.email.like(f'%@{DOMINIO}')
+    ).group_by(Agendamento.psicologo_id).order_by(
+        func.count(Agendamento.id).desc(), Agendamento.psicologo_id
+    ).first()
+    if mais_agendado is None:
+        raise MassaAusente('Nenhum agendamento sintético no banco; execute "flask seed" antes')
+    psicologo = db.session.get(Psicologo, mais_agendado[0])
+    paciente = Paciente.query.join(Usuario, Usuario.id == Paciente.usuario_id).filter(
+        Paciente.psicologo_id == psicologo.id, Usuario.email.like(f'%@{DOMINIO}')
+    ).order_by(Paciente.id).first()
+
+    # Um horário livre por agendamento criado (aquecimento + repetições)
+    livres = []
+    dia = date.today() + timedelta(days=1)
+    data_consulta = None
+    while len(livres) < repeticoes + 1 and dia <= date.today() + timedelta(days=DIAS_PROCURADOS):
+        horarios = disponibilidade.calcular_horarios_disponiveis(psicologo.id, dia)
+        if horarios and data_consulta is None:
+            data_consulta = dia
+        livres += [(dia, horario) for horario in horarios or ()]
+        dia += timedelta(days=1)
+    if data_consulta is None:
+        raise MassaAusente(f'O psicólogo {psicologo.id} não tem horários livres nos próximos {DIAS_PROCURADOS} dias')
+
+    return {
+        'psicologo': psicologo.usuario.email,
+        'psicologo_id': psicologo.id,
+        'paciente': paciente.usuario.email,
+        'data': data_consulta.isoformat(),
+        'livres': livres,
+    }
+
+
+def _endpoints(contexto):
+    """``(nome, perfil, método, url, dados por repetição)`` de cada endpoint medido"""
+    def agendamento(indice):
+        dia, horario = contexto['livres'][indice]
+        return {'psicologo_id': str(contexto['psicologo_id']), 'data': dia.isoformat(), 'horario': horario,
+                'duracao_minutos': '60', 'observacoes': ''}
+
+    horarios = f"/paciente/api/horarios-disponiveis?psicologo_id={contexto['psicologo_id']}&data={contexto['data']}"
+    return (
+        ('psicologo.dashboard', 'psicologo', 'GET', '/psicologo/dashboard', None),
+        ('psicologo.prontuarios', 'psicologo', 'GET', '/psicologo/prontuarios', None),
+        ('psicologo.calendario', 'psicologo', 'GET', '/psicologo/calendario', None),
+        ('admin.dashboard', 'admin', 'GET', '/admin/dashboard', None),
+        ('paciente.api_horarios_disponiveis', 'paciente', 'GET', horarios, None),
+        # Por último: cria agendamentos
+        ('paciente.agendar_modal', 'paciente', 'POST', '/paciente/agendar_modal', agendamento),
+    )
+
+
+def _requisitar(cliente, metodo, url, dados=None):
+    """Status da resposta à requisição"""
+    # O contexto da aplicação é o mesmo entre as requisições (linha de comando,
+    # testes): sem isto o usuário da requisição anterior ficaria em ``g``
+    g.pop('_login_user', None)
+    try:
+        return cliente.open(url, method=metodo, data=dados).status_code
+    except Exception:
+        # Com PROPAGATE_EXCEPTIONS (TESTING) o erro da rota chega até aqui
+        db.session.rollback()
+        return 500
+
+
+def _entrar(tipo_usuario, email):
+    cliente = current_app.test_client()
+    resposta = cliente.post('/auth/api/login', json={'email': email, 'senha': SENHA_PADRAO,
+                                                     'tipo_usuario': tipo_usuario})
+    if resposta.status_code != 200:
+        raise MassaAusente(f'Login de {email} recusado ({resposta.status_code})')
+    return cliente
+
+
+def medir(repeticoes=5):
+    """Mede os endpoints e devolve ``{'endpoints': {nome: medição}, 'massa': {tabela: linhas}}``"""
+    contexto = _contexto(repeticoes)
+    clientes = {
+        'psicologo': _entrar('psicologo', contexto['psicologo']),
+        'paciente': _entrar('paciente', contexto['paciente']),
+        'admin': _entrar('admin', f'admin@{DOMINIO}'),
+    }
+    ultimo_agendamento = db.session.query(func.max(Agendamento.id)).scalar() or 0
+    inicio_medicao = datetime.utcnow()
+    # A primeira requisição de cada endpoint encontra os caches vazios
+    disponibilidade.agendamentos_em_lote()
+
+    resultado = {}
+    try:
+        for nome, perfil, metodo, url, dados in _endpoints(contexto):
+            tempos = []
+            consultas = []
+            status = set()
+            for indice in range(repeticoes + 1):
+                with ContadorInstrucoes(db.engine) as contador:
+                    inicio = time.perf_counter()
+                    status.add(_requisitar(clientes[perfil], metodo, url, dados(indice) if dados else None))
+                    duracao = time.perf_counter() - inicio
+                consultas.append(contador.total)
+                tempos.append(duracao * 1000)
+            medidos = sorted(tempos[1:])
+            resultado[nome] = {
+                'status': sorted(status),
+                'consultas_primeira': consultas[0],
+                'consultas': max(consultas[1:]),
+                'mediana_ms': round(statistics.median(medidos), 2),
+                'p95_ms': round(medidos[min(len(medidos) - 1, int(len(medidos) * 0.95))], 2),
+            }
+    finally:
+        db.session.rollback()
+        Agendamento.query.filter(Agendamento.id > ultimo_agendamento).delete(synchronize_session=False)
+        EmailPendente.query.filter(
+            EmailPendente.destinatario == contexto['paciente'], EmailPendente.data_criacao >= inicio_medicao
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        disponibilidade.agendamentos_em_lote()
+
+    massa = {
+        'psicologos': Psicologo.query.count(),
+        'pacientes': Paciente.query.count(),
+        'agendamentos': Agendamento.query.count(),
+    }
+    return {'endpoints': resultado, 'massa': massa, 'repeticoes': repeticoes}
+
+
+def comparar(resultado, referencia, tolerancia=0.5):
+    """Regressões de ``resultado`` em relação à ``referencia`` (lista de mensagens)"""
+    regressoes = []
+    for nome, medicao in resultado['endpoints'].items():
+        base = referencia.get('endpoints', {}).get(nome)
+        if base is None:
+            continue
+        for chave in ('consultas_primeira', 'consultas'):
+            if medicao[chave] > base[chave]:
+                regressoes.append(f'{nome}: {chave} {base[chave]} -> {medicao[chave]}')
+        if medicao['mediana_ms'] > base['mediana_ms'] * (1 + tolerancia):
+            regressoes.append(f"{nome}: mediana {base['mediana_ms']:.1f} ms -> {medicao['mediana_ms']:.1f} ms")
+        novos_erros = [status for status in medicao['status'] if status >= 400 and status not in base['status']]
+        if novos_erros:
+            regressoes.append(f"{nome}: status {base['status']} -> {medicao['status']}")
+    return regressoes
@@ -0,0 +1,435 @@
+"""Índice de disponibilidade dos psicólogos em bitmap.
+
+Cada dia de atendimento é representado por um inteiro em que o bit ``i``
+corresponde ao intervalo de 15 minutos que começa ``i * 15`` minutos após a
+meia-noite (96 bits por dia). O expediente de cada dia da semana vem de
+``HorarioAtendimento`` e a ocupação de cada data vem dos agendamentos ativos;
+os horários livres são ``expediente & ~ocupacao``.
+
+Com isso, "primeiro horário livre entre todos os psicólogos" e "quem está
+livre na terça às 14:00" viram operações bit a bit sobre poucos inteiros, sem
+consultas ao banco depois que o período foi carregado.
+"""
+import threading
+import time as relogio
+from datetime import date, datetime, time, timedelta
+
+from flask import current_app
+
+from app import invalidacao
+from app.coalescencia import SingleFlight
+from app.models import Agendamento, HorarioAtendimento, Psicologo, Usuario, db
+
+SLOT_MINUTOS = 15
+SLOTS_POR_DIA = 24 * 60 // SLOT_MINUTOS
+DURACAO_SESSAO_MINUTOS = 60
+# Durações oferecidas no agendamento: sessão curta, padrão, estendida e dupla
+DURACOES_SESSAO_MINUTOS = (50, 60, 90, 120)
+STATUS_OCUPADOS = ('agendado', 'confirmado')
+
+
+def indice_slot(horario):
+    """Índice do intervalo de 15 minutos que contém o horário"""
+    return (horario.hour * 60 + horario.minute) // SLOT_MINUTOS
+
+
+def horario_slot(indice):
+    """Horário de início do intervalo de índice informado"""
+    minutos = indice * SLOT_MINUTOS
+    return time(minutos // 60, minutos % 60)
+
+
+def mascara_intervalo(inicio, fim):
+    """Máscara com os intervalos de ``inicio`` (inclusive) até ``fim`` (exclusive)"""
+    primeiro = indice_slot(inicio)
+    # Um expediente que termina no meio de um intervalo ainda o ocupa
+    ultimo = -(-(fim.hour * 60 + fim.minute) // SLOT_MINUTOS)
+    if ultimo <= primeiro:
+        return 0
+    return ((1 << (ultimo - primeiro)) - 1) << primeiro
+
+
+def mascara_sessao(inicio, duracao_minutos=DURACAO_SESSAO_MINUTOS):
+    """Máscara dos intervalos ocupados por uma sessão iniciada em ``inicio``"""
+    primeiro = indice_slot(inicio)
+    quantidade = -(-duracao_minutos // SLOT_MINUTOS)
+    quantidade = min(quantidade, SLOTS_POR_DIA - primeiro)
+    return ((1 << quantidade) - 1) << primeiro
+
+
+def inicios_possiveis(livres, duracao_minutos=DURACAO_SESSAO_MINUTOS):
+    """Bits a partir dos quais há ``duracao_minutos`` livres consecutivos"""
+    resultado = livres
+    for deslocamento in range(1, -(-duracao_minutos // SLOT_MINUTOS)):
+        resultado &= livres >> deslocamento
+    return resultado
+
+
+def menor_bit(mascara):
+    """Índice do bit ligado mais baixo (-1 se a máscara for vazia)"""
+    return (mascara & -mascara).bit_length() - 1
+
+
+def bits_ligados(mascara):
+    """Índices dos bits ligados, em ordem crescente"""
+    while mascara:
+        bit = mascara & -mascara
+        yield bit.bit_length() - 1
+        mascara ^= bit
+
+
+class IndiceDisponibilidade:
+    """Bitmaps de expediente e ocupação mantidos em memória pelo worker.
+
+    O expediente é carregado inteiro (a tabela é pequena) e a ocupação é
+    carregada por data, sob demanda, com uma única consulta para todos os
+    psicólogos. Agendamentos e cancelamentos atualizam o índice de forma
+    incremental; ``ttl`` limita por quanto tempo uma data carregada é usada
+    antes de ser relida, já que outros workers também gravam agendamentos.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._expedientes = None  # psicologo_id -> [máscara por dia da semana]
+        self._ocupacao = {}  # (psicologo_id, data) -> máscara de intervalos ocupados
+        self._datas_carregadas = {}  # data -> instante da carga
+
+    # ---------------------------------------------------------------- carga
+
+    def _carregar_expedientes(self):
+        horarios = db.session.query(
+            HorarioAtendimento.psicologo_id,
+            HorarioAtendimento.dia_semana,
+            HorarioAtendimento.hora_inicio,
+            HorarioAtendimento.hora_fim
+        ).join(
+            Psicologo, Psicologo.id == HorarioAtendimento.psicologo_id
+        ).join(
+            Usuario, Usuario.id == Psicologo.usuario_id
+        ).filter(
+            HorarioAtendimento.ativo.is_(True),
+            Usuario.tipo_usuario == 'psicologo',
+            Usuario.ativo.is_(True)
+        ).all()
+
+        expedientes = {}
+        for psicologo_id, dia_semana, hora_inicio, hora_fim in horarios:
+            dias = expedientes.setdefault(psicologo_id, [0] * 7)
+            dias[dia_semana] |= mascara_intervalo(hora_inicio, hora_fim)
+        self._expedientes = expedientes
+
+    def _carregar_datas(self, datas):
+        """Carrega a ocupação das datas ainda não carregadas (ou expiradas)"""
+        agora = relogio.monotonic()
+        pendentes = [
+            d for d in datas
+            if agora - self._datas_carregadas.get(d, float('-inf')) > self.ttl
+        ]
+        if not pendentes:
+            return
+
+        ocupacao = {}
+        agendamentos = db.session.query(
+            Agendamento.psicologo_id,
+            Agendamento.data_hora,
+            Agendamento.duracao_minutos
+        ).filter(
+            Agendamento.data_hora >= datetime.combine(min(pendentes), time.min),
+            Agendamento.data_hora < datetime.combine(max(pendentes) + timedelta(days=1), time.min),
+            Agendamento.status.in_(STATUS_OCUPADOS)
+        ).all()
+        conjunto = set(pendentes)
+        for psicologo_id, data_hora, duracao in agendamentos:
+            if data_hora.date() in conjunto:
+                chave = (psicologo_id, data_hora.date())
+                ocupacao[chave] = ocupacao.get(chave, 0) | mascara_sessao(data_hora.time(), duracao)
+
+        for chave in [c for c in self._ocupacao if c[1] in conjunto]:
+            del self._ocupacao[chave]
+        self._ocupacao.update(ocupacao)
+        for d in pendentes:
+            self._datas_carregadas[d] = agora
+
+        # Datas passadas não são mais consultadas
+        hoje = date.today()
+        for d in [d for d in self._datas_carregadas if d < hoje]:
+            del self._datas_carregadas[d]
+        for chave in [c for c in self._ocupacao if c[1] < hoje]:
+            del self._ocupacao[chave]
+
+    def _livres(self, psicologo_id, data, bloqueios=None):
+        expediente = self._expedientes.get(psicologo_id)
+        if not expediente:
+            return 0
+        livres = expediente[data.weekday()] & ~self._ocupacao.get((psicologo_id, data), 0)
+        if bloqueios:
+            livres &= ~bloqueios.get((psicologo_id, data), 0)
+        return livres
+
+    def _preparar(self, datas):
+        if self._expedientes is None:
+            self._carregar_expedientes()
+        self._carregar_datas(datas)
+
+    # ---------------------------------------------------------- atualização
+
+    def ocupar(self, psicologo_id, data_hora, duracao_minutos=DURACAO_SESSAO_MINUTOS):
+        """Marca como ocupados os intervalos de um novo agendamento"""
+        with self._lock:
+            if data_hora.date() not in self._datas_carregadas:
+                return
+            chave = (psicologo_id, data_hora.date())
+            self._ocupacao[chave] = self._ocupacao.get(chave, 0) | mascara_sessao(
+                data_hora.time(), duracao_minutos
+            )
+
+    def liberar(self, psicologo_id, data_hora):
+        """Recalcula a ocupação do dia de um agendamento cancelado.
+
+        Limpar os bits diretamente liberaria intervalos que outra consulta
+        sobreposta ainda ocupa, por isso o dia do psicólogo é relido do banco.
+        """
+        with self._lock:
+            data = data_hora.date()
+            if data not in self._datas_carregadas:
+                return
+            agendamentos = db.session.query(
+                Agendamento.data_hora,
+                Agendamento.duracao_minutos
+            ).filter(
+                Agendamento.psicologo_id == psicologo_id,
+                Agendamento.data_hora >= datetime.combine(data, time.min),
+                Agendamento.data_hora < datetime.combine(data + timedelta(days=1), time.min),
+                Agendamento.status.in_(STATUS_OCUPADOS)
+            ).all()
+            mascara = 0
+            for inicio, duracao in agendamentos:
+                mascara |= mascara_sessao(inicio.time(), duracao)
+            self._ocupacao[(psicologo_id, data)] = mascara
+
+    def esquecer_data(self, data):
+        """Descarta a ocupação carregada da data (relida na próxima consulta)"""
+        with self._lock:
+            self._datas_carregadas.pop(data, None)
+            for chave in [c for c in self._ocupacao if c[1] == data]:
+                del self._ocupacao[chave]
+
+    def invalidar_expedientes(self):
+        """Descarta os expedientes (relidos na próxima consulta)"""
+        with self._lock:
+            self._expedientes = None
+
+    def limpar(self):
+        """Descarta todo o conteúdo do índice"""
+        with self._lock:
+            self._expedientes = None
+            self._ocupacao.clear()
+            self._datas_carregadas.clear()
+
+    # -------------------------------------------------------------- consultas
+
+    def horarios_livres(self, psicologo_id, data, duracao_minutos=DURACAO_SESSAO_MINUTOS):
+        """Máscara dos inícios possíveis de sessão do psicólogo na data"""
+        with self._lock:
+            self._preparar([data])
+            return inicios_possiveis(self._livres(psicologo_id, data), duracao_minutos)
+
+    def psicologos_livres(self, data_hora, duracao_minutos=DURACAO_SESSAO_MINUTOS, bloqueios=None):
+        """IDs dos psicólogos com a sessão inteira livre a partir de ``data_hora``.
+
+        ``bloqueios`` (``{(psicologo_id, data): máscara}``) marca intervalos
+        indisponíveis além dos agendamentos, como reservas temporárias.
+        """
+        data = data_hora.date()
+        sessao = mascara_sessao(data_hora.time(), duracao_minutos)
+        with self._lock:
+            self._preparar([data])
+            return sorted(
+                psicologo_id for psicologo_id in self._expedientes
+                if self._livres(psicologo_id, data, bloqueios) & sessao == sessao
+            )
+
+    def primeiro_horario_livre(self, a_partir_de, dias=14, psicologo_ids=None,
+                               duracao_minutos=DURACAO_SESSAO_MINUTOS, bloqueios=None):
+        """Primeiro horário com sessão livre a partir de ``a_partir_de``.
+
+        Retorna ``(data_hora, [psicologo_id, ...])`` com todos os psicólogos
+        livres nesse horário, ou ``None`` se não houver vaga no período.
+        ``bloqueios`` tem o mesmo formato de ``psicologos_livres``.
+        """
+        datas = [a_partir_de.date() + timedelta(days=i) for i in range(dias)]
+        with self._lock:
+            self._preparar(datas)
+            candidatos = self._expedientes.keys() if psicologo_ids is None else [
+                p for p in psicologo_ids if p in self._expedientes
+            ]
+            for data in datas:
+                limite = 0
+                if data == a_partir_de.date():
+                    # Descarta os intervalos que já começaram
+                    agora = a_partir_de.time()
+                    limite = indice_slot(agora) + (1 if agora.minute % SLOT_MINUTOS or agora.second else 0)
+                mascara_limite = ~((1 << limite) - 1)
+
+                melhor = None
+                livres_no_melhor = []
+                for psicologo_id in candidatos:
+                    inicios = inicios_possiveis(self._livres(psicologo_id, data, bloqueios), duracao_minutos)
+                    bit = menor_bit(inicios & mascara_limite)
+                    if bit < 0:
+                        continue
+                    if melhor is None or bit < melhor:
+                        melhor = bit
+                        livres_no_melhor = [psicologo_id]
+                    elif bit == melhor:
+                        livres_no_melhor.append(psicologo_id)
+
+                if melhor is not None:
+                    return datetime.combine(data, horario_slot(melhor)), sorted(livres_no_melhor)
+        return None
+
+
+def calcular_horarios_disponiveis(psicologo_id, data, duracao_minutos=DURACAO_SESSAO_MINUTOS,
+                                   passo_minutos=None, ignorar_id=None):
+    """Inícios (``HH:MM``) de sessões de ``duracao_minutos`` disponíveis na data.
+
+    Os inícios candidatos partem do começo de cada turno a cada
+    ``passo_minutos`` (por padrão, a própria duração); um candidato é
+    descartado se a sessão não couber no turno ou se sobrepuser algum
+    agendamento ativo (exceto ``ignorar_id``, usado no reagendamento).
+    Retorna ``None`` se o psicólogo não existir.
+    """
+    if not db.session.get(Psicologo, psicologo_id):
+        return None
+
+    # Verificar se a data não é no passado
+    if data < datetime.now().date():
+        return ()
+
+    # Buscar TODOS os horários do dia (pode ter múltiplos turnos)
+    horarios_atendimento = HorarioAtendimento.query.filter_by(
+        psicologo_id=psicologo_id,
+        dia_semana=data.weekday(),
+        ativo=True
+    ).all()
+
+    if not horarios_atendimento:
+        return ()
+
+    # Intervalos já ocupados no dia (inclusive sessões que começaram na véspera)
+    inicio_dia = datetime.combine(data, time.min)
+    consulta = db.session.query(Agendamento.data_hora, Agendamento.data_hora_fim).filter(
+        Agendamento.psicologo_id == psicologo_id,
+        Agendamento.filtro_sobreposicao(inicio_dia, inicio_dia + timedelta(days=1)),
+        Agendamento.status.in_(STATUS_OCUPADOS)
+    )
+    if ignorar_id is not None:
+        consulta = consulta.filter(Agendamento.id != ignorar_id)
+    ocupados = consulta.all()
+
+    duracao = timedelta(minutes=duracao_minutos)
+    passo = timedelta(minutes=passo_minutos or duracao_minutos)
+    horarios_disponiveis = set()
+    for horario_atendimento in horarios_atendimento:
+        inicio = datetime.combine(data, horario_atendimento.hora_inicio)
+        fim_turno = datetime.combine(data, horario_atendimento.hora_fim)
+        while inicio + duracao <= fim_turno:
+            fim = inicio + duracao
+            if not any(ocupado_inicio < fim and ocupado_fim > inicio for ocupado_inicio, ocupado_fim in ocupados):
+                horarios_disponiveis.add(inicio.strftime('%H:%M'))
+            inicio += passo
+
+    return tuple(sorted(horarios_disponiveis))
+
+
+def horarios_disponiveis(psicologo_id, data, duracao_minutos=DURACAO_SESSAO_MINUTOS):
+    """Versão coalescida de ``calcular_horarios_disponiveis``.
+
+    Requisições simultâneas para o mesmo psicólogo, data e duração
+    compartilham uma única computação, e o resultado fica em cache por
+    alguns segundos.
+    """
+    psicologo_id = int(psicologo_id)
+    return obter_coalescedor().executar(
+        ('horarios', psicologo_id, data, duracao_minutos),
+        lambda: calcular_horarios_disponiveis(psicologo_id, data, duracao_minutos)
+    )
+
+
+def init_app(app):
+    """Registra o índice de disponibilidade e o coalescedor na aplicação.
+
+    Ambos assinam o prefixo ``disponibilidade`` do barramento de invalidação
+    para descartar o que outros processos alteraram.
+    """
+    indice = IndiceDisponibilidade(ttl=app.config.get('DISPONIBILIDADE_INDICE_TTL', 60))
+    coalescedor = SingleFlight(ttl=app.config.get('DISPONIBILIDADE_CACHE_TTL', 2))
+    app.extensions['indice_disponibilidade'] = indice
+    app.extensions['coalescedor_horarios'] = coalescedor
+    app.extensions['invalidacao'].assinar(
+        'disponibilidade', _tratar_invalidacao(indice, coalescedor), apenas_remotas=True
+    )
+
+
+def _tratar_invalidacao(indice, coalescedor):
+    """Aplica ao índice e ao micro-cache as invalidações vindas de outros processos"""
+    def tratar(chave):
+        partes = chave.split(':')
+        if len(partes) == 4 and partes[1] == 'agenda':
+            psicologo_id, data = int(partes[2]), date.fromisoformat(partes[3])
+            indice.esquecer_data(data)
+            for duracao in DURACOES_SESSAO_MINUTOS:
+                coalescedor.esquecer(('horarios', psicologo_id, data, duracao))
+        elif len(partes) >= 2 and partes[1] == 'expediente':
+            indice.invalidar_expedientes()
+            coalescedor.limpar()
+        else:
+            indice.limpar()
+            coalescedor.limpar()
+    return tratar
+
+
+def obter_indice():
+    """Índice de disponibilidade da aplicação atual"""
+    return current_app.extensions['indice_disponibilidade']
+
+
+def obter_coalescedor():
+    """Coalescedor das consultas de horários disponíveis da aplicação atual"""
+    return current_app.extensions['coalescedor_horarios']
+
+
+def _esquecer_horarios(psicologo_id, data):
+    """Descarta do micro-cache as consultas da data, de qualquer duração"""
+    coalescedor = obter_coalescedor()
+    for duracao in DURACOES_SESSAO_MINUTOS:
+        coalescedor.esquecer(('horarios', psicologo_id, data, duracao))
+
+
+def horario_ocupado(psicologo_id, data_hora, duracao_minutos=DURACAO_SESSAO_MINUTOS):
+    """Deve ser chamada após confirmar (commit) um novo agendamento"""
+    obter_indice().ocupar(int(psicologo_id), data_hora, duracao_minutos)
+    _esquecer_horarios(int(psicologo_id), data_hora.date())
+    invalidacao.publicar('disponibilidade', 'agenda', int(psicologo_id), data_hora.date().isoformat())
+
+
+def horario_liberado(psicologo_id, data_hora):
+    """Deve ser chamada após confirmar (commit) o cancelamento de um agendamento"""
+    obter_indice().liberar(int(psicologo_id), data_hora)
+    _esquecer_horarios(int(psicologo_id), data_hora.date())
+    invalidacao.publicar('disponibilidade', 'agenda', int(psicologo_id), data_hora.date().isoformat())
+
+
+def expediente_alterado(psicologo_id):
+    """Deve ser chamada após alterar os horários de atendimento de um psicólogo"""
+    obter_indice().invalidar_expedientes()
+    obter_coalescedor().limpar()
+    invalidacao.publicar('disponibilidade', 'expediente', int(psicologo_id))
+
+
+def agendamentos_em_lote():
+    """Deve ser chamada após criar ou alterar agendamentos em lote (sem ORM)"""
+    obter_indice().limpar()
+    obter_coalescedor().limpar()
+    invalidacao.publicar('disponibilidade')
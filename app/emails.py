@@ -0,0 +1,173 @@
+"""Envio de e-mails com backends intercambiáveis.
+
+O backend é escolhido por ``EMAIL_BACKEND``:
+
+- ``smtp``: envia pelo servidor configurado em ``SMTP_HOST``/``SMTP_PORTA``,
+  reaproveitando uma única conexão para todas as mensagens de um lote;
+- ``memoria``: guarda as mensagens em ``enviadas`` (testes e desenvolvimento).
+
+Os dois backends expõem ``enviar_lote(mensagens)``, que devolve a lista de
+erros por mensagem (``None`` quando o envio deu certo), de modo que uma falha
+isolada não interrompe o lote.
+
+E-mails disparados por ações dos usuários não são enviados na requisição:
+``enfileirar_email`` grava um ``EmailPendente`` na mesma transação da
+alteração e ``processar_fila`` (comando ``flask processar-emails``) os envia
+em lotes, com novas tentativas e espera exponencial em caso de falha.
+"""
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from flask import current_app
+
+from app.models import EmailPendente, db
+
+
+def criar_mensagem(destinatario, assunto, corpo, remetente=None):
+    """Monta uma mensagem de texto simples"""
+    mensagem = EmailMessage()
+    mensagem['From'] = remetente or current_app.config.get('EMAIL_REMETENTE')
+    mensagem['To'] = destinatario
+    mensagem['Subject'] = assunto
+    mensagem.set_content(corpo)
+    return mensagem
+
+
+class EnvioSMTP:
+    """Envia lotes de mensagens por SMTP em uma única conexão"""
+
+    def __init__(self, host, porta=25, usuario=None, senha=None, usar_tls=False, timeout=30):
+        self.host = host
+        self.porta = porta
+        self.usuario = usuario
+        self.senha = senha
+        self.usar_tls = usar_tls
+        self.timeout = timeout
+
+    def _conectar(self):
+        conexao = smtplib.SMTP(self.host, self.porta, timeout=self.timeout)
+        if self.usar_tls:
+            conexao.starttls()
+        if self.usuario:
+            conexao.login(self.usuario, self.senha)
+        return conexao
+
+    def enviar_lote(self, mensagens):
+        """Envia as mensagens e retorna a lista de erros (``None`` = enviada)"""
+        if not mensagens:
+            return []
+
+        conexao = self._conectar()
+        erros = []
+        try:
+            for mensagem in mensagens:
+                try:
+                    conexao.send_message(mensagem)
+                    erros.append(None)
+                except smtplib.SMTPServerDisconnected:
+                    # Servidor encerrou a conexão no meio do lote: reconectar uma vez
+                    conexao = self._conectar()
+                    try:
+                        conexao.send_message(mensagem)
+                        erros.append(None)
+                    except smtplib.SMTPException as e:
+                        erros.append(str(e))
+                except smtplib.SMTPException as e:
+                    conexao.rset()
+                    erros.append(str(e))
+        finally:
+            try:
+                conexao.quit()
+            except smtplib.SMTPException:
+                conexao.close()
+        return erros
+
+
+class EnvioMemoria:
+    """Guarda as mensagens em memória em vez de enviá-las"""
+
+    def __init__(self):
+        self.enviadas = []
+        self._lock = threading.Lock()
+
+    def enviar_lote(self, mensagens):
+        with self._lock:
+            self.enviadas.extend(mensagens)
+        return [None] * len(mensagens)
+
+
+def init_app(app):
+    """Cria o backend de envio configurado para a aplicação"""
+    backend = app.config.get('EMAIL_BACKEND', 'smtp')
+    if backend == 'memoria':
+        envio = EnvioMemoria()
+    elif backend == 'smtp':
+        envio = EnvioSMTP(
+            app.config.get('SMTP_HOST', 'localhost'),
+            app.config.get('SMTP_PORTA', 25),
+            usuario=app.config.get('SMTP_USUARIO'),
+            senha=app.config.get('SMTP_SENHA'),
+            usar_tls=app.config.get('SMTP_TLS', False)
+        )
+    else:
+        raise ValueError(f'EMAIL_BACKEND desconhecido: {backend}')
+    app.extensions['envio_email'] = envio
+
+
+def obter_envio():
+    """Backend de envio de e-mails da aplicação atual"""
+    return current_app.extensions['envio_email']
+
+
+def enfileirar_email(destinatario, assunto, corpo):
+    """Grava o e-mail na caixa de saída; o envio ocorre após o commit de quem chama"""
+    email = EmailPendente(destinatario=destinatario, assunto=assunto, corpo=corpo)
+    db.session.add(email)
+    return email
+
+
+def processar_fila(tamanho_lote=100, agora=None):
+    """Envia um lote de e-mails pendentes; retorna ``(enviados, falhas)``.
+
+    No PostgreSQL as linhas são travadas com ``FOR UPDATE SKIP LOCKED``, de
+    modo que vários processos podem esvaziar a fila ao mesmo tempo sem enviar
+    o mesmo e-mail duas vezes.
+    """
+    agora = agora or datetime.utcnow()
+    pendentes = EmailPendente.query.filter(
+        EmailPendente.status == 'pendente',
+        EmailPendente.proxima_tentativa <= agora
+    ).order_by(EmailPendente.id).limit(tamanho_lote).with_for_update(skip_locked=True).all()
+
+    if not pendentes:
+        db.session.commit()
+        return 0, 0
+
+    mensagens = [criar_mensagem(email.destinatario, email.assunto, email.corpo) for email in pendentes]
+    try:
+        erros = obter_envio().enviar_lote(mensagens)
+    except (OSError, smtplib.SMTPException) as e:
+        # Servidor indisponível: o lote inteiro volta para a fila
+        erros = [str(e)] * len(pendentes)
+
+    max_tentativas = current_app.config.get('EMAIL_MAX_TENTATIVAS', 5)
+    espera = current_app.config.get('EMAIL_ESPERA_SEGUNDOS', 60)
+    falhas = 0
+    for email, erro in zip(pendentes, erros):
+        email.tentativas += 1
+        if erro is None:
+            email.status = 'enviado'
+            email.data_envio = agora
+            email.ultimo_erro = None
+            continue
+        falhas += 1
+        email.ultimo_erro = erro
+        if email.tentativas >= max_tentativas:
+            email.status = 'falhou'
+        else:
+            email.proxima_tentativa = agora + timedelta(seconds=espera * 2 ** (email.tentativas - 1))
+    db.session.commit()
+
+    return len(pendentes) - falhas, falhas
@@ -0,0 +1,219 @@
+"""Eventos de agenda em tempo real para os painéis dos psicólogos.
+
+Alterações de agendamentos (novo, cancelado, confirmado, reagendado...) são
+publicadas após o commit com ``agendamento_alterado`` e entregues aos
+navegadores abertos pelo endpoint SSE ``/psicologo/eventos``.
+
+Dois brokers estão disponíveis (``EVENTOS_BACKEND``):
+
+- ``memoria``: entrega apenas aos clientes conectados ao mesmo processo
+  (desenvolvimento e testes);
+- ``postgresql``: publica com ``pg_notify`` e cada processo mantém uma
+  conexão dedicada em ``LISTEN``, repassando os eventos aos seus clientes;
+  assim um agendamento feito em uma instância chega aos painéis abertos em
+  qualquer outra.
+
+Cada evento recebe um ID crescente (nanossegundos da publicação) e os últimos
+eventos de cada canal ficam guardados, para que um cliente que reconecte com
+``Last-Event-ID`` receba o que perdeu.
+"""
+import json
+import queue
+import select
+import threading
+import time
+from collections import deque
+
+from flask import current_app
+
+from app.models import db
+
+CANAL_POSTGRESQL = 'clinica_eventos'
+
+
+def canal_psicologo(psicologo_id):
+    return f'psicologo:{psicologo_id}'
+
+
+class Assinatura:
+    """Fila de eventos de um cliente conectado"""
+
+    def __init__(self, canal, tamanho=100):
+        self.canal = canal
+        self.fila = queue.Queue(maxsize=tamanho)
+
+    def proximo(self, timeout):
+        """Próximo evento ou ``None`` se nada chegar em ``timeout`` segundos"""
+        try:
+            return self.fila.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class BrokerMemoria:
+    """Distribui eventos entre as assinaturas do próprio processo"""
+
+    def __init__(self, historico=50):
+        self._lock = threading.Lock()
+        self._assinaturas = {}
+        self._historico = {}
+        self._tamanho_historico = historico
+
+    def assinar(self, canal):
+        assinatura = Assinatura(canal)
+        with self._lock:
+            self._assinaturas.setdefault(canal, set()).add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            assinaturas = self._assinaturas.get(assinatura.canal)
+            if assinaturas:
+                assinaturas.discard(assinatura)
+                if not assinaturas:
+                    del self._assinaturas[assinatura.canal]
+
+    def perdidos(self, canal, ultimo_id):
+        """Eventos do histórico do canal posteriores a ``ultimo_id``"""
+        with self._lock:
+            return [evento for evento in self._historico.get(canal, ()) if evento['id'] > ultimo_id]
+
+    def entregar(self, canal, evento):
+        """Repassa o evento às assinaturas locais do canal"""
+        with self._lock:
+            historico = self._historico.setdefault(canal, deque(maxlen=self._tamanho_historico))
+            historico.append(evento)
+            assinaturas = list(self._assinaturas.get(canal, ()))
+        for assinatura in assinaturas:
+            try:
+                assinatura.fila.put_nowait(evento)
+            except queue.Full:
+                # Cliente lento: descarta o evento mais antigo da fila
+                try:
+                    assinatura.fila.get_nowait()
+                except queue.Empty:
+                    pass
+                assinatura.fila.put_nowait(evento)
+
+    def publicar(self, canal, evento):
+        self.entregar(canal, evento)
+
+    def clientes(self):
+        with self._lock:
+            return sum(len(assinaturas) for assinaturas in self._assinaturas.values())
+
+
+class BrokerPostgres(BrokerMemoria):
+    """Publica via ``NOTIFY`` e entrega o que chega pelo ``LISTEN`` do processo"""
+
+    def __init__(self, engine, historico=50):
+        super().__init__(historico)
+        self._engine = engine
+        self._ouvinte = None
+        self._ouvinte_lock = threading.Lock()
+
+    def assinar(self, canal):
+        self._garantir_ouvinte()
+        return super().assinar(canal)
+
+    def publicar(self, canal, evento):
+        carga = json.dumps({'canal': canal, 'evento': evento})
+        with self._engine.connect() as conexao:
+            conexao.exec_driver_sql('SELECT pg_notify(%s, %s)', (CANAL_POSTGRESQL, carga))
+            conexao.commit()
+
+    def _garantir_ouvinte(self):
+        with self._ouvinte_lock:
+            if self._ouvinte is None or not self._ouvinte.is_alive():
+                self._ouvinte = threading.Thread(
+                    target=ouvir_postgres, args=(self._engine, CANAL_POSTGRESQL, self._receber), daemon=True
+                )
+                self._ouvinte.start()
+
+    def _receber(self, carga):
+        dados = json.loads(carga)
+        self.entregar(dados['canal'], dados['evento'])
+
+
+def ouvir_postgres(engine, canal, tratar, reconectado=None):
+    """Mantém uma conexão dedicada em ``LISTEN canal`` e repassa cada carga a ``tratar``.
+
+    Não retorna: após uma falha espera alguns segundos, reconecta e chama
+    ``reconectado()`` (notificações enviadas enquanto a conexão estava fora
+    foram perdidas).
+    """
+    conectado_antes = False
+    while True:
+        try:
+            conexao = engine.raw_connection()
+            try:
+                conexao.driver_connection.autocommit = True
+                cursor = conexao.cursor()
+                cursor.execute(f'LISTEN {canal}')
+                driver = conexao.driver_connection
+                if conectado_antes and reconectado is not None:
+                    reconectado()
+                conectado_antes = True
+                while True:
+                    if select.select([driver], [], [], 30) == ([], [], []):
+                        continue
+                    driver.poll()
+                    while driver.notifies:
+                        tratar(driver.notifies.pop(0).payload)
+            finally:
+                conexao.close()
+        except Exception as e:
+            print(f'Erro no ouvinte de {canal}: {e}')
+            time.sleep(5)
+
+
+def init_app(app):
+    """Cria o broker de eventos configurado para a aplicação"""
+    backend = app.config.get('EVENTOS_BACKEND')
+    if backend is None:
+        backend = 'postgresql' if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql') else 'memoria'
+    if backend == 'postgresql':
+        with app.app_context():
+            broker = BrokerPostgres(db.engine)
+    elif backend == 'memoria':
+        broker = BrokerMemoria()
+    else:
+        raise ValueError(f'EVENTOS_BACKEND desconhecido: {backend}')
+    app.extensions['eventos'] = broker
+
+
+def obter_broker():
+    """Broker de eventos da aplicação atual"""
+    return current_app.extensions['eventos']
+
+
+def publicar(canal, tipo, dados):
+    """Publica um evento no canal; falhas de entrega não afetam quem publicou"""
+    evento = {'id': time.time_ns(), 'tipo': tipo, 'dados': dados}
+    try:
+        obter_broker().publicar(canal, evento)
+    except Exception as e:
+        print(f'Erro ao publicar evento {tipo}: {e}')
+    return evento
+
+
+def agendamento_alterado(agendamento, tipo, **extras):
+    """Deve ser chamada após o commit de uma alteração no agendamento.
+
+    ``extras`` entram no evento junto com os dados do agendamento (por
+    exemplo ``data_hora_anterior`` de um reagendamento, para que os painéis
+    retirem a consulta do horário antigo).
+    """
+    return publicar(canal_psicologo(agendamento.psicologo_id), tipo, {
+        'id': agendamento.id,
+        'paciente': agendamento.paciente.usuario.nome_completo,
+        'data_hora': agendamento.data_hora.isoformat(),
+        'duracao_minutos': agendamento.duracao_minutos,
+        'status': agendamento.status,
+        **extras
+    })
+
+
+def formatar_sse(evento):
+    """Evento no formato text/event-stream"""
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {json.dumps(evento['dados'])}\n\n"
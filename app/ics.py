@@ -0,0 +1,183 @@
+"""Feeds iCalendar (ICS) das agendas de psicólogos e pacientes.
+
+Cada usuário recebe uma URL secreta (``/calendario/<token>.ics``) que pode
+ser assinada no calendário do celular. O token é assinado com a
+``SECRET_KEY`` e carrega o usuário, o perfil (psicólogo ou paciente) e uma
+versão da senha: trocar a senha invalida os links já distribuídos.
+
+Aplicativos de calendário consultam o feed a cada poucos minutos. Para que
+essas consultas custem pouco, ``abrir_feed`` valida o token e calcula a
+versão do feed (``max(data_atualizacao)`` e quantidade de agendamentos do
+período) em uma única consulta agregada; se o cliente já tiver essa versão a
+rota responde 304 sem ler os agendamentos. Caso contrário ``gerar`` percorre
+uma única consulta do período em lotes, emitindo o calendário aos poucos.
+"""
+from datetime import date, datetime, time, timedelta
+
+import pytz
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import and_, func
+
+from app.models import Agendamento, Paciente, Psicologo, Usuario, db
+
+SAL_TOKEN = 'calendario-ics'
+
+STATUS_ICS = {
+    'agendado': 'TENTATIVE',
+    'pendente_revisao': 'TENTATIVE',
+    'confirmado': 'CONFIRMED',
+    'realizado': 'CONFIRMED',
+    'ausencia': 'CONFIRMED',
+    'cancelado': 'CANCELLED',
+}
+
+
+def _serializador():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt=SAL_TOKEN)
+
+
+def gerar_token(usuario, perfil_id):
+    """Token do feed do usuário (psicólogo ou paciente de ``perfil_id``)"""
+    return _serializador().dumps({
+        'u': usuario.id,
+        't': usuario.tipo_usuario,
+        'p': perfil_id,
+        'h': usuario.versao_senha,
+    })
+
+
+class Feed:
+    """Período e filtros do feed de um psicólogo ou paciente"""
+
+    def __init__(self, tipo, perfil_id, usuario_id, hoje=None):
+        config = current_app.config
+        hoje = hoje or date.today()
+        self.tipo = tipo
+        self.perfil_id = perfil_id
+        self.usuario_id = usuario_id
+        self.inicio = datetime.combine(hoje - timedelta(days=config.get('ICS_DIAS_PASSADOS', 30)), time.min)
+        self.fim = datetime.combine(hoje + timedelta(days=config.get('ICS_DIAS_FUTUROS', 180)), time.min)
+        self.quantidade = 0
+        self.ultima_alteracao = None
+
+        if tipo == 'psicologo':
+            self.coluna_dono = Agendamento.psicologo_id
+            self.outro_modelo, self.coluna_outro = Paciente, Agendamento.paciente_id
+            self.resumo = 'Consulta - {nome}'
+        else:
+            self.coluna_dono = Agendamento.paciente_id
+            self.outro_modelo, self.coluna_outro = Psicologo, Agendamento.psicologo_id
+            self.resumo = 'Consulta com Dr(a). {nome}'
+
+    def filtros(self):
+        return (
+            self.coluna_dono == self.perfil_id,
+            Agendamento.data_hora >= self.inicio,
+            Agendamento.data_hora < self.fim,
+        )
+
+    @property
+    def etag(self):
+        alteracao = self.ultima_alteracao.strftime('%Y%m%d%H%M%S%f') if self.ultima_alteracao else '0'
+        return f'{self.inicio:%Y%m%d}-{self.quantidade}-{alteracao}'
+
+
+def abrir_feed(token, hoje=None):
+    """Valida o token e carrega a versão do feed; ``None`` se inválido ou revogado"""
+    try:
+        dados = _serializador().loads(token)
+    except BadSignature:
+        return None
+    if dados.get('t') not in ('psicologo', 'paciente'):
+        return None
+
+    feed = Feed(dados['t'], dados['p'], dados['u'], hoje)
+    linha = db.session.query(
+        Usuario.versao_senha,
+        Usuario.ativo,
+        func.max(Agendamento.data_atualizacao),
+        func.count(Agendamento.id)
+    ).outerjoin(
+        Agendamento, and_(*feed.filtros())
+    ).filter(
+        Usuario.id == feed.usuario_id
+    ).group_by(Usuario.id, Usuario.versao_senha, Usuario.ativo).first()
+
+    if linha is None or not linha[1] or linha[0] != dados.get('h'):
+        return None
+    feed.ultima_alteracao, feed.quantidade = linha[2], linha[3]
+    return feed
+
+
+# ------------------------------------------------------------------ formato
+
+def _escapar(texto):
+    return texto.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _dobrar(linha):
+    """Quebra a linha em trechos de até 75 octetos (RFC 5545, 3.1)"""
+    partes = []
+    atual, tamanho, limite = '', 0, 75
+    for caractere in linha:
+        octetos = len(caractere.encode())
+        if tamanho + octetos > limite:
+            partes.append(atual)
+            atual, tamanho, limite = ' ', 1, 75
+        atual += caractere
+        tamanho += octetos
+    partes.append(atual)
+    return '\r\n'.join(partes) + '\r\n'
+
+
+def _utc(momento, fuso=None):
+    """Data/hora em UTC no formato iCalendar; ``fuso`` indica o horário local de ``momento``"""
+    if fuso is not None:
+        momento = fuso.localize(momento).astimezone(pytz.utc)
+    return momento.strftime('%Y%m%dT%H%M%SZ')
+
+
+def gerar(feed, dominio):
+    """Gera o calendário do feed em trechos de texto"""
+    fuso = pytz.timezone(current_app.config.get('CLINICA_FUSO_HORARIO', 'America/Sao_Paulo'))
+    nome_clinica = current_app.config.get('CLINICA_NOME', '')
+
+    yield ''.join(_dobrar(linha) for linha in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:-//{_escapar(nome_clinica)}//Agenda//PT-BR',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escapar(nome_clinica)}',
+        'REFRESH-INTERVAL;VALUE=DURATION:PT15M',
+        'X-PUBLISHED-TTL:PT15M',
+    ))
+
+    consulta = db.session.query(
+        Agendamento.id,
+        Agendamento.data_hora,
+        Agendamento.data_hora_fim,
+        Agendamento.status,
+        Agendamento.data_atualizacao,
+        Usuario.nome_completo
+    ).join(
+        feed.outro_modelo, feed.outro_modelo.id == feed.coluna_outro
+    ).join(
+        Usuario, Usuario.id == feed.outro_modelo.usuario_id
+    ).filter(*feed.filtros()).order_by(Agendamento.data_hora, Agendamento.id).execution_options(yield_per=200)
+
+    for agendamento_id, inicio, fim, status, atualizacao, nome in consulta:
+        yield ''.join(_dobrar(linha) for linha in (
+            'BEGIN:VEVENT',
+            f'UID:agendamento-{agendamento_id}@{dominio}',
+            f'DTSTAMP:{_utc(atualizacao)}',
+            f'LAST-MODIFIED:{_utc(atualizacao)}',
+            f'DTSTART:{_utc(inicio, fuso)}',
+            f'DTEND:{_utc(fim, fuso)}',
+            f'SUMMARY:{_escapar(feed.resumo.format(nome=nome))}',
+            f'STATUS:{STATUS_ICS.get(status, "CONFIRMED")}',
+            'END:VEVENT',
+        ))
+
+    yield 'END:VCALENDAR\r\n'
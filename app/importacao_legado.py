@@ -0,0 +1,294 @@
+"""Importação do histórico de consultas e prontuários de sistemas anteriores.
+
+Cada registro do arquivo (CSV com cabeçalho ou JSONL, pela extensão) é uma
+consulta antiga:
+
+- ``paciente_email`` e ``psicologo_email``: já cadastrados no sistema;
+- ``data_hora`` (ISO 8601 ou ``DD/MM/AAAA HH:MM``) e ``duracao_minutos``
+  (padrão 60);
+- ``status`` (padrão ``realizado`` para datas passadas e ``agendado`` para
+  futuras) e ``observacoes``;
+- ``anotacoes``: anotações da sessão; quando presentes geram uma ``Sessao``
+  no prontuário do par paciente/psicólogo, criado se ainda não existir.
+
+O arquivo é lido em blocos de ``tamanho_lote`` registros, de modo que a
+memória usada não depende do tamanho do arquivo (apenas dos mapas de
+e-mails e prontuários, carregados uma vez). Cada bloco é gravado com
+instruções em massa: ``COPY`` no PostgreSQL e ``executemany`` nos demais
+bancos. Os IDs dos agendamentos e prontuários novos são reservados na
+sequência (PostgreSQL) ou devolvidos pelo ``INSERT ... RETURNING``, para
+ligar as sessões sem reler o bloco.
+
+O progresso fica em ``importacoes_legado`` e é atualizado na mesma transação
+de cada bloco: se a importação for interrompida, executá-la de novo retoma
+do primeiro registro ainda não gravado, sem duplicar os anteriores. Registros
+inválidos são gravados, com o número e o motivo, no arquivo de erros.
+
+Não há verificação de conflito de horários: o histórico é importado como
+estava no sistema de origem.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime, timedelta
+from itertools import islice
+
+from sqlalchemy import insert, text
+
+from app import disponibilidade
+from app.models import (
+    Agendamento, ImportacaoLegado, Paciente, Prontuario, Psicologo, Sessao, Usuario, db
+)
+
+STATUS_VALIDOS = set(Agendamento.status.type.enums)
+FORMATOS_DATA = ('%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S')
+
+
+class RegistroInvalido(Exception):
+    """Registro que não pode ser importado"""
+
+
+# ------------------------------------------------------------------- leitura
+
+def ler_registros(caminho):
+    """Registros do arquivo como ``(número, dicionário)``, lidos sob demanda"""
+    if caminho.lower().endswith(('.jsonl', '.ndjson')):
+        with open(caminho, encoding='utf-8') as arquivo:
+            for numero, linha in enumerate(arquivo, start=1):
+                if not linha.strip():
+                    continue
+                try:
+                    yield numero, json.loads(linha)
+                except ValueError:
+                    yield numero, None
+    else:
+        with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+            try:
+                dialeto = csv.Sniffer().sniff(arquivo.read(4096), delimiters=',;')
+            except csv.Error:
+                dialeto = csv.excel
+            arquivo.seek(0)
+            # Linha 1 é o cabeçalho
+            for numero, registro in enumerate(csv.DictReader(arquivo, dialect=dialeto), start=2):
+                yield numero, {chave.strip().lower(): valor for chave, valor in registro.items() if chave}
+
+
+def _data_hora(valor):
+    if isinstance(valor, str):
+        valor = valor.strip()
+        try:
+            return datetime.fromisoformat(valor).replace(tzinfo=None)
+        except ValueError:
+            for formato in FORMATOS_DATA:
+                try:
+                    return datetime.strptime(valor, formato)
+                except ValueError:
+                    pass
+    raise RegistroInvalido(f'Data inválida: {valor!r}')
+
+
+class Mapas:
+    """IDs de pacientes, psicólogos (por e-mail) e prontuários (por par) em memória"""
+
+    def __init__(self):
+        self.pacientes = {
+            email.lower(): paciente_id for email, paciente_id in
+            db.session.query(Usuario.email, Paciente.id).join(Paciente, Paciente.usuario_id == Usuario.id)
+        }
+        self.psicologos = {
+            email.lower(): psicologo_id for email, psicologo_id in
+            db.session.query(Usuario.email, Psicologo.id).join(Psicologo, Psicologo.usuario_id == Usuario.id)
+        }
+        self.prontuarios = {
+            (paciente_id, psicologo_id): prontuario_id for prontuario_id, paciente_id, psicologo_id in
+            db.session.query(Prontuario.id, Prontuario.paciente_id, Prontuario.psicologo_id)
+        }
+
+
+def _converter(registro, mapas, agora, registrado_em):
+    if not isinstance(registro, dict):
+        raise RegistroInvalido('Registro ilegível')
+    paciente_id = mapas.pacientes.get((registro.get('paciente_email') or '').strip().lower())
+    if paciente_id is None:
+        raise RegistroInvalido('Paciente não encontrado')
+    psicologo_id = mapas.psicologos.get((registro.get('psicologo_email') or '').strip().lower())
+    if psicologo_id is None:
+        raise RegistroInvalido('Psicólogo não encontrado')
+    data_hora = _data_hora(registro.get('data_hora'))
+    try:
+        duracao = int(registro.get('duracao_minutos') or 60)
+    except (TypeError, ValueError):
+        duracao = 0
+    if duracao <= 0:
+        raise RegistroInvalido('Duração inválida')
+    status = (registro.get('status') or '').strip() or ('realizado' if data_hora < agora else 'agendado')
+    if status not in STATUS_VALIDOS:
+        raise RegistroInvalido(f'Status inválido: {status}')
+
+    return {
+        'paciente_id': paciente_id,
+        'psicologo_id': psicologo_id,
+        'data_hora': data_hora,
+        'duracao_minutos': duracao,
+        'data_hora_fim': data_hora + timedelta(minutes=duracao),
+        'status': status,
+        'observacoes': registro.get('observacoes') or None,
+        'data_criacao': registrado_em,
+        'data_atualizacao': registrado_em,
+    }, (registro.get('anotacoes') or '').strip() or None
+
+
+# ------------------------------------------------------------------ gravação
+
+def _postgresql():
+    return db.session.get_bind().dialect.name == 'postgresql'
+
+
+def _valor_copy(valor):
+    """Valor no formato texto do ``COPY``"""
+    if valor is None:
+        return '\\N'
+    if isinstance(valor, bool):
+        return 't' if valor else 'f'
+    return str(valor).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _copiar(tabela, linhas):
+    """Grava as linhas com ``COPY ... FROM STDIN`` na conexão da sessão"""
+    colunas = list(linhas[0])
+    buffer = io.StringIO()
+    for linha in linhas:
+        buffer.write('\t'.join(_valor_copy(linha[coluna]) for coluna in colunas) + '\n')
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY {tabela.name} ({", ".join(colunas)}) FROM STDIN', buffer)
+    finally:
+        cursor.close()
+
+
+def _gravar(tabela, linhas):
+    if not linhas:
+        return
+    if _postgresql():
+        _copiar(tabela, linhas)
+    else:
+        db.session.execute(insert(tabela), linhas)
+
+
+def _gravar_com_ids(tabela, linhas):
+    """Grava as linhas e devolve os IDs na mesma ordem"""
+    if not linhas:
+        return []
+    if _postgresql():
+        ids = [linha_id for (linha_id,) in db.session.execute(
+            text(f"SELECT nextval(pg_get_serial_sequence('{tabela.name}', 'id')) FROM generate_series(1, :n)"),
+            {'n': len(linhas)}
+        )]
+        _copiar(tabela, [dict(linha, id=linha_id) for linha, linha_id in zip(linhas, ids)])
+        return ids
+    # Sem ``sort_by_parameter_order``, que no SQLite volta a um INSERT por
+    # linha: os IDs são atribuídos em ordem crescente na ordem do VALUES
+    resultado = db.session.execute(insert(tabela).returning(tabela.c.id), linhas)
+    return sorted(linha_id for (linha_id,) in resultado)
+
+
+def _gravar_bloco(convertidos, mapas, registrado_em):
+    """Grava agendamentos, prontuários novos e sessões de um bloco; devolve os totais"""
+    novos_pares = []
+    for agendamento, anotacoes in convertidos:
+        par = (agendamento['paciente_id'], agendamento['psicologo_id'])
+        if anotacoes and par not in mapas.prontuarios:
+            mapas.prontuarios[par] = None
+            novos_pares.append(par)
+    ids_prontuarios = _gravar_com_ids(Prontuario.__table__, [{
+        'paciente_id': paciente_id,
+        'psicologo_id': psicologo_id,
+        'data_criacao': registrado_em,
+        'recorrencia_ativa': False,
+    } for paciente_id, psicologo_id in novos_pares])
+    mapas.prontuarios.update(zip(novos_pares, ids_prontuarios))
+
+    ids_agendamentos = _gravar_com_ids(Agendamento.__table__, [agendamento for agendamento, _ in convertidos])
+    sessoes = [{
+        'prontuario_id': mapas.prontuarios[(agendamento['paciente_id'], agendamento['psicologo_id'])],
+        'agendamento_id': agendamento_id,
+        'data_sessao': agendamento['data_hora'],
+        'anotacoes': anotacoes,
+        'proxima_sessao': None,
+        'data_criacao': registrado_em,
+    } for (agendamento, anotacoes), agendamento_id in zip(convertidos, ids_agendamentos) if anotacoes]
+    _gravar(Sessao.__table__, sessoes)
+    return len(ids_prontuarios), len(sessoes)
+
+
+# ------------------------------------------------------------------ execução
+
+def importar(caminho, nome=None, tamanho_lote=1000, arquivo_erros=None, reiniciar=False, agora=None, progresso=None):
+    """Importa o arquivo, retomando do ponto gravado em ``importacoes_legado``.
+
+    ``progresso(totais)`` é chamada após cada bloco gravado. Retorna os totais
+    da execução: ``processados``, ``importados``, ``sessoes``,
+    ``prontuarios``, ``erros`` e ``retomado_de`` (registros já importados
+    antes desta execução).
+    """
+    # ``agora`` (hora local) só decide o status padrão de consultas passadas;
+    # as colunas de auditoria seguem o ``datetime.utcnow`` dos modelos.
+    agora = agora or datetime.now()
+    registrado_em = datetime.utcnow()
+    nome = nome or os.path.basename(caminho)
+    controle = ImportacaoLegado.query.filter_by(nome=nome).first()
+    if controle is None:
+        controle = ImportacaoLegado(nome=nome, registros=0, importados=0, erros=0)
+        db.session.add(controle)
+        db.session.commit()
+    elif reiniciar:
+        controle.registros = controle.importados = controle.erros = 0
+        db.session.commit()
+
+    mapas = Mapas()
+    totais = {'processados': 0, 'importados': 0, 'sessoes': 0, 'prontuarios': 0, 'erros': 0,
+              'retomado_de': controle.registros}
+    erros = open(arquivo_erros or f'{caminho}.erros.jsonl', 'a', encoding='utf-8')
+    registros = islice(ler_registros(caminho), controle.registros, None)
+    try:
+        while True:
+            bloco = list(islice(registros, tamanho_lote))
+            if not bloco:
+                break
+            convertidos = []
+            invalidos = []
+            for numero, registro in bloco:
+                try:
+                    convertidos.append(_converter(registro, mapas, agora, registrado_em))
+                except RegistroInvalido as e:
+                    invalidos.append({'registro': numero, 'erro': str(e)})
+
+            try:
+                prontuarios, sessoes = _gravar_bloco(convertidos, mapas, registrado_em)
+                controle.registros += len(bloco)
+                controle.importados += len(convertidos)
+                controle.erros += len(invalidos)
+                controle.atualizado_em = datetime.utcnow()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            for invalido in invalidos:
+                erros.write(json.dumps(invalido, ensure_ascii=False) + '\n')
+            erros.flush()
+
+            totais['processados'] += len(bloco)
+            totais['importados'] += len(convertidos)
+            totais['erros'] += len(invalidos)
+            totais['sessoes'] += sessoes
+            totais['prontuarios'] += prontuarios
+            if progresso:
+                progresso(totais)
+    finally:
+        erros.close()
+
+    if totais['importados']:
+        disponibilidade.agendamentos_em_lote()
+    return totais
@@ -0,0 +1,153 @@
+"""Cadastro de psicólogos em lote a partir de um CSV.
+
+O arquivo tem cabeçalho com as colunas ``nome``, ``email``, ``telefone`` e
+``senha`` (separadas por vírgula ou ponto e vírgula, como exporta o Excel).
+Cada linha passa pelas mesmas validações do cadastro individual; as linhas
+inválidas são relatadas com o número da linha e as demais são cadastradas.
+
+O custo fica concentrado em poucas operações:
+
+- a existência dos e-mails é verificada com uma consulta para o arquivo todo;
+- os hashes das senhas, a parte cara, são calculados com o método de
+  ``SENHA_METODO``; pela linha de comando, em um pool de processos
+  (``IMPORTACAO_PROCESSOS``). O upload pelo painel calcula em série e aceita
+  no máximo ``IMPORTACAO_LIMITE_WEB`` linhas: um ``fork`` dentro do worker
+  web copiaria o processo inteiro (conexões, threads) no meio da requisição;
+- ``usuarios`` e ``psicologos`` são inseridos em lotes de ``tamanho_lote``
+  linhas por instrução, em uma única transação.
+"""
+import csv
+import io
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from flask import current_app
+from sqlalchemy import insert
+
+from app import invalidacao, senhas
+from app.models import Psicologo, Usuario, db
+
+COLUNAS = ('nome', 'email', 'telefone', 'senha')
+EMAIL_VALIDO = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+# Abaixo disso o custo de iniciar os processos supera o ganho
+MINIMO_PARA_POOL = 8
+
+
+class ArquivoInvalido(Exception):
+    """CSV ilegível ou sem as colunas obrigatórias"""
+
+
+def ler_csv(conteudo):
+    """Linhas do CSV como ``(número da linha, dicionário)``"""
+    if isinstance(conteudo, bytes):
+        try:
+            conteudo = conteudo.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            conteudo = conteudo.decode('latin-1')
+    amostra = conteudo[:4096]
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=',;')
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(io.StringIO(conteudo), dialect=dialeto)
+    cabecalho = [coluna.strip().lower() for coluna in (leitor.fieldnames or [])]
+    faltando = [coluna for coluna in COLUNAS if coluna not in cabecalho]
+    if faltando:
+        raise ArquivoInvalido(f'Colunas obrigatórias ausentes: {", ".join(faltando)}')
+    leitor.fieldnames = cabecalho
+    # Linha 1 é o cabeçalho
+    return [
+        (numero, {coluna: (linha.get(coluna) or '').strip() for coluna in COLUNAS})
+        for numero, linha in enumerate(leitor, start=2)
+        if any((valor or '').strip() for valor in linha.values() if isinstance(valor, str))
+    ]
+
+
+def _validar(linha):
+    if not all(linha[coluna] for coluna in COLUNAS):
+        return 'Todos os campos são obrigatórios'
+    if not EMAIL_VALIDO.match(linha['email']):
+        return 'E-mail inválido'
+    if len(linha['senha']) < 6:
+        return 'A senha deve ter pelo menos 6 caracteres'
+    return None
+
+
+def _hashes(senhas_linhas, metodo, processos):
+    gerar = partial(senhas.gerar_hash, metodo=metodo)
+    if processos <= 1 or len(senhas_linhas) < MINIMO_PARA_POOL:
+        return [gerar(senha) for senha in senhas_linhas]
+    contexto = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as executor:
+        return list(executor.map(gerar, senhas_linhas, chunksize=max(len(senhas_linhas) // (processos * 4), 1)))
+
+
+def processos_configurados():
+    """Processos do pool de hashes da linha de comando (``IMPORTACAO_PROCESSOS`` ou nº de CPUs)"""
+    return current_app.config.get('IMPORTACAO_PROCESSOS') or multiprocessing.cpu_count()
+
+
+def importar(linhas, processos=1, tamanho_lote=500, simular=False):
+    """Valida e cadastra os psicólogos das linhas lidas por ``ler_csv``.
+
+    Com ``processos`` maior que 1 os hashes são calculados em um pool de
+    processos, o que só deve ser feito fora do servidor web.
+
+    Retorna ``{'total', 'criados', 'erros': [{'linha', 'email', 'erro'}]}``;
+    com ``simular`` apenas valida.
+    """
+    config = current_app.config
+    erros = []
+    validas = []
+    vistos = {}
+    for numero, linha in linhas:
+        linha['email'] = linha['email'].lower()
+        erro = _validar(linha)
+        if erro is None and linha['email'] in vistos:
+            erro = f'E-mail repetido no arquivo (linha {vistos[linha["email"]]})'
+        if erro:
+            erros.append({'linha': numero, 'email': linha['email'], 'erro': erro})
+            continue
+        vistos[linha['email']] = numero
+        validas.append((numero, linha))
+
+    existentes = set()
+    emails = [linha['email'] for _, linha in validas]
+    for inicio in range(0, len(emails), tamanho_lote):
+        existentes.update(email for (email,) in db.session.query(Usuario.email).filter(
+            Usuario.email.in_(emails[inicio:inicio + tamanho_lote])
+        ))
+    novas = []
+    for numero, linha in validas:
+        if linha['email'] in existentes:
+            erros.append({'linha': numero, 'email': linha['email'], 'erro': 'E-mail já cadastrado'})
+        else:
+            novas.append(linha)
+    erros.sort(key=lambda erro: erro['linha'])
+
+    if simular or not novas:
+        return {'total': len(linhas), 'criados': 0 if simular else len(novas), 'validas': len(novas), 'erros': erros}
+
+    hashes = _hashes([linha['senha'] for linha in novas], senhas.normalizar(config['SENHA_METODO']), processos)
+    try:
+        for inicio in range(0, len(novas), tamanho_lote):
+            lote = novas[inicio:inicio + tamanho_lote]
+            db.session.execute(insert(Usuario), [{
+                'nome_completo': linha['nome'],
+                'email': linha['email'],
+                'telefone': linha['telefone'],
+                'senha_hash': senha_hash,
+                'versao_senha': 1,
+                'tipo_usuario': 'psicologo',
+            } for linha, senha_hash in zip(lote, hashes[inicio:inicio + tamanho_lote])])
+            ids = db.session.query(Usuario.id).filter(Usuario.email.in_([linha['email'] for linha in lote]))
+            db.session.execute(insert(Psicologo), [{'usuario_id': usuario_id} for (usuario_id,) in ids])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    invalidacao.publicar('psicologos')
+    return {'total': len(linhas), 'criados': len(novas), 'validas': len(novas), 'erros': erros}
@@ -0,0 +1,229 @@
+"""Barramento de invalidação dos caches em memória dos workers.
+
+Cada processo (worker do gunicorn, instância, ``flask worker``) mantém seus
+próprios caches: índice de disponibilidade, micro-cache de horários,
+diretório de psicólogos... Quando um processo grava, os demais precisam
+descartar o que guardaram. Quem grava publica, após o commit, uma chave de
+invalidação hierárquica (``'disponibilidade:agenda:5:2026-03-10'``,
+``'psicologos'``) e os caches assinam por prefixo.
+
+Uma chave alcança o assinante do prefixo quando uma é prefixo da outra em
+segmentos separados por ``:``: publicar ``'psicologos'`` invalida
+``'psicologos:diretorio'`` e vice-versa, mas não ``'psicologos_arquivo'``.
+A chave vazia (``TUDO``) alcança todos os assinantes.
+
+Backends (``INVALIDACAO_BACKEND``):
+
+- ``memoria``: apenas o próprio processo (desenvolvimento e testes);
+- ``postgresql``: ``pg_notify`` no canal ``clinica_invalidacao`` e uma
+  conexão em ``LISTEN`` por processo. Se essa conexão cair, as mensagens do
+  intervalo se perdem e, ao reconectar, todos os caches são descartados.
+
+Assinantes com ``apenas_remotas=True`` ignoram as chaves publicadas pelo
+próprio processo; é o caso do índice de disponibilidade, que já se atualiza
+de forma incremental nas rotas que gravam.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+from app.eventos import ouvir_postgres
+from app.models import db
+
+CANAL_POSTGRESQL = 'clinica_invalidacao'
+TUDO = ''
+
+
+def chave(*partes):
+    """Monta a chave de invalidação a partir dos segmentos"""
+    return ':'.join(str(parte) for parte in partes)
+
+
+def corresponde(chave_publicada, prefixo):
+    """Se a chave publicada alcança quem assina o prefixo"""
+    if chave_publicada == TUDO or prefixo == TUDO or chave_publicada == prefixo:
+        return True
+    return chave_publicada.startswith(prefixo + ':') or prefixo.startswith(chave_publicada + ':')
+
+
+class BarramentoMemoria:
+    """Entrega as invalidações aos assinantes do próprio processo"""
+
+    def __init__(self):
+        self.origem = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._assinantes = []
+        self.publicadas = 0
+        self.recebidas = 0
+
+    def assinar(self, prefixo, tratar, apenas_remotas=False):
+        """Registra ``tratar(chave)`` para as chaves que alcançam o prefixo"""
+        with self._lock:
+            self._assinantes.append((prefixo, tratar, apenas_remotas))
+
+    def publicar(self, chave_publicada):
+        with self._lock:
+            self.publicadas += 1
+        self.entregar(chave_publicada, remota=False)
+        self._enviar(chave_publicada)
+
+    def _enviar(self, chave_publicada):
+        """Envia a chave aos outros processos (nada a fazer em memória)"""
+
+    def entregar(self, chave_publicada, remota=True):
+        with self._lock:
+            if remota:
+                self.recebidas += 1
+            assinantes = list(self._assinantes)
+        for prefixo, tratar, apenas_remotas in assinantes:
+            if apenas_remotas and not remota:
+                continue
+            if corresponde(chave_publicada, prefixo):
+                try:
+                    tratar(chave_publicada)
+                except Exception as e:
+                    print(f'Erro ao invalidar {prefixo!r} com {chave_publicada!r}: {e}')
+
+    def garantir_ouvinte(self):
+        """Inicia a escuta de outros processos (nada a fazer em memória)"""
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'publicadas': self.publicadas,
+                'recebidas': self.recebidas,
+                'assinantes': len(self._assinantes),
+            }
+
+
+class BarramentoPostgres(BarramentoMemoria):
+    """Propaga as invalidações com ``NOTIFY`` e as recebe por ``LISTEN``"""
+
+    def __init__(self, engine):
+        super().__init__()
+        self._engine = engine
+        self._ouvinte = None
+        self._pid_ouvinte = None
+        self._ouvinte_lock = threading.Lock()
+
+    def _enviar(self, chave_publicada):
+        carga = json.dumps({'origem': self.origem, 'chave': chave_publicada})
+        with self._engine.connect() as conexao:
+            conexao.exec_driver_sql('SELECT pg_notify(%s, %s)', (CANAL_POSTGRESQL, carga))
+            conexao.commit()
+
+    def _receber(self, carga):
+        dados = json.loads(carga)
+        if dados['origem'] != self.origem:
+            self.entregar(dados['chave'], remota=True)
+
+    def garantir_ouvinte(self):
+        # Threads não sobrevivem ao fork dos workers: cada processo inicia a sua
+        with self._ouvinte_lock:
+            if self._pid_ouvinte == os.getpid() and self._ouvinte.is_alive():
+                return
+            if self._pid_ouvinte is not None and self._pid_ouvinte != os.getpid():
+                # Processo filho: identidade própria para não descartar as mensagens do pai
+                self.origem = uuid.uuid4().hex
+            self._ouvinte = threading.Thread(
+                target=ouvir_postgres,
+                args=(self._engine, CANAL_POSTGRESQL, self._receber, lambda: self.entregar(TUDO)),
+                daemon=True
+            )
+            self._ouvinte.start()
+            self._pid_ouvinte = os.getpid()
+
+
+class CacheLocal:
+    """Cache em memória do processo com expiração e invalidação por prefixo"""
+
+    def __init__(self, prefixo, ttl=300):
+        self.prefixo = prefixo
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._itens = {}  # chave -> (instante da carga, valor)
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave_item, calcular):
+        """Valor em cache da chave ou o resultado de ``calcular()``, que passa a ficar em cache"""
+        agora = time.monotonic()
+        with self._lock:
+            item = self._itens.get(chave_item)
+            if item is not None and agora - item[0] <= self.ttl:
+                self.acertos += 1
+                return item[1]
+            self.falhas += 1
+        valor = calcular()
+        with self._lock:
+            self._itens[chave_item] = (agora, valor)
+        return valor
+
+    def invalidar(self, chave_publicada):
+        """Descarta os itens alcançados pela chave"""
+        with self._lock:
+            for chave_item in [c for c in self._itens if corresponde(chave_publicada, c)]:
+                del self._itens[chave_item]
+
+    def estatisticas(self):
+        with self._lock:
+            return {'itens': len(self._itens), 'acertos': self.acertos, 'falhas': self.falhas}
+
+
+def init_app(app):
+    """Cria o barramento configurado e os caches locais da aplicação"""
+    backend = app.config.get('INVALIDACAO_BACKEND')
+    if backend is None:
+        backend = 'postgresql' if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql') else 'memoria'
+    if backend == 'postgresql':
+        with app.app_context():
+            barramento = BarramentoPostgres(db.engine)
+    elif backend == 'memoria':
+        barramento = BarramentoMemoria()
+    else:
+        raise ValueError(f'INVALIDACAO_BACKEND desconhecido: {backend}')
+    app.extensions['invalidacao'] = barramento
+    app.extensions['caches_locais'] = {}
+    app.before_request(barramento.garantir_ouvinte)
+
+    registrar_cache(app, 'psicologos', ttl=app.config.get('CACHE_PSICOLOGOS_TTL', 300))
+
+
+def registrar_cache(app, prefixo, ttl=300):
+    """Cria um ``CacheLocal`` invalidado pelas chaves que alcançam o prefixo"""
+    cache = CacheLocal(prefixo, ttl)
+    app.extensions['invalidacao'].assinar(prefixo, cache.invalidar)
+    app.extensions['caches_locais'][prefixo] = cache
+    return cache
+
+
+def obter_barramento():
+    """Barramento de invalidação da aplicação atual"""
+    return current_app.extensions['invalidacao']
+
+
+def obter_cache(prefixo):
+    """Cache local registrado com o prefixo"""
+    return current_app.extensions['caches_locais'][prefixo]
+
+
+def publicar(*partes):
+    """Publica a invalidação; deve ser chamada após o commit da alteração"""
+    chave_publicada = chave(*partes)
+    try:
+        obter_barramento().publicar(chave_publicada)
+    except Exception as e:
+        print(f'Erro ao publicar invalidação {chave_publicada}: {e}')
+    return chave_publicada
+
+
+def estatisticas():
+    """Contadores do barramento e de cada cache local"""
+    return {
+        'barramento': obter_barramento().estatisticas(),
+        'caches': {prefixo: cache.estatisticas() for prefixo, cache in current_app.extensions['caches_locais'].items()},
+    }
@@ -0,0 +1,121 @@
+"""Lembretes de consulta por e-mail.
+
+Cada janela de ``LEMBRETES_JANELAS_HORAS`` (por padrão 24h e 2h antes da
+consulta) cobre as consultas que começam entre a janela menor seguinte e a
+sua antecedência; assim uma consulta marcada em cima da hora recebe apenas o
+lembrete mais próximo, e não todos de uma vez.
+
+As consultas de cada janela são lidas por uma consulta de intervalo em
+``data_hora`` (indexada), em lotes paginados por ID, já excluindo as que têm
+registro em ``LembreteEnviado``. Cada lote é entregue ao backend de e-mail de
+uma vez (uma conexão SMTP por lote) e os envios bem-sucedidos são registrados
+com um único ``INSERT``, o que torna a rotina idempotente: rodá-la de novo não
+repete lembretes, e os que falharam são tentados na próxima execução. Um
+servidor SMTP inacessível faz o lote inteiro contar como falha, sem
+interromper os lotes seguintes.
+"""
+import smtplib
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.orm import aliased
+
+from app.disponibilidade import STATUS_OCUPADOS
+from app.emails import criar_mensagem, obter_envio
+from app.models import Agendamento, LembreteEnviado, Paciente, Psicologo, Usuario, db
+
+
+def janelas():
+    """Pares ``(tipo, inicio, fim)`` em horas, da janela mais próxima à mais distante"""
+    configuradas = current_app.config.get('LEMBRETES_JANELAS_HORAS', {'24h': 24, '2h': 2})
+    resultado = []
+    inicio = 0
+    for tipo, horas in sorted(configuradas.items(), key=lambda item: item[1]):
+        resultado.append((tipo, inicio, horas))
+        inicio = horas
+    return resultado
+
+
+def _consultas_pendentes(tipo, de, ate, ultimo_id, tamanho_lote):
+    """Próximo lote de consultas da janela ainda sem lembrete do tipo"""
+    usuario_paciente = aliased(Usuario)
+    usuario_psicologo = aliased(Usuario)
+    ja_enviado = db.session.query(LembreteEnviado.id).filter(
+        LembreteEnviado.agendamento_id == Agendamento.id,
+        LembreteEnviado.tipo == tipo
+    ).exists()
+
+    return db.session.query(
+        Agendamento.id,
+        Agendamento.data_hora,
+        usuario_paciente.nome_completo,
+        usuario_paciente.email,
+        usuario_psicologo.nome_completo
+    ).join(
+        Paciente, Paciente.id == Agendamento.paciente_id
+    ).join(
+        usuario_paciente, usuario_paciente.id == Paciente.usuario_id
+    ).join(
+        Psicologo, Psicologo.id == Agendamento.psicologo_id
+    ).join(
+        usuario_psicologo, usuario_psicologo.id == Psicologo.usuario_id
+    ).filter(
+        Agendamento.data_hora > de,
+        Agendamento.data_hora <= ate,
+        Agendamento.status.in_(STATUS_OCUPADOS),
+        Agendamento.id > ultimo_id,
+        ~ja_enviado
+    ).order_by(Agendamento.id).limit(tamanho_lote).all()
+
+
+def montar_lembrete(nome_paciente, email, nome_psicologo, data_hora):
+    """Mensagem de lembrete de uma consulta"""
+    clinica = current_app.config.get('CLINICA_NOME', '')
+    quando = data_hora.strftime('%d/%m/%Y às %H:%M')
+    corpo = (
+        f'Olá, {nome_paciente}!\n\n'
+        f'Lembramos que sua consulta com Dr(a). {nome_psicologo} está marcada para {quando}.\n'
+        f'Se não puder comparecer, cancele ou reagende pela área do paciente.\n\n'
+        f'{clinica}'
+    )
+    return criar_mensagem(email, f'Lembrete de consulta - {quando}', corpo)
+
+
+def enviar_lembretes(agora=None, tamanho_lote=500):
+    """Envia os lembretes devidos e retorna ``{'enviados': n, 'falhas': n}``"""
+    agora = agora or datetime.now()
+    envio = obter_envio()
+    totais = {'enviados': 0, 'falhas': 0}
+
+    for tipo, inicio_horas, fim_horas in janelas():
+        de = agora + timedelta(hours=inicio_horas)
+        ate = agora + timedelta(hours=fim_horas)
+        ultimo_id = 0
+
+        while True:
+            consultas = _consultas_pendentes(tipo, de, ate, ultimo_id, tamanho_lote)
+            if not consultas:
+                break
+            ultimo_id = consultas[-1].id
+
+            mensagens = [montar_lembrete(nome, email, psicologo, data_hora)
+                         for _, data_hora, nome, email, psicologo in consultas]
+            try:
+                erros = envio.enviar_lote(mensagens)
+            except (OSError, smtplib.SMTPException) as e:
+                # Servidor indisponível: nenhum lembrete do lote é registrado
+                erros = [str(e)] * len(consultas)
+
+            enviados = [{'agendamento_id': consulta.id, 'tipo': tipo}
+                        for consulta, erro in zip(consultas, erros) if erro is None]
+            if enviados:
+                db.session.execute(insert(LembreteEnviado), enviados)
+            db.session.commit()
+
+            totais['enviados'] += len(enviados)
+            totais['falhas'] += len(consultas) - len(enviados)
+            if len(consultas) < tamanho_lote:
+                break
+
+    return totais
@@ -0,0 +1,190 @@
+"""Limite de tentativas de login por IP e por e-mail (janela deslizante).
+
+Cada tentativa de login custa um hash de senha (ver ``app.senhas``); sem
+limite, uma rajada de *credential stuffing* consome a CPU de todos os
+workers. As rotas de login consultam o limitador antes de verificar a senha
+e recusam com 429 (``Retry-After``) quem ultrapassou:
+
+- ``LOGIN_LIMITE_IP``: ``(falhas, segundos)`` por endereço IP;
+- ``LOGIN_LIMITE_EMAIL``: ``(falhas, segundos)`` por e-mail informado.
+
+Só falhas contam; um login bem-sucedido zera o contador do e-mail. A janela
+é deslizante: vale o número de falhas nos últimos ``segundos``, e a espera
+informada é o tempo até a falha mais antiga da janela sair dela.
+
+Backends (``LOGIN_LIMITE_BACKEND``):
+
+- ``memoria``: contadores no próprio processo (desenvolvimento e testes; com
+  vários workers cada um tem seu limite);
+- ``banco``: falhas gravadas em ``tentativas_login`` e contadas com uma
+  consulta por tentativa, compartilhadas por todos os processos.
+
+As recusas são contadas por processo e aparecem em ``/api/metricas``.
+"""
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import current_app, request
+from sqlalchemy import func
+
+from app.models import TentativaLogin, db
+
+# Falhas registradas entre duas limpezas das chaves vencidas
+VARRER_A_CADA = 1000
+
+
+class LimitadorMemoria:
+    """Janela deslizante com o registro das falhas de cada chave no processo"""
+
+    def __init__(self, limites):
+        self.limites = limites  # tipo -> (falhas, segundos)
+        self._lock = threading.Lock()
+        self._falhas = {}  # chave -> deque de instantes
+        self.recusadas = {tipo: 0 for tipo in limites}
+        self.falhas_registradas = 0
+
+    def _janela(self, tipo):
+        return timedelta(seconds=self.limites[tipo][1])
+
+    # Armazenamento: sobrescrito pelo backend compartilhado
+
+    def _contar(self, chaves, agora):
+        """``{chave: (falhas na janela, falha mais antiga)}``"""
+        resultado = {}
+        with self._lock:
+            for tipo, chave in chaves.items():
+                falhas = self._falhas.get(chave)
+                if not falhas:
+                    continue
+                limite = agora - self._janela(tipo)
+                while falhas and falhas[0] <= limite:
+                    falhas.popleft()
+                if falhas:
+                    resultado[chave] = (len(falhas), falhas[0])
+        return resultado
+
+    def _gravar_falha(self, chaves, agora):
+        with self._lock:
+            for tipo, chave in chaves.items():
+                self._falhas.setdefault(chave, deque(maxlen=self.limites[tipo][0])).append(agora)
+
+    def _apagar(self, chave):
+        with self._lock:
+            self._falhas.pop(chave, None)
+
+    def varrer(self, agora=None):
+        """Descarta as chaves sem falhas dentro da janela"""
+        agora = agora or datetime.utcnow()
+        maior_janela = max(self._janela(tipo) for tipo in self.limites)
+        with self._lock:
+            vencidas = [chave for chave, falhas in self._falhas.items() if not falhas or falhas[-1] <= agora - maior_janela]
+            for chave in vencidas:
+                del self._falhas[chave]
+        return len(vencidas)
+
+    # Interface
+
+    def espera(self, chaves, agora=None):
+        """Segundos até a próxima tentativa ser aceita (0 se permitida agora)"""
+        agora = agora or datetime.utcnow()
+        contagens = self._contar(chaves, agora)
+        espera = 0
+        for tipo, chave in chaves.items():
+            falhas, mais_antiga = contagens.get(chave, (0, None))
+            if falhas >= self.limites[tipo][0]:
+                espera = max(espera, (mais_antiga + self._janela(tipo) - agora).total_seconds())
+                self.recusadas[tipo] += 1
+        return max(espera, 0)
+
+    def registrar_falha(self, chaves, agora=None):
+        agora = agora or datetime.utcnow()
+        self._gravar_falha(chaves, agora)
+        self.falhas_registradas += 1
+        if self.falhas_registradas % VARRER_A_CADA == 0:
+            self.varrer(agora)
+
+    def registrar_sucesso(self, chaves):
+        if 'email' in chaves:
+            self._apagar(chaves['email'])
+
+    def estatisticas(self):
+        with self._lock:
+            chaves = len(self._falhas)
+        return {
+            'recusadas': dict(self.recusadas),
+            'falhas_registradas': self.falhas_registradas,
+            'chaves_em_memoria': chaves,
+        }
+
+
+class LimitadorBanco(LimitadorMemoria):
+    """Janela deslizante sobre a tabela ``tentativas_login``, comum a todos os processos"""
+
+    def _contar(self, chaves, agora):
+        condicoes = [
+            (TentativaLogin.chave == chave) & (TentativaLogin.momento > agora - self._janela(tipo))
+            for tipo, chave in chaves.items()
+        ]
+        linhas = db.session.query(
+            TentativaLogin.chave, func.count(TentativaLogin.id), func.min(TentativaLogin.momento)
+        ).filter(db.or_(*condicoes)).group_by(TentativaLogin.chave).all()
+        return {chave: (falhas, mais_antiga) for chave, falhas, mais_antiga in linhas}
+
+    def _gravar_falha(self, chaves, agora):
+        db.session.add_all(TentativaLogin(chave=chave, momento=agora) for chave in chaves.values())
+        db.session.commit()
+
+    def _apagar(self, chave):
+        TentativaLogin.query.filter_by(chave=chave).delete(synchronize_session=False)
+        db.session.commit()
+
+    def varrer(self, agora=None):
+        agora = agora or datetime.utcnow()
+        maior_janela = max(self._janela(tipo) for tipo in self.limites)
+        excluidas = TentativaLogin.query.filter(
+            TentativaLogin.momento <= agora - maior_janela
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return excluidas
+
+
+def init_app(app):
+    """Cria o limitador de tentativas de login configurado"""
+    limites = {
+        'ip': tuple(app.config.get('LOGIN_LIMITE_IP', (20, 300))),
+        'email': tuple(app.config.get('LOGIN_LIMITE_EMAIL', (5, 900))),
+    }
+    backend = app.config.get('LOGIN_LIMITE_BACKEND')
+    if backend is None:
+        backend = 'banco' if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql') else 'memoria'
+    if backend == 'banco':
+        limitador = LimitadorBanco(limites)
+    elif backend == 'memoria':
+        limitador = LimitadorMemoria(limites)
+    else:
+        raise ValueError(f'LOGIN_LIMITE_BACKEND desconhecido: {backend}')
+    app.extensions['limite_login'] = limitador
+
+
+def obter_limitador():
+    """Limitador de tentativas de login da aplicação atual"""
+    return current_app.extensions['limite_login']
+
+
+def chaves(email):
+    """Chaves da tentativa atual: IP da requisição e e-mail informado"""
+    return {'ip': f'ip:{request.remote_addr}', 'email': f'email:{(email or "").strip().lower()}'}
+
+
+def espera(email):
+    """Segundos que o cliente deve aguardar antes de tentar (0 se pode tentar agora)"""
+    return obter_limitador().espera(chaves(email))
+
+
+def registrar_falha(email):
+    obter_limitador().registrar_falha(chaves(email))
+
+
+def registrar_sucesso(email):
+    obter_limitador().registrar_sucesso(chaves(email))
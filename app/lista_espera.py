@@ -0,0 +1,119 @@
+"""Lista de espera com oferta automática de horários cancelados.
+
+Quando uma consulta é cancelada, o horário liberado é oferecido ao primeiro
+paciente da lista de espera do psicólogo cuja janela (dia da semana e faixa
+de horário) contém a sessão inteira, do início ao fim. A oferta reserva o horário para o paciente por
+``LISTA_ESPERA_OFERTA_MINUTOS``; se ele não agendar nesse prazo, a oferta
+vence e o horário passa ao próximo da fila.
+
+A busca usa o índice ``(psicologo_id, dia_semana, hora_inicio, hora_fim)``,
+de modo que cada cancelamento custa uma consulta indexada em vez de os
+pacientes consultarem a disponibilidade repetidamente.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import notificacoes, reservas
+from app.disponibilidade import DURACAO_SESSAO_MINUTOS
+from app.models import ListaEspera, db
+
+
+def ofertar_horario(psicologo_id, data_hora, duracao_minutos=DURACAO_SESSAO_MINUTOS):
+    """Oferece o horário liberado ao próximo paciente elegível da fila.
+
+    ``duracao_minutos`` é a duração da consulta cancelada: a reserva da
+    oferta cobre a sessão inteira. Retorna a inscrição que recebeu a oferta
+    ou ``None`` se ninguém na fila aceitar esse horário (ou se ele já estiver
+    agendado ou reservado).
+    """
+    fim = data_hora + timedelta(minutes=duracao_minutos)
+    # A janela é de um único dia: uma sessão que passa da meia-noite não cabe em nenhuma
+    if data_hora <= datetime.now() or fim.date() != data_hora.date():
+        return None
+
+    inscricao = ListaEspera.query.filter(
+        ListaEspera.psicologo_id == psicologo_id,
+        ListaEspera.dia_semana == data_hora.weekday(),
+        # A sessão inteira precisa caber na janela do inscrito
+        ListaEspera.hora_inicio <= data_hora.time(),
+        ListaEspera.hora_fim >= fim.time(),
+        ListaEspera.status == 'aguardando',
+        # Quem já recebeu este mesmo horário e deixou a oferta vencer não o
+        # recebe de novo; ele segue na fila para os próximos horários
+        db.or_(
+            ListaEspera.oferta_data_hora.is_(None),
+            ListaEspera.oferta_data_hora != data_hora
+        )
+    ).order_by(ListaEspera.data_criacao, ListaEspera.id).first()
+    if inscricao is None:
+        return None
+
+    # O conflito não depende de quem recebe a oferta: se o horário já foi
+    # agendado ou reservado por outra pessoa, nenhum inscrito pode recebê-lo.
+    # A reserva da oferta convive com a que o paciente segura no modal.
+    reserva = reservas.reservar_horario(
+        inscricao.paciente_id, psicologo_id, data_hora,
+        minutos=current_app.config.get('LISTA_ESPERA_OFERTA_MINUTOS', 30),
+        duracao_minutos=duracao_minutos, substituir=False
+    )
+    if reserva is None:
+        return None
+
+    inscricao.status = 'ofertado'
+    inscricao.oferta_data_hora = data_hora
+    inscricao.oferta_duracao_minutos = duracao_minutos
+    inscricao.oferta_expira_em = reserva.expira_em
+    notificacoes.notificar_oferta(
+        inscricao.paciente.usuario, inscricao.psicologo.usuario.nome_completo, data_hora
+    )
+    db.session.commit()
+    return inscricao
+
+
+def expirar_ofertas(agora=None):
+    """Devolve à fila as ofertas vencidas e oferece os horários ao próximo.
+
+    Retorna a quantidade de ofertas vencidas.
+    """
+    agora = agora or datetime.utcnow()
+    vencidas = ListaEspera.query.filter(
+        ListaEspera.status == 'ofertado',
+        ListaEspera.oferta_expira_em <= agora
+    ).all()
+
+    for inscricao in vencidas:
+        inscricao.status = 'aguardando'
+    db.session.commit()
+
+    if vencidas:
+        reservas.varrer_reservas_expiradas(agora)
+    for inscricao in vencidas:
+        ofertar_horario(
+            inscricao.psicologo_id, inscricao.oferta_data_hora,
+            inscricao.oferta_duracao_minutos or DURACAO_SESSAO_MINUTOS
+        )
+
+    return len(vencidas)
+
+
+def registrar_agendamento(paciente_id, psicologo_id, data_hora):
+    """Marca como atendida a oferta aceita pelo paciente.
+
+    Deve ser chamada na mesma transação do novo agendamento.
+    """
+    ListaEspera.query.filter(
+        ListaEspera.paciente_id == paciente_id,
+        ListaEspera.psicologo_id == psicologo_id,
+        ListaEspera.status == 'ofertado',
+        ListaEspera.oferta_data_hora == data_hora
+    ).update({'status': 'atendido'}, synchronize_session=False)
+
+
+def ofertas_do_paciente(paciente_id):
+    """Ofertas válidas feitas ao paciente, da mais próxima para a mais distante"""
+    return ListaEspera.query.filter(
+        ListaEspera.paciente_id == paciente_id,
+        ListaEspera.status == 'ofertado',
+        ListaEspera.oferta_expira_em > datetime.utcnow()
+    ).order_by(ListaEspera.oferta_data_hora).all()
@@ -1,9 +1,11 @@
-from flask import render_template, request, redirect, url_for, flash, session
+from flask import render_template, request, redirect, url_for, flash, session, abort, Response, stream_with_context
 from flask_login import login_required, current_user
 from . import bp
 from app.models import db, Paciente, Psicologo
 from werkzeug.security import check_password_hash, generate_password_hash
-from datetime import datetime
+from werkzeug.http import is_resource_modified
+from datetime import datetime, timezone
+from app import ics
 
 @bp.route('/')
 @bp.route('/index')
@@ -46,4 +48,26 @@ def area_paciente():
     """Redireciona para o dashboard atualizado do paciente"""
     if current_user.tipo_usuario != 'paciente':
         return redirect(url_for('main.dashboard_redirect'))
-    return redirect(url_for('paciente.dashboard'))
\ No newline at end of file
+    return redirect(url_for('paciente.dashboard'))
+
+@bp.route('/calendario/<token>.ics')
+def calendario_ics(token):
+    """Feed iCalendar assinado pelo calendário do celular (sem login, autenticado pelo token)"""
+    feed = ics.abrir_feed(token)
+    if feed is None:
+        abort(404)
+    
+    resposta = Response(mimetype='text/calendar')
+    resposta.set_etag(feed.etag)
+    if feed.ultima_alteracao:
+        resposta.last_modified = feed.ultima_alteracao.replace(tzinfo=timezone.utc)
+    resposta.cache_control.private = True
+    resposta.cache_control.no_cache = True
+    
+    # O cliente já tem esta versão: 304 sem ler os agendamentos
+    if not is_resource_modified(request.environ, feed.etag, last_modified=resposta.last_modified):
+        resposta.status_code = 304
+        return resposta
+    
+    resposta.response = stream_with_context(ics.gerar(feed, request.host))
+    return resposta
@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
-from app import db, login_manager
+from sqlalchemy import event
+from app import db, login_manager, senhas
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -16,9 +16,10 @@ class Usuario(UserMixin, db.Model):
     nome_completo = db.Column(db.String(200), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     senha_hash = db.Column(db.String(255), nullable=False)
+    versao_senha = db.Column(db.Integer, default=0, nullable=False)  # Incrementada a cada troca de senha
     telefone = db.Column(db.String(20), nullable=True)
-    tipo_usuario = db.Column(db.Enum('admin', 'psicologo', 'paciente', name='tipo_usuario_enum'), nullable=False)
-    ativo = db.Column(db.Boolean, default=True, nullable=False)
+    tipo_usuario = db.Column(db.Enum('admin', 'psicologo', 'paciente', name='tipo_usuario_enum'), nullable=False, index=True)
+    ativo = db.Column(db.Boolean, default=True, nullable=False, index=True)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
     # Relacionamentos
@@ -27,12 +28,13 @@ class Usuario(UserMixin, db.Model):
     admin = db.relationship('Admin', backref='usuario', uselist=False, cascade='all, delete-orphan')
     
     def set_senha(self, senha):
-        """Define a senha do usuário com hash"""
-        self.senha_hash = generate_password_hash(senha)
+        """Define a senha do usuário com hash (método em SENHA_METODO)"""
+        self.senha_hash = senhas.gerar_hash(senha)
+        self.versao_senha = (self.versao_senha or 0) + 1
     
     def check_senha(self, senha):
         """Verifica se a senha está correta"""
-        return check_password_hash(self.senha_hash, senha)
+        return senhas.verificar(self.senha_hash, senha)
     
     def __repr__(self):
         return f'<Usuario {self.email}>'
@@ -78,26 +80,98 @@ class Paciente(db.Model):
     def __repr__(self):
         return f'<Paciente {self.usuario.nome_completo}>'
 
+def _data_hora_fim_padrao(context):
+    """Fim do agendamento em inserções em lote (fora do ORM)"""
+    parametros = context.get_current_parameters()
+    return parametros['data_hora'] + timedelta(minutes=parametros.get('duracao_minutos') or 60)
+
 class Agendamento(db.Model):
     """Modelo para agendamentos"""
     __tablename__ = 'agendamentos'
+    __table_args__ = (
+        # Busca de sobreposição por psicólogo (B-tree, todos os bancos)
+        db.Index('ix_agendamentos_psicologo_periodo', 'psicologo_id', 'data_hora', 'data_hora_fim'),
+        # Agenda do paciente por período (feed de calendário)
+        db.Index('ix_agendamentos_paciente_data', 'paciente_id', 'data_hora'),
+        # Sincronização incremental: alterações desde o cursor do cliente
+        db.Index('ix_agendamentos_atualizacao', 'data_atualizacao', 'id'),
+        # Filtro por status da API (listagem por período ou por ID)
+        db.Index('ix_agendamentos_status_data', 'status', 'data_hora'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     paciente_id = db.Column(db.Integer, db.ForeignKey('pacientes.id'), nullable=False)
     psicologo_id = db.Column(db.Integer, db.ForeignKey('psicologos.id'), nullable=False)
     data_hora = db.Column(db.DateTime, nullable=False, index=True)
-    status = db.Column(db.Enum('agendado', 'confirmado', 'realizado', 'cancelado', 'ausencia', name='status_agendamento_enum'), 
+    duracao_minutos = db.Column(db.Integer, default=60, nullable=False)
+    data_hora_fim = db.Column(db.DateTime, default=_data_hora_fim_padrao, nullable=False)
+    status = db.Column(db.Enum('agendado', 'confirmado', 'realizado', 'cancelado', 'ausencia', 'pendente_revisao',
+                               name='status_agendamento_enum'), 
                       default='agendado', nullable=False)
     observacoes = db.Column(db.Text, nullable=True)
+    # Data e hora da série recorrente que gerou a consulta (mantida ao reagendar)
+    data_hora_serie = db.Column(db.DateTime, nullable=True)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     # Relacionamento com sessões
     sessao = db.relationship('Sessao', backref='agendamento', uselist=False, cascade='all, delete-orphan')
     
+    @classmethod
+    def filtro_sobreposicao(cls, inicio, fim):
+        """Condição dos agendamentos que se sobrepõem ao período [inicio, fim).
+        
+        No PostgreSQL usa o operador de intervalos ``&&`` (índice GiST sobre
+        ``tsrange``); nos demais bancos, a comparação equivalente das pontas,
+        atendida pelo índice B-tree ``(psicologo_id, data_hora, data_hora_fim)``.
+        """
+        if db.session.get_bind().dialect.name == 'postgresql':
+            return db.func.tsrange(cls.data_hora, cls.data_hora_fim).op('&&')(db.func.tsrange(inicio, fim))
+        return db.and_(cls.data_hora < fim, cls.data_hora_fim > inicio)
+    
     def __repr__(self):
         return f'<Agendamento {self.paciente.usuario.nome_completo} - {self.data_hora}>'
 
+# Índice GiST de intervalos, criado apenas no PostgreSQL
+db.Index(
+    'ix_agendamentos_periodo_gist',
+    db.func.tsrange(Agendamento.data_hora, Agendamento.data_hora_fim),
+    postgresql_using='gist'
+).ddl_if(dialect='postgresql')
+
+@event.listens_for(Agendamento, 'before_insert')
+@event.listens_for(Agendamento, 'before_update')
+def _atualizar_data_hora_fim(mapper, connection, agendamento):
+    """Mantém ``data_hora_fim`` coerente com início e duração"""
+    if agendamento.data_hora is not None:
+        agendamento.data_hora_fim = agendamento.data_hora + timedelta(minutes=agendamento.duracao_minutos or 60)
+
+class AgendamentoRemovido(db.Model):
+    """Registro (tombstone) de agendamento excluído, para a sincronização incremental"""
+    __tablename__ = 'agendamentos_removidos'
+    __table_args__ = (
+        db.Index('ix_agendamentos_removidos_data', 'data_remocao', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    agendamento_id = db.Column(db.Integer, nullable=False)
+    paciente_id = db.Column(db.Integer, nullable=False, index=True)
+    psicologo_id = db.Column(db.Integer, nullable=False, index=True)
+    data_remocao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<AgendamentoRemovido {self.agendamento_id}>'
+
+@event.listens_for(Agendamento, 'after_delete')
+def _registrar_remocao(mapper, connection, agendamento):
+    """Grava o tombstone na mesma transação da exclusão (apenas exclusões pelo ORM)"""
+    connection.execute(AgendamentoRemovido.__table__.insert().values(
+        agendamento_id=agendamento.id,
+        paciente_id=agendamento.paciente_id,
+        psicologo_id=agendamento.psicologo_id,
+        data_remocao=datetime.utcnow()
+    ))
+
 class Prontuario(db.Model):
     """Modelo para prontuários"""
     __tablename__ = 'prontuarios'
@@ -147,4 +221,168 @@ class HorarioAtendimento(db.Model):
     
     def __repr__(self):
         dias = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
-        return f'<HorarioAtendimento {dias[self.dia_semana]} {self.hora_inicio}-{self.hora_fim}>'
\ No newline at end of file
+        return f'<HorarioAtendimento {dias[self.dia_semana]} {self.hora_inicio}-{self.hora_fim}>'
+
+class ReservaHorario(db.Model):
+    """Reserva temporária de um horário enquanto o paciente conclui o agendamento"""
+    __tablename__ = 'reservas_horario'
+    __table_args__ = (
+        db.UniqueConstraint('psicologo_id', 'data_hora', name='uq_reserva_horario_psicologo_data_hora'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    psicologo_id = db.Column(db.Integer, db.ForeignKey('psicologos.id'), nullable=False)
+    paciente_id = db.Column(db.Integer, db.ForeignKey('pacientes.id'), nullable=False, index=True)
+    data_hora = db.Column(db.DateTime, nullable=False)
+    data_hora_fim = db.Column(db.DateTime, nullable=False)
+    expira_em = db.Column(db.DateTime, nullable=False, index=True)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<ReservaHorario {self.psicologo_id} - {self.data_hora} até {self.expira_em}>'
+
+class ListaEspera(db.Model):
+    """Inscrição de paciente na lista de espera de um psicólogo"""
+    __tablename__ = 'lista_espera'
+    __table_args__ = (
+        db.Index('ix_lista_espera_busca', 'psicologo_id', 'dia_semana', 'hora_inicio', 'hora_fim'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    paciente_id = db.Column(db.Integer, db.ForeignKey('pacientes.id'), nullable=False, index=True)
+    psicologo_id = db.Column(db.Integer, db.ForeignKey('psicologos.id'), nullable=False)
+    dia_semana = db.Column(db.Integer, nullable=False)  # 0=Segunda, 1=Terça, ..., 6=Domingo
+    hora_inicio = db.Column(db.Time, nullable=False)
+    hora_fim = db.Column(db.Time, nullable=False)
+    status = db.Column(db.Enum('aguardando', 'ofertado', 'atendido', 'cancelado', name='status_lista_espera_enum'),
+                      default='aguardando', nullable=False)
+    
+    # Última oferta de horário feita ao paciente
+    oferta_data_hora = db.Column(db.DateTime, nullable=True)
+    oferta_duracao_minutos = db.Column(db.Integer, nullable=True)
+    oferta_expira_em = db.Column(db.DateTime, nullable=True)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Relacionamentos
+    paciente = db.relationship('Paciente', backref=db.backref('lista_espera', lazy='dynamic'))
+    psicologo = db.relationship('Psicologo', backref=db.backref('lista_espera', lazy='dynamic'))
+    
+    def __repr__(self):
+        return f'<ListaEspera {self.paciente_id} - {self.psicologo_id} dia {self.dia_semana} {self.hora_inicio}-{self.hora_fim}>'
+
+class LembreteEnviado(db.Model):
+    """Registro de lembrete de consulta já enviado (garante envio único por janela)"""
+    __tablename__ = 'lembretes_enviados'
+    __table_args__ = (
+        db.UniqueConstraint('agendamento_id', 'tipo', name='uq_lembrete_agendamento_tipo'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    agendamento_id = db.Column(db.Integer, db.ForeignKey('agendamentos.id'), nullable=False)
+    tipo = db.Column(db.String(10), nullable=False)  # '24h', '2h'
+    data_envio = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<LembreteEnviado {self.agendamento_id} - {self.tipo}>'
+
+class EmailPendente(db.Model):
+    """Caixa de saída: e-mail gravado na transação da alteração e enviado em segundo plano"""
+    __tablename__ = 'emails_pendentes'
+    __table_args__ = (
+        db.Index('ix_emails_pendentes_fila', 'status', 'proxima_tentativa'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    destinatario = db.Column(db.String(120), nullable=False)
+    assunto = db.Column(db.String(200), nullable=False)
+    corpo = db.Column(db.Text, nullable=False)
+    status = db.Column(db.Enum('pendente', 'enviado', 'falhou', name='status_email_enum'),
+                      default='pendente', nullable=False)
+    tentativas = db.Column(db.Integer, default=0, nullable=False)
+    proxima_tentativa = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    data_envio = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<EmailPendente {self.destinatario} - {self.status}>'
+
+class Tarefa(db.Model):
+    """Tarefa em segundo plano executada pelo comando ``flask worker``"""
+    __tablename__ = 'tarefas'
+    __table_args__ = (
+        db.Index('ix_tarefas_fila', 'status', 'prioridade', 'executar_em'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), nullable=False)
+    argumentos = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.Enum('pendente', 'executando', 'concluida', 'falhou', name='status_tarefa_enum'),
+                      default='pendente', nullable=False)
+    prioridade = db.Column(db.Integer, default=0, nullable=False)  # Maior valor executa antes
+    tentativas = db.Column(db.Integer, default=0, nullable=False)
+    max_tentativas = db.Column(db.Integer, default=3, nullable=False)
+    executar_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    iniciada_em = db.Column(db.DateTime, nullable=True)
+    concluida_em = db.Column(db.DateTime, nullable=True)
+    duracao_ms = db.Column(db.Float, nullable=True)
+    erro = db.Column(db.Text, nullable=True)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<Tarefa {self.id} {self.nome} - {self.status}>'
+
+class ExecucaoPeriodica(db.Model):
+    """Controle das tarefas periódicas executadas pelo agendador"""
+    __tablename__ = 'execucoes_periodicas'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), unique=True, nullable=False)
+    ultima_execucao = db.Column(db.DateTime, nullable=True)
+    proxima_execucao = db.Column(db.DateTime, nullable=True)
+    duracao_ms = db.Column(db.Float, nullable=True)
+    execucoes = db.Column(db.Integer, default=0, nullable=False)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    executado_por = db.Column(db.String(100), nullable=True)  # host:pid da instância
+    
+    def __repr__(self):
+        return f'<ExecucaoPeriodica {self.nome} - {self.ultima_execucao}>'
+
+class TokenRevogado(db.Model):
+    """Token JWT revogado antes de expirar (logout ou rotação do refresh)"""
+    __tablename__ = 'tokens_revogados'
+    
+    jti = db.Column(db.String(32), primary_key=True)
+    expira_em = db.Column(db.DateTime, nullable=False, index=True)
+    data_revogacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<TokenRevogado {self.jti}>'
+
+class TentativaLogin(db.Model):
+    """Falha de login por IP ou e-mail, para o limite de tentativas compartilhado"""
+    __tablename__ = 'tentativas_login'
+    __table_args__ = (
+        db.Index('ix_tentativas_login_chave_momento', 'chave', 'momento'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    chave = db.Column(db.String(200), nullable=False)  # 'ip:<endereço>' ou 'email:<e-mail>'
+    momento = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<TentativaLogin {self.chave} {self.momento}>'
+
+class ImportacaoLegado(db.Model):
+    """Progresso da importação de um arquivo de histórico (retomada após interrupção)"""
+    __tablename__ = 'importacoes_legado'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(255), unique=True, nullable=False)
+    registros = db.Column(db.Integer, default=0, nullable=False)  # Registros do arquivo já processados
+    importados = db.Column(db.Integer, default=0, nullable=False)
+    erros = db.Column(db.Integer, default=0, nullable=False)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<ImportacaoLegado {self.nome} - {self.registros}>'
@@ -0,0 +1,61 @@
+"""E-mails transacionais enviados aos pacientes.
+
+As funções apenas enfileiram a mensagem na caixa de saída e devem ser
+chamadas antes do commit da alteração correspondente: se a transação for
+desfeita, o e-mail também é descartado.
+"""
+from flask import current_app
+
+from app.emails import enfileirar_email
+
+
+def _assinatura():
+    return f"\n\n{current_app.config.get('CLINICA_NOME', '')}"
+
+
+def notificar_cadastro(usuario):
+    """Boas-vindas ao paciente recém-cadastrado"""
+    enfileirar_email(
+        usuario.email,
+        'Cadastro realizado',
+        f'Olá, {usuario.nome_completo}!\n\n'
+        f'Seu cadastro foi realizado com sucesso. Acesse a área do paciente para agendar sua consulta.'
+        + _assinatura()
+    )
+
+
+def notificar_agendamento(usuario, nome_psicologo, data_hora):
+    """Confirmação de consulta agendada"""
+    quando = data_hora.strftime('%d/%m/%Y às %H:%M')
+    enfileirar_email(
+        usuario.email,
+        f'Consulta agendada - {quando}',
+        f'Olá, {usuario.nome_completo}!\n\n'
+        f'Sua consulta com Dr(a). {nome_psicologo} foi agendada para {quando}.'
+        + _assinatura()
+    )
+
+
+def notificar_cancelamento(usuario, nome_psicologo, data_hora):
+    """Confirmação de consulta cancelada"""
+    quando = data_hora.strftime('%d/%m/%Y às %H:%M')
+    enfileirar_email(
+        usuario.email,
+        f'Consulta cancelada - {quando}',
+        f'Olá, {usuario.nome_completo}!\n\n'
+        f'Sua consulta com Dr(a). {nome_psicologo} em {quando} foi cancelada.'
+        + _assinatura()
+    )
+
+
+def notificar_oferta(usuario, nome_psicologo, data_hora):
+    """Aviso de horário liberado oferecido pela lista de espera"""
+    quando = data_hora.strftime('%d/%m/%Y às %H:%M')
+    enfileirar_email(
+        usuario.email,
+        f'Horário disponível - {quando}',
+        f'Olá, {usuario.nome_completo}!\n\n'
+        f'Um horário com Dr(a). {nome_psicologo} ficou disponível em {quando} e está reservado para você '
+        f'por tempo limitado. Acesse a área do paciente para agendá-lo.'
+        + _assinatura()
+    )
@@ -3,7 +3,10 @@ from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash
 from app.paciente import bp
 from app.models import Paciente, Agendamento, Psicologo, Usuario, Prontuario, HorarioAtendimento, db
-from datetime import datetime, timedelta, timezone
+from app import disponibilidade, reservas, lista_espera, notificacoes, eventos, ics, invalidacao
+from app.agenda import bloquear_agenda, reagendar_agendamento, verificar_conflito, ErroAgendamento
+from app.models import ListaEspera
+from datetime import datetime, time, timedelta, timezone
 
 @bp.route('/dashboard')
 @login_required
@@ -28,9 +31,13 @@ def dashboard():
     # Buscar psicólogos disponíveis para agendamento
     psicologos = Psicologo.query.all()
     
+    # Horários oferecidos pela lista de espera
+    ofertas = lista_espera.ofertas_do_paciente(paciente.id)
+    
     return render_template('paciente/dashboard.html', 
                          proximos_agendamentos=proximos_agendamentos,
-                         psicologos=psicologos)
+                         psicologos=psicologos,
+                         ofertas=ofertas)
 
 @bp.route('/perfil', methods=['GET', 'POST'])
 @login_required
@@ -119,7 +126,10 @@ def agendamentos():
         else:
             agendamento.data_hora = agendamento.data_hora.astimezone(timezone.utc)
 
-    return render_template('paciente/agendamentos.html', agendamentos=agendamentos_list, moment=datetime, now=datetime.now(timezone.utc), timezone=timezone)
+    # Link secreto para assinar as consultas no calendário do celular
+    link_ics = url_for('main.calendario_ics', token=ics.gerar_token(current_user, paciente.id), _external=True)
+
+    return render_template('paciente/agendamentos.html', agendamentos=agendamentos_list, moment=datetime, now=datetime.now(timezone.utc), timezone=timezone, link_ics=link_ics)
 
 @bp.route('/agendar', methods=['POST'])
 @login_required
@@ -139,6 +149,7 @@ def agendar():
             data_str = request.form.get('data')
             horario_str = request.form.get('horario')
             observacoes = request.form.get('observacoes', '').strip()
+            duracao = _duracao_solicitada(request.form)
             
             # Validações
             if not all([psicologo_id, data_str, horario_str]):
@@ -156,21 +167,34 @@ def agendar():
             data_hora = datetime.strptime(data_hora_str, '%Y-%m-%d %H:%M')
             
             # Verificar se a data não é no passado
-            if data_hora < datetime.now(timezone.utc):
+            if data_hora < datetime.now():
                 flash('Não é possível agendar consultas para datas e horários passados.', 'error')
                 return redirect(url_for('paciente.agendamentos'))
             
+            # Trava a agenda do psicólogo até o commit: sessões de durações diferentes
+            # não colidem na restrição única de início, só na checagem de sobreposição
+            bloquear_agenda(psicologo_id)
+            
+            # Verificar se a sessão não se sobrepõe a outra consulta
+            if verificar_conflito(psicologo_id, data_hora, duracao):
+                db.session.rollback()
+                flash('Este horário não está mais disponível.', 'error')
+                return redirect(url_for('paciente.agendamentos'))
+            
             # Criar novo agendamento
             novo_agendamento = Agendamento(
                 paciente_id=paciente.id,
                 psicologo_id=psicologo_id,
                 data_hora=data_hora,
+                duracao_minutos=duracao,
                 status='agendado',
                 observacoes=observacoes
             )
             
             db.session.add(novo_agendamento)
             db.session.commit()
+            disponibilidade.horario_ocupado(psicologo_id, data_hora, duracao)
+            eventos.agendamento_alterado(novo_agendamento, 'agendamento_criado')
             
             flash('Consulta agendada com sucesso!', 'success')
             return redirect(url_for('paciente.agendamentos'))
@@ -180,6 +204,21 @@ def agendar():
             flash('Erro ao agendar consulta. Tente novamente.', 'error')
             return redirect(url_for('paciente.agendamentos'))
 
+def _diretorio_psicologos():
+    """Psicólogos (id e nome) guardados no cache local do processo.
+
+    Invalidado pela chave ``psicologos``, publicada no cadastro de
+    psicólogos e na alteração do perfil.
+    """
+    def carregar():
+        return [
+            {'id': psicologo_id, 'nome': nome}
+            for psicologo_id, nome in db.session.query(Psicologo.id, Usuario.nome_completo).join(
+                Usuario, Usuario.id == Psicologo.usuario_id
+            ).filter(Usuario.tipo_usuario == 'psicologo').order_by(Psicologo.id).all()
+        ]
+    return invalidacao.obter_cache('psicologos').obter('psicologos:diretorio', carregar)
+
 # APIs para o modal de agendamento
 @bp.route('/api/psicologos')
 @login_required
@@ -204,30 +243,15 @@ def api_psicologos():
             # Se há agendamentos, usar o psicólogo do primeiro agendamento como fixo
             psicologo_fixo_id = agendamentos_paciente[0].psicologo_id
         
-        # Buscar todos os psicólogos disponíveis (excluindo administradores)
-        psicologos = Psicologo.query.join(Usuario).filter(Usuario.tipo_usuario == 'psicologo').all()
-        psicologos_data = []
+        # Psicólogos disponíveis (excluindo administradores), do cache local
+        diretorio = _diretorio_psicologos()
         
         if psicologo_fixo_id:
             # Se há psicólogo fixo, retornar apenas ele (se não for admin)
-            psicologo_fixo = Psicologo.query.join(Usuario).filter(
-                Psicologo.id == psicologo_fixo_id,
-                Usuario.tipo_usuario == 'psicologo'
-            ).first()
-            if psicologo_fixo:
-                psicologos_data.append({
-                    'id': psicologo_fixo.id,
-                    'nome': psicologo_fixo.usuario.nome_completo,
-                    'fixo': True
-                })
+            psicologos_data = [dict(p, fixo=True) for p in diretorio if p['id'] == psicologo_fixo_id]
         else:
             # Se não há psicólogo fixo, retornar todos os psicólogos (excluindo admins)
-            for psicologo in psicologos:
-                psicologos_data.append({
-                    'id': psicologo.id,
-                    'nome': psicologo.usuario.nome_completo,
-                    'fixo': False
-                })
+            psicologos_data = [dict(p, fixo=False) for p in diretorio]
         
         return jsonify({
             'psicologos': psicologos_data
@@ -251,68 +275,182 @@ def api_horarios_disponiveis():
         # Converter string para data
         data = datetime.strptime(data_str, '%Y-%m-%d').date()
         
-        # Buscar psicólogo
-        psicologo = Psicologo.query.get(psicologo_id)
-        if not psicologo:
+        duracao = _duracao_solicitada(request.args)
+        
+        # Requisições simultâneas para o mesmo psicólogo e data compartilham a computação
+        horarios = disponibilidade.horarios_disponiveis(psicologo_id, data, duracao)
+        if horarios is None:
             return jsonify({'error': 'Psicólogo não encontrado'}), 404
         
-        # Verificar se a data não é no passado
-        if data < datetime.now().date():
-            return jsonify({'horarios': []})
+        # Horários reservados por outros pacientes não são oferecidos
+        paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+        reservados = reservas.horarios_reservados(
+            psicologo_id, data, horarios, duracao, exceto_paciente_id=paciente.id if paciente else None
+        )
         
-        # Verificar se o psicólogo atende neste dia da semana
-        dia_semana = data.weekday()  # 0=Segunda, 1=Terça, ..., 6=Domingo
+        return jsonify({'horarios': [h for h in horarios if h not in reservados]})
         
-        horarios_atendimento = HorarioAtendimento.query.filter_by(
-            psicologo_id=psicologo_id,
-            dia_semana=dia_semana,
-            ativo=True
-        ).all()  # Buscar TODOS os horários do dia (pode ter múltiplos turnos)
+    except ValueError:
+        return jsonify({'error': 'Formato de data ou duração inválido'}), 400
+    except Exception as e:
+        print(f"Erro na API de horários: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@bp.route('/api/reservar-horario', methods=['POST'])
+@login_required
+def api_reservar_horario():
+    """API para reservar temporariamente o horário escolhido no modal"""
+    try:
+        paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
         
-        if not horarios_atendimento:
-            return jsonify({'horarios': []})
+        if not paciente:
+            return jsonify({'error': 'Perfil de paciente não encontrado'}), 404
         
-        # Gerar horários disponíveis baseados em TODOS os turnos do psicólogo
-        horarios_disponiveis = []
+        dados = request.get_json(silent=True) or request.form
+        psicologo_id = dados.get('psicologo_id')
+        data_str = dados.get('data')
+        horario_str = dados.get('horario')
         
-        for horario_atendimento in horarios_atendimento:
-            hora_atual = horario_atendimento.hora_inicio
-            hora_fim = horario_atendimento.hora_fim
-            
-            while hora_atual < hora_fim:
-                # Gerar slots de 1 hora
-                horario_str = hora_atual.strftime('%H:%M')
-                if horario_str not in horarios_disponiveis:  # Evitar duplicatas
-                    horarios_disponiveis.append(horario_str)
-                
-                # Avançar para a próxima hora
-                hora_atual = (datetime.combine(datetime.today(), hora_atual) + timedelta(hours=1)).time()
+        if not psicologo_id or not data_str or not horario_str:
+            return jsonify({'error': 'Parâmetros obrigatórios: psicologo_id, data e horario'}), 400
         
-        # Ordenar os horários
-        horarios_disponiveis.sort()
+        data_hora = datetime.strptime(f"{data_str} {horario_str}", '%Y-%m-%d %H:%M')
+        duracao = _duracao_solicitada(dados)
+        if data_hora < datetime.now():
+            return jsonify({'error': 'Não é possível reservar horários passados'}), 400
         
-        # Buscar agendamentos já existentes nesta data para este psicólogo
-        data_inicio = datetime.combine(data, datetime.min.time())
-        data_fim = datetime.combine(data, datetime.max.time())
+        if not Psicologo.query.get(psicologo_id):
+            return jsonify({'error': 'Psicólogo não encontrado'}), 404
         
-        agendamentos_existentes = Agendamento.query.filter(
-            Agendamento.psicologo_id == psicologo_id,
-            Agendamento.data_hora >= data_inicio,
-            Agendamento.data_hora <= data_fim,
-            Agendamento.status.in_(['agendado', 'confirmado'])
-        ).all()
+        reserva = reservas.reservar_horario(
+            paciente.id, int(psicologo_id), data_hora, duracao_minutos=duracao
+        )
+        if not reserva:
+            return jsonify({'error': 'Este horário não está mais disponível'}), 409
         
-        horarios_ocupados = [ag.data_hora.strftime('%H:%M') for ag in agendamentos_existentes]
+        return jsonify({
+            'reserva': {
+                'id': reserva.id,
+                'expira_em': reserva.expira_em.isoformat() + 'Z'
+            }
+        }), 201
+        
+    except ValueError:
+        return jsonify({'error': 'Formato de data ou horário inválido'}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erro ao reservar horário: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@bp.route('/api/reservas/<int:reserva_id>/cancelar', methods=['POST'])
+@login_required
+def api_cancelar_reserva(reserva_id):
+    """API para liberar a reserva quando o modal é fechado"""
+    paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+    
+    if not paciente:
+        return jsonify({'error': 'Perfil de paciente não encontrado'}), 404
+    
+    if not reservas.cancelar_reserva(paciente.id, reserva_id):
+        return jsonify({'error': 'Reserva não encontrada'}), 404
+    
+    return jsonify({'success': True})
+
+@bp.route('/api/buscar-horarios')
+@login_required
+def api_buscar_horarios():
+    """API de busca de horários livres entre todos os psicólogos.
+    
+    Com ``horario`` informado, retorna os psicólogos livres na data e horário;
+    sem ele, retorna o primeiro horário livre a partir de ``data`` (ou de agora)
+    dentro de ``dias`` dias.
+    """
+    try:
+        data_str = request.args.get('data')
+        horario_str = request.args.get('horario')
+        dias = min(request.args.get('dias', 14, type=int), 60)
+        psicologo_id = request.args.get('psicologo_id', type=int)
+        duracao = _duracao_solicitada(request.args)
+        
+        agora = datetime.now()
+        indice = disponibilidade.obter_indice()
+        # Horários reservados por outros pacientes não são oferecidos
+        paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+        exceto_paciente_id = paciente.id if paciente else None
+        
+        if horario_str:
+            if not data_str:
+                return jsonify({'error': 'Parâmetro obrigatório: data'}), 400
+            
+            data_hora = datetime.strptime(f"{data_str} {horario_str}", '%Y-%m-%d %H:%M')
+            if data_hora < agora:
+                return jsonify({'data': data_str, 'horario': horario_str, 'psicologos': []})
+            
+            bloqueios = reservas.mascaras_reservadas(
+                data_hora, data_hora + timedelta(minutes=duracao), exceto_paciente_id
+            )
+            psicologo_ids = indice.psicologos_livres(data_hora, duracao_minutos=duracao, bloqueios=bloqueios)
+            return jsonify({
+                'data': data_str,
+                'horario': horario_str,
+                'psicologos': _dados_psicologos(psicologo_ids)
+            })
+        
+        a_partir_de = agora
+        if data_str:
+            a_partir_de = max(agora, datetime.strptime(data_str, '%Y-%m-%d'))
+        
+        dias = max(dias, 1)
+        bloqueios = reservas.mascaras_reservadas(
+            datetime.combine(a_partir_de.date(), time.min),
+            datetime.combine(a_partir_de.date() + timedelta(days=dias), time.min),
+            exceto_paciente_id
+        )
+        resultado = indice.primeiro_horario_livre(
+            a_partir_de,
+            dias=dias,
+            psicologo_ids=[psicologo_id] if psicologo_id else None,
+            duracao_minutos=duracao,
+            bloqueios=bloqueios
+        )
         
-        # Filtrar horários ocupados
-        horarios_finais = [h for h in horarios_disponiveis if h not in horarios_ocupados]
+        if not resultado:
+            return jsonify({'primeiro_horario': None})
         
-        return jsonify({'horarios': horarios_finais})
+        data_hora, psicologo_ids = resultado
+        return jsonify({
+            'primeiro_horario': {
+                'data': data_hora.strftime('%Y-%m-%d'),
+                'horario': data_hora.strftime('%H:%M'),
+                'psicologos': _dados_psicologos(psicologo_ids)
+            }
+        })
         
+    except ValueError:
+        return jsonify({'error': 'Formato de data ou horário inválido'}), 400
     except Exception as e:
-        print(f"Erro na API de horários: {e}")
+        print(f"Erro na API de busca de horários: {e}")
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+def _dados_psicologos(psicologo_ids):
+    """Nome e ID dos psicólogos informados, em uma única consulta"""
+    if not psicologo_ids:
+        return []
+    
+    nomes = dict(db.session.query(Psicologo.id, Usuario.nome_completo).join(
+        Usuario, Usuario.id == Psicologo.usuario_id
+    ).filter(Psicologo.id.in_(psicologo_ids)).all())
+    
+    return [{'id': psicologo_id, 'nome': nomes[psicologo_id]}
+            for psicologo_id in psicologo_ids if psicologo_id in nomes]
+
+def _duracao_solicitada(dados):
+    """Duração da sessão pedida pelo paciente; levanta ValueError se não for oferecida"""
+    duracao = int(dados.get('duracao') or disponibilidade.DURACAO_SESSAO_MINUTOS)
+    if duracao not in disponibilidade.DURACOES_SESSAO_MINUTOS:
+        raise ValueError(f'Duração de sessão inválida: {duracao}')
+    return duracao
+
 @bp.route('/agendar_modal', methods=['POST'])
 @login_required
 def agendar_modal():
@@ -330,6 +468,7 @@ def agendar_modal():
         data_str = request.form.get('data')
         horario_str = request.form.get('horario')
         observacoes = request.form.get('observacoes', '')
+        duracao = _duracao_solicitada(request.form)
         
         # Validações
         if not psicologo_id or not data_str or not horario_str:
@@ -357,27 +496,35 @@ def agendar_modal():
             flash('Para manter a continuidade do tratamento, você deve agendar com o mesmo psicólogo das consultas anteriores.', 'warning')
             return redirect(url_for('paciente.dashboard'))
         
-        # Verificar se horário ainda está disponível
-        conflito = Agendamento.query.filter_by(
-            psicologo_id=psicologo_id,
-            data_hora=data_hora,
-            status='agendado'
-        ).first()
+        # Trava a agenda do psicólogo até o commit (ver ``agendar``)
+        bloquear_agenda(psicologo_id)
         
-        if conflito:
+        # Verificar se horário ainda está disponível (sem sobrepor outra sessão)
+        if verificar_conflito(psicologo_id, data_hora, duracao):
+            db.session.rollback()
             flash('Este horário não está mais disponível.', 'error')
             return redirect(url_for('paciente.dashboard'))
         
+        # Verificar se outro paciente está com o horário reservado
+        if reservas.reservado_por_outro(psicologo_id, data_hora, paciente.id, duracao):
+            db.session.rollback()
+            flash('Este horário está reservado por outro paciente. Escolha outro horário.', 'error')
+            return redirect(url_for('paciente.dashboard'))
+        
         # Criar novo agendamento
         novo_agendamento = Agendamento(
             paciente_id=paciente.id,
             psicologo_id=psicologo_id,
             data_hora=data_hora,
+            duracao_minutos=duracao,
             observacoes=observacoes,
             status='agendado'
         )
         
         db.session.add(novo_agendamento)
+        reservas.consumir_reserva(paciente.id, psicologo_id, data_hora)
+        lista_espera.registrar_agendamento(paciente.id, psicologo_id, data_hora)
+        notificacoes.notificar_agendamento(current_user, psicologo.usuario.nome_completo, data_hora)
         
         # Se é o primeiro agendamento, criar prontuário
         if not agendamentos_paciente:
@@ -395,6 +542,8 @@ def agendar_modal():
                 db.session.add(novo_prontuario)
         
         db.session.commit()
+        disponibilidade.horario_ocupado(psicologo_id, data_hora, duracao)
+        eventos.agendamento_alterado(novo_agendamento, 'agendamento_criado')
         
         flash(f'Consulta agendada com sucesso para {data_hora.strftime("%d/%m/%Y às %H:%M")} com Dr(a). {psicologo.usuario.nome_completo}!', 'success')
         
@@ -437,6 +586,7 @@ def confirmar_agendamento(agendamento_id):
         # Atualizar status para confirmado
         agendamento.status = 'confirmado'
         db.session.commit()
+        eventos.agendamento_alterado(agendamento, 'agendamento_confirmado')
         
         return jsonify({'success': True, 'message': 'Consulta confirmada com sucesso'})
         
@@ -473,7 +623,17 @@ def cancelar_agendamento(agendamento_id):
         
         # Atualizar status para cancelado
         agendamento.status = 'cancelado'
+        notificacoes.notificar_cancelamento(
+            current_user, agendamento.psicologo.usuario.nome_completo, agendamento.data_hora
+        )
         db.session.commit()
+        disponibilidade.horario_liberado(agendamento.psicologo_id, agendamento.data_hora)
+        eventos.agendamento_alterado(agendamento, 'agendamento_cancelado')
+        
+        # Oferecer o horário liberado ao próximo da lista de espera
+        lista_espera.ofertar_horario(
+            agendamento.psicologo_id, agendamento.data_hora, agendamento.duracao_minutos
+        )
         
         flash('Consulta cancelada com sucesso.', 'success')
         
@@ -484,7 +644,95 @@ def cancelar_agendamento(agendamento_id):
     
     return redirect(url_for('paciente.agendamentos'))
 
-@bp.route('/reagendar_consulta/<int:agendamento_id>')
+@bp.route('/api/lista-espera', methods=['GET', 'POST'])
+@login_required
+def api_lista_espera():
+    """API para consultar ou entrar na lista de espera de um psicólogo"""
+    paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+    
+    if not paciente:
+        return jsonify({'error': 'Perfil de paciente não encontrado'}), 404
+    
+    if request.method == 'GET':
+        inscricoes = ListaEspera.query.filter(
+            ListaEspera.paciente_id == paciente.id,
+            ListaEspera.status.in_(['aguardando', 'ofertado'])
+        ).order_by(ListaEspera.data_criacao).all()
+        
+        return jsonify({'inscricoes': [_dados_inscricao(i) for i in inscricoes]})
+    
+    try:
+        dados = request.get_json(silent=True) or request.form
+        psicologo_id = dados.get('psicologo_id')
+        dia_semana = int(dados.get('dia_semana'))
+        hora_inicio = datetime.strptime(dados.get('hora_inicio'), '%H:%M').time()
+        hora_fim = datetime.strptime(dados.get('hora_fim'), '%H:%M').time()
+        
+        if not 0 <= dia_semana <= 6 or hora_fim <= hora_inicio:
+            return jsonify({'error': 'Dia da semana ou faixa de horário inválidos'}), 400
+        
+        if not Psicologo.query.get(psicologo_id):
+            return jsonify({'error': 'Psicólogo não encontrado'}), 404
+        
+        inscricao = ListaEspera(
+            paciente_id=paciente.id,
+            psicologo_id=psicologo_id,
+            dia_semana=dia_semana,
+            hora_inicio=hora_inicio,
+            hora_fim=hora_fim
+        )
+        db.session.add(inscricao)
+        db.session.commit()
+        
+        return jsonify({'success': True, 'inscricao': _dados_inscricao(inscricao)}), 201
+        
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Parâmetros obrigatórios: psicologo_id, dia_semana, hora_inicio e hora_fim (HH:MM)'}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erro ao entrar na lista de espera: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@bp.route('/api/lista-espera/<int:inscricao_id>/cancelar', methods=['POST'])
+@login_required
+def api_sair_lista_espera(inscricao_id):
+    """Remove o paciente da lista de espera"""
+    paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+    
+    if not paciente:
+        return jsonify({'error': 'Perfil de paciente não encontrado'}), 404
+    
+    inscricao = ListaEspera.query.filter_by(id=inscricao_id, paciente_id=paciente.id).first()
+    if not inscricao:
+        return jsonify({'error': 'Inscrição não encontrada'}), 404
+    
+    inscricao.status = 'cancelado'
+    db.session.commit()
+    
+    return jsonify({'success': True})
+
+def _dados_inscricao(inscricao):
+    """Representação JSON de uma inscrição na lista de espera"""
+    oferta = None
+    if inscricao.status == 'ofertado':
+        oferta = {
+            'data': inscricao.oferta_data_hora.strftime('%Y-%m-%d'),
+            'horario': inscricao.oferta_data_hora.strftime('%H:%M'),
+            'duracao': inscricao.oferta_duracao_minutos or disponibilidade.DURACAO_SESSAO_MINUTOS,
+            'expira_em': inscricao.oferta_expira_em.isoformat() + 'Z'
+        }
+    
+    return {
+        'id': inscricao.id,
+        'psicologo_id': inscricao.psicologo_id,
+        'dia_semana': inscricao.dia_semana,
+        'hora_inicio': inscricao.hora_inicio.strftime('%H:%M'),
+        'hora_fim': inscricao.hora_fim.strftime('%H:%M'),
+        'status': inscricao.status,
+        'oferta': oferta
+    }
+
+@bp.route('/reagendar_consulta/<int:agendamento_id>', methods=['GET', 'POST'])
 @login_required
 def reagendar_consulta(agendamento_id):
     """Reagendar consulta"""
@@ -505,7 +753,62 @@ def reagendar_consulta(agendamento_id):
         flash('Agendamento não encontrado.', 'error')
         return redirect(url_for('paciente.agendamentos'))
     
-    # Por enquanto, redirecionar para nova consulta
-    # TODO: Implementar funcionalidade específica de reagendamento
-    flash('Funcionalidade de reagendamento será implementada em breve. Por favor, cancele a consulta atual e agende uma nova.', 'info')
-    return redirect(url_for('paciente.agendamentos'))
\ No newline at end of file
+    if request.method == 'GET':
+        flash('Escolha a nova data e horário da consulta.', 'info')
+        return redirect(url_for('paciente.agendamentos'))
+    
+    try:
+        nova_data_hora = datetime.strptime(
+            f"{request.form.get('data', '')} {request.form.get('horario', '')}", '%Y-%m-%d %H:%M'
+        )
+        reagendar_agendamento(agendamento, nova_data_hora)
+        flash(f'Consulta reagendada para {nova_data_hora.strftime("%d/%m/%Y às %H:%M")}.', 'success')
+        
+    except ValueError:
+        flash('Formato de data ou horário inválido.', 'error')
+    except ErroAgendamento as e:
+        flash(str(e), 'error')
+    except Exception as e:
+        flash('Erro ao reagendar consulta. Tente novamente.', 'error')
+        print(f"Erro ao reagendar consulta: {e}")
+    
+    return redirect(url_for('paciente.agendamentos'))
+
+@bp.route('/api/agendamentos/<int:agendamento_id>/reagendar', methods=['POST'])
+@login_required
+def api_reagendar(agendamento_id):
+    """API para reagendar uma consulta do paciente"""
+    paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+    
+    if not paciente:
+        return jsonify({'error': 'Perfil de paciente não encontrado'}), 404
+    
+    agendamento = Agendamento.query.filter_by(
+        id=agendamento_id,
+        paciente_id=paciente.id
+    ).first()
+    
+    if not agendamento:
+        return jsonify({'error': 'Agendamento não encontrado'}), 404
+    
+    dados = request.get_json(silent=True) or {}
+    try:
+        nova_data_hora = datetime.strptime(f"{dados.get('data')} {dados.get('horario')}", '%Y-%m-%d %H:%M')
+        data_hora_anterior = reagendar_agendamento(agendamento, nova_data_hora)
+    except ValueError:
+        return jsonify({'error': 'Formato de data ou horário inválido'}), 400
+    except ErroAgendamento as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        print(f"Erro ao reagendar consulta: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+    
+    return jsonify({
+        'success': True,
+        'agendamento': {
+            'id': agendamento.id,
+            'data_hora': agendamento.data_hora.isoformat(),
+            'data_hora_anterior': data_hora_anterior.isoformat(),
+            'status': agendamento.status
+        }
+    })
\ No newline at end of file
@@ -1,6 +1,8 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify
+from flask import render_template, request, redirect, url_for, flash, jsonify, current_app, Response
 from app.psicologo import bp
 from app.models import Paciente, Psicologo, Agendamento, Prontuario, Sessao, HorarioAtendimento, db
+from app import disponibilidade, eventos, ics, invalidacao, recorrencia
+from app.agenda import reagendar_agendamento, atualizar_status_em_lote, ErroAgendamento
 from datetime import date, datetime, time, timedelta
 from flask_login import login_required, current_user
 from sqlalchemy import func, extract
@@ -118,6 +120,7 @@ def perfil():
                 current_user.set_senha(nova_senha)
             
             db.session.commit()
+            invalidacao.publicar('psicologos', psicologo.id)
             flash('Dados atualizados com sucesso!', 'success')
             return redirect(url_for('psicologo.perfil'))
             
@@ -208,7 +211,8 @@ def calendario():
                          mes_anterior=mes_anterior,
                          ano_anterior=ano_anterior,
                          mes_proximo=mes_proximo,
-                         ano_proximo=ano_proximo)
+                         ano_proximo=ano_proximo,
+                         link_ics=url_for('main.calendario_ics', token=ics.gerar_token(current_user, psicologo.id), _external=True))
 
 @bp.route('/horarios-atendimento', methods=['GET', 'POST'])
 @login_required
@@ -263,6 +267,7 @@ def horarios_atendimento():
                         db.session.add(horario_tarde)
             
             db.session.commit()
+            disponibilidade.expediente_alterado(psicologo.id)
             flash('Horários de atendimento atualizados com sucesso!', 'success')
             return redirect(url_for('psicologo.horarios_atendimento'))
             
@@ -539,44 +544,14 @@ def configurar_recorrencia(paciente_id):
             db.session.add(prontuario)
         
         # Atualizar recorrência no prontuário
+        prontuario.recorrencia_ativa = True
         prontuario.recorrencia_dia_semana = dia_semana
         prontuario.recorrencia_horario = horario
-        
-        # Gerar 12 agendamentos futuros
-        agendamentos_criados = 0
-        data_atual = datetime.now().date()
-        
-        # Encontrar a próxima data do dia da semana especificado
-        dias_ate_proximo = (dia_semana - data_atual.weekday()) % 7
-        if dias_ate_proximo == 0:
-            dias_ate_proximo = 7  # Se for hoje, começar na próxima semana
-        
-        proxima_data = data_atual + timedelta(days=dias_ate_proximo)
-        
-        for i in range(12):
-            data_agendamento = proxima_data + timedelta(weeks=i)
-            
-            # Verificar se já existe agendamento nesta data e horário
-            agendamento_existente = Agendamento.query.filter_by(
-                paciente_id=paciente_id,
-                psicologo_id=psicologo.id,
-                data_agendamento=data_agendamento,
-                horario=horario
-            ).first()
-            
-            if not agendamento_existente:
-                novo_agendamento = Agendamento(
-                    paciente_id=paciente_id,
-                    psicologo_id=psicologo.id,
-                    data_agendamento=data_agendamento,
-                    horario=horario,
-                    status='agendado'
-                )
-                db.session.add(novo_agendamento)
-                agendamentos_criados += 1
-        
         db.session.commit()
         
+        # Gerar os agendamentos até o horizonte; o comando estender-recorrencias mantém a série
+        agendamentos_criados, _ = recorrencia.estender_recorrencia(prontuario)
+        
         return jsonify({
             'success': True,
             'message': f'Recorrência configurada com sucesso. {agendamentos_criados} agendamentos criados.',
@@ -608,6 +583,7 @@ def marcar_ausente(agendamento_id):
         # Atualizar status
         agendamento.status = 'ausencia'
         db.session.commit()
+        eventos.agendamento_alterado(agendamento, 'agendamento_status')
         
         flash('Consulta marcada como ausência com sucesso!', 'success')
         return jsonify({'success': True, 'message': 'Consulta marcada como ausência'})
@@ -637,10 +613,121 @@ def marcar_realizada(agendamento_id):
         # Atualizar status
         agendamento.status = 'realizado'
         db.session.commit()
+        eventos.agendamento_alterado(agendamento, 'agendamento_status')
         
         flash('Consulta marcada como realizado com sucesso!', 'success')
         return jsonify({'success': True, 'message': 'Consulta marcada como realizado'})
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': f'Erro ao marcar como realizado: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Erro ao marcar como realizado: {str(e)}'}), 500
+
+
+@bp.route('/eventos')
+@login_required
+@psicologo_required
+def eventos_agenda():
+    """Fluxo SSE com as alterações da agenda do psicólogo (novos agendamentos, cancelamentos...)"""
+    psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
+    canal = eventos.canal_psicologo(psicologo.id)
+    broker = eventos.obter_broker()
+    heartbeat = current_app.config.get('EVENTOS_HEARTBEAT_SEGUNDOS', 15)
+    
+    # Reconexão: o navegador envia o ID do último evento recebido
+    try:
+        ultimo_id = int(request.headers.get('Last-Event-ID') or request.args.get('ultimo_id') or 0)
+    except ValueError:
+        ultimo_id = 0
+    
+    assinatura = broker.assinar(canal)
+    # O fluxo dura enquanto o painel estiver aberto: devolve a conexão ao pool
+    # em vez de mantê-la presa à thread até o navegador desconectar
+    db.session.close()
+    
+    def gerar():
+        maior_id = ultimo_id
+        try:
+            yield 'retry: 5000\n\n'
+            pendentes = broker.perdidos(canal, ultimo_id) if ultimo_id else []
+            while True:
+                for evento in pendentes:
+                    if evento['id'] > maior_id:
+                        maior_id = evento['id']
+                        yield eventos.formatar_sse(evento)
+                evento = assinatura.proximo(heartbeat)
+                if evento is None:
+                    yield ': heartbeat\n\n'
+                    pendentes = []
+                else:
+                    pendentes = [evento]
+        finally:
+            broker.cancelar(assinatura)
+    
+    return Response(gerar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@bp.route('/api/agendamentos/status', methods=['POST'])
+@login_required
+@psicologo_required
+def api_atualizar_status():
+    """API para registrar de uma vez o status das consultas do dia"""
+    psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
+    
+    dados = request.get_json(silent=True) or {}
+    itens = dados.get('agendamentos')
+    if not isinstance(itens, list) or not itens:
+        return jsonify({'error': 'Envie a lista "agendamentos" com pares agendamento_id e status'}), 400
+    
+    try:
+        resultados = atualizar_status_em_lote(psicologo.id, itens)
+    except ErroAgendamento as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Erro ao atualizar consultas: {str(e)}'}), 500
+    
+    atualizados = sum(1 for resultado in resultados if resultado['sucesso'])
+    return jsonify({
+        'success': atualizados == len(resultados),
+        'atualizados': atualizados,
+        'resultados': resultados
+    })
+
+
+@bp.route('/api/agendamentos/<int:agendamento_id>/reagendar', methods=['POST'])
+@login_required
+@psicologo_required
+def api_reagendar(agendamento_id):
+    """API para reagendar consulta (arrastar e soltar no calendário)"""
+    psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
+    
+    agendamento = Agendamento.query.filter_by(
+        id=agendamento_id,
+        psicologo_id=psicologo.id
+    ).first()
+    
+    if not agendamento:
+        return jsonify({'error': 'Agendamento não encontrado'}), 404
+    
+    dados = request.get_json(silent=True) or {}
+    try:
+        nova_data_hora = datetime.strptime(f"{dados.get('data')} {dados.get('horario')}", '%Y-%m-%d %H:%M')
+        data_hora_anterior = reagendar_agendamento(agendamento, nova_data_hora, respeitar_expediente=False)
+    except ValueError:
+        return jsonify({'error': 'Formato de data ou horário inválido'}), 400
+    except ErroAgendamento as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': f'Erro ao reagendar consulta: {str(e)}'}), 500
+    
+    return jsonify({
+        'success': True,
+        'agendamento': {
+            'id': agendamento.id,
+            'data_hora': agendamento.data_hora.isoformat(),
+            'data_hora_anterior': data_hora_anterior.isoformat(),
+            'status': agendamento.status
+        }
+    })
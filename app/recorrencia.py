@@ -0,0 +1,168 @@
+"""Extensão contínua das recorrências dos prontuários.
+
+Cada prontuário com ``recorrencia_ativa`` tem uma consulta semanal no
+``recorrencia_dia_semana`` às ``recorrencia_horario``. Em vez de gerar a série
+uma única vez, a rotina ``estender_recorrencias`` (comando
+``flask estender-recorrencias``, executado diariamente pelo cron) completa
+cada série até ``RECORRENCIA_HORIZONTE_SEMANAS`` semanas à frente.
+
+Os prontuários são processados em lotes: para cada lote, uma única consulta
+traz os agendamentos já existentes dos psicólogos envolvidos no período, a
+comparação é feita em memória e os novos agendamentos são gravados com um
+único ``INSERT`` em lote.
+
+Cada consulta gerada guarda a data da série em ``data_hora_serie``, que não
+muda ao reagendar: uma sessão da série movida para outro dia ou horário não
+é recriada na data original.
+"""
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert
+
+from app import disponibilidade
+from app.models import Agendamento, Prontuario, db
+
+
+def datas_da_serie(dia_semana, horario, inicio, fim):
+    """Datas e horas da série semanal entre ``inicio`` e ``fim`` (inclusive)"""
+    primeira = inicio + timedelta(days=(dia_semana - inicio.weekday()) % 7)
+    datas = []
+    while primeira <= fim:
+        datas.append(datetime.combine(primeira, horario))
+        primeira += timedelta(weeks=1)
+    return datas
+
+
+def _estender_lote(recorrencias, inicio, fim):
+    """Cria os agendamentos que faltam para as recorrências do lote.
+
+    ``recorrencias`` são tuplas ``(paciente_id, psicologo_id, dia_semana,
+    horario)``. Uma data é ignorada se o paciente já tiver agendamento nela
+    ou gerado por ela e depois reagendado (inclusive cancelado, para não
+    recriar consultas desmarcadas) ou se o psicólogo tiver outra consulta
+    ativa no mesmo período.
+
+    Retorna ``(criados, conflitos)``; a transação fica a cargo de quem chama.
+    """
+    psicologo_ids = {psicologo_id for _, psicologo_id, _, _ in recorrencias}
+    periodo_inicio = datetime.combine(inicio, datetime.min.time())
+    periodo_fim = datetime.combine(fim + timedelta(days=1), datetime.min.time())
+
+    existentes = db.session.query(
+        Agendamento.paciente_id,
+        Agendamento.psicologo_id,
+        Agendamento.data_hora,
+        Agendamento.data_hora_fim,
+        Agendamento.data_hora_serie,
+        Agendamento.status
+    ).filter(
+        Agendamento.psicologo_id.in_(psicologo_ids),
+        db.or_(
+            Agendamento.filtro_sobreposicao(periodo_inicio, periodo_fim),
+            # Sessões da série do período reagendadas para fora dele
+            db.and_(Agendamento.data_hora_serie >= periodo_inicio, Agendamento.data_hora_serie < periodo_fim)
+        )
+    ).all()
+
+    do_paciente = set()
+    ocupados = {}
+    for paciente_id, psicologo_id, data_hora, data_hora_fim, data_hora_serie, status in existentes:
+        do_paciente.add((paciente_id, psicologo_id, data_hora))
+        if data_hora_serie is not None:
+            do_paciente.add((paciente_id, psicologo_id, data_hora_serie))
+        if status in disponibilidade.STATUS_OCUPADOS and data_hora < periodo_fim and data_hora_fim > periodo_inicio:
+            ocupados.setdefault(psicologo_id, []).append((data_hora, data_hora_fim))
+
+    duracao = timedelta(minutes=disponibilidade.DURACAO_SESSAO_MINUTOS)
+    novos = []
+    conflitos = 0
+    for paciente_id, psicologo_id, dia_semana, horario in recorrencias:
+        for data_hora in datas_da_serie(dia_semana, horario, inicio, fim):
+            if (paciente_id, psicologo_id, data_hora) in do_paciente:
+                continue
+            data_hora_fim = data_hora + duracao
+            agenda = ocupados.setdefault(psicologo_id, [])
+            if any(ocupado_inicio < data_hora_fim and ocupado_fim > data_hora
+                   for ocupado_inicio, ocupado_fim in agenda):
+                conflitos += 1
+                continue
+            agenda.append((data_hora, data_hora_fim))
+            novos.append({
+                'paciente_id': paciente_id,
+                'psicologo_id': psicologo_id,
+                'data_hora': data_hora,
+                'duracao_minutos': disponibilidade.DURACAO_SESSAO_MINUTOS,
+                'data_hora_fim': data_hora_fim,
+                'data_hora_serie': data_hora,
+                'status': 'agendado',
+                'observacoes': 'Consulta recorrente'
+            })
+
+    if novos:
+        db.session.execute(insert(Agendamento), novos)
+    return len(novos), conflitos
+
+
+def _periodo(horizonte_semanas, hoje):
+    """Período coberto pelo horizonte: de amanhã até ``horizonte_semanas`` à frente"""
+    if horizonte_semanas is None:
+        horizonte_semanas = current_app.config.get('RECORRENCIA_HORIZONTE_SEMANAS', 12)
+    hoje = hoje or date.today()
+    return hoje + timedelta(days=1), hoje + timedelta(weeks=horizonte_semanas)
+
+
+def estender_recorrencia(prontuario, horizonte_semanas=None, hoje=None):
+    """Completa a série de um único prontuário; retorna ``(criados, conflitos)``"""
+    inicio, fim = _periodo(horizonte_semanas, hoje)
+    resultado = _estender_lote([(
+        prontuario.paciente_id,
+        prontuario.psicologo_id,
+        prontuario.recorrencia_dia_semana,
+        prontuario.recorrencia_horario
+    )], inicio, fim)
+    db.session.commit()
+    if resultado[0]:
+        disponibilidade.agendamentos_em_lote()
+    return resultado
+
+
+def estender_recorrencias(horizonte_semanas=None, tamanho_lote=500, hoje=None):
+    """Completa todas as recorrências ativas até o horizonte.
+
+    Percorre os prontuários em ordem de ID (paginação por chave, um commit por
+    lote) e retorna um dicionário com ``prontuarios``, ``criados`` e
+    ``conflitos``.
+    """
+    inicio, fim = _periodo(horizonte_semanas, hoje)
+    totais = {'prontuarios': 0, 'criados': 0, 'conflitos': 0}
+    ultimo_id = 0
+
+    while True:
+        lote = db.session.query(
+            Prontuario.id,
+            Prontuario.paciente_id,
+            Prontuario.psicologo_id,
+            Prontuario.recorrencia_dia_semana,
+            Prontuario.recorrencia_horario
+        ).filter(
+            Prontuario.recorrencia_ativa.is_(True),
+            Prontuario.recorrencia_dia_semana.isnot(None),
+            Prontuario.recorrencia_horario.isnot(None),
+            Prontuario.id > ultimo_id
+        ).order_by(Prontuario.id).limit(tamanho_lote).all()
+
+        if not lote:
+            break
+
+        ultimo_id = lote[-1].id
+        criados, conflitos = _estender_lote([tuple(linha)[1:] for linha in lote], inicio, fim)
+        db.session.commit()
+
+        totais['prontuarios'] += len(lote)
+        totais['criados'] += criados
+        totais['conflitos'] += conflitos
+
+    if totais['criados']:
+        disponibilidade.agendamentos_em_lote()
+    return totais
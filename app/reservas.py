@@ -0,0 +1,192 @@
+"""Reservas temporárias de horários.
+
+Quando o paciente escolhe um horário no modal de agendamento, o horário fica
+reservado para ele por alguns minutos. Outros pacientes deixam de vê-lo como
+disponível e não conseguem agendá-lo enquanto a reserva valer, de modo que a
+disputa pelo horário é resolvida na escolha e não no envio do formulário.
+
+Cada reserva guarda o início e o fim da sessão pretendida
+(``data_hora``/``data_hora_fim``), e o conflito é de intervalo: uma reserva
+das 14:00 às 16:00 impede outra às 15:00. A restrição única em
+``(psicologo_id, data_hora)`` continua barrando dois inserts simultâneos do
+mesmo início; reservas vencidas são apagadas por uma única instrução
+``DELETE`` apoiada no índice de ``expira_em``.
+"""
+from datetime import datetime, time, timedelta
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app.disponibilidade import DURACAO_SESSAO_MINUTOS, STATUS_OCUPADOS, mascara_intervalo
+from app.models import Agendamento, ListaEspera, ReservaHorario, db
+
+
+def varrer_reservas_expiradas(agora=None):
+    """Apaga as reservas vencidas e retorna quantas foram removidas"""
+    agora = agora or datetime.utcnow()
+    removidas = ReservaHorario.query.filter(
+        ReservaHorario.expira_em <= agora
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return removidas
+
+
+def reservar_horario(paciente_id, psicologo_id, data_hora, minutos=None,
+                     duracao_minutos=DURACAO_SESSAO_MINUTOS, substituir=True):
+    """Reserva o horário para o paciente.
+
+    Retorna a reserva criada (ou renovada) ou ``None`` se o horário já estiver
+    agendado ou reservado por outro paciente. Cada paciente mantém no máximo
+    uma reserva de escolha: com ``substituir`` (padrão), a nova reserva libera
+    as anteriores, exceto as que garantem ofertas da lista de espera; as
+    anteriores só são apagadas depois que a nova foi gravada. A lista de
+    espera usa ``substituir=False`` para que a oferta não tire do paciente o
+    horário que ele segura no modal. ``minutos`` altera a validade padrão
+    (``RESERVA_HORARIO_MINUTOS``); ``duracao_minutos`` é a duração da sessão
+    pretendida, usada para detectar sobreposições.
+    """
+    agora = datetime.utcnow()
+    if minutos is None:
+        minutos = current_app.config.get('RESERVA_HORARIO_MINUTOS', 5)
+    expira_em = agora + timedelta(minutes=minutos)
+    data_hora_fim = data_hora + timedelta(minutes=duracao_minutos)
+
+    conflito = db.session.query(Agendamento.id).filter(
+        Agendamento.psicologo_id == psicologo_id,
+        Agendamento.filtro_sobreposicao(data_hora, data_hora_fim),
+        Agendamento.status.in_(STATUS_OCUPADOS)
+    ).first()
+    if conflito:
+        return None
+
+    # Reserva vencida do mesmo horário (liberaria a restrição única)
+    ReservaHorario.query.filter(
+        ReservaHorario.psicologo_id == psicologo_id,
+        ReservaHorario.data_hora == data_hora,
+        ReservaHorario.expira_em <= agora
+    ).delete(synchronize_session=False)
+
+    if _reservas_sobrepostas(psicologo_id, data_hora, data_hora_fim, paciente_id, agora).first():
+        db.session.commit()
+        return None
+
+    reserva = ReservaHorario.query.filter_by(
+        psicologo_id=psicologo_id,
+        data_hora=data_hora,
+        paciente_id=paciente_id
+    ).first()
+    if reserva:
+        reserva.data_hora_fim = data_hora_fim
+        # Renovar não encurta uma reserva mais longa (a de uma oferta, por exemplo)
+        reserva.expira_em = max(reserva.expira_em, expira_em)
+    else:
+        reserva = ReservaHorario(
+            paciente_id=paciente_id,
+            psicologo_id=psicologo_id,
+            data_hora=data_hora,
+            data_hora_fim=data_hora_fim,
+            expira_em=expira_em
+        )
+        db.session.add(reserva)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # Outro paciente reservou o mesmo horário ao mesmo tempo
+        db.session.rollback()
+        return None
+
+    if substituir:
+        ofertas = db.session.query(ListaEspera.id).filter(
+            ListaEspera.paciente_id == paciente_id,
+            ListaEspera.psicologo_id == ReservaHorario.psicologo_id,
+            ListaEspera.oferta_data_hora == ReservaHorario.data_hora,
+            ListaEspera.status == 'ofertado'
+        )
+        ReservaHorario.query.filter(
+            ReservaHorario.paciente_id == paciente_id,
+            ReservaHorario.id != reserva.id,
+            ~ofertas.exists()
+        ).delete(synchronize_session=False)
+    db.session.commit()
+    return reserva
+
+
+def cancelar_reserva(paciente_id, reserva_id):
+    """Libera a reserva do paciente; retorna ``False`` se ela não existir"""
+    removidas = ReservaHorario.query.filter_by(
+        id=reserva_id,
+        paciente_id=paciente_id
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return bool(removidas)
+
+
+def _reservas_sobrepostas(psicologo_id, inicio, fim, paciente_id, agora=None):
+    """Consulta das reservas válidas de outros pacientes que se sobrepõem a ``[inicio, fim)``"""
+    consulta = ReservaHorario.query.filter(
+        ReservaHorario.psicologo_id == psicologo_id,
+        ReservaHorario.data_hora < fim,
+        ReservaHorario.data_hora_fim > inicio,
+        ReservaHorario.expira_em > (agora or datetime.utcnow())
+    )
+    if paciente_id is not None:
+        consulta = consulta.filter(ReservaHorario.paciente_id != paciente_id)
+    return consulta
+
+
+def horarios_reservados(psicologo_id, data, horarios, duracao_minutos=DURACAO_SESSAO_MINUTOS,
+                        exceto_paciente_id=None):
+    """Quais dos ``horarios`` (``HH:MM``) da data se sobrepõem a reservas válidas de outros pacientes"""
+    duracao = timedelta(minutes=duracao_minutos)
+    intervalos = _reservas_sobrepostas(
+        psicologo_id, datetime.combine(data, time.min),
+        datetime.combine(data + timedelta(days=1), time.min), exceto_paciente_id
+    ).with_entities(ReservaHorario.data_hora, ReservaHorario.data_hora_fim).all()
+    if not intervalos:
+        return set()
+    reservados = set()
+    for horario in horarios:
+        inicio = datetime.combine(data, datetime.strptime(horario, '%H:%M').time())
+        if any(r_inicio < inicio + duracao and r_fim > inicio for r_inicio, r_fim in intervalos):
+            reservados.add(horario)
+    return reservados
+
+
+def mascaras_reservadas(inicio, fim, exceto_paciente_id=None):
+    """Intervalos reservados por outros pacientes entre ``inicio`` e ``fim``.
+
+    Retorna ``{(psicologo_id, data): máscara}`` no formato de bloqueios do
+    índice de disponibilidade.
+    """
+    consulta = db.session.query(
+        ReservaHorario.psicologo_id, ReservaHorario.data_hora, ReservaHorario.data_hora_fim
+    ).filter(
+        ReservaHorario.data_hora < fim,
+        ReservaHorario.data_hora_fim > inicio,
+        ReservaHorario.expira_em > datetime.utcnow()
+    )
+    if exceto_paciente_id is not None:
+        consulta = consulta.filter(ReservaHorario.paciente_id != exceto_paciente_id)
+    mascaras = {}
+    for psicologo_id, reserva_inicio, reserva_fim in consulta:
+        chave = (psicologo_id, reserva_inicio.date())
+        # Uma reserva que passa da meia-noite ocupa o restante do dia
+        fim_no_dia = reserva_fim.time() if reserva_fim.date() == reserva_inicio.date() else time(23, 59, 59)
+        mascaras[chave] = mascaras.get(chave, 0) | mascara_intervalo(reserva_inicio.time(), fim_no_dia)
+    return mascaras
+
+
+def reservado_por_outro(psicologo_id, data_hora, paciente_id, duracao_minutos=DURACAO_SESSAO_MINUTOS):
+    """Indica se a sessão a partir de ``data_hora`` se sobrepõe a reserva válida de outro paciente"""
+    return _reservas_sobrepostas(
+        psicologo_id, data_hora, data_hora + timedelta(minutes=duracao_minutos), paciente_id
+    ).with_entities(ReservaHorario.id).first() is not None
+
+
+def consumir_reserva(paciente_id, psicologo_id, data_hora):
+    """Remove a reserva do paciente na mesma transação do agendamento"""
+    ReservaHorario.query.filter_by(
+        paciente_id=paciente_id,
+        psicologo_id=psicologo_id,
+        data_hora=data_hora
+    ).delete(synchronize_session=False)
@@ -0,0 +1,161 @@
+"""Hash de senhas com método e custo configuráveis.
+
+``SENHA_METODO`` escolhe o algoritmo dos hashes novos:
+
+- ``pbkdf2:sha256:<iterações>`` ou ``scrypt:<n>:<r>:<p>`` (Werkzeug);
+- ``argon2id:<tempo>:<memória KiB>:<paralelismo>`` (requer ``argon2-cffi``).
+
+Hashes antigos continuam válidos: o método fica gravado no próprio hash. No
+login (``autenticar``) o hash de quem usa um método ou custo diferente do
+configurado é refeito com a senha recém-verificada, de modo que trocar o
+parâmetro migra os usuários aos poucos, sem redefinir senhas.
+
+A verificação é propositalmente cara. Com ``SENHA_THREADS`` maior que zero
+ela roda em um pool de threads limitado (``hashlib`` libera o GIL durante o
+cálculo): no máximo ``SENHA_THREADS`` verificações simultâneas por processo e
+até ``SENHA_FILA`` aguardando; além disso o login é recusado com
+``SobrecargaSenhas`` em vez de ocupar todas as threads do worker.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from app import db
+
+METODO_PADRAO = f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+_PADROES_ARGON2 = (3, 65536, 4)
+
+
+class SobrecargaSenhas(Exception):
+    """Verificações de senha demais em andamento no processo"""
+
+
+def _metodo_configurado():
+    if has_app_context():
+        return normalizar(current_app.config.get('SENHA_METODO') or METODO_PADRAO)
+    return METODO_PADRAO
+
+
+def normalizar(metodo):
+    """Método com todos os parâmetros explícitos, como gravado no hash"""
+    nome, *parametros = metodo.split(':')
+    if nome == 'pbkdf2':
+        hash_nome = parametros[0] if parametros else 'sha256'
+        iteracoes = int(parametros[1]) if len(parametros) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_nome}:{iteracoes}'
+    if nome == 'scrypt':
+        n, r, p = map(int, parametros) if parametros else (2 ** 15, 8, 1)
+        return f'scrypt:{n}:{r}:{p}'
+    if nome == 'argon2id':
+        tempo, memoria, paralelismo = map(int, parametros) if parametros else _PADROES_ARGON2
+        return f'argon2id:{tempo}:{memoria}:{paralelismo}'
+    raise ValueError(f'SENHA_METODO desconhecido: {metodo}')
+
+
+def _argon2(metodo):
+    try:
+        from argon2 import PasswordHasher
+    except ImportError:
+        raise RuntimeError('SENHA_METODO argon2id requer o pacote argon2-cffi')
+    tempo, memoria, paralelismo = map(int, metodo.split(':')[1:])
+    return PasswordHasher(time_cost=tempo, memory_cost=memoria, parallelism=paralelismo)
+
+
+def gerar_hash(senha, metodo=None):
+    """Hash da senha com o método informado ou o configurado"""
+    metodo = normalizar(metodo) if metodo else _metodo_configurado()
+    if metodo.startswith('argon2id:'):
+        return _argon2(metodo).hash(senha)
+    return generate_password_hash(senha, method=metodo)
+
+
+def verificar(senha_hash, senha):
+    """Se a senha confere com o hash (qualquer método suportado)"""
+    if senha_hash.startswith('$argon2'):
+        # Os parâmetros vêm do próprio hash
+        verificador = _argon2(normalizar('argon2id'))
+        from argon2.exceptions import InvalidHashError, VerificationError
+        try:
+            return verificador.verify(senha_hash, senha)
+        except (VerificationError, InvalidHashError):
+            return False
+    return check_password_hash(senha_hash, senha)
+
+
+def precisa_rehash(senha_hash, metodo=None):
+    """Se o hash foi gerado com método ou custo diferente do configurado"""
+    metodo = normalizar(metodo) if metodo else _metodo_configurado()
+    if metodo.startswith('argon2id:'):
+        return not senha_hash.startswith('$argon2id$') or _argon2(metodo).check_needs_rehash(senha_hash)
+    return senha_hash.split('$', 1)[0] != metodo
+
+
+# -------------------------------------------------------------------- pool
+
+class PoolSenhas:
+    """Pool de threads limitado para as verificações de senha"""
+
+    def __init__(self, threads, fila):
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='senhas')
+        self._vagas = threading.BoundedSemaphore(threads + fila)
+        self.recusadas = 0
+
+    def executar(self, funcao, *args):
+        if not self._vagas.acquire(blocking=False):
+            self.recusadas += 1
+            raise SobrecargaSenhas('Muitas tentativas de login simultâneas; tente novamente')
+        try:
+            return self._executor.submit(funcao, *args).result()
+        finally:
+            self._vagas.release()
+
+
+def init_app(app):
+    """Cria o pool de verificação, se ``SENHA_THREADS`` for maior que zero"""
+    normalizar(app.config.get('SENHA_METODO') or METODO_PADRAO)
+    threads = app.config.get('SENHA_THREADS', 0)
+    app.extensions['senhas'] = PoolSenhas(threads, app.config.get('SENHA_FILA', 32)) if threads else None
+
+
+def autenticar(usuario, senha):
+    """Verifica a senha do usuário e atualiza o hash se o método configurado mudou.
+
+    Pode lançar ``SobrecargaSenhas`` quando o pool estiver cheio.
+    """
+    pool = current_app.extensions.get('senhas')
+    senha_hash = usuario.senha_hash
+    correta = pool.executar(verificar, senha_hash, senha) if pool else verificar(senha_hash, senha)
+    if correta and precisa_rehash(senha_hash):
+        # Mesmo segredo com novo custo: não conta como troca de senha (versao_senha)
+        usuario.senha_hash = pool.executar(gerar_hash, senha) if pool else gerar_hash(senha)
+        db.session.commit()
+    return correta
+
+
+def medir(metodo=None, amostras=20, threads=1):
+    """Mede a verificação de senhas com o método informado (ou o configurado).
+
+    Retorna o tempo médio de uma verificação e a vazão de logins por segundo
+    com ``threads`` verificações simultâneas, isto é, o que um worker com esse
+    número de threads consegue atender.
+    """
+    metodo = normalizar(metodo) if metodo else _metodo_configurado()
+    senha_hash = gerar_hash('senha-de-referencia', metodo)
+
+    inicio = time.perf_counter()
+    for _ in range(amostras):
+        verificar(senha_hash, 'senha-de-referencia')
+    media = (time.perf_counter() - inicio) / amostras
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        inicio = time.perf_counter()
+        list(executor.map(lambda _: verificar(senha_hash, 'senha-de-referencia'), range(amostras * threads)))
+        duracao = time.perf_counter() - inicio
+    return {
+        'metodo': metodo,
+        'ms_por_verificacao': media * 1000,
+        'logins_por_segundo': amostras * threads / duracao,
+    }
@@ -0,0 +1,175 @@
+"""Sincronização incremental de agendamentos ("alterações desde o cursor").
+
+O cliente (aplicativo, tela da recepção) guarda o ``cursor`` devolvido pela
+última sincronização e envia-o na próxima; recebe apenas os agendamentos
+criados ou alterados depois dele (pela coluna ``data_atualizacao``, com
+índice ``(data_atualizacao, id)``) e os IDs dos agendamentos excluídos
+(tombstones em ``agendamentos_removidos``). Sem cursor, a primeira chamada
+devolve todo o escopo do usuário, em páginas.
+
+O cursor guarda a posição ``(data_atualizacao, id)`` do último item entregue
+de cada lista e é assinado com a ``SECRET_KEY`` (não pode ser reaproveitado
+por outro usuário).
+
+Limitação: o cursor segue ``data_atualizacao``, que é o momento em que a
+linha foi gravada e não o do commit. Uma transação que grava às 10:00:00 e
+confirma às 10:00:05 torna a linha visível depois que linhas gravadas às
+10:00:03 por outra transação já podem ter sido entregues e adiantado o
+cursor. Duas proteções reduzem a janela:
+
+- só são entregues linhas com mais de ``SINCRONIZACAO_MARGEM_SEGUNDOS`` de
+  idade, o que cobre transações curtas;
+- ao fim de cada sincronização (``mais`` falso) o cursor recua
+  ``SINCRONIZACAO_SOBREPOSICAO_SEGUNDOS`` a partir do último item entregue,
+  de modo que a sincronização seguinte entrega de novo as alterações desse
+  intervalo, incluindo as que foram confirmadas atrasadas.
+
+Por isso **o cliente recebe o mesmo agendamento (ou a mesma remoção) mais de
+uma vez e deve deduplicar por ``id``**, ficando com a versão de maior
+``data_atualizacao``. Uma transação que leve mais que a margem somada à
+sobreposição ainda pode ser perdida; clientes que não toleram isso devem
+fazer periodicamente uma sincronização completa (sem cursor).
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import true, tuple_
+from sqlalchemy.orm import aliased
+
+from app.models import Agendamento, AgendamentoRemovido, Paciente, Psicologo, Usuario, db
+
+SAL_CURSOR = 'sincronizacao-agendamentos'
+_INICIO = (datetime.min.isoformat(), 0)
+
+
+class CursorInvalido(Exception):
+    """Cursor adulterado ou emitido para outro usuário"""
+
+
+def _serializador():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt=SAL_CURSOR)
+
+
+def ler_cursor(token, usuario_id):
+    """Posições ``(alterados, removidos)`` do cursor; o início se ``token`` for vazio"""
+    if not token:
+        return _INICIO, _INICIO
+    try:
+        dados = _serializador().loads(token)
+    except BadSignature:
+        raise CursorInvalido('Cursor inválido')
+    if dados.get('u') != usuario_id:
+        raise CursorInvalido('Cursor emitido para outro usuário')
+    return tuple(dados['a']), tuple(dados['r'])
+
+
+def gerar_cursor(usuario_id, alterados, removidos):
+    return _serializador().dumps({'u': usuario_id, 'a': list(alterados), 'r': list(removidos)})
+
+
+def escopo_do_usuario(usuario):
+    """Filtro dos agendamentos visíveis ao usuário; ``None`` para tipos sem agenda"""
+    if usuario.tipo_usuario == 'admin':
+        return lambda modelo: true()
+    # Autenticado por token: o perfil já vem nas claims
+    perfil_id = getattr(usuario, 'perfil_id', None)
+    if perfil_id is not None and usuario.tipo_usuario == 'psicologo':
+        return lambda modelo: modelo.psicologo_id == perfil_id
+    if perfil_id is not None and usuario.tipo_usuario == 'paciente':
+        return lambda modelo: modelo.paciente_id == perfil_id
+    if usuario.tipo_usuario == 'psicologo':
+        perfil = Psicologo.query.filter_by(usuario_id=usuario.id).first()
+        return perfil and (lambda modelo: modelo.psicologo_id == perfil.id)
+    if usuario.tipo_usuario == 'paciente':
+        perfil = Paciente.query.filter_by(usuario_id=usuario.id).first()
+        return perfil and (lambda modelo: modelo.paciente_id == perfil.id)
+    return None
+
+
+def _posicao(momento, item_id):
+    return (momento.isoformat(), item_id)
+
+
+def _recuar(posicao, segundos):
+    """Posição ``segundos`` antes de ``posicao``, antes de qualquer ID nesse instante"""
+    if not segundos or posicao == _INICIO:
+        return posicao
+    return _posicao(datetime.fromisoformat(posicao[0]) - timedelta(seconds=segundos), 0)
+
+
+def alteracoes(usuario, escopo, token=None, limite=None, agora=None):
+    """Agendamentos alterados e removidos após o cursor, no escopo do usuário.
+
+    ``escopo`` é o filtro devolvido por ``escopo_do_usuario``.
+
+    Retorna ``{'alterados': [...], 'removidos': [...], 'cursor': ..., 'mais': bool}``;
+    com ``mais`` verdadeiro o cliente deve chamar de novo com o novo cursor.
+    Itens já entregues podem voltar na sincronização seguinte (ver o início
+    do módulo): o cliente deduplica por ``id``.
+    """
+    config = current_app.config
+    limite = limite or config.get('SINCRONIZACAO_LIMITE', 500)
+    agora = agora or datetime.utcnow()
+    horizonte = agora - timedelta(seconds=config.get('SINCRONIZACAO_MARGEM_SEGUNDOS', 2))
+    pos_alterados, pos_removidos = ler_cursor(token, usuario.id)
+
+    usuario_paciente = aliased(Usuario)
+    usuario_psicologo = aliased(Usuario)
+    linhas = db.session.query(
+        Agendamento, usuario_paciente.nome_completo, usuario_psicologo.nome_completo
+    ).join(
+        Paciente, Paciente.id == Agendamento.paciente_id
+    ).join(
+        usuario_paciente, usuario_paciente.id == Paciente.usuario_id
+    ).join(
+        Psicologo, Psicologo.id == Agendamento.psicologo_id
+    ).join(
+        usuario_psicologo, usuario_psicologo.id == Psicologo.usuario_id
+    ).filter(
+        escopo(Agendamento),
+        tuple_(Agendamento.data_atualizacao, Agendamento.id) > (datetime.fromisoformat(pos_alterados[0]), pos_alterados[1]),
+        Agendamento.data_atualizacao <= horizonte
+    ).order_by(Agendamento.data_atualizacao, Agendamento.id).limit(limite + 1).all()
+
+    removidos = db.session.query(
+        AgendamentoRemovido.id, AgendamentoRemovido.agendamento_id, AgendamentoRemovido.data_remocao
+    ).filter(
+        escopo(AgendamentoRemovido),
+        tuple_(AgendamentoRemovido.data_remocao, AgendamentoRemovido.id) > (datetime.fromisoformat(pos_removidos[0]), pos_removidos[1]),
+        AgendamentoRemovido.data_remocao <= horizonte
+    ).order_by(AgendamentoRemovido.data_remocao, AgendamentoRemovido.id).limit(limite + 1).all()
+
+    mais = len(linhas) > limite or len(removidos) > limite
+    linhas, removidos = linhas[:limite], removidos[:limite]
+    # Entre páginas o cursor só avança; ao fim da sincronização recua a
+    # sobreposição (apenas a partir de itens entregues agora, para não recuar
+    # de novo a cada chamada sem alterações)
+    sobreposicao = 0 if mais else config.get('SINCRONIZACAO_SOBREPOSICAO_SEGUNDOS', 30)
+    if linhas:
+        pos_alterados = _recuar(_posicao(linhas[-1][0].data_atualizacao, linhas[-1][0].id), sobreposicao)
+    if removidos:
+        pos_removidos = _recuar(_posicao(removidos[-1].data_remocao, removidos[-1].id), sobreposicao)
+
+    return {
+        'alterados': [_serializar(agendamento, paciente, psicologo) for agendamento, paciente, psicologo in linhas],
+        'removidos': [removido.agendamento_id for removido in removidos],
+        'cursor': gerar_cursor(usuario.id, pos_alterados, pos_removidos),
+        'mais': mais,
+    }
+
+
+def _serializar(agendamento, nome_paciente, nome_psicologo):
+    return {
+        'id': agendamento.id,
+        'paciente_id': agendamento.paciente_id,
+        'paciente': nome_paciente,
+        'psicologo_id': agendamento.psicologo_id,
+        'psicologo': nome_psicologo,
+        'data_hora': agendamento.data_hora.isoformat(),
+        'data_hora_fim': agendamento.data_hora_fim.isoformat(),
+        'duracao_minutos': agendamento.duracao_minutos,
+        'status': agendamento.status,
+        'observacoes': agendamento.observacoes,
+        'data_atualizacao': agendamento.data_atualizacao.isoformat(),
+    }
@@ -0,0 +1,254 @@
+"""Fila persistente de tarefas em segundo plano.
+
+Uma tarefa é uma função registrada com ``@registrar('nome')`` e enfileirada
+com ``enfileirar('nome', **argumentos)``; os argumentos são gravados em JSON
+na tabela ``tarefas``. O comando ``flask worker`` executa as tarefas com um
+conjunto configurável de threads (e, opcionalmente, de processos).
+
+Para reivindicar uma tarefa o trabalhador seleciona a próxima candidata
+(maior ``prioridade``, depois ``executar_em``) com ``FOR UPDATE SKIP LOCKED``
+no PostgreSQL e a marca como ``executando`` com um ``UPDATE`` condicionado
+ao status ``pendente``. No SQLite a cláusula de trava é ignorada e a
+condição do ``UPDATE`` garante sozinha que só um trabalhador fique com a
+tarefa; quem perder a disputa tenta a próxima.
+
+Falhas são repetidas com espera exponencial até ``max_tentativas``; cada
+execução registra ``duracao_ms``, resumida por ``estatisticas()``.
+"""
+import json
+import multiprocessing
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func
+
+from app import emails, lembretes, lista_espera, recorrencia, reservas, tokens
+from app.agenda import encerrar_agendamentos_vencidos
+from app.models import Tarefa, db
+
+_REGISTRO = {}
+
+
+def registrar(nome):
+    """Decorador que registra a função como tarefa executável pelo worker"""
+    def decorador(funcao):
+        _REGISTRO[nome] = funcao
+        return funcao
+    return decorador
+
+
+def tarefas_registradas():
+    """Nomes das tarefas que o worker sabe executar"""
+    return sorted(_REGISTRO)
+
+
+def obter_tarefa(nome):
+    """Função registrada com o nome; levanta ``ValueError`` se não existir"""
+    if nome not in _REGISTRO:
+        raise ValueError(f'Tarefa não registrada: {nome}')
+    return _REGISTRO[nome]
+
+
+def enfileirar(nome, prioridade=0, executar_em=None, max_tentativas=3, **argumentos):
+    """Grava a tarefa na fila; ela é executada após o commit de quem chama"""
+    obter_tarefa(nome)
+    tarefa = Tarefa(
+        nome=nome,
+        argumentos=json.dumps(argumentos),
+        prioridade=prioridade,
+        executar_em=executar_em or datetime.utcnow(),
+        max_tentativas=max_tentativas
+    )
+    db.session.add(tarefa)
+    return tarefa
+
+
+def reivindicar(agora=None):
+    """Marca como ``executando`` e retorna a próxima tarefa devida, ou ``None``"""
+    agora = agora or datetime.utcnow()
+    for _ in range(5):
+        candidata = db.session.query(Tarefa.id).filter(
+            Tarefa.status == 'pendente',
+            Tarefa.executar_em <= agora
+        ).order_by(
+            Tarefa.prioridade.desc(), Tarefa.executar_em, Tarefa.id
+        ).limit(1).with_for_update(skip_locked=True).scalar()
+
+        if candidata is None:
+            db.session.commit()
+            return None
+
+        reivindicada = Tarefa.query.filter(
+            Tarefa.id == candidata,
+            Tarefa.status == 'pendente'
+        ).update({'status': 'executando', 'iniciada_em': agora}, synchronize_session=False)
+        db.session.commit()
+        if reivindicada:
+            return db.session.get(Tarefa, candidata)
+    return None
+
+
+def executar(tarefa):
+    """Executa a tarefa reivindicada e registra o resultado"""
+    inicio = time.perf_counter()
+    try:
+        _REGISTRO[tarefa.nome](**json.loads(tarefa.argumentos))
+        erro = None
+    except Exception:
+        db.session.rollback()
+        erro = traceback.format_exc(limit=5)
+
+    agora = datetime.utcnow()
+    tarefa.tentativas += 1
+    tarefa.duracao_ms = (time.perf_counter() - inicio) * 1000
+    tarefa.erro = erro
+    if erro is None:
+        tarefa.status = 'concluida'
+        tarefa.concluida_em = agora
+    elif tarefa.tentativas >= tarefa.max_tentativas:
+        tarefa.status = 'falhou'
+        tarefa.concluida_em = agora
+    else:
+        espera = current_app.config.get('TAREFAS_ESPERA_SEGUNDOS', 30)
+        tarefa.status = 'pendente'
+        tarefa.executar_em = agora + timedelta(seconds=espera * 2 ** (tarefa.tentativas - 1))
+    db.session.commit()
+    return erro is None
+
+
+def processar_proxima():
+    """Reivindica e executa uma tarefa; retorna-a ou ``None`` se a fila estiver vazia"""
+    tarefa = reivindicar()
+    if tarefa is not None:
+        executar(tarefa)
+    return tarefa
+
+
+def recuperar_abandonadas(agora=None):
+    """Devolve à fila as tarefas 'executando' além do tempo limite (worker interrompido)"""
+    agora = agora or datetime.utcnow()
+    limite = agora - timedelta(minutes=current_app.config.get('TAREFAS_TEMPO_LIMITE_MINUTOS', 30))
+    recuperadas = Tarefa.query.filter(
+        Tarefa.status == 'executando',
+        Tarefa.iniciada_em < limite
+    ).update({'status': 'pendente', 'executar_em': agora}, synchronize_session=False)
+    db.session.commit()
+    return recuperadas
+
+
+def estatisticas():
+    """Quantidade por status e tempos de execução por nome de tarefa"""
+    resumo = {}
+    linhas = db.session.query(
+        Tarefa.nome,
+        Tarefa.status,
+        func.count(Tarefa.id),
+        func.avg(Tarefa.duracao_ms),
+        func.max(Tarefa.duracao_ms)
+    ).group_by(Tarefa.nome, Tarefa.status).all()
+    for nome, status, quantidade, media_ms, max_ms in linhas:
+        item = resumo.setdefault(nome, {'por_status': {}, 'duracao_media_ms': None, 'duracao_max_ms': None})
+        item['por_status'][status] = quantidade
+        if status == 'concluida' and media_ms is not None:
+            item['duracao_media_ms'] = round(media_ms, 1)
+            item['duracao_max_ms'] = round(max_ms, 1)
+    return resumo
+
+
+def _laco(app, parar, intervalo, ate_esvaziar):
+    """Laço de um trabalhador: processa tarefas até ``parar`` ou a fila esvaziar"""
+    while not parar.is_set():
+        with app.app_context():
+            try:
+                tarefa = processar_proxima()
+            except Exception as e:
+                db.session.rollback()
+                print(f'Erro no worker de tarefas: {e}')
+                tarefa = None
+        if tarefa is None:
+            if ate_esvaziar:
+                return
+            parar.wait(intervalo)
+
+
+def executar_trabalhador(app, threads=1, intervalo=1.0, ate_esvaziar=False, parar=None):
+    """Executa ``threads`` trabalhadores neste processo até ``parar`` ser sinalizado"""
+    parar = parar or threading.Event()
+    with app.app_context():
+        recuperar_abandonadas()
+    trabalhadores = [
+        threading.Thread(target=_laco, args=(app, parar, intervalo, ate_esvaziar), daemon=True)
+        for _ in range(threads)
+    ]
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    try:
+        for trabalhador in trabalhadores:
+            while trabalhador.is_alive():
+                trabalhador.join(0.5)
+    except KeyboardInterrupt:
+        parar.set()
+        for trabalhador in trabalhadores:
+            trabalhador.join()
+
+
+def _processo_filho(app, threads, intervalo, ate_esvaziar):
+    with app.app_context():
+        # Conexões herdadas do processo pai não podem ser compartilhadas
+        db.engine.dispose(close=False)
+    executar_trabalhador(app, threads, intervalo, ate_esvaziar)
+
+
+def executar_processos(app, processos, threads=1, intervalo=1.0, ate_esvaziar=False):
+    """Executa ``processos`` processos filhos (fork), cada um com ``threads`` trabalhadores"""
+    contexto = multiprocessing.get_context('fork')
+    filhos = [
+        contexto.Process(target=_processo_filho, args=(app, threads, intervalo, ate_esvaziar))
+        for _ in range(processos)
+    ]
+    for filho in filhos:
+        filho.start()
+    try:
+        for filho in filhos:
+            filho.join()
+    except KeyboardInterrupt:
+        for filho in filhos:
+            filho.terminate()
+            filho.join()
+
+
+# ---------------------------------------------------------------- tarefas da aplicação
+
+@registrar('estender_recorrencias')
+def _estender_recorrencias(horizonte_semanas=None):
+    return recorrencia.estender_recorrencias(horizonte_semanas=horizonte_semanas)
+
+
+@registrar('enviar_lembretes')
+def _enviar_lembretes():
+    return lembretes.enviar_lembretes()
+
+
+@registrar('processar_emails')
+def _processar_emails(tamanho_lote=100):
+    while sum(emails.processar_fila(tamanho_lote=tamanho_lote)):
+        pass
+
+
+@registrar('encerrar_agendamentos')
+def _encerrar_agendamentos():
+    return encerrar_agendamentos_vencidos()
+
+
+@registrar('limpar_reservas')
+def _limpar_reservas():
+    lista_espera.expirar_ofertas()
+    return reservas.varrer_reservas_expiradas()
+
+
+@registrar('limpar_tokens_revogados')
+def _limpar_tokens_revogados():
+    return tokens.limpar_revogados()
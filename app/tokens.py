@@ -0,0 +1,192 @@
+"""Autenticação sem estado da API por tokens JWT.
+
+``POST /auth/api/token`` troca e-mail e senha por um par de tokens:
+
+- *access* (``JWT_ACCESS_TOKEN_EXPIRES``, curto): enviado em
+  ``Authorization: Bearer <token>``; carrega usuário, tipo e perfil
+  (psicólogo ou paciente) assinados, de modo que a requisição é autenticada
+  sem consultar o banco (ver ``UsuarioToken``);
+- *refresh* (``JWT_REFRESH_TOKEN_EXPIRES``): usado apenas em
+  ``/auth/api/token/renovar``, que relê o usuário, confere se continua ativo
+  e com a mesma senha e emite um novo par, revogando o refresh usado.
+
+Tokens revogados (logout, rotação do refresh) são gravados em
+``tokens_revogados`` até expirarem. Cada processo mantém o conjunto de
+identificadores (``jti``) revogados em um ``CacheLocal`` do barramento de
+invalidação: a verificação por requisição é uma consulta ao conjunto em
+memória, que é recarregado quando algum processo publica ``tokens_revogados``
+ou, no máximo, a cada ``JWT_REVOGACAO_RECARGA_SEGUNDOS``.
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import jwt
+from flask import current_app, request
+from flask_login import UserMixin
+
+from app import invalidacao, login_manager
+from app.models import Paciente, Psicologo, TokenRevogado, Usuario, db
+
+ALGORITMO = 'HS256'
+PREFIXO_REVOGADOS = 'tokens_revogados'
+
+
+class TokenInvalido(Exception):
+    """Token malformado, expirado, revogado ou de tipo inesperado"""
+
+
+class UsuarioToken(UserMixin):
+    """Usuário autenticado por token de acesso.
+
+    ``id``, ``tipo_usuario`` e ``perfil_id`` vêm das claims assinadas; os
+    demais atributos (nome, e-mail, relacionamentos...) carregam o
+    ``Usuario`` do banco na primeira vez em que são usados.
+    """
+
+    def __init__(self, claims):
+        self.id = int(claims['sub'])
+        self.tipo_usuario = claims['tipo']
+        self.perfil_id = claims.get('perfil')
+        self.jti = claims['jti']
+        self.expira_em = datetime.utcfromtimestamp(claims['exp'])
+
+    def __getattr__(self, nome):
+        if nome.startswith('_'):
+            raise AttributeError(nome)
+        if '_usuario' not in self.__dict__:
+            self.__dict__['_usuario'] = db.session.get(Usuario, self.id)
+        return getattr(self.__dict__['_usuario'], nome)
+
+
+def _segredo():
+    config = current_app.config
+    return config.get('JWT_SECRET_KEY') or config['SECRET_KEY']
+
+
+def perfil_do_usuario(usuario):
+    """ID do psicólogo ou paciente do usuário (``None`` para administradores)"""
+    modelo = {'psicologo': Psicologo, 'paciente': Paciente}.get(usuario.tipo_usuario)
+    if modelo is None:
+        return None
+    return db.session.query(modelo.id).filter(modelo.usuario_id == usuario.id).scalar()
+
+
+def _codificar(usuario, perfil_id, tipo, validade, agora):
+    claims = {
+        'sub': str(usuario.id),
+        'tipo': usuario.tipo_usuario,
+        'perfil': perfil_id,
+        'typ': tipo,
+        'jti': uuid.uuid4().hex,
+        'iat': agora,
+        'exp': agora + timedelta(seconds=validade),
+    }
+    if tipo == 'refresh':
+        claims['h'] = usuario.versao_senha
+    return jwt.encode(claims, _segredo(), algorithm=ALGORITMO)
+
+
+def emitir_tokens(usuario, perfil_id=None, agora=None):
+    """Par de tokens do usuário, no formato devolvido pela API"""
+    config = current_app.config
+    agora = agora or datetime.utcnow()
+    validade_acesso = config.get('JWT_ACCESS_TOKEN_EXPIRES', 900)
+    if perfil_id is None:
+        perfil_id = perfil_do_usuario(usuario)
+    return {
+        'access_token': _codificar(usuario, perfil_id, 'access', validade_acesso, agora),
+        'refresh_token': _codificar(
+            usuario, perfil_id, 'refresh', config.get('JWT_REFRESH_TOKEN_EXPIRES', 30 * 86400), agora
+        ),
+        'token_type': 'Bearer',
+        'expires_in': validade_acesso,
+    }
+
+
+def decodificar(token, tipo):
+    """Claims do token válido e não revogado do ``tipo`` informado"""
+    try:
+        claims = jwt.decode(
+            token, _segredo(), algorithms=[ALGORITMO], options={'require': ['sub', 'exp', 'jti']}
+        )
+    except jwt.InvalidTokenError as e:
+        raise TokenInvalido(str(e))
+    if claims.get('typ') != tipo:
+        raise TokenInvalido('Tipo de token inválido')
+    if claims['jti'] in revogados():
+        raise TokenInvalido('Token revogado')
+    return claims
+
+
+def renovar(token_refresh):
+    """Emite um novo par a partir do refresh e revoga o refresh usado"""
+    claims = decodificar(token_refresh, 'refresh')
+    usuario = db.session.get(Usuario, int(claims['sub']))
+    if usuario is None or not usuario.ativo or usuario.versao_senha != claims.get('h'):
+        raise TokenInvalido('Usuário inativo ou senha alterada')
+    revogar(claims['jti'], datetime.utcfromtimestamp(claims['exp']))
+    return emitir_tokens(usuario, claims.get('perfil'))
+
+
+# --------------------------------------------------------------- revogação
+
+def revogados():
+    """Conjunto dos ``jti`` revogados e ainda não expirados (em cache no processo)"""
+    def carregar():
+        return frozenset(
+            jti for (jti,) in db.session.query(TokenRevogado.jti).filter(TokenRevogado.expira_em > datetime.utcnow())
+        )
+    return invalidacao.obter_cache(PREFIXO_REVOGADOS).obter(PREFIXO_REVOGADOS, carregar)
+
+
+def revogar(jti, expira_em):
+    """Grava a revogação e avisa os demais processos"""
+    if db.session.get(TokenRevogado, jti) is None:
+        db.session.add(TokenRevogado(jti=jti, expira_em=expira_em))
+        db.session.commit()
+    invalidacao.publicar(PREFIXO_REVOGADOS)
+
+
+def revogar_token(token):
+    """Revoga um token (access ou refresh) ainda válido; ignora tokens inválidos"""
+    try:
+        claims = jwt.decode(token, _segredo(), algorithms=[ALGORITMO])
+    except jwt.InvalidTokenError:
+        return False
+    revogar(claims['jti'], datetime.utcfromtimestamp(claims['exp']))
+    return True
+
+
+def limpar_revogados(agora=None):
+    """Exclui as revogações de tokens já expirados"""
+    excluidos = TokenRevogado.query.filter(
+        TokenRevogado.expira_em <= (agora or datetime.utcnow())
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return excluidos
+
+
+# ---------------------------------------------------------------- requisição
+
+def token_da_requisicao():
+    """Token enviado em ``Authorization: Bearer``, se houver"""
+    cabecalho = request.headers.get('Authorization', '')
+    if cabecalho[:7].lower() == 'bearer ':
+        return cabecalho[7:].strip() or None
+    return None
+
+
+def _carregar_da_requisicao(req):
+    token = token_da_requisicao()
+    if token is None:
+        return None
+    try:
+        return UsuarioToken(decodificar(token, 'access'))
+    except TokenInvalido:
+        return None
+
+
+def init_app(app):
+    """Registra o cache de revogações e a autenticação por ``Authorization: Bearer``"""
+    invalidacao.registrar_cache(app, PREFIXO_REVOGADOS, ttl=app.config.get('JWT_REVOGACAO_RECARGA_SEGUNDOS', 60))
+    login_manager.request_loader(_carregar_da_requisicao)
@@ -9,13 +9,97 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///clinica_mentalize.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-chave-desenvolvimento'
-    JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hora
+    # Hash de senhas: PBKDF2 com as iterações padrão do Werkzeug; 'scrypt:<n>:<r>:<p>' e
+    # 'argon2id:<tempo>:<memória KiB>:<paralelismo>' são opcionais (o login migra os hashes aos poucos)
+    SENHA_METODO = os.environ.get('SENHA_METODO') or 'pbkdf2:sha256'
+    # Verificações de senha simultâneas por processo (0 = na própria thread da requisição) e fila máxima
+    SENHA_THREADS = int(os.environ.get('SENHA_THREADS', 0))
+    SENHA_FILA = int(os.environ.get('SENHA_FILA', 32))
+    # Limite de falhas de login (quantidade, janela em segundos) e backend: 'memoria' ou 'banco' (padrão: conforme o banco)
+    LOGIN_LIMITE_IP = (20, 300)
+    LOGIN_LIMITE_EMAIL = (5, 900)
+    LOGIN_LIMITE_BACKEND = os.environ.get('LOGIN_LIMITE_BACKEND')
+    # Proxies reversos à frente da aplicação cujos X-Forwarded-For/Proto são confiáveis (0 = nenhum;
+    # com 0 o cabeçalho é ignorado e o IP é o da conexão)
+    PROXY_SALTOS_CONFIAVEIS = int(os.environ.get('PROXY_SALTOS_CONFIAVEIS', 0))
+    # Processos usados no hash das senhas da importação de psicólogos (0 = nº de CPUs)
+    IMPORTACAO_PROCESSOS = int(os.environ.get('IMPORTACAO_PROCESSOS', 0))
+    # Linhas aceitas no upload pelo painel, que calcula os hashes em série na requisição
+    IMPORTACAO_LIMITE_WEB = int(os.environ.get('IMPORTACAO_LIMITE_WEB', 100))
+    JWT_ACCESS_TOKEN_EXPIRES = 900  # 15 minutos
+    JWT_REFRESH_TOKEN_EXPIRES = 30 * 86400  # 30 dias
+    # Intervalo máximo (segundos) para cada processo recarregar a lista de tokens revogados
+    JWT_REVOGACAO_RECARGA_SEGUNDOS = 60
+    
+    # Índice de disponibilidade: segundos até reler do banco uma data já carregada
+    DISPONIBILIDADE_INDICE_TTL = 60
+    # Micro-cache (segundos) das consultas de horários disponíveis já coalescidas
+    DISPONIBILIDADE_CACHE_TTL = 2
+    # Minutos que um horário escolhido no modal fica reservado para o paciente
+    RESERVA_HORARIO_MINUTOS = 5
+    # Minutos que o paciente da lista de espera tem para aceitar um horário oferecido
+    LISTA_ESPERA_OFERTA_MINUTOS = 30
+    # Semanas à frente mantidas agendadas nas recorrências ativas dos prontuários
+    RECORRENCIA_HORIZONTE_SEMANAS = 12
+    # Horas após o início para uma consulta sem registro ser considerada vencida
+    AGENDAMENTO_VENCIMENTO_HORAS = 24
+    # Status aplicado às consultas vencidas: 'pendente_revisao' ou 'realizado' (política da clínica)
+    AGENDAMENTO_STATUS_VENCIDO = 'pendente_revisao'
+    
+    # Envio de e-mails: 'smtp' ou 'memoria'
+    EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND') or 'smtp'
+    EMAIL_REMETENTE = os.environ.get('EMAIL_REMETENTE') or 'contato@clinicamentalize.com.br'
+    SMTP_HOST = os.environ.get('SMTP_HOST') or 'localhost'
+    SMTP_PORTA = int(os.environ.get('SMTP_PORTA') or 25)
+    SMTP_USUARIO = os.environ.get('SMTP_USUARIO')
+    SMTP_SENHA = os.environ.get('SMTP_SENHA')
+    SMTP_TLS = os.environ.get('SMTP_TLS', '').lower() in ('1', 'true', 'sim')
+    # Caixa de saída: tentativas por e-mail e espera base (dobra a cada falha)
+    EMAIL_MAX_TENTATIVAS = 5
+    EMAIL_ESPERA_SEGUNDOS = 60
+    # Fila de tarefas: espera base entre tentativas (dobra a cada falha) e
+    # minutos após os quais uma tarefa 'executando' é considerada abandonada
+    TAREFAS_ESPERA_SEGUNDOS = 30
+    TAREFAS_TEMPO_LIMITE_MINUTOS = 30
+    # Agendador: intervalo (segundos) de cada tarefa periódica; uma única instância executa cada uma
+    AGENDADOR_TAREFAS = {
+        'limpar_reservas': 60,
+        'processar_emails': 30,
+        'enviar_lembretes': 300,
+        'encerrar_agendamentos': 3600,
+        'estender_recorrencias': 86400,
+        'limpar_tokens_revogados': 86400,
+    }
+    # Diretório das travas de arquivo usadas quando o banco não é PostgreSQL
+    AGENDADOR_DIRETORIO_TRAVAS = os.environ.get('AGENDADOR_DIRETORIO_TRAVAS')
+    # Eventos em tempo real: 'memoria' ou 'postgresql' (padrão: conforme o banco)
+    EVENTOS_BACKEND = os.environ.get('EVENTOS_BACKEND')
+    # Segundos entre comentários de heartbeat no fluxo SSE
+    EVENTOS_HEARTBEAT_SEGUNDOS = 15
+    # Invalidação dos caches em memória entre processos: 'memoria' ou 'postgresql' (padrão: conforme o banco)
+    INVALIDACAO_BACKEND = os.environ.get('INVALIDACAO_BACKEND')
+    # Segundos que o diretório de psicólogos fica no cache local de cada processo
+    CACHE_PSICOLOGOS_TTL = 300
+    # Sincronização incremental: itens por página, idade mínima (segundos) das alterações
+    # entregues e quanto o cursor recua ao fim de cada sincronização (o cliente deduplica por id)
+    SINCRONIZACAO_LIMITE = 500
+    SINCRONIZACAO_MARGEM_SEGUNDOS = int(os.environ.get('SINCRONIZACAO_MARGEM_SEGUNDOS', 2))
+    SINCRONIZACAO_SOBREPOSICAO_SEGUNDOS = int(os.environ.get('SINCRONIZACAO_SOBREPOSICAO_SEGUNDOS', 30))
+    # API /api/v1: máximo de itens por página nas listagens
+    API_LIMITE_PAGINA = 500
+    # Lembretes de consulta: horas de antecedência de cada janela
+    LEMBRETES_JANELAS_HORAS = {'24h': 24, '2h': 2}
     
     # Configurações da clínica
     CLINICA_NOME = "Clínica Mentalize"
     CLINICA_ENDERECO = "R. Progresso, 735 – Centro, Francisco Morato - SP, CEP 07901-080"
     CLINICA_EMAIL = "contato@clinicamentalize.com.br"
     CLINICA_TELEFONE = "(11) 96331-3561"
+    # Fuso horário em que as datas das consultas são gravadas
+    CLINICA_FUSO_HORARIO = 'America/Sao_Paulo'
+    # Período publicado nos feeds de calendário (ICS), em dias antes e depois de hoje
+    ICS_DIAS_PASSADOS = 30
+    ICS_DIAS_FUTUROS = 180
 
 class DevelopmentConfig(Config):
     """Configuração para desenvolvimento"""
@@ -32,6 +116,8 @@ class ProductionConfig(Config):
     # Configurações de segurança para produção
     SECRET_KEY = os.environ.get('SECRET_KEY')
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
+    # O Render encaminha as requisições por um proxy
+    PROXY_SALTOS_CONFIAVEIS = int(os.environ.get('PROXY_SALTOS_CONFIAVEIS', 1))
     
     # Configurações específicas do PostgreSQL
     if SQLALCHEMY_DATABASE_URI and SQLALCHEMY_DATABASE_URI.startswith("postgres://"):
@@ -42,6 +128,8 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    EMAIL_BACKEND = 'memoria'
+    SENHA_METODO = 'pbkdf2:sha256:1000'  # Custo baixo apenas para a suíte de testes
 
 # Dicionário de configurações
 config = {
@@ -7,6 +7,7 @@ Este script deve ser executado após o deploy no Render para configurar o banco
 import os
 import sys
 from app import create_app, db
+from flask_migrate import upgrade
 from app.models import Usuario
 from werkzeug.security import generate_password_hash
 
@@ -21,9 +22,9 @@ def init_database():
     
     with app.app_context():
         try:
-            print("Criando tabelas do banco de dados...")
-            db.create_all()
-            print("✓ Tabelas criadas com sucesso!")
+            print("Criando tabelas e aplicando as migrações do banco de dados...")
+            upgrade()
+            print("✓ Tabelas criadas/atualizadas com sucesso!")
             
             # Verifica se já existe um usuário admin
             admin_email = 'admin@clinicamentalize.com.br'
@@ -0,0 +1,189 @@
+"""tabelas novas: reservas, lista de espera, lembretes, filas e auditoria
+
+As tabelas são criadas já na forma atual (``reservas_horario.data_hora_fim``
+e ``lista_espera.oferta_duracao_minutos`` incluídas). Bancos em que alguma
+delas já foi criada por ``db.create_all()`` mantêm a existente; as colunas
+que faltarem são acrescentadas pela revisão 0004.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 16:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existentes = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'agendamentos_removidos' not in existentes:
+        op.create_table('agendamentos_removidos',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('agendamento_id', sa.Integer(), nullable=False),
+        sa.Column('paciente_id', sa.Integer(), nullable=False),
+        sa.Column('psicologo_id', sa.Integer(), nullable=False),
+        sa.Column('data_remocao', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('agendamentos_removidos', schema=None) as batch_op:
+            batch_op.create_index('ix_agendamentos_removidos_data', ['data_remocao', 'id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_agendamentos_removidos_paciente_id'), ['paciente_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_agendamentos_removidos_psicologo_id'), ['psicologo_id'], unique=False)
+
+    if 'emails_pendentes' not in existentes:
+        op.create_table('emails_pendentes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('destinatario', sa.String(length=120), nullable=False),
+        sa.Column('assunto', sa.String(length=200), nullable=False),
+        sa.Column('corpo', sa.Text(), nullable=False),
+        sa.Column('status', sa.Enum('pendente', 'enviado', 'falhou', name='status_email_enum'), nullable=False),
+        sa.Column('tentativas', sa.Integer(), nullable=False),
+        sa.Column('proxima_tentativa', sa.DateTime(), nullable=False),
+        sa.Column('ultimo_erro', sa.Text(), nullable=True),
+        sa.Column('data_criacao', sa.DateTime(), nullable=False),
+        sa.Column('data_envio', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('emails_pendentes', schema=None) as batch_op:
+            batch_op.create_index('ix_emails_pendentes_fila', ['status', 'proxima_tentativa'], unique=False)
+
+    if 'execucoes_periodicas' not in existentes:
+        op.create_table('execucoes_periodicas',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nome', sa.String(length=100), nullable=False),
+        sa.Column('ultima_execucao', sa.DateTime(), nullable=True),
+        sa.Column('proxima_execucao', sa.DateTime(), nullable=True),
+        sa.Column('duracao_ms', sa.Float(), nullable=True),
+        sa.Column('execucoes', sa.Integer(), nullable=False),
+        sa.Column('ultimo_erro', sa.Text(), nullable=True),
+        sa.Column('executado_por', sa.String(length=100), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('nome')
+        )
+
+    if 'importacoes_legado' not in existentes:
+        op.create_table('importacoes_legado',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nome', sa.String(length=255), nullable=False),
+        sa.Column('registros', sa.Integer(), nullable=False),
+        sa.Column('importados', sa.Integer(), nullable=False),
+        sa.Column('erros', sa.Integer(), nullable=False),
+        sa.Column('atualizado_em', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('nome')
+        )
+
+    if 'tarefas' not in existentes:
+        op.create_table('tarefas',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nome', sa.String(length=100), nullable=False),
+        sa.Column('argumentos', sa.Text(), nullable=False),
+        sa.Column('status', sa.Enum('pendente', 'executando', 'concluida', 'falhou', name='status_tarefa_enum'), nullable=False),
+        sa.Column('prioridade', sa.Integer(), nullable=False),
+        sa.Column('tentativas', sa.Integer(), nullable=False),
+        sa.Column('max_tentativas', sa.Integer(), nullable=False),
+        sa.Column('executar_em', sa.DateTime(), nullable=False),
+        sa.Column('iniciada_em', sa.DateTime(), nullable=True),
+        sa.Column('concluida_em', sa.DateTime(), nullable=True),
+        sa.Column('duracao_ms', sa.Float(), nullable=True),
+        sa.Column('erro', sa.Text(), nullable=True),
+        sa.Column('data_criacao', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('tarefas', schema=None) as batch_op:
+            batch_op.create_index('ix_tarefas_fila', ['status', 'prioridade', 'executar_em'], unique=False)
+
+    if 'tentativas_login' not in existentes:
+        op.create_table('tentativas_login',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('chave', sa.String(length=200), nullable=False),
+        sa.Column('momento', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('tentativas_login', schema=None) as batch_op:
+            batch_op.create_index('ix_tentativas_login_chave_momento', ['chave', 'momento'], unique=False)
+            batch_op.create_index(batch_op.f('ix_tentativas_login_momento'), ['momento'], unique=False)
+
+    if 'tokens_revogados' not in existentes:
+        op.create_table('tokens_revogados',
+        sa.Column('jti', sa.String(length=32), nullable=False),
+        sa.Column('expira_em', sa.DateTime(), nullable=False),
+        sa.Column('data_revogacao', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('jti')
+        )
+        with op.batch_alter_table('tokens_revogados', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_tokens_revogados_expira_em'), ['expira_em'], unique=False)
+
+    if 'lista_espera' not in existentes:
+        op.create_table('lista_espera',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('paciente_id', sa.Integer(), nullable=False),
+        sa.Column('psicologo_id', sa.Integer(), nullable=False),
+        sa.Column('dia_semana', sa.Integer(), nullable=False),
+        sa.Column('hora_inicio', sa.Time(), nullable=False),
+        sa.Column('hora_fim', sa.Time(), nullable=False),
+        sa.Column('status', sa.Enum('aguardando', 'ofertado', 'atendido', 'cancelado', name='status_lista_espera_enum'), nullable=False),
+        sa.Column('oferta_data_hora', sa.DateTime(), nullable=True),
+        sa.Column('oferta_duracao_minutos', sa.Integer(), nullable=True),
+        sa.Column('oferta_expira_em', sa.DateTime(), nullable=True),
+        sa.Column('data_criacao', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['paciente_id'], ['pacientes.id'], ),
+        sa.ForeignKeyConstraint(['psicologo_id'], ['psicologos.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('lista_espera', schema=None) as batch_op:
+            batch_op.create_index('ix_lista_espera_busca', ['psicologo_id', 'dia_semana', 'hora_inicio', 'hora_fim'], unique=False)
+            batch_op.create_index(batch_op.f('ix_lista_espera_paciente_id'), ['paciente_id'], unique=False)
+
+    if 'reservas_horario' not in existentes:
+        op.create_table('reservas_horario',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('psicologo_id', sa.Integer(), nullable=False),
+        sa.Column('paciente_id', sa.Integer(), nullable=False),
+        sa.Column('data_hora', sa.DateTime(), nullable=False),
+        sa.Column('data_hora_fim', sa.DateTime(), nullable=False),
+        sa.Column('expira_em', sa.DateTime(), nullable=False),
+        sa.Column('data_criacao', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['paciente_id'], ['pacientes.id'], ),
+        sa.ForeignKeyConstraint(['psicologo_id'], ['psicologos.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('psicologo_id', 'data_hora', name='uq_reserva_horario_psicologo_data_hora')
+        )
+        with op.batch_alter_table('reservas_horario', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_reservas_horario_expira_em'), ['expira_em'], unique=False)
+            batch_op.create_index(batch_op.f('ix_reservas_horario_paciente_id'), ['paciente_id'], unique=False)
+
+    if 'lembretes_enviados' not in existentes:
+        op.create_table('lembretes_enviados',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('agendamento_id', sa.Integer(), nullable=False),
+        sa.Column('tipo', sa.String(length=10), nullable=False),
+        sa.Column('data_envio', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['agendamento_id'], ['agendamentos.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('agendamento_id', 'tipo', name='uq_lembrete_agendamento_tipo')
+        )
+
+
+def downgrade():
+    op.drop_table('lembretes_enviados')
+    op.drop_table('reservas_horario')
+    op.drop_table('lista_espera')
+    op.drop_table('tokens_revogados')
+    op.drop_table('tentativas_login')
+    op.drop_table('tarefas')
+    op.drop_table('importacoes_legado')
+    op.drop_table('execucoes_periodicas')
+    op.drop_table('emails_pendentes')
+    op.drop_table('agendamentos_removidos')
+    # Os tipos enum do PostgreSQL não saem junto com as tabelas
+    for tipo in ('status_lista_espera_enum', 'status_tarefa_enum', 'status_email_enum'):
+        sa.Enum(name=tipo).drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,64 @@
+"""agendamentos: duracao_minutos, data_hora_fim e índices de intervalo
+
+Os agendamentos anteriores têm a duração padrão de 60 minutos; o fim é
+preenchido a partir dela antes de a coluna passar a ``NOT NULL``. O índice
+GiST de ``tsrange(data_hora, data_hora_fim)`` só existe no PostgreSQL.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 16:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conexao = op.get_bind()
+    inspetor = sa.inspect(conexao)
+    colunas = {coluna['name'] for coluna in inspetor.get_columns('agendamentos')}
+    indices = {indice['name'] for indice in inspetor.get_indexes('agendamentos')}
+    postgresql = conexao.dialect.name == 'postgresql'
+
+    if 'duracao_minutos' not in colunas:
+        op.add_column('agendamentos', sa.Column('duracao_minutos', sa.Integer(), nullable=False, server_default='60'))
+    if 'data_hora_fim' not in colunas:
+        op.add_column('agendamentos', sa.Column('data_hora_fim', sa.DateTime(), nullable=True))
+        if postgresql:
+            op.execute("UPDATE agendamentos SET data_hora_fim = data_hora + interval '60 minutes'")
+        else:
+            op.execute("UPDATE agendamentos SET data_hora_fim = datetime(data_hora, '+60 minutes')")
+        with op.batch_alter_table('agendamentos', schema=None) as batch_op:
+            batch_op.alter_column('data_hora_fim', existing_type=sa.DateTime(), nullable=False)
+
+    with op.batch_alter_table('agendamentos', schema=None) as batch_op:
+        if 'ix_agendamentos_psicologo_periodo' not in indices:
+            batch_op.create_index('ix_agendamentos_psicologo_periodo', ['psicologo_id', 'data_hora', 'data_hora_fim'], unique=False)
+        if 'ix_agendamentos_paciente_data' not in indices:
+            batch_op.create_index('ix_agendamentos_paciente_data', ['paciente_id', 'data_hora'], unique=False)
+        if 'ix_agendamentos_atualizacao' not in indices:
+            batch_op.create_index('ix_agendamentos_atualizacao', ['data_atualizacao', 'id'], unique=False)
+
+    if postgresql and 'ix_agendamentos_periodo_gist' not in indices:
+        op.create_index(
+            'ix_agendamentos_periodo_gist', 'agendamentos',
+            [sa.text('tsrange(data_hora, data_hora_fim)')], postgresql_using='gist'
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_agendamentos_periodo_gist', table_name='agendamentos')
+    with op.batch_alter_table('agendamentos', schema=None) as batch_op:
+        batch_op.drop_index('ix_agendamentos_atualizacao')
+        batch_op.drop_index('ix_agendamentos_paciente_data')
+        batch_op.drop_index('ix_agendamentos_psicologo_periodo')
+        batch_op.drop_column('data_hora_fim')
+        batch_op.drop_column('duracao_minutos')
@@ -0,0 +1,38 @@
+"""reservas_horario.data_hora_fim e lista_espera.oferta_duracao_minutos
+
+Só altera bancos em que essas tabelas foram criadas por ``db.create_all()``
+antes das colunas existirem; a revisão 0002 já as cria completas.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 16:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspetor = sa.inspect(op.get_bind())
+
+    if 'data_hora_fim' not in {coluna['name'] for coluna in inspetor.get_columns('reservas_horario')}:
+        # Reservas duram minutos: as existentes são descartadas em vez de receber um fim presumido
+        op.execute('DELETE FROM reservas_horario')
+        with op.batch_alter_table('reservas_horario', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('data_hora_fim', sa.DateTime(), nullable=False))
+
+    if 'oferta_duracao_minutos' not in {coluna['name'] for coluna in inspetor.get_columns('lista_espera')}:
+        # Ofertas anteriores ficam sem duração e são tratadas como sessão padrão
+        op.add_column('lista_espera', sa.Column('oferta_duracao_minutos', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    # As colunas fazem parte das tabelas criadas pela revisão 0002
+    pass
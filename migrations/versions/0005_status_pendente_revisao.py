@@ -0,0 +1,43 @@
+"""agendamentos: valor 'pendente_revisao' do status
+
+No PostgreSQL o valor é acrescentado ao tipo ``status_agendamento_enum``
+fora da transação das migrações, para que fique utilizável logo depois. Nos
+demais bancos o enum é um ``VARCHAR`` sem ``CHECK``, que só precisa caber o
+valor mais longo.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 16:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+ANTERIORES = ('agendado', 'confirmado', 'realizado', 'cancelado', 'ausencia')
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE status_agendamento_enum ADD VALUE IF NOT EXISTS 'pendente_revisao'")
+        return
+    with op.batch_alter_table('agendamentos', schema=None) as batch_op:
+        batch_op.alter_column(
+            'status', existing_type=sa.Enum(*ANTERIORES, name='status_agendamento_enum'),
+            type_=sa.Enum(*ANTERIORES, 'pendente_revisao', name='status_agendamento_enum'),
+            existing_nullable=False
+        )
+
+
+def downgrade():
+    # O PostgreSQL não remove valores de um tipo enum; nos demais bancos o
+    # VARCHAR mais largo continua aceitando os valores anteriores
+    pass
@@ -0,0 +1,29 @@
+"""usuarios: coluna versao_senha
+
+Usuários existentes começam na versão 0 (sem trocas de senha registradas).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'versao_senha' in {coluna['name'] for coluna in sa.inspect(op.get_bind()).get_columns('usuarios')}:
+        return
+    op.add_column('usuarios', sa.Column('versao_senha', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.drop_column('versao_senha')
@@ -0,0 +1,30 @@
+"""agendamentos: coluna data_hora_serie
+
+Consultas recorrentes já geradas ficam sem marca; enquanto não forem
+reagendadas, a data exata continua evitando duplicatas.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 17:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'data_hora_serie' in {coluna['name'] for coluna in sa.inspect(op.get_bind()).get_columns('agendamentos')}:
+        return
+    op.add_column('agendamentos', sa.Column('data_hora_serie', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('agendamentos', schema=None) as batch_op:
+        batch_op.drop_column('data_hora_serie')
@@ -0,0 +1,40 @@
+"""índices dos filtros da API: usuarios.tipo_usuario/ativo e agendamentos.status
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspetor = sa.inspect(op.get_bind())
+    indices_usuarios = {indice['name'] for indice in inspetor.get_indexes('usuarios')}
+    indices_agendamentos = {indice['name'] for indice in inspetor.get_indexes('agendamentos')}
+
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        if 'ix_usuarios_tipo_usuario' not in indices_usuarios:
+            batch_op.create_index(batch_op.f('ix_usuarios_tipo_usuario'), ['tipo_usuario'], unique=False)
+        if 'ix_usuarios_ativo' not in indices_usuarios:
+            batch_op.create_index(batch_op.f('ix_usuarios_ativo'), ['ativo'], unique=False)
+
+    if 'ix_agendamentos_status_data' not in indices_agendamentos:
+        with op.batch_alter_table('agendamentos', schema=None) as batch_op:
+            batch_op.create_index('ix_agendamentos_status_data', ['status', 'data_hora'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('agendamentos', schema=None) as batch_op:
+        batch_op.drop_index('ix_agendamentos_status_data')
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_usuarios_ativo'))
+        batch_op.drop_index(batch_op.f('ix_usuarios_tipo_usuario'))
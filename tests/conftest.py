@@ -2,7 +2,7 @@ import pytest
 import tempfile
 import os
 from app import create_app, db
-from app.models import Usuario
+from app.models import Usuario, Psicologo, Paciente
 
 @pytest.fixture
 def app():
@@ -45,4 +45,27 @@ def admin_user(app):
         admin.set_senha('senha123')
         db.session.add(admin)
         db.session.commit()
-        return admin
\ No newline at end of file
+        return admin
+
+@pytest.fixture
+def criar_usuario(app):
+    """Fábrica de usuários de teste (senha ``senha123``) com o perfil do tipo.
+
+    Devolve o ``Psicologo``/``Paciente`` criado ou, para administradores, o
+    próprio ``Usuario``. Os registros recebem flush; o commit fica com o teste.
+    """
+    perfis = {'psicologo': Psicologo, 'paciente': Paciente}
+
+    def criar(nome, email, tipo):
+        usuario = Usuario(nome_completo=nome, email=email, tipo_usuario=tipo)
+        usuario.set_senha('senha123')
+        db.session.add(usuario)
+        db.session.flush()
+        if tipo not in perfis:
+            return usuario
+        perfil = perfis[tipo](usuario_id=usuario.id)
+        db.session.add(perfil)
+        db.session.flush()
+        return perfil
+
+    return criar
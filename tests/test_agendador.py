@@ -0,0 +1,62 @@
+import fcntl
+import os
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from app.models import ExecucaoPeriodica
+from app import agendador, tarefas
+
+EXECUCOES = []
+
+
+@tarefas.registrar('teste_periodica')
+def tarefa_periodica():
+    EXECUCOES.append(datetime.utcnow())
+
+
+@tarefas.registrar('teste_periodica_falha')
+def tarefa_periodica_falha():
+    raise RuntimeError('falha proposital')
+
+
+@pytest.fixture
+def configurado(app, tmp_path):
+    EXECUCOES.clear()
+    app.config['AGENDADOR_TAREFAS'] = {'teste_periodica': 60}
+    app.config['AGENDADOR_DIRETORIO_TRAVAS'] = str(tmp_path)
+    return tmp_path
+
+
+class TestAgendador:
+    """Testes do agendador de tarefas periódicas"""
+
+    def test_executa_conforme_intervalo(self, app, configurado):
+        agora = datetime(2030, 1, 1, 12, 0)
+        assert agendador.executar_devidas(agora=agora) == ['teste_periodica']
+        assert agendador.executar_devidas(agora=agora + timedelta(seconds=30)) == []
+        assert agendador.executar_devidas(agora=agora + timedelta(seconds=60)) == ['teste_periodica']
+        assert len(EXECUCOES) == 2
+
+        controle = ExecucaoPeriodica.query.filter_by(nome='teste_periodica').one()
+        assert controle.execucoes == 2
+        assert controle.proxima_execucao == agora + timedelta(seconds=120)
+        assert controle.duracao_ms is not None and controle.executado_por
+
+    def test_outra_instancia_com_a_trava(self, app, configurado):
+        """Se outra instância detém a trava, a tarefa não é executada aqui"""
+        caminho = os.path.join(configurado, 'clinica-agendador-teste_periodica.lock')
+        with open(caminho, 'a') as arquivo:
+            fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            assert agendador.executar_devidas() == []
+        assert agendador.executar_devidas() == ['teste_periodica']
+
+    def test_registra_erro(self, app, configurado):
+        app.config['AGENDADOR_TAREFAS'] = {'teste_periodica_falha': 60}
+        assert agendador.executar_devidas() == ['teste_periodica_falha']
+        controle = ExecucaoPeriodica.query.one()
+        assert 'falha proposital' in controle.ultimo_erro
+        assert controle.proxima_execucao is not None
+
+    def test_comando(self, runner, app, configurado):
+        result = runner.invoke(args=['agendador', '--uma-vez'])
+        assert 'teste_periodica executada.' in result.output
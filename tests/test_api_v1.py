@@ -0,0 +1,224 @@
+import pytest
+from datetime import datetime, date, time, timedelta
+from app import db
+from app.models import Usuario, Agendamento, Prontuario, Sessao, HorarioAtendimento
+
+
+@pytest.fixture
+def clinica(app, criar_usuario):
+    """Administrador, psicóloga com cinco consultas amanhã e dois pacientes"""
+    criar_usuario('Admin', 'admin@teste.com', 'admin')
+    perfis = {}
+    for nome, email, tipo in [('Dra. Ana Lima', 'ana@teste.com', 'psicologo'),
+                              ('Carla Souza', 'carla@teste.com', 'paciente'),
+                              ('Davi Rocha', 'davi@teste.com', 'paciente')]:
+        perfis[email] = criar_usuario(nome, email, tipo).id
+
+    amanha = date.today() + timedelta(days=1)
+    for hora in range(8, 13):
+        paciente = 'carla@teste.com' if hora < 12 else 'davi@teste.com'
+        db.session.add(Agendamento(
+            paciente_id=perfis[paciente], psicologo_id=perfis['ana@teste.com'],
+            data_hora=datetime.combine(amanha, time(hora, 0)), status='agendado'
+        ))
+    prontuario = Prontuario(paciente_id=perfis['carla@teste.com'], psicologo_id=perfis['ana@teste.com'])
+    db.session.add(prontuario)
+    db.session.flush()
+    for dias in (14, 7):
+        db.session.add(Sessao(prontuario_id=prontuario.id, data_sessao=datetime.now() - timedelta(days=dias)))
+    db.session.commit()
+    return perfis, amanha
+
+
+def login(client, email):
+    tipo = {'admin@teste.com': 'admin', 'ana@teste.com': 'psicologo'}.get(email, 'paciente')
+    client.post('/auth/login', data={'email': email, 'senha': 'senha123', 'tipo_usuario': tipo})
+
+
+class TestListagens:
+    """Testes das listagens paginadas"""
+
+    def test_paginacao_por_cursor(self, app, client, clinica):
+        login(client, 'ana@teste.com')
+        recebidos = []
+        cursor = None
+        paginas = 0
+        while True:
+            parametros = {'limite': 2, 'ordem': 'data_hora'}
+            if cursor:
+                parametros['cursor'] = cursor
+            dados = client.get('/api/v1/agendamentos', query_string=parametros).get_json()
+            recebidos += [item['data_hora'] for item in dados['itens']]
+            paginas += 1
+            cursor = dados['proximo_cursor']
+            if not cursor:
+                break
+        assert paginas == 3
+        assert len(recebidos) == 5 and recebidos == sorted(recebidos)
+
+    def test_campos_e_filtros(self, app, client, clinica):
+        perfis, _ = clinica
+        login(client, 'ana@teste.com')
+        response = client.get('/api/v1/agendamentos', query_string={
+            'fields': 'id,paciente', 'paciente_id': perfis['davi@teste.com']
+        })
+        itens = response.get_json()['itens']
+        assert len(itens) == 1
+        assert set(itens[0]) == {'id', 'paciente'} and itens[0]['paciente'] == 'Davi Rocha'
+
+        assert client.get('/api/v1/agendamentos', query_string={'fields': 'senha'}).status_code == 400
+        assert client.get('/api/v1/agendamentos', query_string={'status': 'inexistente'}).status_code == 400
+        assert client.get('/api/v1/agendamentos', query_string={'cursor': 'lixo'}).status_code == 400
+
+    def test_escopo_dos_usuarios(self, app, client, clinica):
+        login(client, 'davi@teste.com')
+        emails = [u['email'] for u in client.get('/api/v1/usuarios').get_json()['itens']]
+        assert emails == ['davi@teste.com']
+        assert len(client.get('/api/v1/agendamentos').get_json()['itens']) == 1
+        assert client.get('/api/v1/prontuarios').status_code == 403
+
+        client.get('/auth/logout')
+        login(client, 'ana@teste.com')
+        dados = client.get('/api/v1/usuarios', query_string={'tipo_usuario': 'paciente'}).get_json()
+        assert sorted(u['email'] for u in dados['itens']) == ['carla@teste.com', 'davi@teste.com']
+
+    def test_resumo_de_prontuarios(self, app, client, clinica):
+        perfis, amanha = clinica
+        login(client, 'ana@teste.com')
+        itens = client.get('/api/v1/prontuarios').get_json()['itens']
+        assert len(itens) == 1
+        assert itens[0]['paciente'] == 'Carla Souza'
+        assert itens[0]['total_sessoes'] == 2
+        assert itens[0]['proxima_consulta'] == datetime.combine(amanha, time(8, 0)).isoformat()
+
+    def test_placeholders_redirecionam(self, app, client, clinica):
+        response = client.get('/api/agendamentos?limite=1')
+        assert response.status_code == 308
+        assert response.headers['Location'].endswith('/api/v1/agendamentos?limite=1')
+
+    def test_requer_autenticacao(self, app, client, clinica):
+        assert client.get('/api/v1/usuarios').status_code == 401
+        assert client.post('/api/v1/agendamentos/lote', json={}).status_code == 401
+
+
+class TestLotes:
+    """Testes das operações em lote"""
+
+    def test_criacao_em_lote(self, app, client, clinica):
+        perfis, amanha = clinica
+        login(client, 'ana@teste.com')
+        response = client.post('/api/v1/agendamentos/lote', json={'agendamentos': [
+            {'paciente_id': perfis['davi@teste.com'], 'data_hora': f'{amanha}T14:00:00'},
+            {'paciente_id': perfis['davi@teste.com'], 'data_hora': f'{amanha}T14:30:00', 'duracao_minutos': 50},
+            {'paciente_id': perfis['carla@teste.com'], 'data_hora': f'{amanha}T09:00:00'},
+            {'paciente_id': perfis['carla@teste.com'], 'data_hora': f'{amanha}T16:00:00', 'duracao_minutos': 45},
+            {'paciente_id': perfis['carla@teste.com'], 'psicologo_id': 999, 'data_hora': f'{amanha}T17:00:00'},
+        ]})
+        assert response.status_code == 201
+        dados = response.get_json()
+        assert dados['criados'] == 1
+        assert [r['sucesso'] for r in dados['resultados']] == [True, False, False, False, False]
+        assert dados['resultados'][1]['erro'] == 'Horário indisponível'
+        assert dados['resultados'][4]['erro'] == 'Acesso negado'
+
+        # Primeiro agendamento de Davi com a psicóloga cria o prontuário
+        assert Prontuario.query.filter_by(paciente_id=perfis['davi@teste.com']).count() == 1
+
+    def test_alteracao_em_lote(self, app, client, clinica):
+        perfis, _ = clinica
+        ids = [a.id for a in Agendamento.query.order_by(Agendamento.data_hora)]
+        login(client, 'carla@teste.com')
+        response = client.patch('/api/v1/agendamentos/lote', json={'agendamentos': [
+            {'id': ids[0], 'status': 'confirmado'},
+            {'id': ids[1], 'status': 'cancelado'},
+            {'id': ids[2], 'status': 'realizado'},
+            {'id': ids[4], 'status': 'confirmado'},
+        ]})
+        resultados = response.get_json()['resultados']
+        assert [r['sucesso'] for r in resultados] == [True, True, False, False]
+        assert resultados[3]['erro'] == 'Agendamento não encontrado'
+        assert db.session.get(Agendamento, ids[1]).status == 'cancelado'
+
+        response = client.patch('/api/v1/agendamentos/lote', json={'agendamentos': [{'id': ids[1], 'status': 'confirmado'}]})
+        assert response.get_json()['resultados'][0]['erro'] == 'Consulta cancelada'
+
+    def test_transicoes_do_paciente(self, app, client, clinica):
+        """O paciente não cancela consultas realizadas nem confirma ausências"""
+        ids = [a.id for a in Agendamento.query.order_by(Agendamento.data_hora)]
+        db.session.get(Agendamento, ids[0]).status = 'realizado'
+        db.session.get(Agendamento, ids[1]).status = 'ausencia'
+        db.session.get(Agendamento, ids[2]).status = 'confirmado'
+        db.session.commit()
+        login(client, 'carla@teste.com')
+        response = client.patch('/api/v1/agendamentos/lote', json={'agendamentos': [
+            {'id': ids[0], 'status': 'cancelado'},
+            {'id': ids[1], 'status': 'confirmado'},
+            {'id': ids[2], 'status': 'cancelado'},
+            {'id': ids[3], 'status': 'confirmado'},
+        ]})
+        resultados = response.get_json()['resultados']
+        assert [r['sucesso'] for r in resultados] == [False, False, True, True]
+        assert resultados[0]['erro'] == 'Não é possível passar de realizado para cancelado'
+        assert resultados[1]['erro'] == 'Não é possível passar de ausencia para confirmado'
+        assert [db.session.get(Agendamento, i).status for i in ids[:4]] == [
+            'realizado', 'ausencia', 'cancelado', 'confirmado'
+        ]
+
+        # A equipe continua podendo corrigir o registro da consulta
+        client.get('/auth/logout')
+        login(client, 'ana@teste.com')
+        response = client.patch('/api/v1/agendamentos/lote', json={'agendamentos': [{'id': ids[1], 'status': 'realizado'}]})
+        assert response.get_json()['resultados'][0]['sucesso'] is True
+
+    def test_transicoes_da_equipe(self, app, client, clinica):
+        """A equipe corrige o registro da consulta, mas não reabre consultas encerradas"""
+        ids = [a.id for a in Agendamento.query.order_by(Agendamento.data_hora)]
+        db.session.get(Agendamento, ids[0]).status = 'realizado'
+        db.session.get(Agendamento, ids[1]).status = 'pendente_revisao'
+        db.session.commit()
+        login(client, 'ana@teste.com')
+        response = client.patch('/api/v1/agendamentos/lote', json={'agendamentos': [
+            {'id': ids[0], 'status': 'agendado'},
+            {'id': ids[1], 'status': 'ausencia'},
+            {'id': ids[2], 'status': 'pendente_revisao'},
+        ]})
+        resultados = response.get_json()['resultados']
+        assert [r['sucesso'] for r in resultados] == [False, True, False]
+        assert resultados[0]['erro'] == 'Não é possível passar de realizado para agendado'
+        assert resultados[2]['erro'] == 'Status não permitido'
+
+    def test_substituir_horarios(self, app, client, clinica):
+        perfis, _ = clinica
+        psicologo_id = perfis['ana@teste.com']
+        url = f'/api/v1/psicologos/{psicologo_id}/horarios-atendimento'
+        login(client, 'ana@teste.com')
+        response = client.put(url, json={'horarios': [
+            {'dia_semana': 0, 'hora_inicio': '08:00', 'hora_fim': '12:00'},
+            {'dia_semana': 0, 'hora_inicio': '13:00', 'hora_fim': '18:00'},
+        ]})
+        assert response.status_code == 200
+        assert HorarioAtendimento.query.filter_by(psicologo_id=psicologo_id).count() == 2
+
+        sobrepostos = [{'dia_semana': 1, 'hora_inicio': '08:00', 'hora_fim': '12:00'},
+                       {'dia_semana': 1, 'hora_inicio': '11:00', 'hora_fim': '13:00'}]
+        assert client.put(url, json={'horarios': sobrepostos}).status_code == 400
+        assert HorarioAtendimento.query.filter_by(psicologo_id=psicologo_id).count() == 2
+
+        dados = client.get('/api/v1/horarios-atendimento', query_string={'psicologo_id': psicologo_id}).get_json()
+        assert [(h['hora_inicio'], h['hora_fim']) for h in dados['itens']] == [('08:00', '12:00'), ('13:00', '18:00')]
+
+        client.get('/auth/logout')
+        login(client, 'carla@teste.com')
+        assert client.put(url, json={'horarios': []}).status_code == 403
+
+    def test_usuarios_em_lote_apenas_admin(self, app, client, clinica):
+        davi = Usuario.query.filter_by(email='davi@teste.com').first()
+        login(client, 'ana@teste.com')
+        corpo = {'usuarios': [{'id': davi.id, 'ativo': False}]}
+        assert client.patch('/api/v1/usuarios/lote', json=corpo).status_code == 403
+
+        client.get('/auth/logout')
+        login(client, 'admin@teste.com')
+        resultados = client.patch('/api/v1/usuarios/lote', json=corpo).get_json()['resultados']
+        assert resultados == [{'id': davi.id, 'sucesso': True}]
+        assert db.session.get(Usuario, davi.id).ativo is False
@@ -0,0 +1,96 @@
+import pytest
+from datetime import datetime, date, time, timedelta
+from app import db
+from app.models import Agendamento, EmailPendente
+from app.emails import EnvioSMTP, enfileirar_email, obter_envio, processar_fila
+
+
+class EnvioInstavel:
+    """Backend que recusa os destinatários indicados"""
+
+    def __init__(self, recusar):
+        self.recusar = recusar
+
+    def enviar_lote(self, mensagens):
+        return ['recusado' if m['To'] in self.recusar else None for m in mensagens]
+
+
+@pytest.fixture
+def dados(app, criar_usuario):
+    """Psicóloga e paciente cadastrados"""
+    ids = {}
+    for nome, email, tipo in [('Dra. Ana Lima', 'ana@teste.com', 'psicologo'),
+                              ('Carla Souza', 'carla@teste.com', 'paciente')]:
+        ids[tipo] = criar_usuario(nome, email, tipo).id
+    db.session.commit()
+    return ids
+
+
+class TestCaixaSaida:
+    """Testes da caixa de saída de e-mails"""
+
+    def test_envio_em_lotes(self, app):
+        for i in range(5):
+            enfileirar_email(f'paciente{i}@teste.com', 'Assunto', 'Corpo')
+        db.session.commit()
+
+        assert processar_fila(tamanho_lote=3) == (3, 0)
+        assert processar_fila(tamanho_lote=3) == (2, 0)
+        assert processar_fila() == (0, 0)
+        assert len(obter_envio().enviadas) == 5
+        assert EmailPendente.query.filter_by(status='enviado').count() == 5
+
+    def test_rollback_descarta_email(self, app):
+        enfileirar_email('carla@teste.com', 'Assunto', 'Corpo')
+        db.session.rollback()
+        assert EmailPendente.query.count() == 0
+
+    def test_nova_tentativa_com_espera(self, app):
+        app.config['EMAIL_MAX_TENTATIVAS'] = 2
+        app.extensions['envio_email'] = EnvioInstavel({'falha@teste.com'})
+        enfileirar_email('falha@teste.com', 'Assunto', 'Corpo')
+        enfileirar_email('ok@teste.com', 'Assunto', 'Corpo')
+        db.session.commit()
+
+        agora = datetime.utcnow()
+        assert processar_fila(agora=agora) == (1, 1)
+        email = EmailPendente.query.filter_by(destinatario='falha@teste.com').one()
+        assert email.status == 'pendente' and email.ultimo_erro == 'recusado'
+        assert email.proxima_tentativa == agora + timedelta(seconds=60)
+
+        # Antes do prazo nada é reenviado; depois, a segunda falha esgota as tentativas
+        assert processar_fila(agora=agora + timedelta(seconds=30)) == (0, 0)
+        assert processar_fila(agora=agora + timedelta(seconds=61)) == (0, 1)
+        assert db.session.get(EmailPendente, email.id).status == 'falhou'
+
+    def test_servidor_indisponivel(self, app):
+        app.extensions['envio_email'] = EnvioSMTP('127.0.0.1', 1, timeout=1)
+        enfileirar_email('carla@teste.com', 'Assunto', 'Corpo')
+        db.session.commit()
+        assert processar_fila() == (0, 1)
+        assert EmailPendente.query.one().status == 'pendente'
+
+    def test_comando(self, runner, app):
+        enfileirar_email('carla@teste.com', 'Assunto', 'Corpo')
+        db.session.commit()
+        result = runner.invoke(args=['processar-emails'])
+        assert '1 e-mail(s) enviado(s), 0 falha(s).' in result.output
+
+
+class TestEmailsTransacionais:
+    """E-mails enfileirados pelas ações dos usuários"""
+
+    def test_agendar_e_cancelar(self, app, client, dados):
+        amanha = date.today() + timedelta(days=1)
+        client.post('/auth/login', data={'email': 'carla@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+        client.post('/paciente/agendar_modal', data={
+            'psicologo_id': str(dados['psicologo']), 'data': amanha.isoformat(), 'horario': '10:00'
+        })
+        agendamento = Agendamento.query.one()
+        client.post(f'/paciente/cancelar/{agendamento.id}')
+
+        assuntos = [email.assunto for email in EmailPendente.query.order_by(EmailPendente.id)]
+        quando = datetime.combine(amanha, time(10, 0)).strftime('%d/%m/%Y às %H:%M')
+        assert assuntos == [f'Consulta agendada - {quando}', f'Consulta cancelada - {quando}']
+        # Nada é enviado durante a requisição
+        assert obter_envio().enviadas == []
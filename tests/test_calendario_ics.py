@@ -0,0 +1,87 @@
+import pytest
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import event
+from app import db
+from app.models import Agendamento
+from app.ics import gerar_token, _dobrar
+
+
+@pytest.fixture
+def consulta(app, criar_usuario):
+    """Psicóloga, paciente e uma consulta amanhã às 10h (horário de Brasília)"""
+    perfis = {}
+    for nome, email, tipo in [('Dra. Ana Lima', 'ana@teste.com', 'psicologo'),
+                              ('Carla Souza', 'carla@teste.com', 'paciente')]:
+        perfis[tipo] = criar_usuario(nome, email, tipo)
+    agendamento = Agendamento(
+        paciente_id=perfis['paciente'].id, psicologo_id=perfis['psicologo'].id,
+        data_hora=datetime.combine(date.today() + timedelta(days=1), time(10, 0)), status='agendado'
+    )
+    db.session.add(agendamento)
+    db.session.commit()
+    return perfis, agendamento
+
+
+def url_feed(perfil):
+    return f'/calendario/{gerar_token(perfil.usuario, perfil.id)}.ics'
+
+
+class TestFeedICS:
+    """Testes dos feeds de calendário"""
+
+    def test_feed_do_psicologo(self, app, client, consulta):
+        perfis, agendamento = consulta
+        response = client.get(url_feed(perfis['psicologo']))
+        assert response.status_code == 200
+        assert response.mimetype == 'text/calendar'
+        corpo = response.get_data(as_text=True)
+        amanha = agendamento.data_hora.date()
+        assert corpo.startswith('BEGIN:VCALENDAR\r\n')
+        assert f'UID:agendamento-{agendamento.id}@localhost\r\n' in corpo
+        assert f'DTSTART:{amanha:%Y%m%d}T130000Z\r\n' in corpo
+        assert f'DTEND:{amanha:%Y%m%d}T140000Z\r\n' in corpo
+        assert 'SUMMARY:Consulta - Carla Souza\r\n' in corpo
+        assert 'STATUS:TENTATIVE\r\n' in corpo
+        assert corpo.endswith('END:VCALENDAR\r\n')
+
+    def test_feed_do_paciente(self, app, client, consulta):
+        perfis, _ = consulta
+        corpo = client.get(url_feed(perfis['paciente'])).get_data(as_text=True)
+        assert 'SUMMARY:Consulta com Dr(a). Dra. Ana Lima\r\n' in corpo
+
+    def test_304_com_uma_consulta(self, app, client, consulta):
+        perfis, agendamento = consulta
+        url = url_feed(perfis['psicologo'])
+        etag = client.get(url).headers['ETag']
+
+        consultas = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: consultas.append(args[2]))
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.get_data() == b''
+        assert len(consultas) == 1
+
+        # Alteração na consulta gera nova versão
+        agendamento.status = 'cancelado'
+        db.session.commit()
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert 'STATUS:CANCELLED' in response.get_data(as_text=True)
+
+    def test_token_invalido_ou_revogado(self, app, client, consulta):
+        perfis, _ = consulta
+        url = url_feed(perfis['psicologo'])
+        assert client.get('/calendario/adulterado.ics').status_code == 404
+
+        perfis['psicologo'].usuario.set_senha('nova-senha')
+        db.session.commit()
+        assert client.get(url).status_code == 404
+
+    def test_dobra_linhas_longas(self):
+        linha = 'SUMMARY:' + 'Consulta com Dr(a). João Araújo ' * 5
+        dobrada = _dobrar(linha)
+        partes = dobrada.split('\r\n')[:-1]
+        assert all(len(parte.encode()) <= 75 for parte in partes)
+        assert all(parte.startswith(' ') for parte in partes[1:])
+        assert ''.join(parte[1:] if i else parte for i, parte in enumerate(partes)) == linha
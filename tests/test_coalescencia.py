@@ -0,0 +1,118 @@
+import threading
+import time
+import pytest
+from datetime import date, timedelta, time as hora
+from app import db
+from app.coalescencia import SingleFlight
+from app.disponibilidade import obter_coalescedor
+from app.models import HorarioAtendimento
+
+
+class TestSingleFlight:
+    """Testes da coalescência de computações"""
+
+    def test_chamadas_simultaneas_compartilham_computacao(self):
+        """Várias threads pedindo a mesma chave executam a função uma vez"""
+        coalescedor = SingleFlight(ttl=0)
+        liberar = threading.Event()
+        execucoes = []
+
+        def computar():
+            execucoes.append(1)
+            liberar.wait(timeout=5)
+            return ('08:00', '09:00')
+
+        resultados = []
+        threads = [
+            threading.Thread(target=lambda: resultados.append(coalescedor.executar('chave', computar)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        # Aguarda todas as threads chegarem à computação em andamento
+        while coalescedor.estatisticas()['coalescidas'] < 7:
+            time.sleep(0.01)
+        liberar.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(execucoes) == 1
+        assert resultados == [('08:00', '09:00')] * 8
+        estatisticas = coalescedor.estatisticas()
+        assert estatisticas['computacoes'] == 1
+        assert estatisticas['economizadas'] == 7
+
+    def test_micro_cache(self):
+        """Dentro do TTL o resultado é reaproveitado; depois de esquecido, recalculado"""
+        coalescedor = SingleFlight(ttl=60)
+        contador = iter(range(10))
+
+        assert coalescedor.executar('chave', lambda: next(contador)) == 0
+        assert coalescedor.executar('chave', lambda: next(contador)) == 0
+        assert coalescedor.estatisticas()['acertos_cache'] == 1
+
+        coalescedor.esquecer('chave')
+        assert coalescedor.executar('chave', lambda: next(contador)) == 1
+
+    def test_erro_nao_fica_em_cache(self):
+        """Uma falha é repassada e a próxima chamada tenta novamente"""
+        coalescedor = SingleFlight(ttl=60)
+
+        def falhar():
+            raise RuntimeError('banco indisponível')
+
+        with pytest.raises(RuntimeError):
+            coalescedor.executar('chave', falhar)
+        assert coalescedor.executar('chave', lambda: 'ok') == 'ok'
+
+
+class TestHorariosDisponiveisCoalescidos:
+    """Testes da API de horários disponíveis com o coalescedor"""
+
+    @pytest.fixture
+    def psicologo_id(self, app, criar_usuario):
+        psicologo = criar_usuario('Dra. Ana Lima', 'ana@teste.com', 'psicologo')
+        for dia in range(7):
+            db.session.add(HorarioAtendimento(
+                psicologo_id=psicologo.id, dia_semana=dia, hora_inicio=hora(8, 0), hora_fim=hora(10, 0)
+            ))
+        db.session.commit()
+        return psicologo.id
+
+    @pytest.fixture
+    def paciente_logado(self, app, client, criar_usuario):
+        criar_usuario('Carla Souza', 'carla@teste.com', 'paciente')
+        db.session.commit()
+        client.post('/auth/login', data={
+            'email': 'carla@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'
+        })
+
+    def test_requisicoes_repetidas_usam_cache(self, client, psicologo_id, paciente_logado):
+        amanha = (date.today() + timedelta(days=1)).isoformat()
+        url = f'/paciente/api/horarios-disponiveis?psicologo_id={psicologo_id}&data={amanha}'
+
+        for _ in range(3):
+            response = client.get(url)
+            assert response.get_json() == {'horarios': ['08:00', '09:00']}
+
+        estatisticas = obter_coalescedor().estatisticas()
+        assert estatisticas['computacoes'] == 1
+        assert estatisticas['acertos_cache'] == 2
+
+    def test_agendamento_invalida_cache(self, client, psicologo_id, paciente_logado):
+        amanha = (date.today() + timedelta(days=1)).isoformat()
+        url = f'/paciente/api/horarios-disponiveis?psicologo_id={psicologo_id}&data={amanha}'
+        assert client.get(url).get_json() == {'horarios': ['08:00', '09:00']}
+
+        client.post('/paciente/agendar_modal', data={
+            'psicologo_id': str(psicologo_id), 'data': amanha, 'horario': '08:00'
+        })
+        assert client.get(url).get_json() == {'horarios': ['09:00']}
+
+    def test_psicologo_inexistente(self, client, paciente_logado):
+        amanha = (date.today() + timedelta(days=1)).isoformat()
+        response = client.get(f'/paciente/api/horarios-disponiveis?psicologo_id=999&data={amanha}')
+        assert response.status_code == 404
+
+    def test_metricas_restritas_a_admin(self, client, paciente_logado):
+        assert client.get('/api/metricas').status_code == 403
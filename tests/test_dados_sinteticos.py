@@ -0,0 +1,74 @@
+import pytest
+from datetime import date, datetime
+from sqlalchemy import func
+from app import db
+from app.models import Usuario, Psicologo, Paciente, Prontuario, Sessao, Agendamento, HorarioAtendimento
+from app.dados_sinteticos import gerar, BaseJaPopulada
+
+HOJE = date(2024, 6, 3)
+
+
+def retrato():
+    """Resumo determinístico do conteúdo gerado"""
+    return (
+        [(u.email, u.nome_completo, u.telefone) for u in Usuario.query.order_by(Usuario.id)],
+        db.session.query(Agendamento.id, Agendamento.paciente_id, Agendamento.psicologo_id,
+                         Agendamento.data_hora, Agendamento.status).order_by(Agendamento.id).all(),
+        db.session.query(Sessao.agendamento_id, Sessao.anotacoes).order_by(Sessao.id).all(),
+    )
+
+
+class TestDadosSinteticos:
+    """Testes do gerador da clínica sintética"""
+
+    def test_volumes_e_consistencia(self, app):
+        totais = gerar(psicologos=4, pacientes=40, anos=1, hoje=HOJE, tamanho_lote=100)
+        assert totais['psicologos'] == Psicologo.query.count() == 4
+        assert totais['pacientes'] == Paciente.query.count() == Prontuario.query.count() == 40
+        assert totais['usuarios'] == Usuario.query.count() == 45  # Inclui o administrador
+        assert totais['agendamentos'] == Agendamento.query.count() > 0
+        assert totais['sessoes'] == Sessao.query.count() > 0
+        assert HorarioAtendimento.query.count() == totais['horarios_atendimento']
+
+        # Sem dois agendamentos do mesmo psicólogo no mesmo horário
+        repetidos = db.session.query(Agendamento.psicologo_id, Agendamento.data_hora).group_by(
+            Agendamento.psicologo_id, Agendamento.data_hora).having(func.count() > 1).count()
+        assert repetidos == 0
+
+        agora = datetime(2024, 6, 3, 12)
+        assert Agendamento.query.filter(Agendamento.data_hora < agora,
+                                        Agendamento.status.in_(['agendado', 'confirmado'])).count() == 0
+        assert Agendamento.query.filter(Agendamento.data_hora > agora, Agendamento.status == 'realizado').count() == 0
+        # Sessões apenas de consultas realizadas, no prontuário do paciente
+        assert db.session.query(Sessao).join(Agendamento, Sessao.agendamento_id == Agendamento.id).join(
+            Prontuario, Sessao.prontuario_id == Prontuario.id).filter(
+            (Agendamento.status != 'realizado') | (Prontuario.paciente_id != Agendamento.paciente_id)).count() == 0
+
+    def test_mesma_semente_mesmos_dados(self, app):
+        gerar(psicologos=3, pacientes=20, anos=1, semente=7, hoje=HOJE)
+        primeiro = retrato()
+        db.drop_all()
+        db.create_all()
+        gerar(psicologos=3, pacientes=20, anos=1, semente=7, hoje=HOJE)
+        assert retrato() == primeiro
+
+        db.drop_all()
+        db.create_all()
+        gerar(psicologos=3, pacientes=20, anos=1, semente=8, hoje=HOJE)
+        assert retrato() != primeiro
+
+    def test_nao_gera_duas_vezes(self, app):
+        gerar(psicologos=1, pacientes=2, anos=1, hoje=HOJE)
+        with pytest.raises(BaseJaPopulada):
+            gerar(psicologos=1, pacientes=2, anos=1, hoje=HOJE)
+
+    def test_comando(self, app, runner):
+        resultado = runner.invoke(args=['seed', '--psicologos', '2', '--pacientes', '5', '--anos', '0.5',
+                                        '--hoje', '2024-06-03'])
+        assert resultado.exit_code == 0, resultado.output
+        assert 'pacientes: 5' in resultado.output
+        assert Usuario.query.filter_by(email='admin@sintetico.test').one().check_senha('senha123')
+
+        resultado = runner.invoke(args=['seed'])
+        assert resultado.exit_code != 0
+        assert 'já contém' in resultado.output
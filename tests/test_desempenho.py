@@ -0,0 +1,67 @@
+import pytest
+from app import db
+from app.models import Agendamento, EmailPendente
+from app.dados_sinteticos import gerar
+from app.desempenho import medir, comparar, MassaAusente
+
+ENDPOINTS = {
+    'psicologo.dashboard', 'psicologo.prontuarios', 'psicologo.calendario', 'admin.dashboard',
+    'paciente.api_horarios_disponiveis', 'paciente.agendar_modal',
+}
+
+
+@pytest.fixture
+def massa(app):
+    gerar(psicologos=2, pacientes=15, anos=0.5)
+
+
+def medicao(consultas, mediana_ms, status=(200,)):
+    return {'status': list(status), 'consultas_primeira': consultas, 'consultas': consultas,
+            'mediana_ms': mediana_ms, 'p95_ms': mediana_ms}
+
+
+class TestDesempenho:
+    """Testes da medição dos endpoints"""
+
+    def test_medicao(self, app, massa):
+        agendamentos = Agendamento.query.count()
+        resultado = medir(repeticoes=2)
+        assert set(resultado['endpoints']) == ENDPOINTS
+        assert resultado['massa']['pacientes'] == 15
+        for nome in ('psicologo.dashboard', 'psicologo.calendario', 'paciente.api_horarios_disponiveis'):
+            assert resultado['endpoints'][nome]['status'] == [200]
+            assert resultado['endpoints'][nome]['consultas'] > 0
+        # Cada repetição agenda um horário livre diferente
+        assert resultado['endpoints']['paciente.agendar_modal']['status'] == [302]
+        # Agendamentos e e-mails criados pela medição são removidos
+        assert Agendamento.query.count() == agendamentos
+        assert EmailPendente.query.count() == 0
+
+    def test_sem_massa(self, app):
+        with pytest.raises(MassaAusente):
+            medir()
+
+    def test_comparacao(self):
+        referencia = {'endpoints': {'a': medicao(10, 20.0), 'b': medicao(5, 10.0, status=(500,))}}
+        assert comparar({'endpoints': {'a': medicao(10, 25.0), 'b': medicao(7, 8.0, status=(200,))}},
+                        referencia) == ['b: consultas_primeira 5 -> 7', 'b: consultas 5 -> 7']
+        assert comparar({'endpoints': {'a': medicao(9, 40.0, status=(500,))}}, referencia, tolerancia=0.5) == [
+            'a: mediana 20.0 ms -> 40.0 ms', 'a: status [200] -> [500]'
+        ]
+
+    def test_comando(self, app, runner, massa, tmp_path):
+        referencia = tmp_path / 'referencia.json'
+        resultado = runner.invoke(args=['benchmark-endpoints', '--repeticoes', '1', '--referencia', str(referencia),
+                                        '--salvar'])
+        assert resultado.exit_code == 0, resultado.output
+        assert referencia.exists()
+        resultado = runner.invoke(args=['benchmark-endpoints', '--repeticoes', '1', '--referencia', str(referencia),
+                                        '--tolerancia', '100'])
+        assert resultado.exit_code == 0, resultado.output
+        assert 'Sem regressões' in resultado.output
+
+    def test_comando_sem_referencia(self, app, runner, massa, tmp_path):
+        resultado = runner.invoke(args=['benchmark-endpoints', '--repeticoes', '1',
+                                        '--referencia', str(tmp_path / 'inexistente.json')])
+        assert resultado.exit_code != 0
+        assert 'Sem referência' in resultado.output
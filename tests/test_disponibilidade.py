@@ -0,0 +1,177 @@
+import pytest
+from datetime import datetime, date, time, timedelta
+from app import db
+from app.models import Agendamento, HorarioAtendimento
+from app.reservas import reservar_horario
+from app.disponibilidade import (
+    mascara_intervalo, mascara_sessao, inicios_possiveis, menor_bit, horario_slot, obter_indice
+)
+
+
+def proxima_data(dia_semana):
+    """Próxima data (a partir de amanhã) no dia da semana informado"""
+    amanha = date.today() + timedelta(days=1)
+    return amanha + timedelta(days=(dia_semana - amanha.weekday()) % 7)
+
+
+@pytest.fixture
+def psicologos(app, criar_usuario):
+    """Dois psicólogos: um atende de manhã e outro à tarde, todos os dias"""
+    ids = []
+    for nome, email, inicio, fim in [
+        ('Dra. Ana Lima', 'ana@teste.com', time(8, 0), time(12, 0)),
+        ('Dr. Bruno Reis', 'bruno@teste.com', time(13, 0), time(18, 0)),
+    ]:
+        psicologo = criar_usuario(nome, email, 'psicologo')
+        for dia in range(7):
+            db.session.add(HorarioAtendimento(
+                psicologo_id=psicologo.id, dia_semana=dia, hora_inicio=inicio, hora_fim=fim
+            ))
+        ids.append(psicologo.id)
+    db.session.commit()
+    return ids
+
+
+@pytest.fixture
+def paciente_logado(app, client, criar_usuario):
+    """Cria um paciente e faz login"""
+    paciente = criar_usuario('Carla Souza', 'carla@teste.com', 'paciente')
+    db.session.commit()
+    client.post('/auth/login', data={
+        'email': 'carla@teste.com',
+        'senha': 'senha123',
+        'tipo_usuario': 'paciente'
+    })
+    return paciente.id
+
+
+class TestMascaras:
+    """Testes das operações de bitmap"""
+
+    def test_mascara_intervalo(self):
+        """Expediente das 08:00 às 09:00 ocupa os intervalos 32 a 35"""
+        assert mascara_intervalo(time(8, 0), time(9, 0)) == 0b1111 << 32
+        assert mascara_intervalo(time(9, 0), time(8, 0)) == 0
+
+    def test_mascara_intervalo_fim_quebrado(self):
+        """Um expediente que termina às 08:10 ainda ocupa o intervalo das 08:00"""
+        assert mascara_intervalo(time(8, 0), time(8, 10)) == 1 << 32
+
+    def test_inicios_possiveis_exige_sessao_inteira(self):
+        """Só há início possível onde cabem 60 minutos livres"""
+        livres = mascara_intervalo(time(8, 0), time(9, 30))
+        inicios = inicios_possiveis(livres)
+        assert [horario_slot(i) for i in range(96) if inicios >> i & 1] == [
+            time(8, 0), time(8, 15), time(8, 30)
+        ]
+
+    def test_menor_bit(self):
+        assert menor_bit(0) == -1
+        assert menor_bit(mascara_sessao(time(14, 0))) == 56
+
+
+class TestIndiceDisponibilidade:
+    """Testes do índice de disponibilidade"""
+
+    def test_primeiro_horario_livre(self, app, psicologos):
+        """O primeiro horário é o início do expediente mais cedo"""
+        inicio = datetime.combine(date.today() + timedelta(days=1), time.min)
+        data_hora, livres = obter_indice().primeiro_horario_livre(inicio)
+        assert data_hora == datetime.combine(inicio.date(), time(8, 0))
+        assert livres == [psicologos[0]]
+
+    def test_psicologos_livres(self, app, psicologos):
+        """À tarde apenas o segundo psicólogo atende"""
+        data_hora = datetime.combine(proxima_data(1), time(14, 0))
+        assert obter_indice().psicologos_livres(data_hora) == [psicologos[1]]
+
+    def test_agendamento_ocupa_horario(self, app, psicologos, paciente_logado):
+        """Um agendamento registrado tira o horário do índice"""
+        indice = obter_indice()
+        data_hora = datetime.combine(proxima_data(1), time(14, 0))
+        assert indice.psicologos_livres(data_hora) == [psicologos[1]]
+
+        db.session.add(Agendamento(
+            paciente_id=paciente_logado, psicologo_id=psicologos[1], data_hora=data_hora
+        ))
+        db.session.commit()
+        indice.ocupar(psicologos[1], data_hora)
+        assert indice.psicologos_livres(data_hora) == []
+        assert indice.psicologos_livres(data_hora + timedelta(minutes=30)) == []
+        assert indice.psicologos_livres(data_hora + timedelta(hours=1)) == [psicologos[1]]
+
+    def test_cancelamento_libera_horario(self, client, psicologos, paciente_logado):
+        """Cancelar pela rota do paciente devolve o horário ao índice"""
+        data_hora = datetime.combine(proxima_data(2), time(9, 0))
+        agendamento = Agendamento(
+            paciente_id=paciente_logado, psicologo_id=psicologos[0], data_hora=data_hora
+        )
+        db.session.add(agendamento)
+        db.session.commit()
+
+        indice = obter_indice()
+        assert indice.psicologos_livres(data_hora) == []
+
+        client.post(f'/paciente/cancelar/{agendamento.id}')
+        assert indice.psicologos_livres(data_hora) == [psicologos[0]]
+
+
+class TestBuscaHorarios:
+    """Testes da API de busca de horários"""
+
+    def test_busca_requer_login(self, client):
+        response = client.get('/paciente/api/buscar-horarios')
+        assert response.status_code == 302
+
+    def test_busca_primeiro_horario(self, client, psicologos, paciente_logado):
+        amanha = date.today() + timedelta(days=1)
+        response = client.get(f'/paciente/api/buscar-horarios?data={amanha.isoformat()}')
+        assert response.status_code == 200
+        dados = response.get_json()['primeiro_horario']
+        assert dados['data'] == amanha.isoformat()
+        assert dados['horario'] == '08:00'
+        assert dados['psicologos'] == [{'id': psicologos[0], 'nome': 'Dra. Ana Lima'}]
+
+    def test_busca_quem_esta_livre(self, client, psicologos, paciente_logado):
+        data = proxima_data(1).isoformat()
+        response = client.get(f'/paciente/api/buscar-horarios?data={data}&horario=14:00')
+        assert response.status_code == 200
+        assert [p['id'] for p in response.get_json()['psicologos']] == [psicologos[1]]
+
+    def test_busca_ignora_horarios_reservados(self, client, psicologos, paciente_logado, criar_usuario):
+        """Horários reservados por outro paciente não aparecem na busca"""
+        outro = criar_usuario('Diego Alves', 'diego@teste.com', 'paciente')
+        db.session.commit()
+        amanha = date.today() + timedelta(days=1)
+        reservar_horario(outro.id, psicologos[0], datetime.combine(amanha, time(8, 0)), duracao_minutos=90)
+
+        response = client.get(f'/paciente/api/buscar-horarios?data={amanha.isoformat()}')
+        assert response.get_json()['primeiro_horario']['horario'] == '09:30'
+        response = client.get(f'/paciente/api/buscar-horarios?data={amanha.isoformat()}&horario=09:00')
+        assert response.get_json()['psicologos'] == []
+
+        # A própria reserva não esconde o horário de quem a fez
+        reservar_horario(paciente_logado, psicologos[0], datetime.combine(amanha, time(9, 30)))
+        response = client.get(f'/paciente/api/buscar-horarios?data={amanha.isoformat()}&horario=09:30')
+        assert [p['id'] for p in response.get_json()['psicologos']] == [psicologos[0]]
+
+    def test_busca_respeita_duracao(self, client, psicologos, paciente_logado):
+        """Com ``duracao`` a busca só devolve horários onde cabe a sessão inteira"""
+        amanha = date.today() + timedelta(days=1)
+        db.session.add(Agendamento(paciente_id=paciente_logado, psicologo_id=psicologos[0],
+                                   data_hora=datetime.combine(amanha, time(9, 30))))
+        db.session.commit()
+        obter_indice().ocupar(psicologos[0], datetime.combine(amanha, time(9, 30)))
+
+        url = f'/paciente/api/buscar-horarios?data={amanha.isoformat()}'
+        assert client.get(url).get_json()['primeiro_horario']['horario'] == '08:00'
+        dados = client.get(f'{url}&duracao=120').get_json()['primeiro_horario']
+        assert (dados['horario'], dados['psicologos'][0]['id']) == ('13:00', psicologos[1])
+
+        assert client.get(f'{url}&horario=10:30').get_json()['psicologos'] != []
+        assert client.get(f'{url}&horario=10:30&duracao=120').get_json()['psicologos'] == []
+        assert client.get(f'{url}&duracao=45').status_code == 400
+
+    def test_busca_formato_invalido(self, client, paciente_logado):
+        response = client.get('/paciente/api/buscar-horarios?data=31/12/2030&horario=14:00')
+        assert response.status_code == 400
@@ -0,0 +1,119 @@
+import pytest
+from datetime import datetime, date, time, timedelta
+from app import db
+from app.models import Agendamento, HorarioAtendimento
+from app.agenda import verificar_conflito, reagendar_agendamento
+from app.disponibilidade import calcular_horarios_disponiveis, obter_indice
+
+
+@pytest.fixture
+def dados(app, criar_usuario):
+    """Psicólogo com expediente das 08:00 às 12:00 e dois pacientes"""
+    psicologo = criar_usuario('Dra. Ana Lima', 'ana@teste.com', 'psicologo')
+    for dia in range(7):
+        db.session.add(HorarioAtendimento(
+            psicologo_id=psicologo.id, dia_semana=dia, hora_inicio=time(8, 0), hora_fim=time(12, 0)
+        ))
+
+    pacientes = [criar_usuario(nome, email, 'paciente').id
+                 for nome, email in [('Carla Souza', 'carla@teste.com'), ('Diego Alves', 'diego@teste.com')]]
+    db.session.commit()
+    return {'psicologo_id': psicologo.id, 'pacientes': pacientes, 'amanha': date.today() + timedelta(days=1)}
+
+
+def agendar(dados, inicio, duracao, paciente=0):
+    agendamento = Agendamento(
+        paciente_id=dados['pacientes'][paciente], psicologo_id=dados['psicologo_id'],
+        data_hora=datetime.combine(dados['amanha'], inicio), duracao_minutos=duracao
+    )
+    db.session.add(agendamento)
+    db.session.commit()
+    return agendamento
+
+
+class TestDuracaoAgendamentos:
+    """Testes de agendamentos com duração variável"""
+
+    def test_fim_calculado(self, app, dados):
+        agendamento = agendar(dados, time(8, 0), 90)
+        assert agendamento.data_hora_fim == datetime.combine(dados['amanha'], time(9, 30))
+
+        agendamento.duracao_minutos = 50
+        db.session.commit()
+        assert agendamento.data_hora_fim == datetime.combine(dados['amanha'], time(8, 50))
+
+    def test_sessoes_encostadas_nao_conflitam(self, app, dados):
+        """Uma sessão de 50 minutos não bloqueia o horário seguinte"""
+        agendar(dados, time(8, 0), 50)
+        amanha = dados['amanha']
+        assert verificar_conflito(dados['psicologo_id'], datetime.combine(amanha, time(8, 50)), 60) is None
+        assert verificar_conflito(dados['psicologo_id'], datetime.combine(amanha, time(9, 0)), 60) is None
+        assert verificar_conflito(dados['psicologo_id'], datetime.combine(amanha, time(8, 30)), 60) is not None
+
+    def test_sessao_dupla_bloqueia_intervalo(self, app, dados):
+        agendar(dados, time(9, 0), 120)
+        assert verificar_conflito(dados['psicologo_id'], datetime.combine(dados['amanha'], time(10, 0)), 60) is not None
+        assert verificar_conflito(dados['psicologo_id'], datetime.combine(dados['amanha'], time(8, 0)), 60) is None
+
+    def test_horarios_disponiveis_por_duracao(self, app, dados):
+        assert calcular_horarios_disponiveis(dados['psicologo_id'], dados['amanha'], 90) == ('08:00', '09:30')
+        agendar(dados, time(9, 0), 120)
+        assert calcular_horarios_disponiveis(dados['psicologo_id'], dados['amanha']) == ('08:00', '11:00')
+        assert calcular_horarios_disponiveis(dados['psicologo_id'], dados['amanha'], 120) == ()
+        assert calcular_horarios_disponiveis(
+            dados['psicologo_id'], dados['amanha'], 60, passo_minutos=15
+        ) == ('08:00', '11:00')
+
+    def test_indice_considera_duracao(self, app, dados):
+        agendar(dados, time(8, 0), 120)
+        inicio = datetime.combine(dados['amanha'], time(9, 0))
+        assert dados['psicologo_id'] not in obter_indice().psicologos_livres(inicio)
+        assert dados['psicologo_id'] in obter_indice().psicologos_livres(inicio + timedelta(hours=1))
+
+    def test_reagendar_sobrepondo_a_propria_sessao(self, app, dados):
+        agendamento = agendar(dados, time(8, 0), 120)
+        reagendar_agendamento(agendamento, datetime.combine(dados['amanha'], time(10, 0)))
+        agendamento = db.session.get(Agendamento, agendamento.id)
+        assert agendamento.duracao_minutos == 120
+        assert agendamento.data_hora_fim == datetime.combine(dados['amanha'], time(12, 0))
+
+
+class TestDuracaoRotas:
+    """Testes das rotas do paciente com duração de sessão"""
+
+    def test_agendar_sessao_dupla(self, app, client, dados):
+        client.post('/auth/login', data={'email': 'carla@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+        amanha = dados['amanha'].isoformat()
+        url = f"/paciente/api/horarios-disponiveis?psicologo_id={dados['psicologo_id']}&data={amanha}"
+        assert client.get(url + '&duracao=120').get_json() == {'horarios': ['08:00', '10:00']}
+        assert client.get(url + '&duracao=45').status_code == 400
+
+        client.post('/paciente/agendar_modal', data={
+            'psicologo_id': str(dados['psicologo_id']), 'data': amanha, 'horario': '08:00', 'duracao': '120'
+        })
+        assert Agendamento.query.one().duracao_minutos == 120
+        assert client.get(url).get_json() == {'horarios': ['10:00', '11:00']}
+
+    def test_agendamento_sobreposto_recusado(self, app, client, dados):
+        agendar(dados, time(8, 0), 90, paciente=1)
+        client.post('/auth/login', data={'email': 'carla@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+        client.post('/paciente/agendar_modal', data={
+            'psicologo_id': str(dados['psicologo_id']), 'data': dados['amanha'].isoformat(), 'horario': '09:00'
+        })
+        assert Agendamento.query.count() == 1
+
+    @pytest.mark.parametrize('rota', ['/paciente/agendar', '/paciente/agendar_modal'])
+    def test_agenda_travada_antes_da_checagem(self, app, client, dados, monkeypatch, rota):
+        """As rotas de agendamento travam a agenda antes de verificar sobreposição"""
+        from app.paciente import routes
+        chamadas = []
+        bloquear, verificar = routes.bloquear_agenda, routes.verificar_conflito
+        monkeypatch.setattr(routes, 'bloquear_agenda', lambda *a: chamadas.append('bloquear') or bloquear(*a))
+        monkeypatch.setattr(routes, 'verificar_conflito', lambda *a: chamadas.append('verificar') or verificar(*a))
+        client.post('/auth/login', data={'email': 'carla@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+        client.post(rota, data={
+            'psicologo_id': str(dados['psicologo_id']), 'data': dados['amanha'].isoformat(),
+            'horario': '08:30', 'duracao': '50'
+        })
+        assert chamadas == ['bloquear', 'verificar']
+        assert Agendamento.query.count() == 1
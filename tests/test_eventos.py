@@ -0,0 +1,135 @@
+import json
+import threading
+import pytest
+from datetime import datetime, date, time, timedelta
+from app import db
+from app.models import Agendamento
+from app import agenda, eventos
+from app.eventos import BrokerMemoria, canal_psicologo
+
+
+@pytest.fixture
+def dados(app, criar_usuario):
+    """Psicóloga e paciente cadastrados"""
+    ids = {}
+    for nome, email, tipo in [('Dra. Ana Lima', 'ana@teste.com', 'psicologo'),
+                              ('Carla Souza', 'carla@teste.com', 'paciente')]:
+        ids[tipo] = criar_usuario(nome, email, tipo).id
+    db.session.commit()
+    return ids
+
+
+def ler_evento(partes, limite=100):
+    """Lê o fluxo SSE até o próximo evento (ignorando heartbeats)"""
+    for _ in range(limite):
+        parte = next(partes).decode()
+        if parte.startswith('id:'):
+            campos = dict(linha.split(': ', 1) for linha in parte.strip().split('\n'))
+            return campos['event'], json.loads(campos['data']), int(campos['id'])
+    raise AssertionError('Nenhum evento recebido')
+
+
+class TestBroker:
+    """Testes do broker de eventos em memória"""
+
+    def test_entrega_por_canal(self):
+        broker = BrokerMemoria()
+        ana = broker.assinar('psicologo:1')
+        bruno = broker.assinar('psicologo:2')
+        broker.publicar('psicologo:1', {'id': 1, 'tipo': 'teste', 'dados': {}})
+        assert ana.proximo(0.01)['id'] == 1
+        assert bruno.proximo(0.01) is None
+
+        broker.cancelar(ana)
+        assert broker.clientes() == 1
+
+    def test_historico_para_reconexao(self):
+        broker = BrokerMemoria(historico=2)
+        for i in range(1, 4):
+            broker.publicar('psicologo:1', {'id': i, 'tipo': 'teste', 'dados': {}})
+        assert [e['id'] for e in broker.perdidos('psicologo:1', 1)] == [2, 3]
+
+
+class TestFluxoSSE:
+    """Testes do endpoint SSE do psicólogo"""
+
+    def test_recebe_agendamento_do_paciente(self, app, client, dados):
+        app.config['EVENTOS_HEARTBEAT_SEGUNDOS'] = 0.01
+        client.post('/auth/login', data={'email': 'ana@teste.com', 'senha': 'senha123', 'tipo_usuario': 'psicologo'})
+        response = client.get('/psicologo/eventos', buffered=False)
+        assert response.mimetype == 'text/event-stream'
+        partes = iter(response.response)
+        assert next(partes).decode() == 'retry: 5000\n\n'
+        assert next(partes).decode() == ': heartbeat\n\n'
+
+        # Outro cliente (o paciente) agenda uma consulta. Roda em outra thread
+        # porque o contexto da requisição em streaming continua ativo nesta.
+        amanha = date.today() + timedelta(days=1)
+
+        def agendar():
+            paciente = app.test_client()
+            paciente.post('/auth/login', data={'email': 'carla@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+            paciente.post('/paciente/agendar_modal', data={
+                'psicologo_id': str(dados['psicologo']), 'data': amanha.isoformat(), 'horario': '10:00'
+            })
+
+        thread = threading.Thread(target=agendar)
+        thread.start()
+        thread.join()
+
+        tipo, corpo, _ = ler_evento(partes)
+        assert tipo == 'agendamento_criado'
+        assert corpo['paciente'] == 'Carla Souza'
+        assert corpo['data_hora'] == datetime.combine(amanha, time(10, 0)).isoformat()
+        response.close()
+        assert eventos.obter_broker().clientes() == 0
+
+    def test_reconexao_recebe_perdidos(self, app, client, dados):
+        app.config['EVENTOS_HEARTBEAT_SEGUNDOS'] = 0.01
+        canal = canal_psicologo(dados['psicologo'])
+        primeiro = eventos.publicar(canal, 'agendamento_status', {'id': 1, 'status': 'realizado'})
+        segundo = eventos.publicar(canal, 'agendamento_status', {'id': 2, 'status': 'ausencia'})
+
+        client.post('/auth/login', data={'email': 'ana@teste.com', 'senha': 'senha123', 'tipo_usuario': 'psicologo'})
+        response = client.get('/psicologo/eventos', headers={'Last-Event-ID': str(primeiro['id'])}, buffered=False)
+        partes = iter(response.response)
+        _, corpo, evento_id = ler_evento(partes)
+        assert (corpo, evento_id) == ({'id': 2, 'status': 'ausencia'}, segundo['id'])
+        response.close()
+
+    def test_apenas_psicologos(self, app, client, dados):
+        client.post('/auth/login', data={'email': 'carla@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+        assert client.get('/psicologo/eventos').status_code in (302, 403)
+
+
+class TestPaineis:
+    """Testes dos dados usados pelo dashboard e pelo calendário para se atualizar"""
+
+    def test_reagendamento_informa_horario_anterior(self, app, dados):
+        amanha = datetime.combine(date.today() + timedelta(days=1), time(10, 0))
+        agendamento = Agendamento(paciente_id=dados['paciente'], psicologo_id=dados['psicologo'], data_hora=amanha)
+        db.session.add(agendamento)
+        db.session.commit()
+        assinatura = eventos.obter_broker().assinar(canal_psicologo(dados['psicologo']))
+
+        agenda.reagendar_agendamento(agendamento, amanha + timedelta(hours=3), respeitar_expediente=False)
+
+        evento = assinatura.proximo(0.1)
+        assert evento['tipo'] == 'agendamento_reagendado'
+        assert evento['dados']['data_hora'] == (amanha + timedelta(hours=3)).isoformat()
+        assert evento['dados']['data_hora_anterior'] == amanha.isoformat()
+        eventos.obter_broker().cancelar(assinatura)
+
+    @pytest.mark.parametrize('pagina', ['/psicologo/dashboard', '/psicologo/calendario'])
+    def test_paginas_assinam_o_fluxo(self, app, client, dados, pagina):
+        # Consultas de hoje aparecem nas duas páginas
+        hoje = datetime.combine(date.today(), time(23, 0))
+        agendamento = Agendamento(paciente_id=dados['paciente'], psicologo_id=dados['psicologo'], data_hora=hoje)
+        db.session.add(agendamento)
+        db.session.commit()
+
+        client.post('/auth/login', data={'email': 'ana@teste.com', 'senha': 'senha123', 'tipo_usuario': 'psicologo'})
+        html = client.get(pagina).get_data(as_text=True)
+        assert "new EventSource('/psicologo/eventos')" in html
+        assert f'data-agendamento-id="{agendamento.id}"' in html
+        assert 'status-agendamento' in html
@@ -0,0 +1,111 @@
+import json
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import db
+from app.models import Usuario, Paciente, Psicologo, Prontuario, Sessao, Agendamento, ImportacaoLegado
+from app.importacao_legado import importar
+
+AGORA = datetime(2024, 6, 1, 12, 0)
+
+
+@pytest.fixture
+def cadastros(app):
+    """Paciente e psicólogo já cadastrados; o par ainda não tem prontuário"""
+    paciente = Usuario(nome_completo='João Silva', email='joao@teste.com', tipo_usuario='paciente')
+    psicologo = Usuario(nome_completo='Dra. Ana Lima', email='ana@teste.com', tipo_usuario='psicologo')
+    paciente.set_senha('senha123')
+    psicologo.set_senha('senha123')
+    db.session.add_all([paciente, psicologo])
+    db.session.flush()
+    db.session.add_all([Paciente(usuario_id=paciente.id), Psicologo(usuario_id=psicologo.id)])
+    db.session.commit()
+
+
+CSV_MISTO = (
+    'paciente_email;psicologo_email;data_hora;duracao_minutos;status;anotacoes\n'
+    'JOAO@teste.com;ana@teste.com;10/01/2023 09:00;50;;Primeira sessão\n'
+    'joao@teste.com;ana@teste.com;2023-01-17T09:00;;cancelado;\n'
+    'maria@teste.com;ana@teste.com;2023-01-18T09:00;;;\n'
+    'joao@teste.com;ana@teste.com;ontem;;;\n'
+    'joao@teste.com;ana@teste.com;2023-01-24 09:00;;;Segunda sessão\n'
+    'joao@teste.com;ana@teste.com;2024-07-01 09:00;;;\n'
+)
+
+
+def jsonl(quantidade):
+    return '\n'.join(json.dumps({
+        'paciente_email': 'joao@teste.com',
+        'psicologo_email': 'ana@teste.com',
+        'data_hora': f'2023-03-{dia + 1:02d}T10:00:00',
+        'anotacoes': f'Sessão {dia + 1}',
+    }) for dia in range(quantidade)) + '\n'
+
+
+class TestImportacaoLegado:
+    """Testes da importação do histórico de consultas"""
+
+    def test_csv_com_erros(self, app, cadastros, tmp_path):
+        arquivo = tmp_path / 'historico.csv'
+        arquivo.write_text(CSV_MISTO, encoding='utf-8')
+        totais = importar(str(arquivo), agora=AGORA)
+        assert totais == {'processados': 6, 'importados': 4, 'sessoes': 2, 'prontuarios': 1,
+                          'erros': 2, 'retomado_de': 0}
+
+        agendamentos = Agendamento.query.order_by(Agendamento.data_hora).all()
+        assert [a.status for a in agendamentos] == ['realizado', 'cancelado', 'realizado', 'agendado']
+        assert agendamentos[0].duracao_minutos == 50
+        assert agendamentos[0].data_hora_fim == datetime(2023, 1, 10, 9, 50)
+        # Auditoria em UTC, independente do ``agora`` local usado para o status
+        assert all(abs(a.data_criacao - datetime.utcnow()) < timedelta(minutes=1) for a in agendamentos)
+
+        prontuario = Prontuario.query.one()
+        sessoes = Sessao.query.order_by(Sessao.data_sessao).all()
+        assert [s.anotacoes for s in sessoes] == ['Primeira sessão', 'Segunda sessão']
+        assert {s.prontuario_id for s in sessoes} == {prontuario.id}
+        assert sessoes[1].agendamento_id == agendamentos[2].id
+
+        erros = [json.loads(linha) for linha in (tmp_path / 'historico.csv.erros.jsonl').read_text().splitlines()]
+        assert erros == [{'registro': 4, 'erro': 'Paciente não encontrado'},
+                         {'registro': 5, 'erro': "Data inválida: 'ontem'"}]
+
+    def test_um_insert_por_tabela_e_bloco(self, app, cadastros, tmp_path):
+        arquivo = tmp_path / 'historico.jsonl'
+        arquivo.write_text(jsonl(10), encoding='utf-8')
+        instrucoes = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: instrucoes.append(args[2]))
+        totais = importar(str(arquivo), tamanho_lote=4, agora=AGORA)
+        assert totais['importados'] == 10 and totais['sessoes'] == 10 and totais['prontuarios'] == 1
+        inserts = [sql.split('(')[0].strip() for sql in instrucoes if sql.startswith('INSERT')]
+        # Três blocos: agendamentos e sessões em cada um, o prontuário só no primeiro
+        assert inserts.count('INSERT INTO agendamentos') == 3
+        assert inserts.count('INSERT INTO sessoes') == 3
+        assert inserts.count('INSERT INTO prontuarios') == 1
+
+    def test_retoma_apos_interrupcao(self, app, cadastros, tmp_path):
+        arquivo = tmp_path / 'historico.jsonl'
+        arquivo.write_text(jsonl(10), encoding='utf-8')
+
+        def interromper(totais):
+            raise KeyboardInterrupt
+        with pytest.raises(KeyboardInterrupt):
+            importar(str(arquivo), tamanho_lote=4, agora=AGORA, progresso=interromper)
+        assert Agendamento.query.count() == 4
+        assert ImportacaoLegado.query.one().registros == 4
+
+        totais = importar(str(arquivo), tamanho_lote=4, agora=AGORA)
+        assert totais['retomado_de'] == 4 and totais['importados'] == 6
+        assert Agendamento.query.count() == 10
+        assert Sessao.query.count() == 10 and Prontuario.query.count() == 1
+
+        # Arquivo já importado: nada a fazer
+        assert importar(str(arquivo), agora=AGORA)['processados'] == 0
+        assert Agendamento.query.count() == 10
+
+    def test_comando(self, app, runner, cadastros, tmp_path):
+        arquivo = tmp_path / 'historico.jsonl'
+        arquivo.write_text(jsonl(3), encoding='utf-8')
+        resultado = runner.invoke(args=['importar-historico', str(arquivo), '--lote', '2'])
+        assert resultado.exit_code == 0, resultado.output
+        assert '2 registro(s) processado(s)' in resultado.output
+        assert '3 consulta(s), 3 sessão(ões) e 1 prontuário(s) importado(s)' in resultado.output
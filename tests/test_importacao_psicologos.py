@@ -0,0 +1,101 @@
+import io
+import pytest
+from sqlalchemy import event
+from app import db, importacao_psicologos
+from app.models import Usuario, Psicologo
+from app.importacao_psicologos import MINIMO_PARA_POOL, ler_csv, importar, ArquivoInvalido
+
+
+@pytest.fixture
+def existente(app, criar_usuario):
+    usuario = criar_usuario('Dra. Ana Lima', 'ana@teste.com', 'psicologo').usuario
+    db.session.commit()
+    return usuario
+
+
+CSV_MISTO = (
+    'Nome;Email;Telefone;Senha\n'
+    'Bruno Reis;bruno@teste.com;(11) 90000-0001;senha123\n'
+    'Carla Dias;CARLA@teste.com;(11) 90000-0002;senha456\n'
+    'Carla Duplicada;carla@teste.com;(11) 90000-0003;senha789\n'
+    'Ana Repetida;ana@teste.com;(11) 90000-0004;senha123\n'
+    'Davi Curto;davi@teste.com;(11) 90000-0005;123\n'
+    'Sem Telefone;eva@teste.com;;senha123\n'
+)
+
+
+def csv_valido(quantidade):
+    linhas = ['nome,email,telefone,senha']
+    linhas += [f'Psicólogo {i},psi{i}@teste.com,(11) 9{i:04d}-0000,senha{i:03d}' for i in range(quantidade)]
+    return '\n'.join(linhas).encode()
+
+
+class TestImportacaoPsicologos:
+    """Testes do cadastro de psicólogos em lote"""
+
+    def test_linhas_validas_e_erros(self, app, existente):
+        resultado = importar(ler_csv(CSV_MISTO.encode()), processos=1)
+        assert resultado['total'] == 6 and resultado['criados'] == 2
+        assert [(erro['linha'], erro['erro']) for erro in resultado['erros']] == [
+            (4, 'E-mail repetido no arquivo (linha 3)'),
+            (5, 'E-mail já cadastrado'),
+            (6, 'A senha deve ter pelo menos 6 caracteres'),
+            (7, 'Todos os campos são obrigatórios'),
+        ]
+        carla = Usuario.query.filter_by(email='carla@teste.com').one()
+        assert carla.tipo_usuario == 'psicologo' and carla.ativo and carla.check_senha('senha456')
+        assert carla.psicologo is not None
+
+    def test_insercao_em_lotes_com_pool(self, app):
+        instrucoes = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: instrucoes.append(args[2]))
+        resultado = importar(ler_csv(csv_valido(12)), processos=2, tamanho_lote=5)
+        assert resultado['criados'] == 12 and resultado['erros'] == []
+        # Três lotes: um INSERT de usuários e um de psicólogos por lote
+        assert sum(1 for sql in instrucoes if sql.startswith('INSERT')) == 6
+        assert Psicologo.query.count() == 12
+        assert Usuario.query.filter_by(email='psi7@teste.com').one().check_senha('senha007')
+
+    def test_simulacao_nao_grava(self, app):
+        resultado = importar(ler_csv(csv_valido(3)), simular=True)
+        assert resultado['validas'] == 3 and resultado['criados'] == 0
+        assert Usuario.query.count() == 0
+
+    def test_colunas_obrigatorias(self):
+        with pytest.raises(ArquivoInvalido):
+            ler_csv(b'nome,email\nAna,ana@teste.com\n')
+
+    def test_upload_pelo_admin(self, app, client, admin_user, existente):
+        client.post('/auth/login', data={'email': 'admin@teste.com', 'senha': 'senha123', 'tipo_usuario': 'admin'})
+        response = client.post('/admin/importar_psicologos', data={
+            'arquivo': (io.BytesIO(CSV_MISTO.encode()), 'psicologos.csv')
+        }, content_type='multipart/form-data')
+        assert response.status_code == 200
+        pagina = response.get_data(as_text=True)
+        assert '2 psicólogo(s) cadastrado(s)' in pagina
+        assert 'E-mail repetido no arquivo' in pagina
+
+    def test_upload_acima_do_limite(self, app, client, admin_user, monkeypatch):
+        """O painel calcula os hashes em série e recusa arquivos grandes, sem abrir processos"""
+        app.config['IMPORTACAO_LIMITE_WEB'] = 2
+        monkeypatch.setattr(importacao_psicologos, 'ProcessPoolExecutor', None)
+        client.post('/auth/login', data={'email': 'admin@teste.com', 'senha': 'senha123', 'tipo_usuario': 'admin'})
+        response = client.post('/admin/importar_psicologos', data={
+            'arquivo': (io.BytesIO(csv_valido(3)), 'psicologos.csv')
+        }, content_type='multipart/form-data')
+        assert 'pelo painel o limite é 2' in response.get_data(as_text=True)
+        assert Psicologo.query.count() == 0
+
+        app.config['IMPORTACAO_LIMITE_WEB'] = 100
+        app.config['IMPORTACAO_PROCESSOS'] = 4
+        response = client.post('/admin/importar_psicologos', data={
+            'arquivo': (io.BytesIO(csv_valido(MINIMO_PARA_POOL)), 'psicologos.csv')
+        }, content_type='multipart/form-data')
+        assert Psicologo.query.count() == MINIMO_PARA_POOL
+
+    def test_comando(self, app, runner, tmp_path):
+        arquivo = tmp_path / 'psicologos.csv'
+        arquivo.write_bytes(csv_valido(2))
+        resultado = runner.invoke(args=['importar-psicologos', str(arquivo), '--processos', '1'])
+        assert resultado.exit_code == 0
+        assert '2 psicólogo(s) cadastrado(s)' in resultado.output
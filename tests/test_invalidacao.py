@@ -0,0 +1,111 @@
+import pytest
+from datetime import datetime, date, time, timedelta
+from app import db, invalidacao
+from app.models import Agendamento, HorarioAtendimento
+from app.disponibilidade import obter_indice, mascara_sessao, indice_slot
+from app.invalidacao import BarramentoMemoria, CacheLocal, corresponde
+
+
+@pytest.fixture
+def psicologo(app, criar_usuario):
+    """Psicóloga que atende das 8h às 12h todos os dias"""
+    psicologo = criar_usuario('Dra. Ana Lima', 'ana@teste.com', 'psicologo')
+    for dia in range(7):
+        db.session.add(HorarioAtendimento(
+            psicologo_id=psicologo.id, dia_semana=dia, hora_inicio=time(8, 0), hora_fim=time(12, 0)
+        ))
+    db.session.commit()
+    return psicologo.id
+
+
+@pytest.fixture
+def paciente_logado(app, client, criar_usuario):
+    """Cria um paciente e faz login"""
+    paciente = criar_usuario('Carla Souza', 'carla@teste.com', 'paciente')
+    db.session.commit()
+    client.post('/auth/login', data={'email': 'carla@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+    return paciente.id
+
+
+class TestBarramento:
+    """Testes do barramento e dos caches locais"""
+
+    def test_correspondencia_por_segmentos(self):
+        assert corresponde('psicologos', 'psicologos:diretorio')
+        assert corresponde('psicologos:diretorio', 'psicologos')
+        assert corresponde('', 'disponibilidade')
+        assert not corresponde('psicologos_arquivo', 'psicologos')
+        assert not corresponde('disponibilidade:agenda:1', 'disponibilidade:agenda:10')
+
+    def test_cache_invalidado_por_prefixo(self):
+        barramento = BarramentoMemoria()
+        cache = CacheLocal('psicologos', ttl=60)
+        barramento.assinar('psicologos', cache.invalidar)
+        cargas = []
+
+        def carregar():
+            cargas.append(1)
+            return len(cargas)
+
+        assert cache.obter('psicologos:diretorio', carregar) == 1
+        assert cache.obter('psicologos:diretorio', carregar) == 1
+        barramento.publicar('agendamentos')
+        assert cache.obter('psicologos:diretorio', carregar) == 1
+        barramento.publicar('psicologos:3')
+        assert cache.obter('psicologos:diretorio', carregar) == 1
+        barramento.publicar('psicologos')
+        assert cache.obter('psicologos:diretorio', carregar) == 2
+
+    def test_assinante_apenas_remotas(self):
+        barramento = BarramentoMemoria()
+        recebidas = []
+        barramento.assinar('disponibilidade', recebidas.append, apenas_remotas=True)
+        barramento.publicar('disponibilidade:expediente:1')
+        assert recebidas == []
+        barramento.entregar('disponibilidade:expediente:1', remota=True)
+        assert recebidas == ['disponibilidade:expediente:1']
+
+
+class TestInvalidacaoDisponibilidade:
+    """O índice descarta o que outro processo alterou"""
+
+    def test_agendamento_de_outro_processo(self, app, psicologo, paciente_logado):
+        data = date.today() + timedelta(days=1)
+        indice = obter_indice()
+        antes = indice.horarios_livres(psicologo, data)
+        assert antes >> indice_slot(time(9, 0)) & 1
+
+        # Outro worker grava o agendamento e publica a invalidação
+        db.session.add(Agendamento(
+            paciente_id=paciente_logado, psicologo_id=psicologo,
+            data_hora=datetime.combine(data, time(9, 0)), status='agendado'
+        ))
+        db.session.commit()
+        assert indice.horarios_livres(psicologo, data) == antes
+
+        invalidacao.obter_barramento().entregar(f'disponibilidade:agenda:{psicologo}:{data.isoformat()}')
+        assert indice.horarios_livres(psicologo, data) & mascara_sessao(time(9, 0)) == 0
+
+    def test_agendamento_local_publica_chave(self, app, client, psicologo, paciente_logado):
+        publicadas = []
+        invalidacao.obter_barramento().assinar('disponibilidade', publicadas.append)
+        data = date.today() + timedelta(days=1)
+        client.post('/paciente/agendar_modal', data={
+            'psicologo_id': str(psicologo), 'data': data.isoformat(), 'horario': '10:00'
+        })
+        assert publicadas == [f'disponibilidade:agenda:{psicologo}:{data.isoformat()}']
+
+
+class TestDiretorioPsicologos:
+    """O diretório de psicólogos fica em cache até um cadastro invalidá-lo"""
+
+    def test_cadastro_invalida_diretorio(self, app, client, psicologo, paciente_logado, criar_usuario):
+        nomes = lambda: [p['nome'] for p in client.get('/paciente/api/psicologos').get_json()['psicologos']]
+        assert nomes() == ['Dra. Ana Lima']
+
+        criar_usuario('Dr. Bruno Reis', 'bruno@teste.com', 'psicologo')
+        db.session.commit()
+        assert nomes() == ['Dra. Ana Lima']
+
+        invalidacao.publicar('psicologos')
+        assert nomes() == ['Dra. Ana Lima', 'Dr. Bruno Reis']
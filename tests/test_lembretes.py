@@ -0,0 +1,133 @@
+import socket
+import socketserver
+import threading
+import pytest
+from datetime import datetime, date, time, timedelta
+from app import db
+from app.models import Agendamento, LembreteEnviado
+from app.emails import EnvioMemoria, EnvioSMTP, criar_mensagem, obter_envio
+from app.lembretes import enviar_lembretes, janelas
+
+
+class _ConexaoSMTP(socketserver.StreamRequestHandler):
+    """Atende o mínimo do protocolo SMTP e guarda as mensagens recebidas"""
+
+    def responder(self, linha):
+        self.wfile.write(linha.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.conexoes += 1
+        self.responder('220 stub')
+        while True:
+            linha = self.rfile.readline().decode().strip()
+            if not linha:
+                return
+            comando = linha.split(' ')[0].upper()
+            if comando == 'EHLO':
+                self.responder('250 stub')
+            elif comando == 'DATA':
+                self.responder('354 fim com .')
+                corpo = []
+                while True:
+                    dado = self.rfile.readline().decode()
+                    if dado.rstrip('\r\n') == '.':
+                        break
+                    corpo.append(dado)
+                self.server.mensagens.append(''.join(corpo))
+                self.responder('250 ok')
+            elif comando == 'QUIT':
+                self.responder('221 tchau')
+                return
+            else:
+                self.responder('250 ok')
+
+
+@pytest.fixture
+def servidor_smtp():
+    """Servidor SMTP local que apenas registra conexões e mensagens"""
+    servidor = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _ConexaoSMTP)
+    servidor.conexoes = 0
+    servidor.mensagens = []
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def dados(app, criar_usuario):
+    """Psicólogo e paciente com consultas em 1h, 20h e 3 dias"""
+    ids = {}
+    for nome, email, tipo in [('Dra. Ana Lima', 'ana@teste.com', 'psicologo'),
+                              ('Carla Souza', 'carla@teste.com', 'paciente')]:
+        ids[tipo] = criar_usuario(nome, email, tipo).id
+
+    agora = datetime(2030, 3, 4, 10, 0)
+    for horas in (1, 20, 72):
+        db.session.add(Agendamento(
+            paciente_id=ids['paciente'], psicologo_id=ids['psicologo'],
+            data_hora=agora + timedelta(hours=horas)
+        ))
+    db.session.commit()
+    return agora
+
+
+class TestLembretes:
+    """Testes do envio de lembretes de consulta"""
+
+    def test_janelas(self, app):
+        assert janelas() == [('2h', 0, 2), ('24h', 2, 24)]
+
+    def test_envio_idempotente(self, app, dados):
+        assert enviar_lembretes(agora=dados) == {'enviados': 2, 'falhas': 0}
+        enviadas = obter_envio().enviadas
+        assert [m['To'] for m in enviadas] == ['carla@teste.com', 'carla@teste.com']
+        assert 'Dra. Ana Lima' in enviadas[0].get_content()
+
+        # A consulta em 1h recebeu só o lembrete de 2h; nada se repete
+        assert {l.tipo for l in LembreteEnviado.query.all()} == {'2h', '24h'}
+        assert enviar_lembretes(agora=dados) == {'enviados': 0, 'falhas': 0}
+
+        # 19h depois, a consulta das 20h entra na janela de 2h
+        assert enviar_lembretes(agora=dados + timedelta(hours=19)) == {'enviados': 1, 'falhas': 0}
+
+    def test_consulta_cancelada_sem_lembrete(self, app, dados):
+        Agendamento.query.update({'status': 'cancelado'})
+        db.session.commit()
+        assert enviar_lembretes(agora=dados)['enviados'] == 0
+
+    def test_comando(self, runner, app):
+        result = runner.invoke(args=['enviar-lembretes'])
+        assert '0 lembrete(s) enviado(s), 0 falha(s)' in result.output
+
+
+class TestEnvioSMTP:
+    """Testes do backend SMTP contra um servidor local"""
+
+    def test_lote_em_uma_conexao(self, app, servidor_smtp):
+        envio = EnvioSMTP('127.0.0.1', servidor_smtp.server_address[1])
+        mensagens = [criar_mensagem(f'paciente{i}@teste.com', 'Lembrete', 'Corpo') for i in range(5)]
+        assert envio.enviar_lote(mensagens) == [None] * 5
+        assert servidor_smtp.conexoes == 1
+        assert len(servidor_smtp.mensagens) == 5
+        assert 'paciente3@teste.com' in servidor_smtp.mensagens[3]
+
+    def test_lembretes_por_smtp(self, app, dados, servidor_smtp):
+        app.extensions['envio_email'] = EnvioSMTP('127.0.0.1', servidor_smtp.server_address[1])
+        assert enviar_lembretes(agora=dados, tamanho_lote=10)['enviados'] == 2
+        # Uma conexão por lote: um lote em cada janela
+        assert servidor_smtp.conexoes == 2
+
+    def test_servidor_inacessivel(self, app, dados):
+        """Falha de conexão conta o lote como falho e não registra os lembretes"""
+        with socket.socket() as livre:
+            livre.bind(('127.0.0.1', 0))
+            porta = livre.getsockname()[1]
+        app.extensions['envio_email'] = EnvioSMTP('127.0.0.1', porta, timeout=1)
+        assert enviar_lembretes(agora=dados) == {'enviados': 0, 'falhas': 2}
+        assert LembreteEnviado.query.count() == 0
+
+        # Na execução seguinte os lembretes são tentados de novo
+        app.extensions['envio_email'] = EnvioMemoria()
+        assert enviar_lembretes(agora=dados) == {'enviados': 2, 'falhas': 0}
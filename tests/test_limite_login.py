@@ -0,0 +1,124 @@
+import pytest
+from datetime import datetime, timedelta
+from app import create_app, db, senhas, limite_login
+from app.limite_login import LimitadorMemoria, LimitadorBanco
+from app.models import TentativaLogin
+from config import config
+
+
+@pytest.fixture
+def usuario(app, criar_usuario):
+    usuario = criar_usuario('Carla Souza', 'carla@teste.com', 'paciente').usuario
+    db.session.commit()
+    return usuario
+
+
+@pytest.fixture
+def verificacoes(monkeypatch):
+    """Conta as verificações de senha (hashes calculados)"""
+    chamadas = []
+    original = senhas.verificar
+
+    def verificar(senha_hash, senha):
+        chamadas.append(senha)
+        return original(senha_hash, senha)
+    monkeypatch.setattr(senhas, 'verificar', verificar)
+    return chamadas
+
+
+@pytest.fixture
+def app_atras_de_proxy(monkeypatch):
+    """Aplicação configurada com um proxy reverso confiável"""
+    monkeypatch.setattr(config['testing'], 'PROXY_SALTOS_CONFIAVEIS', 1)
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+def tentar(client, senha, email='carla@teste.com', ip=None):
+    cabecalhos = {'X-Forwarded-For': ip} if ip else {}
+    return client.post('/auth/api/login', json={'email': email, 'senha': senha, 'tipo_usuario': 'paciente'},
+                       headers=cabecalhos)
+
+
+CHAVES = {'ip': 'ip:10.0.0.1', 'email': 'email:carla@teste.com'}
+
+
+class TestLimiteLogin:
+    """Testes do limite de tentativas de login"""
+
+    def test_recusa_por_email_antes_do_hash(self, app, client, usuario, verificacoes):
+        for _ in range(5):
+            assert tentar(client, 'errada').status_code == 401
+        assert len(verificacoes) == 5
+
+        response = tentar(client, 'senha123')
+        assert response.status_code == 429
+        assert 0 < int(response.headers['Retry-After']) <= 900
+        assert len(verificacoes) == 5
+        assert limite_login.obter_limitador().estatisticas()['recusadas']['email'] == 1
+
+    def test_sucesso_zera_contador_do_email(self, app, client, usuario):
+        for _ in range(4):
+            tentar(client, 'errada')
+        assert tentar(client, 'senha123').status_code == 200
+        client.post('/auth/api/logout')
+        for _ in range(4):
+            assert tentar(client, 'errada').status_code == 401
+
+    def test_recusa_por_ip(self, app, client, usuario):
+        limite_login.obter_limitador().limites['ip'] = (3, 60)
+        for indice in range(3):
+            assert tentar(client, 'x', email=f'outro{indice}@teste.com').status_code == 401
+        assert tentar(client, 'senha123').status_code == 429
+
+    def test_ip_encaminhado_pelo_proxy(self, app_atras_de_proxy):
+        """Atrás do proxy, cada cliente é limitado pelo próprio IP e não pelo do proxy"""
+        client = app_atras_de_proxy.test_client()
+        limite_login.obter_limitador().limites['ip'] = (3, 60)
+        for indice in range(3):
+            tentar(client, 'x', email=f'outro{indice}@teste.com', ip='203.0.113.7')
+        assert tentar(client, 'x', email='mais@teste.com', ip='203.0.113.7').status_code == 429
+        assert tentar(client, 'x', email='mais@teste.com', ip='198.51.100.23').status_code == 401
+
+    def test_cabecalho_ignorado_sem_proxy(self, app, client, usuario):
+        """Sem proxy confiável, X-Forwarded-For não permite escapar do limite"""
+        limite_login.obter_limitador().limites['ip'] = (3, 60)
+        for indice in range(3):
+            tentar(client, 'x', email=f'outro{indice}@teste.com', ip=f'203.0.113.{indice}')
+        assert tentar(client, 'x', email='mais@teste.com', ip='198.51.100.23').status_code == 429
+
+    def test_formulario_de_login(self, app, client, usuario):
+        limite_login.obter_limitador().limites['email'] = (1, 60)
+        dados = {'email': 'carla@teste.com', 'senha': 'errada', 'tipo_usuario': 'paciente'}
+        assert client.post('/auth/login', data=dados).status_code == 200
+        response = client.post('/auth/login', data=dados)
+        assert response.status_code == 429
+        assert 'Muitas tentativas' in response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize('classe', [LimitadorMemoria, LimitadorBanco])
+def test_janela_deslizante(app, classe):
+    limitador = classe({'ip': (10, 60), 'email': (3, 60)})
+    inicio = datetime.utcnow()
+    for segundos in (0, 10, 20):
+        assert limitador.espera(CHAVES, inicio + timedelta(seconds=segundos)) == 0
+        limitador.registrar_falha(CHAVES, inicio + timedelta(seconds=segundos))
+
+    # Bloqueado até a primeira falha sair da janela
+    assert limitador.espera(CHAVES, inicio + timedelta(seconds=30)) == 30
+    assert limitador.espera(CHAVES, inicio + timedelta(seconds=61)) == 0
+
+
+def test_backend_banco_compartilhado(app):
+    limites = {'ip': (2, 60), 'email': (5, 60)}
+    primeiro, segundo = LimitadorBanco(limites), LimitadorBanco(limites)
+    agora = datetime.utcnow()
+    primeiro.registrar_falha(CHAVES, agora)
+    segundo.registrar_falha(CHAVES, agora)
+    assert primeiro.espera(CHAVES, agora) > 0 and segundo.espera(CHAVES, agora) > 0
+
+    assert primeiro.varrer(agora + timedelta(minutes=2)) == 4
+    assert TentativaLogin.query.count() == 0
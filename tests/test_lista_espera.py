@@ -0,0 +1,147 @@
+import pytest
+from datetime import datetime, date, time, timedelta
+from app import db
+from app.models import Agendamento, ListaEspera, ReservaHorario
+from app import lista_espera
+from app.reservas import reservar_horario
+
+
+@pytest.fixture
+def psicologo_id(app, criar_usuario):
+    psicologo = criar_usuario('Dra. Ana Lima', 'ana@teste.com', 'psicologo')
+    db.session.commit()
+    return psicologo.id
+
+
+@pytest.fixture
+def pacientes(app, criar_usuario):
+    ids = [
+        criar_usuario('Carla Souza', 'carla@teste.com', 'paciente').id,
+        criar_usuario('Diego Alves', 'diego@teste.com', 'paciente').id,
+        criar_usuario('Elisa Prado', 'elisa@teste.com', 'paciente').id,
+    ]
+    db.session.commit()
+    return ids
+
+
+@pytest.fixture
+def horario():
+    """Horário futuro (daqui a 3 dias, às 14:00)"""
+    return datetime.combine(date.today() + timedelta(days=3), time(14, 0))
+
+
+def inscrever(paciente_id, psicologo_id, dia_semana, inicio, fim):
+    inscricao = ListaEspera(
+        paciente_id=paciente_id, psicologo_id=psicologo_id, dia_semana=dia_semana,
+        hora_inicio=inicio, hora_fim=fim
+    )
+    db.session.add(inscricao)
+    db.session.commit()
+    return inscricao
+
+
+class TestListaEspera:
+    """Testes do casamento de horários liberados com a lista de espera"""
+
+    def test_oferta_ao_primeiro_elegivel(self, app, psicologo_id, pacientes, horario):
+        """A oferta vai para o inscrito mais antigo cuja janela contém o horário"""
+        dia = horario.weekday()
+        inscrever(pacientes[0], psicologo_id, (dia + 1) % 7, time(8, 0), time(18, 0))
+        inscrever(pacientes[1], psicologo_id, dia, time(8, 0), time(12, 0))
+        elegivel = inscrever(pacientes[2], psicologo_id, dia, time(13, 0), time(18, 0))
+
+        inscricao = lista_espera.ofertar_horario(psicologo_id, horario)
+        assert inscricao.id == elegivel.id
+        assert inscricao.status == 'ofertado'
+        reserva = ReservaHorario.query.one()
+        assert (reserva.paciente_id, reserva.data_hora) == (pacientes[2], horario)
+
+    def test_oferta_reserva_duracao_cancelada(self, app, psicologo_id, pacientes, horario):
+        """A reserva da oferta cobre a duração da consulta cancelada"""
+        inscrever(pacientes[0], psicologo_id, horario.weekday(), time(13, 0), time(18, 0))
+        inscricao = lista_espera.ofertar_horario(psicologo_id, horario, 120)
+        assert inscricao.oferta_duracao_minutos == 120
+        assert ReservaHorario.query.one().data_hora_fim == horario + timedelta(minutes=120)
+
+    def test_oferta_convive_com_reserva_do_modal(self, app, psicologo_id, pacientes, horario):
+        """A oferta não tira do paciente o horário que ele segura no modal, e vice-versa"""
+        no_modal = horario + timedelta(days=1)
+        reservar_horario(pacientes[0], psicologo_id, no_modal)
+        inscrever(pacientes[0], psicologo_id, horario.weekday(), time(13, 0), time(18, 0))
+        assert lista_espera.ofertar_horario(psicologo_id, horario) is not None
+        assert {r.data_hora for r in ReservaHorario.query} == {no_modal, horario}
+
+        # Trocar o horário do modal libera só a reserva anterior do modal
+        outro = no_modal + timedelta(hours=1)
+        assert reservar_horario(pacientes[0], psicologo_id, outro) is not None
+        assert {r.data_hora for r in ReservaHorario.query} == {outro, horario}
+
+    def test_sessao_precisa_caber_na_janela(self, app, psicologo_id, pacientes, horario):
+        """Uma consulta de 120 minutos às 14:00 não é ofertada a quem só pode até as 15:00"""
+        dia = horario.weekday()
+        inscrever(pacientes[0], psicologo_id, dia, time(13, 0), time(15, 0))
+        cabe = inscrever(pacientes[1], psicologo_id, dia, time(14, 0), time(16, 0))
+        assert lista_espera.ofertar_horario(psicologo_id, horario, 120).id == cabe.id
+
+    def test_sem_elegiveis(self, app, psicologo_id, pacientes, horario):
+        inscrever(pacientes[0], psicologo_id, horario.weekday(), time(8, 0), time(12, 0))
+        assert lista_espera.ofertar_horario(psicologo_id, horario) is None
+        assert ReservaHorario.query.count() == 0
+
+    def test_oferta_vencida_passa_ao_proximo(self, app, psicologo_id, pacientes, horario):
+        dia = horario.weekday()
+        primeiro = inscrever(pacientes[0], psicologo_id, dia, time(13, 0), time(18, 0))
+        segundo = inscrever(pacientes[1], psicologo_id, dia, time(13, 0), time(18, 0))
+        lista_espera.ofertar_horario(psicologo_id, horario)
+
+        depois_do_prazo = datetime.utcnow() + timedelta(hours=1)
+        assert lista_espera.expirar_ofertas(agora=depois_do_prazo) == 1
+        assert db.session.get(ListaEspera, primeiro.id).status == 'aguardando'
+        assert db.session.get(ListaEspera, segundo.id).status == 'ofertado'
+        assert ReservaHorario.query.one().paciente_id == pacientes[1]
+
+
+class TestListaEsperaRotas:
+    """Testes das rotas da lista de espera"""
+
+    def test_cancelamento_oferece_horario(self, app, client, psicologo_id, pacientes, horario):
+        """Cancelar uma consulta oferece o horário ao paciente da lista de espera"""
+        agendamento = Agendamento(paciente_id=pacientes[0], psicologo_id=psicologo_id, data_hora=horario)
+        db.session.add(agendamento)
+        db.session.commit()
+        inscricao = inscrever(pacientes[1], psicologo_id, horario.weekday(), time(13, 0), time(18, 0))
+
+        client.post('/auth/login', data={'email': 'carla@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+        client.post(f'/paciente/cancelar/{agendamento.id}')
+        assert db.session.get(ListaEspera, inscricao.id).status == 'ofertado'
+
+        # O paciente da lista de espera aceita a oferta agendando o horário
+        client.get('/auth/logout')
+        client.post('/auth/login', data={'email': 'diego@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+        dados = client.get('/paciente/api/lista-espera').get_json()
+        assert dados['inscricoes'][0]['oferta']['horario'] == '14:00'
+
+        client.post('/paciente/agendar_modal', data={
+            'psicologo_id': str(psicologo_id),
+            'data': horario.strftime('%Y-%m-%d'),
+            'horario': '14:00'
+        })
+        db.session.expire_all()
+        assert db.session.get(ListaEspera, inscricao.id).status == 'atendido'
+        assert Agendamento.query.filter_by(paciente_id=pacientes[1], status='agendado').count() == 1
+
+    def test_inscricao(self, app, client, psicologo_id, pacientes):
+        client.post('/auth/login', data={'email': 'carla@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+        response = client.post('/paciente/api/lista-espera', json={
+            'psicologo_id': psicologo_id, 'dia_semana': 1, 'hora_inicio': '14:00', 'hora_fim': '18:00'
+        })
+        assert response.status_code == 201
+        inscricao_id = response.get_json()['inscricao']['id']
+
+        response = client.post('/paciente/api/lista-espera', json={
+            'psicologo_id': psicologo_id, 'dia_semana': 1, 'hora_inicio': '18:00', 'hora_fim': '14:00'
+        })
+        assert response.status_code == 400
+
+        assert client.post(f'/paciente/api/lista-espera/{inscricao_id}/cancelar').status_code == 200
+        assert client.get('/paciente/api/lista-espera').get_json() == {'inscricoes': []}
@@ -0,0 +1,67 @@
+import os
+from datetime import datetime
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import downgrade, upgrade
+from sqlalchemy import text
+from app import db
+from app.models import Agendamento, Usuario
+
+MIGRACOES = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+
+
+def diferencas():
+    """Diferenças entre o banco e os modelos, como o ``flask db migrate`` as veria"""
+    with db.engine.connect() as conexao:
+        return compare_metadata(MigrationContext.configure(conexao), db.metadata)
+
+
+def revisao_atual():
+    with db.engine.connect() as conexao:
+        return MigrationContext.configure(conexao).get_current_revision()
+
+
+class TestMigracoes:
+    """Testes das revisões do Alembic em ``migrations/``"""
+
+    def test_banco_novo_igual_aos_modelos(self, app):
+        db.drop_all()
+        upgrade(directory=MIGRACOES)
+        assert diferencas() == []
+
+    def test_banco_anterior_as_migracoes(self, app):
+        """Um banco da primeira versão recebe colunas, fim das consultas e índices"""
+        db.drop_all()
+        upgrade(directory=MIGRACOES, revision='0001')
+        with db.engine.begin() as conexao:
+            conexao.execute(text(
+                "INSERT INTO agendamentos (paciente_id, psicologo_id, data_hora, status, data_criacao, data_atualizacao) "
+                "VALUES (1, 1, '2024-03-04 14:00:00.000000', 'agendado', '2024-03-01 10:00:00', '2024-03-01 10:00:00')"
+            ))
+            conexao.execute(text(
+                "INSERT INTO usuarios (nome_completo, email, senha_hash, tipo_usuario, ativo, data_criacao) "
+                "VALUES ('Ana Lima', 'ana@teste.com', 'x', 'paciente', 1, '2024-03-01 10:00:00')"
+            ))
+            # Bancos criados por db.create_all() não têm o controle de versão
+            conexao.execute(text('DROP TABLE alembic_version'))
+
+        upgrade(directory=MIGRACOES)
+        assert diferencas() == []
+        agendamento = db.session.get(Agendamento, 1)
+        assert agendamento.duracao_minutos == 60
+        assert agendamento.data_hora_fim == datetime(2024, 3, 4, 15, 0)
+        assert Usuario.query.one().versao_senha == 0
+
+    def test_banco_do_create_all_atual(self, app):
+        """Revisões aplicadas sobre um esquema já completo não alteram nada"""
+        upgrade(directory=MIGRACOES)
+        assert diferencas() == []
+        assert revisao_atual() is not None
+
+    def test_downgrade(self, app):
+        db.drop_all()
+        upgrade(directory=MIGRACOES)
+        downgrade(directory=MIGRACOES, revision='base')
+        assert revisao_atual() is None
+        upgrade(directory=MIGRACOES)
+        assert diferencas() == []
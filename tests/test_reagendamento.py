@@ -0,0 +1,99 @@
+import pytest
+from datetime import datetime, date, time, timedelta
+from app import db
+from app.models import Agendamento, HorarioAtendimento
+from app.agenda import reagendar_agendamento, ErroAgendamento
+
+
+@pytest.fixture
+def dados(app, criar_usuario):
+    """Psicólogo com expediente das 08:00 às 12:00, dois pacientes e uma consulta"""
+    psicologo = criar_usuario('Dra. Ana Lima', 'ana@teste.com', 'psicologo')
+    for dia in range(7):
+        db.session.add(HorarioAtendimento(
+            psicologo_id=psicologo.id, dia_semana=dia, hora_inicio=time(8, 0), hora_fim=time(12, 0)
+        ))
+
+    pacientes = [criar_usuario(nome, email, 'paciente').id
+                 for nome, email in [('Carla Souza', 'carla@teste.com'), ('Diego Alves', 'diego@teste.com')]]
+
+    amanha = date.today() + timedelta(days=1)
+    agendamento = Agendamento(
+        paciente_id=pacientes[0], psicologo_id=psicologo.id,
+        data_hora=datetime.combine(amanha, time(8, 0)), status='confirmado'
+    )
+    db.session.add(agendamento)
+    db.session.commit()
+    return {'psicologo_id': psicologo.id, 'pacientes': pacientes, 'agendamento_id': agendamento.id, 'amanha': amanha}
+
+
+class TestReagendamento:
+    """Testes da operação de reagendamento"""
+
+    def test_reagendar_mantem_registro(self, app, dados):
+        agendamento = db.session.get(Agendamento, dados['agendamento_id'])
+        nova = datetime.combine(dados['amanha'], time(10, 0))
+        anterior = reagendar_agendamento(agendamento, nova)
+
+        assert anterior == datetime.combine(dados['amanha'], time(8, 0))
+        assert Agendamento.query.count() == 1
+        agendamento = db.session.get(Agendamento, dados['agendamento_id'])
+        assert agendamento.data_hora == nova
+        assert agendamento.status == 'agendado'
+
+    def test_conflito_no_horario_destino(self, app, dados):
+        db.session.add(Agendamento(
+            paciente_id=dados['pacientes'][1], psicologo_id=dados['psicologo_id'],
+            data_hora=datetime.combine(dados['amanha'], time(9, 0))
+        ))
+        db.session.commit()
+        agendamento = db.session.get(Agendamento, dados['agendamento_id'])
+        with pytest.raises(ErroAgendamento):
+            reagendar_agendamento(agendamento, datetime.combine(dados['amanha'], time(9, 0)), respeitar_expediente=False)
+        assert db.session.get(Agendamento, dados['agendamento_id']).data_hora.time() == time(8, 0)
+
+    def test_fora_do_expediente(self, app, dados):
+        agendamento = db.session.get(Agendamento, dados['agendamento_id'])
+        with pytest.raises(ErroAgendamento):
+            reagendar_agendamento(agendamento, datetime.combine(dados['amanha'], time(15, 0)))
+        # O psicólogo pode mover para fora do expediente publicado
+        reagendar_agendamento(agendamento, datetime.combine(dados['amanha'], time(15, 0)), respeitar_expediente=False)
+
+    def test_consulta_cancelada(self, app, dados):
+        agendamento = db.session.get(Agendamento, dados['agendamento_id'])
+        agendamento.status = 'cancelado'
+        db.session.commit()
+        with pytest.raises(ErroAgendamento):
+            reagendar_agendamento(agendamento, datetime.combine(dados['amanha'], time(10, 0)))
+
+
+class TestReagendamentoRotas:
+    """Testes das rotas de reagendamento"""
+
+    def test_api_paciente(self, app, client, dados):
+        client.post('/auth/login', data={'email': 'carla@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+        url = f"/paciente/api/agendamentos/{dados['agendamento_id']}/reagendar"
+
+        response = client.post(url, json={'data': dados['amanha'].isoformat(), 'horario': '11:00'})
+        assert response.status_code == 200
+        assert response.get_json()['agendamento']['id'] == dados['agendamento_id']
+
+        response = client.post(url, json={'data': dados['amanha'].isoformat(), 'horario': '19:00'})
+        assert response.status_code == 409
+
+    def test_api_psicologo(self, app, client, dados):
+        client.post('/auth/login', data={'email': 'ana@teste.com', 'senha': 'senha123', 'tipo_usuario': 'psicologo'})
+        response = client.post(
+            f"/psicologo/api/agendamentos/{dados['agendamento_id']}/reagendar",
+            json={'data': dados['amanha'].isoformat(), 'horario': '13:30'}
+        )
+        assert response.status_code == 200
+        assert db.session.get(Agendamento, dados['agendamento_id']).data_hora.time() == time(13, 30)
+
+    def test_formulario_paciente(self, app, client, dados):
+        client.post('/auth/login', data={'email': 'carla@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+        response = client.post(f"/paciente/reagendar_consulta/{dados['agendamento_id']}", data={
+            'data': dados['amanha'].isoformat(), 'horario': '09:00'
+        })
+        assert response.status_code == 302
+        assert db.session.get(Agendamento, dados['agendamento_id']).data_hora.time() == time(9, 0)
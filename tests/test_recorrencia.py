@@ -0,0 +1,98 @@
+import pytest
+from datetime import datetime, date, time, timedelta
+from app import db
+from app.models import Agendamento, Prontuario
+from app.agenda import reagendar_agendamento
+from app.recorrencia import estender_recorrencias, datas_da_serie
+
+
+@pytest.fixture
+def dados(app, criar_usuario):
+    """Psicólogo e dois pacientes com recorrência ativa às segundas"""
+    psicologo_id = criar_usuario('Dra. Ana Lima', 'ana@teste.com', 'psicologo').id
+    pacientes = [
+        criar_usuario('Carla Souza', 'carla@teste.com', 'paciente').id,
+        criar_usuario('Diego Alves', 'diego@teste.com', 'paciente').id,
+    ]
+    for paciente_id, horario in zip(pacientes, [time(9, 0), time(10, 0)]):
+        db.session.add(Prontuario(
+            paciente_id=paciente_id, psicologo_id=psicologo_id, recorrencia_ativa=True,
+            recorrencia_dia_semana=0, recorrencia_horario=horario
+        ))
+    db.session.commit()
+    return {'psicologo_id': psicologo_id, 'pacientes': pacientes}
+
+
+# Domingo: a série começa na segunda-feira seguinte
+HOJE = date(2030, 1, 6)
+
+
+class TestRecorrencia:
+    """Testes da extensão das recorrências até o horizonte"""
+
+    def test_datas_da_serie(self):
+        datas = datas_da_serie(0, time(9, 0), date(2030, 1, 7), date(2030, 1, 28))
+        assert datas[0] == datetime(2030, 1, 7, 9, 0)
+        assert len(datas) == 4
+
+    def test_estende_ate_o_horizonte(self, app, dados):
+        totais = estender_recorrencias(horizonte_semanas=4, tamanho_lote=1, hoje=HOJE)
+        assert totais == {'prontuarios': 2, 'criados': 8, 'conflitos': 0}
+        agendamento = Agendamento.query.order_by(Agendamento.data_hora).first()
+        assert agendamento.data_hora == datetime(2030, 1, 7, 9, 0)
+        assert agendamento.data_hora_fim == datetime(2030, 1, 7, 10, 0)
+
+        # Rodar de novo não duplica; avançar o horizonte acrescenta uma semana por série
+        assert estender_recorrencias(horizonte_semanas=4, hoje=HOJE)['criados'] == 0
+        assert estender_recorrencias(horizonte_semanas=5, hoje=HOJE)['criados'] == 2
+
+    def test_nao_recria_cancelada_nem_sobrepoe(self, app, dados):
+        db.session.add_all([
+            Agendamento(paciente_id=dados['pacientes'][0], psicologo_id=dados['psicologo_id'],
+                        data_hora=datetime(2030, 1, 7, 9, 0), status='cancelado'),
+            # Sessão estendida de outro paciente ocupa o horário das 10:00
+            Agendamento(paciente_id=dados['pacientes'][0], psicologo_id=dados['psicologo_id'],
+                        data_hora=datetime(2030, 1, 14, 9, 30), duracao_minutos=90),
+        ])
+        db.session.commit()
+        totais = estender_recorrencias(horizonte_semanas=2, hoje=HOJE)
+        # 09:00 de 14/01 e 10:00 de 14/01 se sobrepõem à sessão estendida
+        assert totais == {'prontuarios': 2, 'criados': 1, 'conflitos': 2}
+
+    def test_nao_recria_sessao_reagendada(self, app, dados):
+        """A sessão da série movida para outro dia não volta à data original"""
+        estender_recorrencias(horizonte_semanas=2, hoje=HOJE)
+        sessao = Agendamento.query.filter_by(
+            paciente_id=dados['pacientes'][0], data_hora=datetime(2030, 1, 14, 9, 0)
+        ).one()
+        reagendar_agendamento(sessao, datetime(2030, 1, 16, 15, 0), respeitar_expediente=False)
+
+        assert estender_recorrencias(horizonte_semanas=2, hoje=HOJE)['criados'] == 0
+        # Nem quando a sessão foi levada para depois do horizonte
+        reagendar_agendamento(sessao, datetime(2030, 3, 4, 15, 0), respeitar_expediente=False)
+        assert estender_recorrencias(horizonte_semanas=2, hoje=HOJE)['criados'] == 0
+        assert Agendamento.query.filter_by(paciente_id=dados['pacientes'][0]).count() == 2
+
+    def test_recorrencia_inativa_ignorada(self, app, dados):
+        Prontuario.query.update({'recorrencia_ativa': False})
+        db.session.commit()
+        assert estender_recorrencias(hoje=HOJE)['prontuarios'] == 0
+
+    def test_comando(self, runner, app, dados):
+        result = runner.invoke(args=['estender-recorrencias', '--semanas', '1'])
+        assert '2 recorrência(s) ativa(s) verificada(s).' in result.output
+        assert '2 agendamento(s) criado(s)' in result.output
+
+    def test_configurar_recorrencia(self, app, client, dados):
+        db.session.add(Agendamento(
+            paciente_id=dados['pacientes'][0], psicologo_id=dados['psicologo_id'],
+            data_hora=datetime.combine(date.today() - timedelta(days=7), time(9, 0)), status='realizado'
+        ))
+        db.session.commit()
+        client.post('/auth/login', data={'email': 'ana@teste.com', 'senha': 'senha123', 'tipo_usuario': 'psicologo'})
+        response = client.post(f"/psicologo/prontuario/{dados['pacientes'][0]}/recorrencia",
+                               json={'dia_semana': 2, 'horario': '15:00'})
+        assert response.status_code == 200
+        assert response.get_json()['agendamentos_criados'] == 12
+        prontuario = Prontuario.query.filter_by(paciente_id=dados['pacientes'][0]).one()
+        assert prontuario.recorrencia_ativa and prontuario.recorrencia_dia_semana == 2
@@ -0,0 +1,155 @@
+import pytest
+from datetime import datetime, date, time, timedelta
+from app import db
+from app.models import Agendamento, HorarioAtendimento, ReservaHorario
+from app.agenda import criar_agendamentos_em_lote
+from app.reservas import horarios_reservados, reservado_por_outro, reservar_horario, varrer_reservas_expiradas
+
+
+@pytest.fixture
+def psicologo_id(app, criar_usuario):
+    psicologo = criar_usuario('Dra. Ana Lima', 'ana@teste.com', 'psicologo')
+    for dia in range(7):
+        db.session.add(HorarioAtendimento(
+            psicologo_id=psicologo.id, dia_semana=dia, hora_inicio=time(8, 0), hora_fim=time(10, 0)
+        ))
+    db.session.commit()
+    return psicologo.id
+
+
+@pytest.fixture
+def pacientes(app, criar_usuario):
+    ids = (criar_usuario('Carla Souza', 'carla@teste.com', 'paciente').id,
+           criar_usuario('Diego Alves', 'diego@teste.com', 'paciente').id)
+    db.session.commit()
+    return ids
+
+
+@pytest.fixture
+def amanha():
+    return date.today() + timedelta(days=1)
+
+
+def login(client, email):
+    client.post('/auth/login', data={'email': email, 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+
+
+class TestReservas:
+    """Testes das reservas temporárias de horários"""
+
+    def test_reserva_exclusiva(self, app, psicologo_id, pacientes, amanha):
+        """Um horário reservado não pode ser reservado por outro paciente"""
+        data_hora = datetime.combine(amanha, time(8, 0))
+        assert reservar_horario(pacientes[0], psicologo_id, data_hora) is not None
+        assert reservar_horario(pacientes[1], psicologo_id, data_hora) is None
+        # O próprio paciente pode renovar a reserva
+        assert reservar_horario(pacientes[0], psicologo_id, data_hora) is not None
+
+    def test_paciente_mantem_uma_reserva(self, app, psicologo_id, pacientes, amanha):
+        """Escolher outro horário libera a reserva anterior"""
+        reservar_horario(pacientes[0], psicologo_id, datetime.combine(amanha, time(8, 0)))
+        reservar_horario(pacientes[0], psicologo_id, datetime.combine(amanha, time(9, 0)))
+        assert ReservaHorario.query.count() == 1
+        assert reservar_horario(pacientes[1], psicologo_id, datetime.combine(amanha, time(8, 0)))
+
+    def test_falha_mantem_reserva_anterior(self, app, psicologo_id, pacientes, amanha):
+        """Uma nova escolha recusada não libera a reserva que o paciente já tinha"""
+        oito_horas = datetime.combine(amanha, time(8, 0))
+        reservar_horario(pacientes[0], psicologo_id, oito_horas)
+        reservar_horario(pacientes[1], psicologo_id, datetime.combine(amanha, time(9, 0)))
+        assert reservar_horario(pacientes[0], psicologo_id, datetime.combine(amanha, time(9, 0))) is None
+        db.session.expire_all()
+        assert ReservaHorario.query.filter_by(paciente_id=pacientes[0]).one().data_hora == oito_horas
+
+    def test_reserva_bloqueia_intervalo(self, app, psicologo_id, pacientes, amanha):
+        """Uma reserva de 120 minutos às 08:00 impede reservar e agendar às 09:00"""
+        assert reservar_horario(pacientes[0], psicologo_id, datetime.combine(amanha, time(8, 0)),
+                                duracao_minutos=120) is not None
+        nove_horas = datetime.combine(amanha, time(9, 0))
+        assert reservar_horario(pacientes[1], psicologo_id, nove_horas) is None
+        assert reservado_por_outro(psicologo_id, nove_horas, pacientes[1])
+        assert not reservado_por_outro(psicologo_id, nove_horas, pacientes[0])
+        assert horarios_reservados(psicologo_id, amanha, ['08:00', '09:00', '10:00'],
+                                   exceto_paciente_id=pacientes[1]) == {'08:00', '09:00'}
+        assert reservar_horario(pacientes[1], psicologo_id, datetime.combine(amanha, time(10, 0))) is not None
+
+    def test_lote_respeita_intervalo_reservado(self, app, psicologo_id, pacientes, amanha):
+        reservar_horario(pacientes[0], psicologo_id, datetime.combine(amanha, time(8, 0)), duracao_minutos=120)
+        item = {'paciente_id': pacientes[1], 'psicologo_id': psicologo_id,
+                'data_hora': datetime.combine(amanha, time(9, 0)), 'duracao_minutos': 60}
+        resultado, = criar_agendamentos_em_lote([item])
+        assert resultado['erro'] == 'Horário reservado por outro paciente'
+
+    def test_reserva_vencida_nao_bloqueia(self, app, psicologo_id, pacientes, amanha):
+        data_hora = datetime.combine(amanha, time(8, 0))
+        reserva = reservar_horario(pacientes[0], psicologo_id, data_hora)
+        reserva.expira_em = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        assert reservar_horario(pacientes[1], psicologo_id, data_hora) is not None
+
+    def test_varredura(self, app, psicologo_id, pacientes, amanha):
+        reserva = reservar_horario(pacientes[0], psicologo_id, datetime.combine(amanha, time(8, 0)))
+        reservar_horario(pacientes[1], psicologo_id, datetime.combine(amanha, time(9, 0)))
+        reserva.expira_em = datetime.utcnow() - timedelta(minutes=1)
+        db.session.commit()
+        assert varrer_reservas_expiradas() == 1
+        assert ReservaHorario.query.count() == 1
+
+    def test_comando_limpar_reservas(self, runner, app):
+        result = runner.invoke(args=['limpar-reservas'])
+        assert '0 reserva(s) vencida(s) removida(s).' in result.output
+        assert '0 oferta(s) da lista de espera vencida(s).' in result.output
+
+
+class TestReservasRotas:
+    """Testes das rotas do paciente com reservas"""
+
+    def test_reservar_e_ocultar_para_outros(self, app, client, psicologo_id, pacientes, amanha):
+        login(client, 'carla@teste.com')
+        response = client.post('/paciente/api/reservar-horario', json={
+            'psicologo_id': psicologo_id, 'data': amanha.isoformat(), 'horario': '08:00'
+        })
+        assert response.status_code == 201
+        url = f'/paciente/api/horarios-disponiveis?psicologo_id={psicologo_id}&data={amanha.isoformat()}'
+        assert client.get(url).get_json() == {'horarios': ['08:00', '09:00']}
+
+        client.get('/auth/logout')
+        login(client, 'diego@teste.com')
+        assert client.get(url).get_json() == {'horarios': ['09:00']}
+        response = client.post('/paciente/api/reservar-horario', json={
+            'psicologo_id': psicologo_id, 'data': amanha.isoformat(), 'horario': '08:00'
+        })
+        assert response.status_code == 409
+
+    def test_agendamento_respeita_reserva(self, app, client, psicologo_id, pacientes, amanha):
+        reservar_horario(pacientes[0], psicologo_id, datetime.combine(amanha, time(8, 0)))
+        login(client, 'diego@teste.com')
+        client.post('/paciente/agendar_modal', data={
+            'psicologo_id': str(psicologo_id), 'data': amanha.isoformat(), 'horario': '08:00'
+        })
+        assert Agendamento.query.count() == 0
+
+    def test_agendamento_respeita_intervalo_reservado(self, app, client, psicologo_id, pacientes, amanha):
+        reservar_horario(pacientes[0], psicologo_id, datetime.combine(amanha, time(8, 0)), duracao_minutos=120)
+        login(client, 'diego@teste.com')
+        url = f'/paciente/api/horarios-disponiveis?psicologo_id={psicologo_id}&data={amanha.isoformat()}'
+        assert client.get(url).get_json() == {'horarios': []}
+        client.post('/paciente/agendar_modal', data={
+            'psicologo_id': str(psicologo_id), 'data': amanha.isoformat(), 'horario': '09:00'
+        })
+        assert Agendamento.query.count() == 0
+
+    def test_agendamento_consome_reserva(self, app, client, psicologo_id, pacientes, amanha):
+        reservar_horario(pacientes[0], psicologo_id, datetime.combine(amanha, time(8, 0)))
+        login(client, 'carla@teste.com')
+        client.post('/paciente/agendar_modal', data={
+            'psicologo_id': str(psicologo_id), 'data': amanha.isoformat(), 'horario': '08:00'
+        })
+        assert Agendamento.query.count() == 1
+        assert ReservaHorario.query.count() == 0
+
+    def test_cancelar_reserva(self, app, client, psicologo_id, pacientes, amanha):
+        reserva = reservar_horario(pacientes[0], psicologo_id, datetime.combine(amanha, time(8, 0)))
+        login(client, 'carla@teste.com')
+        assert client.post(f'/paciente/api/reservas/{reserva.id}/cancelar').status_code == 200
+        assert ReservaHorario.query.count() == 0
@@ -0,0 +1,83 @@
+import threading
+import pytest
+from app import db, senhas
+from app.models import Usuario
+
+
+@pytest.fixture
+def usuario(app):
+    usuario = Usuario(nome_completo='Carla Souza', email='carla@teste.com', tipo_usuario='paciente')
+    usuario.senha_hash = senhas.gerar_hash('senha123', 'pbkdf2:sha256:2000')
+    db.session.add(usuario)
+    db.session.commit()
+    return usuario
+
+
+class TestSenhas:
+    """Testes do hash de senhas configurável"""
+
+    def test_metodo_configurado(self, app):
+        usuario = Usuario(nome_completo='Ana', email='ana@teste.com', tipo_usuario='paciente')
+        usuario.set_senha('segredo')
+        assert usuario.senha_hash.startswith('pbkdf2:sha256:1000$')
+        assert usuario.versao_senha == 1
+        assert usuario.check_senha('segredo') and not usuario.check_senha('outra')
+
+    def test_normalizar(self):
+        assert senhas.normalizar('scrypt') == 'scrypt:32768:8:1'
+        assert senhas.normalizar('pbkdf2:sha512') == f'pbkdf2:sha512:{senhas.DEFAULT_PBKDF2_ITERATIONS}'
+        with pytest.raises(ValueError):
+            senhas.normalizar('md5')
+
+    def test_rehash_no_login(self, app, client, usuario):
+        versao = usuario.versao_senha
+        response = client.post('/auth/api/login', json={
+            'email': 'carla@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'
+        })
+        assert response.status_code == 200
+        db.session.refresh(usuario)
+        assert usuario.senha_hash.startswith('pbkdf2:sha256:1000$')
+        # Refazer o hash não é troca de senha: links e tokens continuam válidos
+        assert usuario.versao_senha == versao
+        assert not senhas.precisa_rehash(usuario.senha_hash)
+
+    def test_senha_errada_nao_refaz_hash(self, app, client, usuario):
+        hash_antigo = usuario.senha_hash
+        response = client.post('/auth/api/login', json={
+            'email': 'carla@teste.com', 'senha': 'errada', 'tipo_usuario': 'paciente'
+        })
+        assert response.status_code == 401
+        db.session.refresh(usuario)
+        assert usuario.senha_hash == hash_antigo
+
+    def test_pool_limitado(self):
+        pool = senhas.PoolSenhas(threads=1, fila=0)
+        iniciada, liberar = threading.Event(), threading.Event()
+
+        def ocupar():
+            iniciada.set()
+            liberar.wait(5)
+
+        ocupada = threading.Thread(target=pool.executar, args=(ocupar,))
+        ocupada.start()
+        try:
+            assert iniciada.wait(5)
+            with pytest.raises(senhas.SobrecargaSenhas):
+                pool.executar(senhas.verificar, 'pbkdf2:sha256:1000$x$y', 'senha')
+            assert pool.recusadas == 1
+        finally:
+            liberar.set()
+            ocupada.join()
+        assert pool.executar(lambda: 'ok') == 'ok'
+
+    def test_login_com_pool(self, app, client, usuario):
+        app.extensions['senhas'] = senhas.PoolSenhas(threads=2, fila=2)
+        response = client.post('/auth/api/token', json={
+            'email': 'carla@teste.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'
+        })
+        assert response.status_code == 200
+
+    def test_comando_benchmark(self, app, runner):
+        resultado = runner.invoke(args=['benchmark-senhas', '--amostras', '2', '--threads', '2'])
+        assert resultado.exit_code == 0
+        assert 'pbkdf2:sha256:1000' in resultado.output and 'login(s)/s' in resultado.output
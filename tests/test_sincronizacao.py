@@ -0,0 +1,126 @@
+import pytest
+from datetime import datetime, date, time, timedelta
+from app import db
+from app.models import Agendamento, AgendamentoRemovido
+from app.agenda import atualizar_status_em_lote
+
+
+@pytest.fixture
+def agenda(app, criar_usuario):
+    """Psicóloga com três consultas: duas de Carla e uma de Davi"""
+    app.config['SINCRONIZACAO_MARGEM_SEGUNDOS'] = 0
+    app.config['SINCRONIZACAO_SOBREPOSICAO_SEGUNDOS'] = 0
+    perfis = {}
+    for nome, email, tipo in [('Dra. Ana Lima', 'ana@teste.com', 'psicologo'),
+                              ('Carla Souza', 'carla@teste.com', 'paciente'),
+                              ('Davi Rocha', 'davi@teste.com', 'paciente')]:
+        perfis[email] = criar_usuario(nome, email, tipo).id
+
+    amanha = date.today() + timedelta(days=1)
+    ids = []
+    for hora, paciente in [(9, 'carla@teste.com'), (10, 'carla@teste.com'), (11, 'davi@teste.com')]:
+        agendamento = Agendamento(
+            paciente_id=perfis[paciente], psicologo_id=perfis['ana@teste.com'],
+            data_hora=datetime.combine(amanha, time(hora, 0)), status='agendado'
+        )
+        db.session.add(agendamento)
+        db.session.flush()
+        ids.append(agendamento.id)
+    db.session.commit()
+    return perfis, ids
+
+
+def login(client, email):
+    tipo = 'psicologo' if email == 'ana@teste.com' else 'paciente'
+    client.post('/auth/login', data={'email': email, 'senha': 'senha123', 'tipo_usuario': tipo})
+
+
+def sincronizar(client, cursor=None, limite=None):
+    parametros = {}
+    if cursor:
+        parametros['cursor'] = cursor
+    if limite:
+        parametros['limite'] = limite
+    response = client.get('/api/sincronizacao/agendamentos', query_string=parametros)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+class TestSincronizacao:
+    """Testes da sincronização incremental de agendamentos"""
+
+    def test_primeira_sincronizacao_paginada(self, app, client, agenda):
+        _, ids = agenda
+        login(client, 'ana@teste.com')
+        recebidos = []
+        resultado = sincronizar(client, limite=2)
+        recebidos += [a['id'] for a in resultado['alterados']]
+        assert resultado['mais'] is True
+
+        resultado = sincronizar(client, resultado['cursor'], limite=2)
+        recebidos += [a['id'] for a in resultado['alterados']]
+        assert resultado['mais'] is False
+        assert sorted(recebidos) == ids
+
+        # Sem alterações, nada é reenviado
+        vazio = sincronizar(client, resultado['cursor'])
+        assert vazio['alterados'] == [] and vazio['removidos'] == []
+
+    def test_apenas_alteracoes_e_remocoes(self, app, client, agenda):
+        perfis, ids = agenda
+        login(client, 'ana@teste.com')
+        cursor = sincronizar(client)['cursor']
+
+        atualizar_status_em_lote(perfis['ana@teste.com'], [{'agendamento_id': ids[0], 'status': 'confirmado'}])
+        db.session.delete(db.session.get(Agendamento, ids[2]))
+        db.session.commit()
+        assert AgendamentoRemovido.query.filter_by(agendamento_id=ids[2]).count() == 1
+
+        resultado = sincronizar(client, cursor)
+        assert [(a['id'], a['status']) for a in resultado['alterados']] == [(ids[0], 'confirmado')]
+        assert resultado['removidos'] == [ids[2]]
+        assert sincronizar(client, resultado['cursor'])['alterados'] == []
+
+    def test_escopo_do_paciente(self, app, client, agenda):
+        _, ids = agenda
+        login(client, 'davi@teste.com')
+        resultado = sincronizar(client)
+        assert [a['id'] for a in resultado['alterados']] == [ids[2]]
+        assert resultado['alterados'][0]['psicologo'] == 'Dra. Ana Lima'
+
+    def test_alteracoes_recentes_aguardam_margem(self, app, client, agenda):
+        app.config['SINCRONIZACAO_MARGEM_SEGUNDOS'] = 60
+        login(client, 'ana@teste.com')
+        assert sincronizar(client)['alterados'] == []
+
+    def test_sobreposicao_entrega_commit_atrasado(self, app, client, agenda):
+        """Uma linha gravada antes do último item entregue, mas confirmada depois, chega na seguinte"""
+        app.config['SINCRONIZACAO_SOBREPOSICAO_SEGUNDOS'] = 60
+        perfis, ids = agenda
+        login(client, 'ana@teste.com')
+        primeira = sincronizar(client)
+        ultimo = max(datetime.fromisoformat(a['data_atualizacao']) for a in primeira['alterados'])
+
+        atrasado = Agendamento(
+            paciente_id=perfis['davi@teste.com'], psicologo_id=perfis['ana@teste.com'],
+            data_hora=datetime.combine(date.today() + timedelta(days=2), time(9, 0)),
+            data_atualizacao=ultimo - timedelta(seconds=5)
+        )
+        db.session.add(atrasado)
+        db.session.commit()
+
+        # Os itens da janela de sobreposição voltam junto; o cliente deduplica por id
+        recebidos = [a['id'] for a in sincronizar(client, primeira['cursor'])['alterados']]
+        assert atrasado.id in recebidos
+        assert set(recebidos) <= set(ids) | {atrasado.id}
+
+    def test_cursor_de_outro_usuario(self, app, client, agenda):
+        login(client, 'carla@teste.com')
+        cursor = sincronizar(client)['cursor']
+        client.get('/auth/logout')
+        login(client, 'davi@teste.com')
+        response = client.get('/api/sincronizacao/agendamentos', query_string={'cursor': cursor})
+        assert response.status_code == 400
+
+    def test_requer_autenticacao(self, app, client, agenda):
+        assert client.get('/api/sincronizacao/agendamentos').status_code == 401
@@ -0,0 +1,114 @@
+import pytest
+from datetime import datetime, date, time, timedelta
+from app import db
+from app.models import Agendamento
+from sqlalchemy import event
+from app.agenda import encerrar_agendamentos_vencidos, atualizar_status_em_lote
+
+
+@pytest.fixture
+def dados(app, criar_usuario):
+    """Dois psicólogos; a Dra. Ana tem três consultas hoje e o Dr. Bruno uma"""
+    ana = criar_usuario('Dra. Ana Lima', 'ana@teste.com', 'psicologo').id
+    bruno = criar_usuario('Dr. Bruno Reis', 'bruno@teste.com', 'psicologo').id
+    paciente = criar_usuario('Carla Souza', 'carla@teste.com', 'paciente').id
+
+    ids = []
+    for psicologo_id, hora, status in [(ana, 8, 'agendado'), (ana, 9, 'confirmado'),
+                                       (ana, 10, 'cancelado'), (bruno, 11, 'agendado')]:
+        agendamento = Agendamento(
+            paciente_id=paciente, psicologo_id=psicologo_id, status=status,
+            data_hora=datetime.combine(date.today(), time(hora, 0))
+        )
+        db.session.add(agendamento)
+        db.session.flush()
+        ids.append(agendamento.id)
+    db.session.commit()
+    return ids
+
+
+@pytest.fixture
+def logado(client, dados):
+    client.post('/auth/login', data={'email': 'ana@teste.com', 'senha': 'senha123', 'tipo_usuario': 'psicologo'})
+    return client
+
+
+class TestStatusEmLote:
+    """Testes da atualização de status de várias consultas"""
+
+    def test_atualiza_e_reporta_por_item(self, app, logado, dados):
+        response = logado.post('/psicologo/api/agendamentos/status', json={'agendamentos': [
+            {'agendamento_id': dados[0], 'status': 'realizado'},
+            {'agendamento_id': dados[1], 'status': 'ausencia'},
+            {'agendamento_id': dados[2], 'status': 'realizado'},
+            {'agendamento_id': dados[3], 'status': 'realizado'},
+            {'agendamento_id': dados[0], 'status': 'agendado'},
+        ]})
+        assert response.status_code == 200
+        corpo = response.get_json()
+        assert corpo['atualizados'] == 2
+        assert [r['sucesso'] for r in corpo['resultados']] == [True, True, False, False, False]
+        assert corpo['resultados'][2]['erro'] == 'Consulta cancelada'
+        assert corpo['resultados'][3]['erro'] == 'Agendamento não encontrado'
+
+        db.session.expire_all()
+        assert [db.session.get(Agendamento, i).status for i in dados] == [
+            'realizado', 'ausencia', 'cancelado', 'agendado'
+        ]
+
+    def test_cancelamento_concorrente_nao_e_sobrescrito(self, app, dados):
+        """Um cancelamento entre a leitura e o UPDATE vence a alteração em lote"""
+        ana = db.session.get(Agendamento, dados[0]).psicologo_id
+        engine = db.session.connection().engine
+        pendente = [True]
+
+        def cancelar_antes_do_update(conn, cursor, sql, parametros, contexto, executemany):
+            if pendente and sql.lstrip().upper().startswith('UPDATE AGENDAMENTOS'):
+                pendente.clear()
+                cursor.execute("UPDATE agendamentos SET status = 'cancelado' WHERE id = ?", (dados[1],))
+
+        event.listen(engine, 'before_cursor_execute', cancelar_antes_do_update)
+        try:
+            resultados = atualizar_status_em_lote(ana, [
+                {'agendamento_id': dados[0], 'status': 'realizado'},
+                {'agendamento_id': dados[1], 'status': 'realizado'},
+            ])
+        finally:
+            event.remove(engine, 'before_cursor_execute', cancelar_antes_do_update)
+
+        assert [r['sucesso'] for r in resultados] == [True, False]
+        assert resultados[1]['erro'] == 'Agendamento alterado por outra operação'
+        db.session.expire_all()
+        assert db.session.get(Agendamento, dados[0]).status == 'realizado'
+        assert db.session.get(Agendamento, dados[1]).status == 'cancelado'
+
+    def test_requisicao_invalida(self, app, logado):
+        assert logado.post('/psicologo/api/agendamentos/status', json={}).status_code == 400
+        itens = [{'agendamento_id': i, 'status': 'realizado'} for i in range(1, 202)]
+        assert logado.post('/psicologo/api/agendamentos/status', json={'agendamentos': itens}).status_code == 400
+
+
+class TestEncerramentoAutomatico:
+    """Testes da transição automática de consultas vencidas"""
+
+    def test_marca_vencidas_em_lotes(self, app, dados):
+        depois = datetime.combine(date.today() + timedelta(days=2), time(0, 0))
+
+        assert encerrar_agendamentos_vencidos(agora=depois, simular=True) == 3
+        assert Agendamento.query.filter_by(status='pendente_revisao').count() == 0
+
+        assert encerrar_agendamentos_vencidos(agora=depois, tamanho_lote=2) == 3
+        assert [db.session.get(Agendamento, i).status for i in dados] == [
+            'pendente_revisao', 'pendente_revisao', 'cancelado', 'pendente_revisao'
+        ]
+        assert encerrar_agendamentos_vencidos(agora=depois) == 0
+
+    def test_politica_realizado(self, app, dados):
+        app.config['AGENDAMENTO_STATUS_VENCIDO'] = 'realizado'
+        depois = datetime.combine(date.today() + timedelta(days=2), time(0, 0))
+        assert encerrar_agendamentos_vencidos(agora=depois) == 3
+        assert Agendamento.query.filter_by(status='realizado').count() == 3
+
+    def test_comando(self, runner, app, dados):
+        result = runner.invoke(args=['encerrar-agendamentos', '--simular'])
+        assert '0 consulta(s) vencida(s) seriam marcadas como pendente_revisao.' in result.output
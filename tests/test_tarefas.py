@@ -0,0 +1,82 @@
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from app.models import Tarefa
+from app import tarefas
+
+EXECUCOES = []
+
+
+@tarefas.registrar('teste_registrar')
+def tarefa_de_teste(valor, falhar=False):
+    if falhar:
+        raise RuntimeError('falha proposital')
+    EXECUCOES.append(valor)
+
+
+@pytest.fixture(autouse=True)
+def limpar_execucoes():
+    EXECUCOES.clear()
+
+
+class TestFilaTarefas:
+    """Testes da fila de tarefas em segundo plano"""
+
+    def test_prioridade_e_agendamento(self, app):
+        tarefas.enfileirar('teste_registrar', valor='baixa')
+        tarefas.enfileirar('teste_registrar', prioridade=10, valor='alta')
+        tarefas.enfileirar('teste_registrar', executar_em=datetime.utcnow() + timedelta(hours=1), valor='depois')
+        db.session.commit()
+
+        while tarefas.processar_proxima():
+            pass
+        assert EXECUCOES == ['alta', 'baixa']
+        assert Tarefa.query.filter_by(status='pendente').count() == 1
+        assert Tarefa.query.filter_by(status='concluida').first().duracao_ms is not None
+
+    def test_novas_tentativas(self, app):
+        app.config['TAREFAS_ESPERA_SEGUNDOS'] = 0
+        tarefa = tarefas.enfileirar('teste_registrar', max_tentativas=2, valor=1, falhar=True)
+        db.session.commit()
+
+        tarefas.processar_proxima()
+        assert db.session.get(Tarefa, tarefa.id).status == 'pendente'
+        tarefas.processar_proxima()
+        tarefa = db.session.get(Tarefa, tarefa.id)
+        assert (tarefa.status, tarefa.tentativas) == ('falhou', 2)
+        assert 'falha proposital' in tarefa.erro
+
+    def test_tarefa_nao_registrada(self, app):
+        with pytest.raises(ValueError):
+            tarefas.enfileirar('inexistente')
+
+    def test_reivindicacao_unica(self, app):
+        tarefas.enfileirar('teste_registrar', valor=1)
+        db.session.commit()
+        assert tarefas.reivindicar() is not None
+        assert tarefas.reivindicar() is None
+
+    def test_recupera_abandonadas(self, app):
+        tarefa = tarefas.enfileirar('teste_registrar', valor=1)
+        db.session.commit()
+        tarefas.reivindicar()
+        db.session.get(Tarefa, tarefa.id).iniciada_em = datetime.utcnow() - timedelta(hours=2)
+        db.session.commit()
+        assert tarefas.recuperar_abandonadas() == 1
+        assert db.session.get(Tarefa, tarefa.id).status == 'pendente'
+
+    def test_trabalhador_esvazia_fila(self, app):
+        for valor in range(20):
+            tarefas.enfileirar('teste_registrar', valor=valor)
+        db.session.commit()
+        # O banco de testes em memória tem uma única conexão: um trabalhador por vez
+        tarefas.executar_trabalhador(app, threads=1, ate_esvaziar=True)
+        assert sorted(EXECUCOES) == list(range(20))
+        assert tarefas.estatisticas()['teste_registrar']['por_status'] == {'concluida': 20}
+
+    def test_comandos(self, runner, app):
+        result = runner.invoke(args=['enfileirar-tarefa', 'limpar_reservas'])
+        assert 'enfileirada' in result.output
+        result = runner.invoke(args=['worker', '--threads', '1', '--ate-esvaziar'])
+        assert result.exit_code == 0
+        assert Tarefa.query.one().status == 'concluida'
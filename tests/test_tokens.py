@@ -0,0 +1,93 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import db
+from app.models import TokenRevogado
+from app import tokens
+
+
+@pytest.fixture
+def psicologo(app, criar_usuario):
+    usuario = criar_usuario('Dra. Ana Lima', 'ana@teste.com', 'psicologo').usuario
+    db.session.commit()
+    return usuario
+
+
+def emitir(client):
+    response = client.post('/auth/api/token', json={
+        'email': 'ana@teste.com', 'senha': 'senha123', 'tipo_usuario': 'psicologo'
+    })
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+class TestTokens:
+    """Testes da autenticação por JWT"""
+
+    def test_acesso_sem_consultar_usuario(self, app, client, psicologo):
+        par = emitir(client)
+        assert par['token_type'] == 'Bearer' and par['expires_in'] == app.config['JWT_ACCESS_TOKEN_EXPIRES']
+
+        # A primeira requisição carrega a lista de revogados do processo
+        client.get('/api/v1/horarios-atendimento', headers=bearer(par['access_token']))
+
+        consultas = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: consultas.append(args[2]))
+        response = client.get('/api/v1/horarios-atendimento', headers=bearer(par['access_token']))
+        assert response.status_code == 200
+        # Apenas a listagem: nem o usuário nem o perfil são lidos do banco
+        assert len(consultas) == 1 and 'horarios_atendimento' in consultas[0]
+
+    def test_token_invalido_ou_expirado(self, app, client, psicologo):
+        assert client.get('/api/v1/usuarios', headers=bearer('lixo')).status_code == 401
+
+        with app.test_request_context():
+            antigo = tokens.emitir_tokens(psicologo, agora=datetime.utcnow() - timedelta(hours=1))
+        assert client.get('/api/v1/usuarios', headers=bearer(antigo['access_token'])).status_code == 401
+        # O refresh não serve como token de acesso
+        par = emitir(client)
+        assert client.get('/api/v1/usuarios', headers=bearer(par['refresh_token'])).status_code == 401
+
+    def test_renovacao_com_rotacao(self, app, client, psicologo):
+        par = emitir(client)
+        response = client.post('/auth/api/token/renovar', json={'refresh_token': par['refresh_token']})
+        assert response.status_code == 200
+        novo = response.get_json()
+        assert client.get('/api/v1/usuarios', headers=bearer(novo['access_token'])).status_code == 200
+
+        # O refresh usado fica revogado
+        response = client.post('/auth/api/token/renovar', json={'refresh_token': par['refresh_token']})
+        assert response.status_code == 401
+
+        # Trocar a senha invalida os refresh tokens emitidos
+        psicologo.set_senha('nova-senha')
+        db.session.commit()
+        response = client.post('/auth/api/token/renovar', json={'refresh_token': novo['refresh_token']})
+        assert response.status_code == 401
+
+    def test_revogacao(self, app, client, psicologo):
+        par = emitir(client)
+        headers = bearer(par['access_token'])
+        assert client.get('/api/v1/usuarios', headers=headers).status_code == 200
+
+        response = client.post('/auth/api/token/revogar', headers=headers, json={'refresh_token': par['refresh_token']})
+        assert response.get_json()['revogados'] == 2
+        assert client.get('/api/v1/usuarios', headers=headers).status_code == 401
+        assert client.post('/auth/api/token/renovar', json={'refresh_token': par['refresh_token']}).status_code == 401
+
+    def test_limpeza_de_revogados(self, app, psicologo):
+        db.session.add(TokenRevogado(jti='a' * 32, expira_em=datetime.utcnow() - timedelta(minutes=1)))
+        db.session.add(TokenRevogado(jti='b' * 32, expira_em=datetime.utcnow() + timedelta(minutes=1)))
+        db.session.commit()
+        assert tokens.limpar_revogados() == 1
+        assert [t.jti for t in TokenRevogado.query.all()] == ['b' * 32]
+
+    def test_credenciais_invalidas(self, app, client, psicologo):
+        response = client.post('/auth/api/token', json={
+            'email': 'ana@teste.com', 'senha': 'errada', 'tipo_usuario': 'psicologo'
+        })
+        assert response.status_code == 401